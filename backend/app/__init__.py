@@ -0,0 +1,5 @@
+import time
+
+# Inicio de la importación del paquete: origen de las fases del arranque
+# (services/startup.py)
+IMPORT_STARTED = time.perf_counter()
@@ -9,6 +9,13 @@ class Settings(BaseSettings):
     supabase_url: str = ""
     supabase_jwt_secret: str = ""
     supabase_anon_key: str = ""
+    # JWKS (por defecto {supabase_url}/auth/v1/.well-known/jwks.json)
+    supabase_jwks_url: str = ""
+    jwks_refresh_interval: float = 600.0
+    jwks_min_refetch_interval: float = 30.0
+
+    # Caché de JWT verificados (0 deshabilita)
+    jwt_cache_size: int = 1024
 
     # CORS
     allowed_origins: str = "http://localhost:3000"
@@ -18,8 +25,95 @@ class Settings(BaseSettings):
     metadata_path: str = "./artifacts/metadata_v3.json"
     features_path: str = "./artifacts/feature_names_v3.json"
 
-    # Rate limiting
+    # Registro de modelos: versión de los artefactos anteriores (vacío = se
+    # deduce del nombre del pipeline) y versiones adicionales separadas por
+    # coma, cargadas desde artifacts_dir (pipeline_completo_{v}.pkl, ...)
+    model_version: str = ""
+    extra_model_versions: str = ""
+    artifacts_dir: str = "./artifacts"
+
+    # Bundles de arranque rápido (python -m app.tools.export_bundle).
+    # bundle_path: bundle explícito del modelo por defecto; con use_bundles
+    # se usa {artifacts_dir}/bundle_{v} si existe. bundle_verify recalcula
+    # el SHA-256 de cada arreglo al abrirlo.
+    bundle_path: str = ""
+    use_bundles: bool = True
+    bundle_verify: bool = True
+
+    # Rate limiting por usuario (token bucket, claim `sub` del JWT).
+    # rate_limit: "<n>/<second|minute|hour|day>"; rate_limit_burst: capacidad
+    # del bucket (0 = n). rate_limit_store: archivo compartido por los workers
+    # del host (vacío = /dev/shm/febril-rate-limit; "memory" = por proceso).
+    rate_limit_enabled: bool = True
     rate_limit: str = "30/minute"
+    rate_limit_burst: int = 0
+    rate_limit_store: str = ""
+    rate_limit_slots: int = 4096
+
+    # Registro de evaluaciones en el servidor (vacío = deshabilitado):
+    # postgresql://... (Supabase, requiere psycopg) o sqlite:///ruta.db
+    database_url: str = ""
+    database_pool_size: int = 4
+    persist_evaluations: bool = True
+    persist_batch_size: int = 100
+    persist_flush_interval: float = 1.0
+    persist_max_pending: int = 10_000
+    persist_max_backoff: float = 30.0
+
+    # Monitoreo de deriva de entradas (GET /api/model/drift). Ventanas
+    # deslizantes sobre buckets de drift_bucket_seconds (memoria fija por
+    # versión); referencia en {artifacts_dir}/reference_stats_{v}.json
+    # (python -m app.tools.reference_stats) o derivada del modelo. Alertas:
+    # PSI de categóricas y clases, diferencia de medias en desviaciones de
+    # referencia y diferencia absoluta de tasas (faltantes, no vistas).
+    # drift_max_pending: registros en cola entre agregaciones.
+    drift_enabled: bool = True
+    drift_windows: str = "1h,24h,7d"
+    drift_bucket_seconds: int = 600
+    drift_fold_interval: float = 5.0
+    drift_max_pending: int = 10_000
+    drift_min_samples: int = 30
+    drift_psi_threshold: float = 0.25
+    drift_smd_threshold: float = 0.5
+    drift_rate_threshold: float = 0.1
+
+    # Métricas Prometheus en /api/metrics (token opcional: Authorization: Bearer)
+    metrics_enabled: bool = True
+    metrics_token: str = ""
+
+    # Predicción por lotes
+    batch_max_size: int = 500
+
+    # Puntuación masiva en streaming (/api/predict/stream)
+    stream_chunk_size: int = 256
+    stream_max_line_length: int = 1_000_000
+
+    # Servidor pre-fork (python -m app.server): workers que heredan los
+    # modelos ya cargados por el proceso padre
+    server_workers: int = 1
+    server_memory_report_interval: float = 300.0
+    server_graceful_timeout: float = 30.0
+    # Cada cuántos segundos publica cada worker sus métricas y su deriva
+    server_share_interval: float = 2.0
+    # Reinicio de un worker que termina antes de SERVER_RESTART_RESET s:
+    # espera exponencial desde 1 s hasta este máximo
+    server_restart_max_backoff: float = 60.0
+    server_restart_reset: float = 60.0
+
+    # Ejecutor de inferencia: "thread" | "process"
+    inference_executor: str = "thread"
+    inference_workers: int = 2
+    inference_queue_size: int = 32
+    inference_retry_after: int = 1
+
+    # Caché de predicciones (0 deshabilita)
+    prediction_cache_size: int = 2048
+    prediction_cache_ttl: float = 900.0
+
+    # Micro-batching de /api/predict (opt-in)
+    microbatch_enabled: bool = False
+    microbatch_max_size: int = 32
+    microbatch_window_ms: float = 2.0
 
     class Config:
         env_file = ".env"
@@ -1,17 +1,33 @@
 """FastAPI application — Predicción de Severidad Febril Pediátrica."""
+import asyncio
+import hmac
 import logging
+import os
+import time
 from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from fastapi.responses import JSONResponse, Response
 
 from .config import get_settings
-from .services.ml_service import ml_service
-from .routes import predict, model_info
+from .services.batching import micro_batcher
+from .services.auth import jwks_url
+from .services.bundle import find_bundle
+from .services.cluster import RELOAD_SIGNAL, cluster
+from .services.database import database
+from .services.drift import drift_monitor, reference_path
+from .services.executor import inference_executor
+from .services.jwks import jwks_manager
+from .services.memory import memory_usage
+from .services.metrics import CONTENT_TYPE, MetricsMiddleware, metrics
+from .services.persistence import evaluation_writer
+from .services.rate_limit import rate_limiter
+from .services.registry import ModelSpec, model_registry, version_from_path
+from .services.startup import startup
+from .routes import predict, model_info, evaluaciones
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,8 +35,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+
+def load_models(settings):
+    """Carga (y calienta) el modelo por defecto y las versiones adicionales.
+
+    La llama el lifespan o, en modo pre-fork (app.server), el proceso padre
+    antes de crear los workers.
+    """
+    model_registry.configure_cache(
+        maxsize=settings.prediction_cache_size,
+        ttl=settings.prediction_cache_ttl,
+    )
+    model_registry.configure_bundles(verify=settings.bundle_verify)
+    default_version = settings.model_version or version_from_path(settings.pipeline_path)
+    model_registry.load(
+        ModelSpec(
+            version=default_version,
+            pipeline_path=settings.pipeline_path,
+            metadata_path=settings.metadata_path,
+            features_path=settings.features_path,
+            bundle_path=settings.bundle_path
+            or (find_bundle(settings.artifacts_dir, default_version) if settings.use_bundles else ""),
+            reference_path=reference_path(Path(settings.metadata_path).parent, default_version),
+        ),
+        default=True,
+    )
+    for version in filter(None, (v.strip() for v in settings.extra_model_versions.split(","))):
+        model_registry.load(
+            ModelSpec.from_artifacts_dir(version, settings.artifacts_dir, settings.use_bundles)
+        )
+
+
+async def warm_up():
+    """Warm-up por el ejecutor de inferencia; al terminar, la instancia está lista."""
+    try:
+        with startup.phase("warm-up"):
+            workers = await inference_executor.warm_up()
+    except Exception as e:
+        startup.mark_failed(f"{type(e).__name__}: {e}")
+        return
+    logger.info("Warm-up completo en %d worker(s) de inferencia", workers)
+    startup.mark_ready()
 
 
 @asynccontextmanager
@@ -31,16 +86,96 @@ async def lifespan(app: FastAPI):
     logger.info("Iniciando servidor — Predicción Febril Pediátrica")
     logger.info("=" * 60)
 
-    ml_service.load(
-        pipeline_path=settings.pipeline_path,
-        metadata_path=settings.metadata_path,
-        features_path=settings.features_path,
-    )
-    logger.info("Servidor listo ✓")
+    if model_registry.is_loaded:
+        logger.info("Modelos precargados antes de iniciar el servidor (pre-fork)")
+    else:
+        with startup.phase("modelos"):
+            load_models(settings)
+    with startup.phase("servicios"):
+        _start_services(settings)
+    if cluster.enabled:
+        await _join_cluster(settings)
+    if settings.supabase_url:
+        with startup.phase("jwks"):
+            jwks_manager.configure(
+                jwks_url(settings),
+                refresh_interval=settings.jwks_refresh_interval,
+                min_refetch_interval=settings.jwks_min_refetch_interval,
+            )
+            await jwks_manager.start()
+    # /api/health responde desde ya; /api/ready, al terminar el warm-up
+    warm_up_task = asyncio.create_task(warm_up())
+    logger.info("Servidor atendiendo — warm-up en curso")
     yield
+    warm_up_task.cancel()
+    await jwks_manager.stop()
+    await micro_batcher.stop()
+    await evaluation_writer.stop()
+    cluster.stop()
+    database.close()
+    inference_executor.shutdown()
+    drift_monitor.stop()
+    rate_limiter.close()
     logger.info("Servidor detenido")
 
 
+def _start_services(settings):
+    """Ejecutor, micro-batching, deriva, rate limit y base de datos."""
+    if settings.drift_enabled:
+        drift_monitor.configure(
+            windows=settings.drift_windows,
+            bucket_seconds=settings.drift_bucket_seconds,
+            max_pending=settings.drift_max_pending,
+            min_samples=settings.drift_min_samples,
+            psi_threshold=settings.drift_psi_threshold,
+            smd_threshold=settings.drift_smd_threshold,
+            rate_threshold=settings.drift_rate_threshold,
+        )
+        drift_monitor.start(settings.drift_fold_interval)
+    inference_executor.start(
+        mode=settings.inference_executor,
+        workers=settings.inference_workers,
+        max_queue=settings.inference_queue_size,
+        retry_after=settings.inference_retry_after,
+    )
+    if settings.microbatch_enabled:
+        micro_batcher.start(
+            max_batch=settings.microbatch_max_size,
+            window_ms=settings.microbatch_window_ms,
+        )
+    if settings.rate_limit_enabled:
+        rate_limiter.configure(
+            settings.rate_limit,
+            burst=settings.rate_limit_burst,
+            path=settings.rate_limit_store,
+            slots=settings.rate_limit_slots,
+        )
+    if settings.database_url:
+        database.configure(settings.database_url, pool_size=settings.database_pool_size)
+        if settings.persist_evaluations:
+            evaluation_writer.start(
+                batch_size=settings.persist_batch_size,
+                flush_interval=settings.persist_flush_interval,
+                max_pending=settings.persist_max_pending,
+                max_backoff=settings.persist_max_backoff,
+            )
+
+
+async def _join_cluster(settings):
+    """Worker pre-fork: publica su estado y sigue las recargas de los demás."""
+    cluster.add_publisher(metrics.publish)
+    cluster.add_publisher(drift_monitor.publish)
+    cluster.start(settings.server_share_interval)
+    asyncio.get_running_loop().add_signal_handler(
+        RELOAD_SIGNAL, model_info.apply_cluster_reloads
+    )
+    # Recargas anteriores a este worker (p. ej. tras un reinicio)
+    replay = model_info.apply_cluster_reloads()
+    if replay is not None:
+        with startup.phase("recargas"):
+            await replay
+
+
 app = FastAPI(
     title="API Predicción Febril Pediátrica",
     description=(
@@ -51,10 +186,6 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# Rate limiter
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # CORS
 settings = get_settings()
 origins = [o.strip() for o in settings.allowed_origins.split(",")]
@@ -65,10 +196,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
 
 # Routers
 app.include_router(predict.router)
 app.include_router(model_info.router)
+app.include_router(evaluaciones.router)
 
 
 @app.exception_handler(Exception)
@@ -83,11 +217,155 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 @app.get("/api/health", tags=["Health"])
 async def health_check():
-    """Health check del servicio."""
+    """Health check del servicio (liveness: responde aunque no esté listo)."""
+    loaded = model_registry.is_loaded
+    default = model_registry.get() if loaded else None
     return {
         "status": "ok",
-        "model_loaded": ml_service.is_loaded,
-        "version": ml_service.metadata.get("version", "unknown")
-        if ml_service.is_loaded
+        "ready": startup.ready,
+        "model_loaded": loaded,
+        "version": default.metadata.get("version", "unknown")
+        if loaded
         else "not loaded",
+        "model_version": model_registry.default_version if loaded else None,
+        "models": sorted(model_registry.specs_by_version()),
+        "inference": inference_executor.stats(),
+        "microbatch": micro_batcher.stats(),
+        "cache": default.cache.stats() if loaded else None,
+        "persistence": evaluation_writer.stats(),
+        "drift": drift_monitor.stats(),
+        "startup": startup.stats(),
+        "worker": {"pid": os.getpid(), "memory": memory_usage()},
     }
+
+
+@app.get("/api/ready", tags=["Health"])
+async def readiness_check():
+    """Readiness: 200 recién cuando el warm-up pasó por el ejecutor; 503 antes.
+
+    Es la ruta del healthcheck de despliegue (Railway, Docker): la instancia
+    no recibe tráfico hasta haber ejecutado una predicción completa.
+    """
+    state = startup.stats()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
+def _model_gauges():
+    for version in model_registry.specs_by_version():
+        service = model_registry.get(version)
+        yield (
+            version,
+            service.model_version,
+            service.source,
+            str(version == model_registry.default_version).lower(),
+        ), 1
+
+
+def _fallback_gauges():
+    for version in model_registry.specs_by_version():
+        fallbacks = model_registry.get(version).fallbacks
+        for component in ("preprocesamiento", "motor"):
+            yield (version, component), int(component in fallbacks)
+
+
+def _cache_gauges():
+    for version in model_registry.specs_by_version():
+        stats = model_registry.get(version).cache.stats()
+        yield (version, "entries"), stats["size"]
+        yield (version, "hits"), stats["hits"]
+        yield (version, "misses"), stats["misses"]
+
+
+def _executor_gauges():
+    stats = inference_executor.stats()
+    for key in ("in_flight", "queue_depth", "rejected", "wait_ms_avg", "wait_ms_max"):
+        yield (key,), stats[key]
+
+
+def _microbatch_gauges():
+    if not micro_batcher.enabled:
+        return
+    stats = micro_batcher.stats()
+    for key in ("window_ms", "max_window_ms", "demand_avg", "waiting", "pending"):
+        yield (key,), stats[key]
+
+
+metrics.gauge(
+    "febril_model_info",
+    "Versiones de modelo cargadas (1 por versión).",
+    ("version", "model_version", "source", "default"),
+    _model_gauges,
+)
+metrics.gauge(
+    "febril_model_fallback",
+    "1 si el componente compilado de la versión quedó deshabilitado y se usa sklearn.",
+    ("version", "component"),
+    _fallback_gauges,
+)
+metrics.gauge(
+    "febril_prediction_cache",
+    "Estado de la caché de predicciones por versión.",
+    ("version", "stat"),
+    _cache_gauges,
+)
+metrics.gauge(
+    "febril_inference_executor",
+    "Cola del ejecutor de inferencia (rejected = respuestas 503 por saturación).",
+    ("stat",),
+    _executor_gauges,
+)
+metrics.gauge(
+    "febril_microbatch",
+    "Micro-batching (si está activo): ventana actual y máxima (ms), demanda media y pendientes.",
+    ("stat",),
+    _microbatch_gauges,
+)
+metrics.gauge(
+    "febril_process_memory_bytes",
+    "Memoria de este worker (pss = parte proporcional de las páginas compartidas).",
+    ("pid", "stat"),
+    lambda: [((os.getpid(), stat), value) for stat, value in memory_usage().items()],
+)
+metrics.gauge(
+    "febril_persistence_pending",
+    "Evaluaciones en cola a la espera de guardarse.",
+    (),
+    lambda: [((), evaluation_writer.stats()["pending"])],
+)
+metrics.gauge(
+    "febril_drift_alerts",
+    "Variables con deriva respecto de la referencia, por versión y ventana.",
+    ("version", "window"),
+    drift_monitor.alert_counts,
+)
+metrics.gauge(
+    "febril_startup_seconds",
+    "Duración de cada fase del arranque (ready = hasta quedar lista).",
+    ("phase",),
+    lambda: [((name,), seconds) for name, seconds in startup.phases.items()]
+    + ([(("ready",), startup.ready_after)] if startup.ready else []),
+)
+metrics.gauge(
+    "febril_jwks_keys",
+    "Claves JWKS cargadas.",
+    (),
+    lambda: [((), jwks_manager.stats()["keys"])],
+)
+
+
+@app.get("/api/metrics", tags=["Health"])
+async def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    """Métricas en formato de texto de Prometheus.
+
+    Si METRICS_TOKEN está definido se exige `Authorization: Bearer <token>`.
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.metrics_token and not hmac.compare_digest(
+        authorization or "", f"Bearer {settings.metrics_token}"
+    ):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+
+startup.record("importaciones", time.perf_counter() - startup.started)
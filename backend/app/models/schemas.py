@@ -1,6 +1,6 @@
 """Pydantic schemas para la API de predicción."""
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Optional
 
 
 class PatientInput(BaseModel):
@@ -62,6 +62,26 @@ class PatientInput(BaseModel):
     )
 
 
+class FeatureContribution(BaseModel):
+    """Aporte de una variable clínica a cada clase (puntos porcentuales)."""
+
+    variable: str  # Campo de la API, p. ej. "plaquetas"
+    valor: Any = None  # Valor ingresado
+    leve: float
+    moderada: float
+    severa: float
+
+
+class Explanation(BaseModel):
+    """Contribuciones por variable a partir de las trayectorias de los árboles."""
+
+    metodo: str
+    clase: str  # Clase explicada (la predicha)
+    base: dict  # Probabilidad media del bosque antes de ver al paciente (%)
+    bosque: dict  # base + Σ contribuciones: probabilidad del bosque sin calibrar (%)
+    contribuciones: list[FeatureContribution]  # De mayor a menor |aporte| a `clase`
+
+
 class PredictionOutput(BaseModel):
     """Resultado de la predicción del modelo."""
 
@@ -71,6 +91,37 @@ class PredictionOutput(BaseModel):
     factores: list[str]  # Factores contribuyentes
     confianza: float  # Probabilidad máxima
     disclaimer: str  # Disclaimer legal obligatorio
+    explicacion: Optional[Explanation] = None  # Solo con explain=true
+    evaluacion_id: Optional[str] = None  # Id en `evaluaciones` si el servidor la registró
+
+
+class BatchPredictionInput(BaseModel):
+    """Lote de pacientes a evaluar en una sola pasada del modelo.
+
+    Cada elemento se valida por separado contra PatientInput, de modo que un
+    registro inválido no invalida el resto del lote.
+    """
+
+    pacientes: list[dict] = Field(
+        ..., min_length=1, description="Lista de registros con las 18 variables clínicas"
+    )
+
+
+class BatchItemResult(BaseModel):
+    """Resultado de un paciente dentro de un lote (mismo orden de entrada)."""
+
+    indice: int  # Posición del registro en el lote
+    resultado: Optional[PredictionOutput] = None
+    errores: Optional[list[dict]] = None  # Errores de validación del registro
+
+
+class BatchPredictionOutput(BaseModel):
+    """Resultado de la predicción por lotes."""
+
+    total: int
+    exitosos: int
+    fallidos: int
+    resultados: list[BatchItemResult]
 
 
 class ModelInfo(BaseModel):
@@ -83,6 +134,9 @@ class ModelInfo(BaseModel):
     n_features_post_ohe: int
     clases: dict
     calibrado: bool
+    fuente: str = ""  # "joblib" (pickles) o "bundle"
+    fallbacks: dict = {}  # Componente → motivo por el que se usa sklearn (vacío: todo compilado)
+    compactacion: Optional[dict] = None  # Resumen de tools/compact.py si el bosque fue compactado
 
 
 class ModelMetrics(BaseModel):
@@ -94,9 +148,83 @@ class ModelMetrics(BaseModel):
     test_size: int
 
 
+class ModelReloadRequest(BaseModel):
+    """Solicitud de carga/recarga en caliente de una versión del modelo."""
+
+    version: str = Field(..., description="Versión de los artefactos, p. ej. 'v3' o 'v3-compacto'")
+    default: bool = Field(False, description="Usarla como versión por defecto")
+
+
 class HealthResponse(BaseModel):
     """Respuesta del health check."""
 
     status: str
     model_loaded: bool
     version: str
+
+
+class StatsPoint(BaseModel):
+    """Evaluaciones de un día (o de una semana, desde su lunes)."""
+
+    fecha: str  # ISO, YYYY-MM-DD
+    total: int
+    leve: int
+    moderada: int
+    severa: int
+    confianza_promedio: Optional[float] = None  # None si no hubo evaluaciones
+
+
+class FactorCount(BaseModel):
+    """Frecuencia de un factor contribuyente (sin el valor del paciente)."""
+
+    factor: str
+    n: int
+
+
+class EvaluationStats(BaseModel):
+    """Estadísticas agregadas de las evaluaciones de un usuario."""
+
+    total: int  # Todo el historial
+    clases: dict  # {"leve": n, "moderada": n, "severa": n}
+    confianza_promedio: Optional[float] = None
+    confianza: dict  # {"alta": n (>= 80), "media": n (50-79), "baja": n (< 50)}
+    desde: str  # Primer día de las series y de los factores
+    diario: list[StatsPoint]
+    semanal: list[StatsPoint]
+    factores: list[FactorCount]  # Más frecuentes en la ventana
+
+
+class EvaluationSummary(BaseModel):
+    """Fila del historial: solo las columnas que muestra el listado."""
+
+    id: str
+    created_at: str  # ISO 8601
+    prediccion: str
+    prediccion_codigo: int
+    confianza: Optional[float] = None
+    modelo_version: Optional[str] = None
+    grupo_edad: Optional[str] = None
+    sexo: Optional[str] = None
+    area: Optional[str] = None
+    tiempo_fiebre: Optional[float] = None
+
+
+class EvaluationPage(BaseModel):
+    """Página del historial; siguiente_cursor es None en la última."""
+
+    items: list[EvaluationSummary]
+    siguiente_cursor: Optional[str] = None
+
+
+class EvaluationDetail(BaseModel):
+    """Evaluación registrada completa."""
+
+    id: str
+    created_at: str
+    datos_paciente: dict
+    prediccion: str
+    prediccion_codigo: int
+    probabilidades: dict
+    factores: Optional[list[str]] = None
+    confianza: Optional[float] = None
+    modelo_version: Optional[str] = None
@@ -0,0 +1,100 @@
+"""Rutas de evaluaciones registradas — /api/evaluaciones/*."""
+import logging
+import uuid
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from ..models.schemas import EvaluationDetail, EvaluationPage, EvaluationStats
+from ..services.auth import verify_jwt
+from ..services.database import database
+from ..services.evaluations import user_evaluation, user_history, user_stats
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api/evaluaciones", tags=["Evaluaciones"])
+
+
+def _require_database():
+    if not database.enabled:
+        raise HTTPException(
+            status_code=503,
+            detail="El registro de evaluaciones no está configurado (DATABASE_URL).",
+        )
+
+
+@router.get("/estadisticas", response_model=EvaluationStats)
+def estadisticas(
+    dias: int = Query(90, ge=1, le=366, description="Días de las series y de los factores"),
+    factores: int = Query(10, ge=0, le=100, description="Cantidad de factores a retornar"),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    Estadísticas del usuario para el panel de rendimiento: conteo por clase,
+    confianza promedio y por rango sobre todo el historial, series diaria y
+    semanal de los últimos `dias` días y los factores más frecuentes.
+
+    Se calculan sobre acumulados por día que se actualizan al registrar cada
+    evaluación, por lo que el costo no depende del tamaño del historial.
+    """
+    _require_database()
+    try:
+        return user_stats(user["sub"], dias, factores)
+    except Exception as e:
+        logger.error("Error consultando estadísticas: %s", e, exc_info=True)
+        raise HTTPException(status_code=503, detail="Base de datos no disponible.")
+
+
+@router.get("", response_model=EvaluationPage)
+def historial(
+    limit: int = Query(20, ge=1, le=100, description="Evaluaciones por página"),
+    cursor: Optional[str] = Query(None, max_length=200, description="siguiente_cursor de la página anterior"),
+    clase: Optional[Literal["leve", "moderada", "severa"]] = None,
+    confianza_min: Optional[float] = Query(None, ge=0, le=100),
+    confianza_max: Optional[float] = Query(None, ge=0, le=100),
+    desde: Optional[date] = Query(None, description="Primer día (hora de Colombia)"),
+    hasta: Optional[date] = Query(None, description="Último día, inclusive"),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    Historial del usuario, de la más reciente a la más antigua, con filtros
+    por clase, rango de confianza y rango de fechas.
+
+    Paginación por cursor: para la página siguiente se repite la consulta
+    (con los mismos filtros) agregando `cursor=siguiente_cursor`. Cada fila
+    trae solo los campos del listado; el detalle está en
+    /api/evaluaciones/{id}.
+    """
+    _require_database()
+    if confianza_min is not None and confianza_max is not None and confianza_min > confianza_max:
+        raise HTTPException(status_code=422, detail="confianza_min es mayor que confianza_max.")
+    if desde is not None and hasta is not None and desde > hasta:
+        raise HTTPException(status_code=422, detail="desde es posterior a hasta.")
+    try:
+        return user_history(
+            user["sub"],
+            limit,
+            cursor=cursor,
+            clase=clase,
+            confidence_min=confianza_min,
+            confidence_max=confianza_max,
+            since=desde,
+            until=hasta,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}.")
+    except Exception as e:
+        logger.error("Error consultando historial: %s", e, exc_info=True)
+        raise HTTPException(status_code=503, detail="Base de datos no disponible.")
+
+
+@router.get("/{evaluacion_id}", response_model=EvaluationDetail)
+def detalle(evaluacion_id: uuid.UUID, user: dict = Depends(verify_jwt)):
+    """Evaluación completa: datos del paciente, probabilidades y factores."""
+    _require_database()
+    try:
+        evaluation = user_evaluation(user["sub"], str(evaluacion_id))
+    except Exception as e:
+        logger.error("Error consultando evaluación: %s", e, exc_info=True)
+        raise HTTPException(status_code=503, detail="Base de datos no disponible.")
+    if evaluation is None:
+        raise HTTPException(status_code=404, detail="Evaluación no encontrada.")
+    return evaluation
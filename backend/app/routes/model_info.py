@@ -1,17 +1,34 @@
 """Rutas de información del modelo — /api/model/*."""
-from fastapi import APIRouter, HTTPException
-from ..services.ml_service import ml_service
-from ..models.schemas import ModelInfo, ModelMetrics
+import asyncio
+import logging
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from ..config import get_settings
+from ..models.schemas import ModelInfo, ModelMetrics, ModelReloadRequest
+from ..services.auth import require_service_role
+from ..services.cluster import cluster
+from ..services.drift import drift_monitor
+from ..services.executor import inference_executor
+from ..services.registry import (
+    VERSION_PATTERN,
+    ModelSpec,
+    model_registry,
+    selected_version,
+)
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/model", tags=["Modelo"])
 
+# Recargas en segundo plano (referencia para que no las recolecte el GC)
+_reload_tasks: set[asyncio.Task] = set()
+
 
 @router.get("/info", response_model=ModelInfo)
-async def model_info():
-    """Retorna metadata general del modelo."""
-    if not ml_service.is_loaded:
-        raise HTTPException(status_code=503, detail="Modelo no cargado")
-    meta = ml_service.metadata
+async def model_info(version: str = Depends(selected_version)):
+    """Retorna metadata general del modelo y si corre con el motor compilado."""
+    service = model_registry.get(version)
+    meta = service.metadata
     return ModelInfo(
         version=meta.get("version", ""),
         modelo_nombre=meta.get("modelo_nombre", ""),
@@ -20,18 +37,139 @@ async def model_info():
         n_features_post_ohe=meta.get("n_features_post_ohe", 0),
         clases=meta.get("clases", {}),
         calibrado=meta.get("calibrado", False),
+        fuente=service.source,
+        fallbacks=service.fallbacks,
+        compactacion=_compaction_summary(service.compaction),
     )
 
 
+def _compaction_summary(compaction: dict | None) -> dict | None:
+    """Árboles, nodos y métricas antes/después, sin latencias ni presupuesto."""
+    if not compaction:
+        return None
+    keys = ("arboles", "nodos", "concordancia", "f1_macro", "recall_severa", "errores_sev_leve")
+    return {
+        "de_version": compaction.get("de_version"),
+        "referencia": compaction.get("referencia"),
+        **{
+            part: {k: compaction[part][k] for k in keys if k in compaction.get(part, {})}
+            for part in ("original", "compactado")
+        },
+    }
+
+
 @router.get("/metrics", response_model=ModelMetrics)
-async def model_metrics():
+async def model_metrics(version: str = Depends(selected_version)):
     """Retorna métricas de rendimiento del modelo."""
-    if not ml_service.is_loaded:
-        raise HTTPException(status_code=503, detail="Modelo no cargado")
-    meta = ml_service.metadata
+    meta = model_registry.get(version).metadata
     return ModelMetrics(
         metricas_holdout=meta.get("metricas_holdout", {}),
         metricas_nested_cv=meta.get("metricas_nested_cv", {}),
         train_size=meta.get("train_size", 0),
         test_size=meta.get("test_size", 0),
     )
+
+
+@router.get("/versions")
+async def model_versions(_admin: dict = Depends(require_service_role)):
+    """Versiones cargadas y estado de las recargas (rutas de artefactos y errores).
+
+    Reservado al rol service_role, como /reload y /drift: expone rutas del
+    sistema de archivos y mensajes de error de carga. Con varios workers,
+    `worker` identifica al proceso que respondió (las recargas llegan a
+    todos).
+    """
+    return {
+        "worker": os.getpid(),
+        "default": model_registry.default_version,
+        "versions": model_registry.versions(),
+        "reloads": model_registry.reload_status(),
+    }
+
+
+@router.get("/drift")
+def model_drift(
+    version: str = Depends(selected_version),
+    ventana: Optional[str] = Query(None, description="Una de DRIFT_WINDOWS (p. ej. 24h)"),
+    _admin: dict = Depends(require_service_role),
+):
+    """
+    Deriva de las entradas respecto de las estadísticas de entrenamiento.
+
+    Por ventana deslizante: media, desviación y faltantes de las numéricas
+    (con la diferencia de medias en desviaciones de la referencia),
+    distribución y PSI de las categóricas, mezcla de clases predichas y la
+    lista de variables en alerta. Incluye los valores no vistos en
+    entrenamiento más frecuentes. Con varios workers, combina el tráfico de
+    todos (publicado cada SERVER_SHARE_INTERVAL segundos).
+    """
+    if not drift_monitor.enabled:
+        raise HTTPException(status_code=404, detail="Monitoreo de deriva deshabilitado")
+    try:
+        return drift_monitor.report(version, ventana)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _reload(spec: ModelSpec, default: bool):
+    if await model_registry.reload(spec, default=default):
+        inference_executor.reload_workers()
+
+
+def _spec(version: str) -> ModelSpec:
+    settings = get_settings()
+    return model_registry.spec_for(version) or ModelSpec.from_artifacts_dir(
+        version, settings.artifacts_dir, settings.use_bundles
+    )
+
+
+def _track(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _reload_tasks.add(task)
+    task.add_done_callback(_reload_tasks.discard)
+    return task
+
+
+async def _apply(orders: list[dict]):
+    # En orden: la última recarga con default=True decide la versión por defecto
+    for order in orders:
+        logger.info(
+            "Recarga anunciada por el worker pid %d — versión: %s", order["pid"], order["version"]
+        )
+        await _reload(_spec(order["version"]), order["default"])
+
+
+def apply_cluster_reloads() -> asyncio.Task | None:
+    """Aplica las recargas anunciadas por otros workers (ver services/cluster)."""
+    orders = cluster.pending_reloads()
+    return _track(_apply(orders)) if orders else None
+
+
+@router.post("/reload", status_code=202)
+async def model_reload(
+    request: ModelReloadRequest,
+    _admin: dict = Depends(require_service_role),
+):
+    """
+    Carga (o recarga) una versión en segundo plano sin cortar el servicio.
+
+    La versión nueva se carga y precalienta aparte; solo entonces se
+    reemplaza el puntero del registro. Las solicitudes en curso terminan con
+    la instancia anterior. Con varios workers, la recarga se anuncia a los
+    demás, que la aplican por su cuenta. El progreso se consulta en
+    /api/model/versions.
+    """
+    if not VERSION_PATTERN.match(request.version):
+        raise HTTPException(status_code=422, detail="Versión de modelo inválida")
+
+    spec = _spec(request.version)
+    logger.info(
+        "Recarga solicitada — versión: %s, por defecto: %s, usuario: %s",
+        request.version,
+        request.default,
+        _admin.get("sub", "?"),
+    )
+    _track(_reload(spec, request.default))
+    if cluster.enabled:
+        cluster.announce_reload(request.version, request.default)
+    return {"version": request.version, "state": "loading"}
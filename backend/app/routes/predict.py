@@ -1,43 +1,92 @@
-"""Ruta de predicción — /api/predict."""
+"""Rutas de predicción — /api/predict, /api/predict/batch y /api/predict/stream."""
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from ..models.schemas import PatientInput, PredictionOutput
-from ..services.ml_service import ml_service
-from ..services.auth import verify_jwt
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from ..config import get_settings
+from ..models.schemas import (
+    BatchItemResult,
+    BatchPredictionInput,
+    BatchPredictionOutput,
+    PatientInput,
+    PredictionOutput,
+)
+from ..services.batching import micro_batcher
+from ..services.bulk import (
+    CSV_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    BulkInputError,
+    CSVFormatter,
+    DuplexStreamingResponse,
+    detect_format,
+    iter_lines,
+    iter_records,
+    score_stream,
+    to_ndjson,
+)
+from ..services.executor import (
+    ExecutorSaturated,
+    inference_executor,
+    run_predict_batch,
+)
+from ..services.ml_service import ExplanationUnavailable
+from ..services.persistence import evaluation_writer
+from ..services.rate_limit import rate_limit
+from ..services.registry import selected_version
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["Predicción"])
 
 
+def _saturated(e: ExecutorSaturated) -> HTTPException:
+    """503 con Retry-After cuando la cola de inferencia está llena."""
+    logger.warning("Cola de inferencia llena — solicitud rechazada")
+    return HTTPException(
+        status_code=503,
+        detail="El servidor está ocupado. Intente nuevamente en unos segundos.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
 @router.post("/predict", response_model=PredictionOutput)
 async def predict(
     patient: PatientInput,
-    _user: dict = Depends(verify_jwt),
+    explain: bool = Query(False, description="Incluir contribuciones por variable (explicacion)"),
+    _user: dict = Depends(rate_limit),
+    version: str = Depends(selected_version),
 ):
     """
     Recibe 18 variables clínicas y retorna la predicción de severidad.
+    La versión del modelo se elige con el header X-Model-Version o el query
+    `model_version` (por defecto, la versión principal).
 
     El pipeline completo (imputers + OHE + scaler + modelo V3) se ejecuta
     internamente. El resultado incluye la clase predicha, probabilidades
-    de las 3 clases, factores contribuyentes y un disclaimer legal.
+    de las 3 clases, factores contribuyentes y un disclaimer legal. Con
+    `explain=true` incluye además las contribuciones de cada variable
+    según las trayectorias de los árboles del modelo.
     """
-    if not ml_service.is_loaded:
-        raise HTTPException(
-            status_code=503,
-            detail="El modelo no está cargado. Reinicie el servidor.",
-        )
-
     data = patient.model_dump()
 
     logger.info(
-        "Predicción solicitada — usuario: %s, hallazgo: %s, glasgow: %s",
+        "Predicción solicitada — usuario: %s, modelo: %s, hallazgo: %s, glasgow: %s",
         _user.get("email", "?"),
+        version,
         data.get("hallazgo_examen_fisico"),
         data.get("glasgow"),
     )
 
     try:
-        result = ml_service.predict(data)
+        if micro_batcher.enabled and not explain:
+            result = await micro_batcher.submit(data, version)
+        else:
+            result = (
+                await inference_executor.run(run_predict_batch, [data], version, explain)
+            )[0]
+    except ExecutorSaturated as e:
+        raise _saturated(e)
+    except ExplanationUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
     except Exception as e:
         logger.error("Error ejecutando predicción: %s", e, exc_info=True)
         raise HTTPException(
@@ -51,4 +100,145 @@ async def predict(
         result["confianza"],
     )
 
+    # Registro diferido: la respuesta no espera a la base de datos
+    evaluacion_id = evaluation_writer.record(_user.get("sub"), data, result, version)
+    if evaluacion_id is not None:
+        result = {**result, "evaluacion_id": evaluacion_id}
     return result
+
+
+@router.post("/predict/batch", response_model=BatchPredictionOutput)
+async def predict_batch(
+    batch: BatchPredictionInput,
+    explain: bool = Query(False, description="Incluir contribuciones por variable (explicacion)"),
+    _user: dict = Depends(rate_limit),
+    version: str = Depends(selected_version),
+):
+    """
+    Evalúa un lote de pacientes en una sola pasada del pipeline.
+
+    Cada registro se valida de forma independiente; los inválidos se reportan
+    con sus errores en la posición correspondiente y los válidos se puntúan
+    juntos (una llamada por transformador y una a predict_proba). Los
+    resultados conservan el orden de entrada.
+    """
+    settings = get_settings()
+    if len(batch.pacientes) > settings.batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote excede el máximo de {settings.batch_max_size} pacientes.",
+        )
+
+    resultados: list[BatchItemResult] = []
+    valid_idx: list[int] = []
+    valid_data: list[dict] = []
+    for i, raw in enumerate(batch.pacientes):
+        try:
+            patient = PatientInput.model_validate(raw)
+        except ValidationError as e:
+            resultados.append(
+                BatchItemResult(
+                    indice=i,
+                    errores=e.errors(include_url=False, include_context=False),
+                )
+            )
+            continue
+        resultados.append(BatchItemResult(indice=i))
+        valid_idx.append(i)
+        valid_data.append(patient.model_dump())
+
+    logger.info(
+        "Predicción por lotes solicitada — usuario: %s, registros: %d, válidos: %d",
+        _user.get("email", "?"),
+        len(batch.pacientes),
+        len(valid_data),
+    )
+
+    try:
+        outputs = await inference_executor.run(run_predict_batch, valid_data, version, explain)
+    except ExecutorSaturated as e:
+        raise _saturated(e)
+    except ExplanationUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        logger.error("Error ejecutando predicción por lotes: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno al ejecutar la predicción por lotes.",
+        )
+
+    for i, output in zip(valid_idx, outputs):
+        resultados[i] = BatchItemResult(indice=i, resultado=output)
+
+    return BatchPredictionOutput(
+        total=len(resultados),
+        exitosos=len(valid_data),
+        fallidos=len(resultados) - len(valid_data),
+        resultados=resultados,
+    )
+
+
+@router.post("/predict/stream")
+async def predict_stream(
+    request: Request,
+    formato: str = Query(
+        "ndjson", pattern="^(ndjson|csv)$", description="Formato de salida: ndjson o csv"
+    ),
+    _user: dict = Depends(rate_limit),
+    version: str = Depends(selected_version),
+):
+    """
+    Re-puntúa una cohorte enviada como NDJSON o CSV en el cuerpo.
+
+    Cada línea (o fila CSV con encabezado) es un paciente o una fila de
+    `evaluaciones` con `datos_paciente`. Los registros se leen a medida que
+    llegan y se puntúan en lotes de STREAM_CHUNK_SIZE; los resultados se
+    devuelven en streaming, uno por registro y en el mismo orden. En NDJSON
+    la última línea es un resumen. El formato de entrada se toma del
+    Content-Type (application/x-ndjson, text/csv) o del contenido.
+    """
+    settings = get_settings()
+    body = request.stream()
+    first = b""
+    async for first in body:
+        if first:
+            break
+    fmt = detect_format(request.headers.get("content-type"), first)
+
+    async def chunks():
+        yield first
+        async for chunk in body:
+            yield chunk
+
+    logger.info(
+        "Puntuación masiva solicitada — usuario: %s, modelo: %s, entrada: %s, salida: %s",
+        _user.get("email", "?"),
+        version,
+        fmt,
+        formato,
+    )
+    formatter = CSVFormatter() if formato == "csv" else to_ndjson
+
+    async def generate():
+        records = iter_records(iter_lines(chunks(), settings.stream_max_line_length), fmt)
+        try:
+            async for item in score_stream(records, version, settings.stream_chunk_size):
+                if "resumen" in item:
+                    logger.info("Puntuación masiva completada — %s", item["resumen"])
+                yield formatter(item)
+        except BulkInputError as e:
+            logger.warning("Puntuación masiva interrumpida: %s", e)
+            yield formatter({"indice": -1, "errores": [{"type": "input_error", "msg": str(e)}]})
+        except ClientDisconnect:
+            logger.warning("Cliente desconectado durante la puntuación masiva")
+        except Exception as e:
+            logger.error("Error en la puntuación masiva: %s", e, exc_info=True)
+            yield formatter(
+                {"indice": -1, "errores": [{"type": "internal_error", "msg": "Error interno"}]}
+            )
+
+    return DuplexStreamingResponse(
+        generate(),
+        media_type=CSV_MEDIA_TYPE if formato == "csv" else NDJSON_MEDIA_TYPE,
+        headers=getattr(request.state, "rate_limit_headers", None),
+    )
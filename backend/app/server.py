@@ -0,0 +1,329 @@
+"""Servidor pre-fork: carga los modelos una vez y luego crea los workers.
+
+`uvicorn --workers N` arranca N intérpretes independientes y cada uno carga
+y calienta los artefactos en su lifespan: N veces la memoria y el tiempo de
+arranque. Aquí el proceso padre carga y calienta el registro de modelos,
+congela el heap (gc.freeze, para que el recolector de los hijos no escriba
+en los objetos del modelo) y recién entonces hace fork de los workers, que
+heredan los modelos en páginas copy-on-write y comparten el socket de
+escucha. Los arreglos de los bundles ya viven en páginas mapeadas del
+archivo, compartidas por todos los procesos.
+
+El padre no atiende solicitudes: reinicia los workers que terminan (con
+espera exponencial si vuelven a caer enseguida), reenvía SIGTERM/SIGINT,
+retransmite a todos los workers las recargas de modelo (SIGUSR1, ver
+services/cluster) y registra periódicamente la memoria de cada proceso
+(RSS, PSS, compartida y privada). Para dimensionar el contenedor, la cifra
+útil es la suma de las PSS.
+
+Con --workers 1 no hay fork: el modelo se precarga y uvicorn corre en este
+mismo proceso. Requiere os.fork (Linux/macOS).
+
+Uso (desde backend/):
+    python -m app.server [--host 0.0.0.0] [--port 8000] [--workers 4]
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from .config import get_settings
+from .main import app, load_models
+from .services.cluster import RELOAD_SIGNAL, cluster, create_directory, remove_directory
+from .services.memory import format_bytes, memory_usage
+from .services.startup import startup
+
+logger = logging.getLogger("server")
+
+# Código de salida de uvicorn cuando el lifespan falla al arrancar
+STARTUP_FAILURE = 3
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Socket de escucha creado en el padre y heredado por los workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(settings):
+    """Carga y calienta los modelos, y congela el heap antes del fork."""
+    with startup.phase("modelos"):
+        load_models(settings)
+        gc.collect()
+        gc.freeze()
+    logger.info(
+        "Modelos precargados en %.2f s — memoria del padre: RSS %s",
+        startup.phases["modelos"],
+        format_bytes(memory_usage().get("rss")),
+    )
+
+
+def _uvicorn_config() -> uvicorn.Config:
+    return uvicorn.Config(app, lifespan="on", proxy_headers=True)
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn.Server que se detiene si el proceso padre desaparece."""
+
+    def __init__(self, config: uvicorn.Config, parent_pid: int):
+        super().__init__(config)
+        self.parent_pid = parent_pid
+
+    async def on_tick(self, counter: int) -> bool:
+        # on_tick corre cada 0.1 s; el padre se revisa cada segundo
+        if counter % 10 == 0 and os.getppid() != self.parent_pid:
+            logger.warning("Proceso padre terminado — deteniendo worker %d", os.getpid())
+            return True
+        return await super().on_tick(counter)
+
+
+def _run_worker(sock: socket.socket, parent_pid: int, slot: int, directory: str) -> int:
+    """Cuerpo de un worker (proceso hijo). Retorna el código de salida."""
+    # uvicorn instala sus propios manejadores de señales
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Hasta que el lifespan instale el suyo (por defecto, SIGUSR1 termina el proceso)
+    signal.signal(RELOAD_SIGNAL, signal.SIG_IGN)
+    if directory:
+        cluster.configure(directory, slot)
+    server = _WorkerServer(_uvicorn_config(), parent_pid)
+    try:
+        server.run(sockets=[sock])
+    except BaseException:
+        logger.exception("Worker %d terminó con error", os.getpid())
+        return 1
+    return 0 if server.started else STARTUP_FAILURE
+
+
+class Supervisor:
+    """Crea, vigila y reinicia los workers; reporta su memoria."""
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        workers: int,
+        memory_report_interval: float,
+        graceful_timeout: float,
+        directory: str = "",
+        max_backoff: float = 60.0,
+        backoff_reset: float = 60.0,
+    ):
+        self.sock = sock
+        self.workers = workers
+        self.memory_report_interval = memory_report_interval
+        self.graceful_timeout = graceful_timeout
+        self.directory = directory
+        self.max_backoff = max_backoff
+        self.backoff_reset = backoff_reset
+        self.children: dict[int, int] = {}  # pid → número de worker
+        self._started: dict[int, float] = {}  # pid → inicio (monotónico)
+        self._failures: dict[int, int] = {}  # número de worker → caídas seguidas
+        self._respawn_at: dict[int, float] = {}  # número de worker → reinicio
+        self._stopping = False
+        self._exit_code = 0
+
+    def spawn(self, slot: int) -> int:
+        parent_pid = os.getpid()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _run_worker(self.sock, parent_pid, slot, self.directory)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = slot
+        self._started[pid] = time.monotonic()
+        logger.info("Worker %d iniciado (pid %d)", slot, pid)
+        return pid
+
+    def _handle_signal(self, signum, frame):
+        if not self._stopping:
+            logger.info("Señal %s — deteniendo workers", signal.Signals(signum).name)
+        self._stopping = True
+
+    def _forward_reload(self, signum, frame):
+        """Un worker anotó una recarga: se avisa a todos (ver cluster)."""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, RELOAD_SIGNAL)
+            except ProcessLookupError:
+                pass
+
+    def restart_delay(self, slot: int, uptime: float) -> float:
+        """Espera antes de reiniciar: 0 s, luego 1 s, 2 s, 4 s... hasta max_backoff.
+
+        La cuenta de caídas seguidas vuelve a cero si el worker duró al
+        menos backoff_reset segundos.
+        """
+        if uptime >= self.backoff_reset:
+            self._failures[slot] = 0
+        failures = self._failures.get(slot, 0)
+        self._failures[slot] = failures + 1
+        if failures == 0:
+            return 0.0
+        return min(self.max_backoff, 2.0 ** (failures - 1))
+
+    def _respawn_due(self):
+        now = time.monotonic()
+        for slot, when in list(self._respawn_at.items()):
+            if when <= now:
+                del self._respawn_at[slot]
+                self.spawn(slot)
+
+    def _reap(self):
+        """Recoge los workers terminados y reinicia los que no debían salir."""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            slot = self.children.pop(pid, None)
+            started = self._started.pop(pid, None)
+            if slot is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self._stopping:
+                continue
+            if code == STARTUP_FAILURE:
+                logger.error("Worker %d no pudo arrancar — deteniendo el servidor", slot)
+                self._exit_code = code
+                self._stopping = True
+                continue
+            delay = self.restart_delay(slot, time.monotonic() - started)
+            logger.warning(
+                "Worker %d (pid %d) terminó con código %s — reiniciando en %.0f s",
+                slot,
+                pid,
+                code,
+                delay,
+            )
+            self._respawn_at[slot] = time.monotonic() + delay
+
+    def report_memory(self):
+        """Registra la memoria del padre y de cada worker."""
+        total_pss = 0
+        rows = [("padre", os.getpid())] + [
+            (f"worker {slot}", pid) for pid, slot in sorted(self.children.items(), key=lambda x: x[1])
+        ]
+        for name, pid in rows:
+            usage = memory_usage(pid)
+            total_pss += usage.get("pss", usage.get("rss", 0))
+            logger.info(
+                "Memoria %-9s pid %-7d RSS %s · PSS %s · compartida %s · privada %s",
+                name,
+                pid,
+                format_bytes(usage.get("rss")),
+                format_bytes(usage.get("pss")),
+                format_bytes(usage.get("shared")),
+                format_bytes(usage.get("private")),
+            )
+        logger.info("Memoria total (suma de PSS): %s", format_bytes(total_pss))
+
+    def _stop_children(self):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            logger.warning("Worker pid %d no terminó a tiempo — SIGKILL", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.children:
+            self._reap()
+            time.sleep(0.05)
+
+    def run(self) -> int:
+        # Antes del fork: un worker puede anunciar una recarga apenas arranca
+        signal.signal(RELOAD_SIGNAL, self._forward_reload)
+        for slot in range(1, self.workers + 1):
+            self.spawn(slot)
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        # Primer reporte cuando los workers ya arrancaron
+        next_report = time.monotonic() + min(10.0, self.memory_report_interval)
+        while not self._stopping:
+            self._reap()
+            self._respawn_due()
+            if self.memory_report_interval > 0 and time.monotonic() >= next_report:
+                self.report_memory()
+                next_report = time.monotonic() + self.memory_report_interval
+            time.sleep(0.5)
+        self._stop_children()
+        self.sock.close()
+        logger.info("Servidor detenido")
+        return self._exit_code
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument(
+        "--workers", type=int, default=settings.server_workers, help="Procesos worker"
+    )
+    parser.add_argument(
+        "--memory-report-interval",
+        type=float,
+        default=settings.server_memory_report_interval,
+        help="Segundos entre reportes de memoria (0 = nunca)",
+    )
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    if workers > 1 and not hasattr(os, "fork"):
+        parser.error("--workers > 1 requiere os.fork (Linux/macOS)")
+    if workers > 1 and settings.inference_executor == "process":
+        logger.warning(
+            "INFERENCE_EXECUTOR=process: cada worker crea su propio pool, "
+            "que vuelve a cargar los modelos (sin compartir páginas)"
+        )
+
+    sock = bind_socket(args.host, args.port)
+    logger.info("Escuchando en %s:%d — %d worker(s)", args.host, args.port, workers)
+    preload(settings)
+    if workers == 1:
+        server = uvicorn.Server(_uvicorn_config())
+        server.run(sockets=[sock])
+        return 0 if server.started else STARTUP_FAILURE
+    directory = create_directory()
+    try:
+        return Supervisor(
+            sock,
+            workers,
+            memory_report_interval=args.memory_report_interval,
+            graceful_timeout=settings.server_graceful_timeout,
+            directory=directory,
+            max_backoff=settings.server_restart_max_backoff,
+            backoff_reset=settings.server_restart_reset,
+        ).run()
+    finally:
+        remove_directory(directory)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
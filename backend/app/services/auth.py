@@ -1,94 +1,143 @@
 """Verificación de JWT de Supabase — HS256 y RS256."""
-import base64
-import json
+import hashlib
 import logging
-import httpx
+import threading
+import time
+from collections import OrderedDict
 import jwt as pyjwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from ..config import get_settings
-from functools import lru_cache
+from .jwks import jwks_manager
+from .metrics import auth_latency
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
-@lru_cache(maxsize=1)
-def _get_jwks(supabase_url: str) -> dict:
-    """Obtiene las claves públicas JWKS de Supabase (cacheado)."""
-    jwks_url = f"{supabase_url}/auth/v1/.well-known/jwks.json"
+class VerifiedTokenCache:
+    """Payloads de JWT ya verificados, indexados por digest del token.
+
+    Cada entrada se descarta al llegar el `exp` del token, de modo que un
+    token nunca se acepta desde la caché después de haber expirado. Acotada
+    por número de entradas (LRU).
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            exp, payload = entry
+            if exp <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: bytes, payload: dict):
+        exp = payload.get("exp")
+        if self.maxsize <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._data[key] = (exp, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_token_cache = VerifiedTokenCache(get_settings().jwt_cache_size)
+
+
+def jwks_url(settings) -> str:
+    """URL del JWKS: explícita o la estándar del proyecto Supabase."""
+    return (
+        settings.supabase_jwks_url
+        or f"{settings.supabase_url}/auth/v1/.well-known/jwks.json"
+    )
+
+
+def _get_token_header(token: str) -> dict:
+    """Lee el header del JWT sin validarlo (una sola vez por token)."""
     try:
-        response = httpx.get(jwks_url, timeout=10)
-        response.raise_for_status()
-        logger.info("JWKS obtenido desde %s", jwks_url)
-        return response.json()
-    except Exception as e:
-        logger.error("No se pudo obtener JWKS: %s", e)
-        return {}
-
-
-def _get_token_alg(token: str) -> str:
-    """Extrae el algoritmo del header del JWT sin validarlo."""
-    try:
-        header = pyjwt.get_unverified_header(token)
-        return header.get("alg", "HS256")
+        return pyjwt.get_unverified_header(token)
     except Exception as e:
         logger.error("Error al leer header del token: %s", e)
-        return "HS256"
+        return {}
 
 
 async def verify_jwt(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> dict:
-    """Verifica el JWT de Supabase — soporta HS256 y RS256."""
+    """Verifica el JWT de Supabase — soporta HS256 y RS256.
+
+    El tiempo de verificación se registra por algoritmo y resultado.
+    """
+    start = time.perf_counter()
+    outcome = {"alg": "unknown", "result": "error"}
+    try:
+        return await _verify_token(credentials.credentials, outcome)
+    finally:
+        auth_latency.observe(time.perf_counter() - start, outcome["alg"], outcome["result"])
+
+
+async def _verify_token(token: str, outcome: dict) -> dict:
+    """Verifica `token`; deja en `outcome` el algoritmo y el resultado."""
     settings = get_settings()
-    token = credentials.credentials
 
     # Modo dev
     if not settings.supabase_url:
         logger.warning("SUPABASE_URL no configurado — modo dev")
+        outcome.update(alg="dev", result="ok")
         return {"sub": "dev-user", "email": "dev@local"}
 
-    alg = _get_token_alg(token)
-    logger.info("JWT algorithm detectado: %s", alg)
+    cache_key = _token_cache.digest(token)
+    cached = _token_cache.get(cache_key)
+    if cached is not None:
+        outcome.update(alg="cached", result="ok")
+        return cached
+
+    header = _get_token_header(token)
+    alg = header.get("alg", "HS256")
+    outcome["alg"] = alg if alg in ("HS256", "RS256", "ES256") else "other"
+    logger.debug("JWT algorithm detectado: %s", alg)
 
     try:
         if alg in ["RS256", "ES256"]:
             # ── RS256/ES256: verificar con clave pública JWKS de Supabase ──
-            jwks = _get_jwks(settings.supabase_url)
-            if not jwks:
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail="No se pudo obtener las claves públicas de Supabase",
-                )
-            
-            # Intentar obtener llave por kid
-            try:
-                header = pyjwt.get_unverified_header(token)
-                kid = header.get("kid")
-            except Exception:
-                kid = None
-
-            key_data = None
-            if kid:
-                key_data = next((k for k in jwks.get("keys", []) if k.get("kid") == kid), None)
-            
-            # Fallback: usar la primera llave de firma si no se encuentra por kid
-            if not key_data:
-                key_data = next(
-                    (k for k in jwks.get("keys", []) 
-                     if k.get("use") == "sig" or k.get("alg") in ["RS256", "ES256"]),
-                    None
-                )
-            
-            if not key_data:
+            if not jwks_manager.url:
+                jwks_manager.configure(jwks_url(settings))
+            signing_key = await jwks_manager.get_key(header.get("kid"))
+            if signing_key is None:
+                if not jwks_manager.has_keys:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="No se pudo obtener las claves públicas de Supabase",
+                    )
                 logger.error("No se encontró clave pública válida en JWKS para el token")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Clave de firma no encontrada",
                 )
 
-            signing_key = pyjwt.PyJWK.from_dict(key_data)
             payload = pyjwt.decode(
                 token,
                 signing_key.key,
@@ -117,9 +166,12 @@ async def verify_jwt(
             payload.get("sub", "?"),
             payload.get("role", "?"),
         )
+        _token_cache.put(cache_key, payload)
+        outcome["result"] = "ok"
         return payload
 
     except pyjwt.ExpiredSignatureError:
+        outcome["result"] = "expired"
         logger.warning("JWT expirado")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -145,3 +197,14 @@ async def verify_jwt(
 def get_user_id(payload: dict = Depends(verify_jwt)) -> str:
     """Extrae el user_id del JWT."""
     return payload.get("sub", "")
+
+
+def require_service_role(payload: dict = Depends(verify_jwt)) -> dict:
+    """Restringe operaciones administrativas a tokens con rol service_role."""
+    settings = get_settings()
+    if settings.supabase_url and payload.get("role") != "service_role":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Operación reservada al rol service_role",
+        )
+    return payload
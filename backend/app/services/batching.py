@@ -0,0 +1,180 @@
+"""Micro-batching adaptativo de predicciones concurrentes.
+
+Las solicitudes individuales de /api/predict se encolan y un único
+recolector las agrupa hasta `max_batch` registros o hasta que vence la
+ventana, para ejecutarlas en una sola llamada vectorizada a
+MLService.predict_batch. Cada solicitante recibe su propio resultado.
+
+La ventana se adapta a la demanda, medida al tomar cada lote como las
+solicitudes sin resolver (en cola y en ejecución): una solicitud aislada
+no espera, mientras haya otras pendientes la ventana no baja de una
+fracción de `max_window_ms`, y a medida que crece la demanda media se
+acerca a `max_window_ms`. Medir solo el tamaño de lote no alcanza: con
+llegadas escalonadas cada lote sale de a uno y la ventana nunca se abre.
+"""
+import asyncio
+import logging
+import time
+
+from .executor import inference_executor, run_predict_batch
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Suavizado de la demanda media (EMA)
+_EMA_ALPHA = 0.2
+# Demanda media a partir de la cual se usa la ventana completa
+_FULL_WINDOW_AT = 4.0
+# Ventana mínima (fracción de la máxima) mientras haya otras solicitudes pendientes
+_MIN_WINDOW_FRACTION = 0.25
+# Solicitudes por lote
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+batch_sizes = metrics.histogram(
+    "febril_microbatch_size",
+    "Solicitudes agrupadas en cada lote del micro-batching.",
+    (),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+
+
+class MicroBatcher:
+    """Agrupa predicciones concurrentes en lotes (opt-in)."""
+
+    def __init__(self):
+        self.enabled = False
+        self.max_batch = 32
+        self.max_window = 0.002
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+        self._ema = 1.0
+        # Solicitudes sin resolver (en cola, en un lote o en el ejecutor)
+        self._waiting = 0
+        self._batches = 0
+        self._requests = 0
+        self._last_batch = 0
+        self._max_seen = 0
+
+    def start(self, max_batch: int, window_ms: float):
+        """Arranca el recolector en el event loop actual."""
+        self.enabled = True
+        self.max_batch = max(1, max_batch)
+        self.max_window = max(0.0, window_ms) / 1000
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._collect())
+        logger.info(
+            "Micro-batching activo — lote máx. %d, ventana máx. %.1f ms",
+            self.max_batch,
+            window_ms,
+        )
+
+    async def stop(self):
+        """Detiene el recolector y falla las solicitudes pendientes."""
+        self.enabled = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Servidor detenido"))
+
+    @property
+    def window(self) -> float:
+        """Ventana actual (s) según la demanda media y las solicitudes pendientes."""
+        load = (self._ema - 1.0) / (_FULL_WINDOW_AT - 1.0)
+        window = self.max_window * min(1.0, max(0.0, load))
+        if self._waiting > 1:
+            window = max(window, self.max_window * _MIN_WINDOW_FRACTION)
+        return window
+
+    async def submit(self, data: dict, version: str | None = None) -> dict:
+        """Encola una predicción para `version` y espera su resultado."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiting += 1
+        try:
+            await self._queue.put((data, version, future))
+            return await future
+        finally:
+            self._waiting -= 1
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._ema += _EMA_ALPHA * (self._waiting - self._ema)
+            window = self.window
+            deadline = time.monotonic() + window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self._record(len(batch))
+            # Un lote por versión de modelo
+            by_version: dict = {}
+            for item in batch:
+                by_version.setdefault(item[1], []).append(item)
+            for version, items in by_version.items():
+                task = asyncio.create_task(self._dispatch(items, version))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    def _record(self, size: int):
+        self._batches += 1
+        self._requests += size
+        self._last_batch = size
+        self._max_seen = max(self._max_seen, size)
+        batch_sizes.observe(size)
+
+    async def _dispatch(self, batch: list[tuple], version: str | None):
+        """Ejecuta el lote y resuelve el futuro de cada solicitante."""
+        records = [data for data, _, _ in batch]
+        try:
+            results = await inference_executor.run(run_predict_batch, records, version)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        """Métricas del micro-batching."""
+        return {
+            "enabled": self.enabled,
+            "max_batch": self.max_batch,
+            "max_window_ms": round(self.max_window * 1000, 3),
+            "window_ms": round(self.window * 1000, 3),
+            "demand_avg": round(self._ema, 2),
+            "batches": self._batches,
+            "requests": self._requests,
+            "avg_batch_size": round(self._requests / self._batches, 2)
+            if self._batches
+            else 0.0,
+            "last_batch_size": self._last_batch,
+            "max_batch_size": self._max_seen,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "waiting": self._waiting,
+        }
+
+
+# Instancia global
+micro_batcher = MicroBatcher()
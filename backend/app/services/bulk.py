@@ -0,0 +1,268 @@
+"""Puntuación masiva en streaming (NDJSON / CSV) para cohortes retrospectivas.
+
+El cuerpo de la solicitud se lee por fragmentos a medida que llega, se
+divide en registros y se puntúa en lotes de tamaño fijo con el pipeline
+vectorizado; cada lote se devuelve apenas está listo. La memoria depende del
+tamaño de lote, no del archivo.
+
+Cada registro puede ser un paciente plano (los 18 campos de PatientInput) o
+una fila exportada de `evaluaciones`, con los campos dentro de
+`datos_paciente`; en ese caso se conservan `id` y la predicción anterior
+para comparar.
+"""
+import asyncio
+import codecs
+import csv
+import io
+import json
+import logging
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+
+from ..models.schemas import PatientInput
+from .executor import ExecutorSaturated, inference_executor, run_predict_batch
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+CSV_COLUMNS = [
+    "indice",
+    "id",
+    "prediccion",
+    "codigo",
+    "leve",
+    "moderada",
+    "severa",
+    "confianza",
+    "factores",
+    "prediccion_anterior",
+    "errores",
+]
+
+
+class BulkInputError(ValueError):
+    """El cuerpo no se puede interpretar (formato, encabezado, línea enorme)."""
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse que permite seguir leyendo el cuerpo de la solicitud.
+
+    StreamingResponse escucha `http.disconnect` consumiendo `receive()` en
+    paralelo, lo que le robaría fragmentos del cuerpo al generador. Aquí la
+    desconexión se detecta al leer el cuerpo (ClientDisconnect) o al enviar.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            logger.warning("Cliente desconectado durante el streaming")
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_length: int) -> AsyncIterator[str]:
+    """Líneas de texto UTF-8 del cuerpo, sin cargarlo completo en memoria."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(pending) > max_line_length:
+            raise BulkInputError(f"Línea de más de {max_line_length} caracteres")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+def _from_evaluacion(obj: dict) -> tuple[dict, dict]:
+    """Separa los datos del paciente de la referencia (id, predicción anterior)."""
+    ref = {"id": obj.get("id"), "prediccion_anterior": obj.get("prediccion")}
+    data = obj.get("datos_paciente", obj)
+    if isinstance(data, str):
+        data = json.loads(data)
+    if not isinstance(data, dict):
+        raise ValueError("datos_paciente debe ser un objeto")
+    return data, ref
+
+
+def prepare_record(obj: dict) -> tuple:
+    """Registro crudo → (datos validados | None, referencia, errores | None)."""
+    try:
+        data, ref = _from_evaluacion(obj)
+    except ValueError as e:
+        return None, {"id": obj.get("id")}, [{"type": "parse_error", "msg": str(e)}]
+    return validate_record(data, ref)
+
+
+def validate_record(data: dict, ref: dict) -> tuple:
+    """Valida con PatientInput: (datos, ref, None) o (None, ref, errores)."""
+    try:
+        return PatientInput.model_validate(data).model_dump(), ref, None
+    except ValidationError as e:
+        return None, ref, e.errors(include_url=False, include_context=False)
+
+
+def result_items(start: int, entries: list[tuple], outputs: list[dict]) -> list[dict]:
+    """Un dict de salida por registro, numerado desde `start`.
+
+    `entries` son tuplas (datos, ref, errores); `outputs` las predicciones de
+    los registros válidos, en el mismo orden.
+    """
+    outputs_iter = iter(outputs)
+    items = []
+    for offset, (data, ref, errors) in enumerate(entries):
+        item = {"indice": start + offset, "id": ref.get("id")}
+        if data is not None:
+            item["resultado"] = next(outputs_iter)
+        else:
+            item["errores"] = errors
+        if ref.get("prediccion_anterior") is not None:
+            item["prediccion_anterior"] = ref["prediccion_anterior"]
+        items.append(item)
+    return items
+
+
+def flatten_item(item: dict) -> list:
+    """Resultado → fila con las columnas de CSV_COLUMNS (None si falta)."""
+    result = item.get("resultado") or {}
+    probs = result.get("probabilidades", {})
+    errors = item.get("errores")
+    return [
+        item["indice"],
+        None if item.get("id") is None else str(item["id"]),
+        result.get("prediccion"),
+        result.get("codigo"),
+        probs.get("leve"),
+        probs.get("moderada"),
+        probs.get("severa"),
+        result.get("confianza"),
+        " | ".join(result["factores"]) if "factores" in result else None,
+        item.get("prediccion_anterior"),
+        json.dumps(errors, ensure_ascii=False, default=str) if errors else None,
+    ]
+
+
+def _csv_row(header: list[str], values: list[str]) -> dict:
+    """Fila CSV → dict; celdas vacías como faltantes."""
+    if len(values) != len(header):
+        raise ValueError(f"se esperaban {len(header)} columnas, hay {len(values)}")
+    return {k: (v if v != "" else None) for k, v in zip(header, values)}
+
+
+async def iter_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[tuple]:
+    """(datos, referencia, error) por registro, en orden de entrada.
+
+    `fmt` es "ndjson" o "csv". En CSV, la primera línea es el encabezado y
+    los campos entre comillas pueden contener saltos de línea.
+    """
+    header = None
+    pending = ""
+    async for line in lines:
+        if fmt == "csv":
+            # Un número impar de comillas indica un campo que continúa
+            pending = f"{pending}\n{line}" if pending else line
+            if pending.count('"') % 2:
+                continue
+            line, pending = pending, ""
+        if not line.strip():
+            continue
+        try:
+            if fmt == "ndjson":
+                obj = json.loads(line)
+                if not isinstance(obj, dict):
+                    raise ValueError("cada línea debe ser un objeto JSON")
+            else:
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [h.strip() for h in values]
+                    continue
+                obj = _csv_row(header, values)
+            data, ref = _from_evaluacion(obj)
+        except (ValueError, StopIteration) as e:
+            yield None, {}, [{"type": "parse_error", "msg": str(e)}]
+            continue
+        yield data, ref, None
+    if pending:
+        yield None, {}, [{"type": "parse_error", "msg": "comillas sin cerrar al final del CSV"}]
+    if fmt == "csv" and header is None:
+        raise BulkInputError("CSV sin encabezado")
+
+
+def detect_format(content_type: str | None, first_bytes: bytes = b"") -> str:
+    """Formato de entrada por Content-Type o, si es ambiguo, por el contenido."""
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "json" in content_type:
+        return "ndjson"
+    head = first_bytes.lstrip(b"\xef\xbb\xbf \r\n\t")
+    return "ndjson" if not head or head.startswith(b"{") else "csv"
+
+
+async def _score(records: list[dict], version: str) -> list[dict]:
+    """Puntúa un lote; ante una cola llena espera y reintenta (trabajo masivo)."""
+    while True:
+        try:
+            return await inference_executor.run(run_predict_batch, records, version)
+        except ExecutorSaturated as e:
+            await asyncio.sleep(e.retry_after or 1)
+
+
+async def score_stream(
+    records: AsyncIterator[tuple], version: str, chunk_size: int
+) -> AsyncIterator[dict]:
+    """Puntúa los registros en lotes de `chunk_size`; un dict por registro.
+
+    Termina con {"resumen": {...}}.
+    """
+    total = ok = 0
+    chunk: list[tuple] = []
+
+    async def flush():
+        valid = [data for data, _, _ in chunk if data is not None]
+        outputs = await _score(valid, version) if valid else []
+        items = result_items(total - len(chunk), chunk, outputs)
+        chunk.clear()
+        return items
+
+    async for data, ref, errors in records:
+        entry = validate_record(data, ref) if errors is None else (None, ref, errors)
+        chunk.append(entry)
+        total += 1
+        ok += entry[0] is not None
+        if len(chunk) >= chunk_size:
+            for item in await flush():
+                yield item
+    if chunk:
+        for item in await flush():
+            yield item
+    yield {"resumen": {"total": total, "exitosos": ok, "fallidos": total - ok, "version": version}}
+
+
+def to_ndjson(item: dict) -> str:
+    return json.dumps(item, ensure_ascii=False, default=str) + "\n"
+
+
+class CSVFormatter:
+    """Serializa los resultados como filas CSV (encabezado en la primera)."""
+
+    def __init__(self):
+        self._header_sent = False
+
+    def __call__(self, item: dict) -> str:
+        if "resumen" in item:
+            return ""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self._header_sent:
+            writer.writerow(CSV_COLUMNS)
+            self._header_sent = True
+        writer.writerow(flatten_item(item))
+        return buffer.getvalue()
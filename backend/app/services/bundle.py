@@ -0,0 +1,242 @@
+"""Bundle de artefactos de arranque rápido (arreglos NumPy mapeados en memoria).
+
+Un bundle es un directorio con un `manifest.json` y un archivo `.npy` por
+arreglo: nodos del bosque, tablas de calibración y parámetros de los
+transformadores. Se genera una sola vez a partir de los pickles
+(`python -m app.tools.export_bundle`) y al iniciar se abre con
+np.load(mmap_mode="r"): no hay unpickling y las páginas del page cache se
+comparten entre todos los workers del mismo host.
+
+El manifest registra dtype, forma y SHA-256 de cada arreglo, y un checksum
+propio sobre todo su contenido.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .forest_engine import CompiledForest
+from .preprocessing import CompiledPreprocessor
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+
+# Prefijos de los arreglos de cada componente dentro del bundle
+_PREPROCESSOR = "preprocessor"
+_FOREST = "forest"
+
+
+class BundleError(ValueError):
+    """Bundle inexistente, corrupto o incompatible."""
+
+
+def bundle_dir(artifacts_dir: str, version: str) -> Path:
+    """Ubicación estándar del bundle de una versión: {artifacts_dir}/bundle_{v}."""
+    return Path(artifacts_dir) / f"bundle_{version}"
+
+
+def find_bundle(artifacts_dir: str, version: str) -> str:
+    """Ruta del bundle de `version` si existe, o cadena vacía."""
+    path = bundle_dir(artifacts_dir, version)
+    return str(path) if (path / MANIFEST_NAME).is_file() else ""
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_checksum(manifest: dict) -> str:
+    """SHA-256 del manifest canónico, sin el propio campo checksum."""
+    body = {k: v for k, v in manifest.items() if k != "checksum"}
+    canonical = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def write_bundle(
+    out_dir: str,
+    components: dict,
+    metadata: dict,
+    feature_names: dict,
+    pipeline: dict,
+    source: dict | None = None,
+) -> dict:
+    """Escribe el bundle y retorna su manifest.
+
+    `components` mapea nombre → (parámetros JSON, arreglos) tal como los
+    retornan los métodos to_arrays. El directorio se construye aparte y se
+    reemplaza al final, para que un lector nunca vea un bundle a medias.
+    """
+    target = Path(out_dir)
+    staging = target.with_name(target.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    arrays_manifest, params_manifest = {}, {}
+    for component, (params, arrays) in components.items():
+        params_manifest[component] = params
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            if array.dtype.hasobject:
+                raise BundleError(f"{component}.{name}: dtype object no exportable")
+            filename = f"{component}.{name}.npy"
+            np.save(staging / filename, array, allow_pickle=False)
+            arrays_manifest[f"{component}.{name}"] = {
+                "file": filename,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "sha256": _file_sha256(staging / filename),
+            }
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source": source or {},
+        "metadata": metadata,
+        "feature_names": feature_names,
+        "pipeline": pipeline,
+        "params": params_manifest,
+        "arrays": arrays_manifest,
+    }
+    manifest["checksum"] = _manifest_checksum(manifest)
+    with open(staging / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    replace_bundle(staging, target)
+    return manifest
+
+
+def replace_bundle(staging: Path, target: Path):
+    """Reemplaza `target` por el bundle completo de `staging` (mismo sistema de archivos)."""
+    previous = target.with_name(target.name + ".old")
+    shutil.rmtree(previous, ignore_errors=True)
+    if target.exists():
+        os.replace(target, previous)
+    os.replace(staging, target)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def read_bundle(path: str, verify: bool = True) -> tuple[dict, dict]:
+    """Abre un bundle: retorna (manifest, {componente: {nombre: memmap}}).
+
+    El checksum del manifest, la forma y el dtype de cada arreglo se validan
+    siempre; con `verify` además se recalcula el SHA-256 de cada archivo.
+    """
+    base = Path(path)
+    try:
+        with open(base / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BundleError(f"manifest ilegible en {base}: {e}") from e
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"formato de bundle no soportado: {manifest.get('format')}")
+    if manifest.get("checksum") != _manifest_checksum(manifest):
+        raise BundleError("checksum del manifest inválido")
+
+    components: dict = {}
+    for key, entry in manifest["arrays"].items():
+        component, name = key.split(".", 1)
+        file_path = base / entry["file"]
+        if verify and _file_sha256(file_path) != entry["sha256"]:
+            raise BundleError(f"checksum inválido: {entry['file']}")
+        try:
+            array = np.load(file_path, mmap_mode="r", allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise BundleError(f"arreglo ilegible {entry['file']}: {e}") from e
+        if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise BundleError(f"dtype/forma inesperados en {entry['file']}")
+        components.setdefault(component, {})[name] = array
+    return manifest, components
+
+
+def source_info(pipeline_path: str) -> dict:
+    """Identifica el pickle de origen de un bundle (nombre, tamaño y SHA-256)."""
+    path = Path(pipeline_path)
+    return {
+        "pipeline": path.name,
+        "size": path.stat().st_size,
+        "sha256": _file_sha256(path),
+    }
+
+
+def check_source(manifest: dict, pipeline_path: str):
+    """Lanza BundleError si el pickle de origen cambió desde la exportación.
+
+    Compara el SHA-256 registrado por source_info (el tamaño primero, como
+    descarte rápido): un pickle reentrenado del mismo tamaño también se
+    detecta. Hashear el pickle una vez al cargar cuesta poco al lado de
+    deserializarlo. Sin pickle junto al bundle, o con un bundle sin origen
+    registrado, no hay nada que comparar.
+    """
+    source = manifest.get("source") or {}
+    path = Path(pipeline_path)
+    if not source.get("sha256") or not path.exists():
+        return
+    if path.stat().st_size != source.get("size") or _file_sha256(path) != source["sha256"]:
+        raise BundleError(f"bundle desactualizado respecto de {path.name}")
+
+
+def export_service(
+    service, out_dir: str, source: dict | None = None, compaction: dict | None = None
+) -> dict:
+    """Exporta un MLService cargado desde los pickles a un bundle.
+
+    Requiere que el preprocesamiento y el motor compilados hayan pasado la
+    verificación de paridad: el bundle no incluye los objetos de sklearn.
+    `compaction` es el reporte de tools/compact.py cuando el bosque del
+    servicio fue compactado.
+    """
+    if service.preprocessor is None or service.engine is None:
+        raise BundleError(
+            "el modelo no tiene preprocesamiento/motor compilado verificado"
+        )
+    pipeline = {
+        "cols_num": list(service.cols_num),
+        "cols_cat": list(service.cols_cat),
+        "cols_escalar": list(service.cols_escalar),
+        "feature_names_post_ohe": list(service.feature_names_post_ohe),
+        "features_originales": list(service.features_originales),
+        "categorias_raras": {
+            col: list(values) for col, values in service.categorias_raras.items()
+        },
+        "categorias_ohe": service.categories,
+        "class_names": [str(c) for c in service.class_names],
+        "model_type": type(service.modelo).__name__,
+    }
+    if compaction:
+        pipeline["compactacion"] = compaction
+    return write_bundle(
+        out_dir,
+        components={
+            _PREPROCESSOR: service.preprocessor.to_arrays(),
+            _FOREST: service.engine.to_arrays(),
+        },
+        metadata=service.metadata,
+        feature_names=service.feature_names,
+        pipeline=pipeline,
+        source=source,
+    )
+
+
+def load_components(manifest: dict, arrays: dict) -> tuple:
+    """Retorna (CompiledPreprocessor, CompiledForest) desde un bundle abierto."""
+    try:
+        preprocessor = CompiledPreprocessor.from_arrays(
+            manifest["params"][_PREPROCESSOR], arrays[_PREPROCESSOR]
+        )
+        engine = CompiledForest.from_arrays(manifest["params"][_FOREST], arrays[_FOREST])
+    except (KeyError, TypeError) as e:
+        raise BundleError(f"bundle incompleto: {e}") from e
+    if preprocessor.n_features != engine.n_features:
+        raise BundleError("el preprocesador y el bosque no coinciden en features")
+    return preprocessor, engine
@@ -0,0 +1,81 @@
+"""Caché LRU + TTL en proceso para resultados de inferencia."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Caché acotada por número de entradas y por antigüedad.
+
+    Las entradas expiradas se descartan al consultarlas; al superar
+    `maxsize` se expulsa la menos usada recientemente. Es segura entre
+    hilos (el ejecutor de inferencia puede usar varios).
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 900.0):
+        self._lock = threading.Lock()
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.configure(maxsize, ttl)
+
+    def configure(self, maxsize: int, ttl: float):
+        """Ajusta límites; maxsize=0 o ttl=0 deshabilita la caché."""
+        with self._lock:
+            self.maxsize = max(0, int(maxsize))
+            self.ttl = max(0.0, float(ttl))
+            self._trim()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key):
+        """Retorna el valor o None si no existe o expiró."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            self._trim()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _trim(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
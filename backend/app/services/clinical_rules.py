@@ -0,0 +1,245 @@
+"""Reglas clínicas declarativas para los factores contribuyentes.
+
+Cada regla compara un campo del paciente con un umbral (o con un conjunto
+de categorías) y, si se cumple, aporta un mensaje. La tabla se compila al
+cargar el modelo y se evalúa sobre el lote completo con máscaras booleanas
+de NumPy; solo se formatean los mensajes de las reglas que se activan.
+
+DEFAULT_RULES reproduce los umbrales del modelo V3. Una versión del modelo
+puede traer su propia tabla en metadata["reglas_clinicas"], con el mismo
+formato:
+
+    {"version": "v3-2026.03",
+     "sin_factores": "Parámetros clínicos dentro de rangos esperados",
+     "reglas": [{"campo": "glasgow", "op": "<", "valor": 13,
+                 "mensaje": "Glasgow alterado ({valor})"}, ...]}
+
+En `mensaje`, {valor} es el valor del paciente tal como llegó. Un campo
+faltante nunca activa una regla.
+"""
+import operator
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..models.schemas import PatientInput
+
+NUMERIC_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+_UFUNCS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+# Operadores de categorías: (negado, un solo valor)
+CATEGORY_OPS = {"==": (False, True), "!=": (True, True), "in": (False, False), "not_in": (True, False)}
+
+DEFAULT_RULES = {
+    "version": "v3",
+    "sin_factores": "Parámetros clínicos dentro de rangos esperados",
+    "reglas": [
+        {"campo": "glasgow", "op": "<", "valor": 13, "mensaje": "Glasgow alterado ({valor})"},
+        {"campo": "plaquetas", "op": "<", "valor": 150000, "mensaje": "Trombocitopenia ({valor:,.0f} cel/mm³)"},
+        {"campo": "plaquetas", "op": ">", "valor": 400000, "mensaje": "Trombocitosis ({valor:,.0f} cel/mm³)"},
+        {"campo": "albumina", "op": "<", "valor": 3.5, "mensaje": "Hipoalbuminemia ({valor} g/dl)"},
+        {"campo": "cayados", "op": ">", "valor": 500, "mensaje": "Cayados elevados ({valor:,.0f} cel/mm³)"},
+        {"campo": "globulina", "op": ">", "valor": 4.0, "mensaje": "Globulina elevada ({valor} g/dl)"},
+        # Nuevos factores V3
+        {"campo": "procalcitonina", "op": ">", "valor": 0.5, "mensaje": "Procalcitonina elevada ({valor} ng/mL)"},
+        {"campo": "leucocitos", "op": "<", "valor": 4000, "mensaje": "Leucopenia ({valor:,.0f} cel/mm³)"},
+        {"campo": "leucocitos", "op": ">", "valor": 15000, "mensaje": "Leucocitosis ({valor:,.0f} cel/mm³)"},
+        {"campo": "pcr", "op": ">", "valor": 10, "mensaje": "PCR elevada ({valor} mg/dL)"},
+        {
+            "campo": "hallazgo_examen_fisico",
+            "op": "not_in",
+            "valor": ["Ninguno", ""],
+            "mensaje": "Hallazgo al examen físico: {valor}",
+        },
+        {"campo": "tiempo_fiebre", "op": ">", "valor": 5, "mensaje": "Fiebre prolongada ({valor} días)"},
+        {"campo": "vacunacion", "op": "==", "valor": "Incompleto", "mensaje": "Esquema de vacunación incompleto"},
+        {
+            "campo": "estado_nutricional",
+            "op": "==",
+            "valor": "Riesgo de desnutrición",
+            "mensaje": "Desnutrición",
+        },
+    ],
+}
+
+# Campos categóricos de la API (el resto son numéricos)
+CATEGORICAL_FIELDS = frozenset(
+    name for name, info in PatientInput.model_fields.items() if info.annotation is str
+)
+
+
+class RuleError(ValueError):
+    """Tabla de reglas inválida."""
+
+
+@dataclass(frozen=True)
+class Rule:
+    campo: str
+    op: str
+    valor: object
+    mensaje: str
+
+    @property
+    def numeric(self) -> bool:
+        return self.op in NUMERIC_OPS
+
+    def format(self, data: dict) -> str:
+        return self.mensaje.format(valor=data.get(self.campo))
+
+
+def _renderer(rule: Rule):
+    """valor → mensaje, con el menor trabajo posible por mensaje.
+
+    Los mensajes sin {valor} son constantes y los de campos categóricos se
+    memorizan por categoría; los numéricos se formatean con el método ya
+    enlazado, sin pasar por argumentos con nombre.
+    """
+    if "{" not in rule.mensaje:
+        return lambda value: rule.mensaje
+    if not rule.numeric:
+        rendered: dict = {}
+
+        def render(value):
+            try:
+                return rendered[value]
+            except KeyError:
+                message = rendered[value] = rule.mensaje.format(valor=value)
+                return message
+
+        return render
+    return rule.mensaje.replace("{valor", "{0").format
+
+
+def _compile_rule(entry: dict) -> Rule:
+    try:
+        rule = Rule(entry["campo"], entry["op"], entry["valor"], entry["mensaje"])
+    except (KeyError, TypeError) as e:
+        raise RuleError(f"regla incompleta {entry!r}: {e}") from e
+    if rule.campo not in PatientInput.model_fields:
+        raise RuleError(f"campo desconocido: {rule.campo}")
+    categorical = rule.campo in CATEGORICAL_FIELDS
+    if rule.op in NUMERIC_OPS:
+        if categorical or isinstance(rule.valor, bool) or not isinstance(rule.valor, (int, float)):
+            raise RuleError(f"{rule.campo} {rule.op}: requiere campo y umbral numéricos")
+        sample = float(rule.valor)
+    elif rule.op in CATEGORY_OPS:
+        single = CATEGORY_OPS[rule.op][1]
+        if not categorical or single != isinstance(rule.valor, str):
+            raise RuleError(f"{rule.campo} {rule.op}: valor inválido {rule.valor!r}")
+        sample = "x"
+    else:
+        raise RuleError(f"operador desconocido: {rule.op}")
+    try:
+        rule.mensaje.format(valor=sample)
+    except (KeyError, IndexError, ValueError) as e:
+        raise RuleError(f"mensaje inválido {rule.mensaje!r}: {e}") from e
+    return rule
+
+
+def _members(rule: Rule) -> frozenset:
+    return frozenset([rule.valor] if CATEGORY_OPS[rule.op][1] else rule.valor)
+
+
+def _scalar_check(rule: Rule):
+    """Predicado de la regla para un valor presente (no None)."""
+    if rule.numeric:
+        compare, threshold = NUMERIC_OPS[rule.op], rule.valor
+        return lambda value: compare(value, threshold)
+    members = _members(rule)
+    if CATEGORY_OPS[rule.op][0]:
+        return lambda value: value not in members
+    return lambda value: value in members
+
+
+class ClinicalRules:
+    """Tabla de reglas compilada de una versión del modelo."""
+
+    def __init__(self, rules: list[Rule], version: str, sin_factores: str):
+        self.rules = rules
+        self.version = version
+        self.sin_factores = sin_factores
+        self._fields = [rule.campo for rule in rules]
+        self._used_fields = list(dict.fromkeys(self._fields))
+        # Numéricas: una columna por campo y una comparación por regla
+        self._num_fields = list(dict.fromkeys(r.campo for r in rules if r.numeric))
+        self._num_checks = [
+            (i, self._num_fields.index(rule.campo), _UFUNCS[rule.op], rule.valor)
+            for i, rule in enumerate(rules)
+            if rule.numeric
+        ]
+        # Categóricas: pertenencia a un conjunto (negada en != y not_in)
+        self._cat_checks = [
+            (i, rule.campo, _members(rule), CATEGORY_OPS[rule.op][0])
+            for i, rule in enumerate(rules)
+            if not rule.numeric
+        ]
+        self._scalar_checks = [_scalar_check(rule) for rule in rules]
+        self._render = [_renderer(rule) for rule in rules]
+
+    @classmethod
+    def compile(cls, table: dict) -> "ClinicalRules":
+        """Valida la tabla (campos, operadores y mensajes) y la compila."""
+        if not isinstance(table, dict) or not isinstance(table.get("reglas"), list):
+            raise RuleError("la tabla de reglas debe tener una lista 'reglas'")
+        return cls(
+            [_compile_rule(entry) for entry in table["reglas"]],
+            version=str(table.get("version", "sin versión")),
+            sin_factores=table.get("sin_factores", DEFAULT_RULES["sin_factores"]),
+        )
+
+    @classmethod
+    def from_metadata(cls, metadata: dict) -> "ClinicalRules":
+        """Reglas de metadata["reglas_clinicas"] o, si no hay, DEFAULT_RULES."""
+        return cls.compile(metadata.get("reglas_clinicas") or DEFAULT_RULES)
+
+    def _columns(self, records: list[dict]) -> dict[str, tuple]:
+        """Valores crudos de cada campo usado por la tabla (None si falta)."""
+        fields = self._used_fields
+        columns = zip(*([data.get(f) for f in fields] for data in records))
+        return dict(zip(fields, columns))
+
+    def masks(self, records: list[dict], columns: dict | None = None) -> np.ndarray:
+        """Matriz booleana (reglas × registros): True si la regla se activa."""
+        columns = columns if columns is not None else self._columns(records)
+        out = np.zeros((len(self.rules), len(records)), dtype=bool)
+        if self._num_fields:
+            # None → NaN, y NaN es falso en toda comparación
+            values = np.array([columns[f] for f in self._num_fields], dtype=np.float64)
+            for i, row, compare, threshold in self._num_checks:
+                compare(values[row], threshold, out=out[i])
+        for i, field, members, negate in self._cat_checks:
+            hit = [v in members for v in columns[field]]
+            if negate:
+                present = [v is not None for v in columns[field]]
+                out[i] = np.logical_and(present, np.logical_not(hit))
+            else:
+                out[i] = hit
+        return out
+
+    def _evaluate_one(self, data: dict) -> list[str]:
+        """Un registro, sin NumPy (predicciones individuales)."""
+        messages = []
+        for field, check, render in zip(self._fields, self._scalar_checks, self._render):
+            value = data.get(field)
+            if value is not None and check(value):
+                messages.append(render(value))
+        return messages or [self.sin_factores]
+
+    def evaluate(self, records: list[dict]) -> list[list[str]]:
+        """Factores de cada registro, en el orden de la tabla."""
+        if len(records) == 1:
+            return [self._evaluate_one(records[0])]
+        if not records:
+            return []
+        columns = self._columns(records)
+        masks = self.masks(records, columns)
+        factors: list[list[str]] = [[] for _ in records]
+        # Regla por regla (orden de la tabla): solo las filas activadas
+        for i, mask in enumerate(masks):
+            rows = np.flatnonzero(mask).tolist()
+            if not rows:
+                continue
+            column = columns[self._fields[i]]
+            messages = map(self._render[i], [column[row] for row in rows])
+            for row, message in zip(rows, messages):
+                factors[row].append(message)
+        return [messages or [self.sin_factores] for messages in factors]
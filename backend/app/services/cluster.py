@@ -0,0 +1,159 @@
+"""Estado compartido entre los workers del servidor pre-fork (app.server).
+
+Con --workers > 1 cada worker es un proceso con su propia memoria: los
+contadores, la deriva o una recarga de modelo que ve uno no existen para
+los demás. El supervisor crea antes del fork un directorio compartido (en
+/dev/shm si existe) y cada worker:
+
+- publica cada `interval` segundos su acumulado (métricas, deriva) en un
+  archivo propio `<tipo>-<pid>.<ext>`, reemplazado de forma atómica.
+  /api/metrics y /api/model/drift combinan los archivos de todos los
+  workers, así que el resultado no depende de qué worker responda. Los
+  archivos de los workers terminados se conservan para que los contadores
+  no retrocedan tras un reinicio;
+- anota las recargas de modelo en `reloads.jsonl` y avisa al supervisor con
+  SIGUSR1, que reenvía la señal a los workers; cada uno aplica las órdenes
+  nuevas del registro. Un worker que arranca (o se reinicia) aplica el
+  registro completo: hereda del padre los modelos de la precarga.
+
+Con un solo worker (o uvicorn directo) `cluster.enabled` es False y nada de
+esto ocurre.
+"""
+import json
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Solo POSIX, como el fork del servidor
+RELOAD_SIGNAL = getattr(signal, "SIGUSR1", None)
+_RELOAD_LOG = "reloads.jsonl"
+
+
+def create_directory() -> str:
+    """Directorio nuevo para una ejecución del servidor: /dev/shm si existe."""
+    base = Path("/dev/shm")
+    return tempfile.mkdtemp(prefix="febril-workers-", dir=base if base.is_dir() else None)
+
+
+def remove_directory(directory: str):
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class Cluster:
+    """Directorio compartido, publicación periódica y registro de recargas."""
+
+    def __init__(self):
+        self.directory: Path | None = None
+        self.worker = ""
+        self._publishers: list = []
+        self._reload_offset = 0
+        self._reload_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def configure(self, directory: str, worker: str):
+        """Activa el modo multiproceso en este worker (después del fork)."""
+        self.directory = Path(directory)
+        self.worker = str(worker)
+        self._reload_offset = 0
+
+    # ── Snapshots por worker ──
+
+    def path(self, kind: str, suffix: str, pid: int | None = None) -> Path:
+        return self.directory / f"{kind}-{pid or os.getpid()}.{suffix}"
+
+    def snapshots(self, kind: str, suffix: str, include_self: bool = True) -> list[Path]:
+        """Archivos publicados por los workers (vivos y terminados)."""
+        own = self.path(kind, suffix)
+        return sorted(
+            path
+            for path in self.directory.glob(f"{kind}-*.{suffix}")
+            if include_self or path != own
+        )
+
+    def publish(self, kind: str, suffix: str, write):
+        """write(archivo) escribe el snapshot; se publica con os.replace."""
+        target = self.path(kind, suffix)
+        tmp = target.with_name(f".{target.name}.tmp")
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, target)
+
+    def add_publisher(self, callback):
+        """callback() publica el estado de un servicio; lo llama el hilo de start."""
+        self._publishers.append(callback)
+
+    def publish_all(self):
+        for callback in self._publishers:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Error publicando el estado del worker")
+
+    def start(self, interval: float):
+        if self._thread is not None or not self.enabled:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                self.publish_all()
+
+        self._thread = threading.Thread(target=run, name="cluster-publish", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo y publica por última vez (al apagar el worker)."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self.publish_all()
+
+    # ── Recargas de modelo ──
+
+    def announce_reload(self, version: str, default: bool):
+        """Anota una recarga solicitada a este worker y avisa al supervisor."""
+        order = {"version": version, "default": default, "pid": os.getpid()}
+        with open(self.directory / _RELOAD_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(order) + "\n")
+        os.kill(os.getppid(), RELOAD_SIGNAL)
+
+    def pending_reloads(self) -> list[dict]:
+        """Órdenes de otros workers aún no aplicadas por este, en orden.
+
+        De varias órdenes sobre la misma versión queda la última.
+        """
+        path = self.directory / _RELOAD_LOG
+        with self._reload_lock:
+            try:
+                with open(path, "rb") as f:
+                    f.seek(self._reload_offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return []
+            # Solo líneas completas: una escritura en curso se lee la próxima vez
+            complete = data[: data.rfind(b"\n") + 1]
+            self._reload_offset += len(complete)
+        orders: dict[str, dict] = {}
+        for line in complete.decode("utf-8").splitlines():
+            order = json.loads(line)
+            if order["pid"] != os.getpid():
+                orders.pop(order["version"], None)
+                orders[order["version"]] = order
+        return list(orders.values())
+
+
+# Instancia global
+cluster = Cluster()
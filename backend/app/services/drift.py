@@ -0,0 +1,681 @@
+"""Monitoreo en línea de deriva de las entradas, con memoria constante.
+
+Cada predicción servida por MLService.predict_batch se compara, en
+agregado, con las estadísticas del conjunto de entrenamiento:
+
+- numéricas (laboratorios, días de fiebre, Glasgow): media y varianza por
+  el método de Welford, y tasa de faltantes (albúmina y globulina son las
+  que el modelo marca con indicador de missingness);
+- categóricas: conteo por categoría del vocabulario de referencia, más un
+  contador de valores no vistos y un top-k acotado (space-saving) de esos
+  valores por bucket, de modo que cada ventana reporta los suyos;
+- mezcla de clases predichas.
+
+Los acumulados viven en un anillo de buckets de tiempo por versión de
+modelo (arreglos NumPy de tamaño fijo, dimensionados por la ventana más
+larga); una ventana deslizante es la combinación de sus buckets (fórmula
+de Chan para medias y varianzas).
+
+En el camino de la solicitud solo se encola una referencia al lote (un
+append a una deque acotada por número de registros, `max_pending`); un hilo en segundo plano agrega la cola cada
+`fold_interval` segundos. Con el ejecutor de procesos, cada hijo entrega
+su cola junto con el resultado (`drain` / `merge`, como las métricas). Con
+varios workers pre-fork, cada uno publica sus buckets (ver cluster) y el
+reporte combina los de todos.
+
+La referencia de cada versión es {artifacts_dir}/reference_stats_{v}.json
+(python -m app.tools.reference_stats). Si no existe, se deriva del modelo
+(media y escala del StandardScaler y categorías del OneHotEncoder): sin
+proporciones de categorías, tasas de faltantes ni mezcla de clases.
+"""
+import json
+import logging
+import math
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from .cluster import cluster
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# Valores no vistos que se conservan por variable (top-k aproximado)
+UNSEEN_TOP_K = 10
+_UNSEEN_MAX_LENGTH = 80
+# Suavizado de proporciones nulas en el PSI
+_PSI_EPSILON = 1e-4
+
+drift_observations = metrics.counter(
+    "febril_drift_observations_total",
+    "Predicciones encoladas para el monitoreo de deriva.",
+    ("version",),
+)
+drift_dropped = metrics.counter(
+    "febril_drift_dropped_total",
+    "Predicciones no monitoreadas (cola llena o bucket ya expirado).",
+    (),
+)
+
+
+def parse_window(text: str) -> int:
+    """'24h' → segundos. Unidades: s, m, h, d."""
+    match = re.fullmatch(r"\s*(\d+)\s*([smhd])\s*", text)
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Ventana inválida: {text!r} (ej. 1h, 24h, 7d)")
+    return int(match.group(1)) * WINDOW_UNITS[match.group(2)]
+
+
+def reference_path(directory: str, version: str) -> str:
+    """Ruta estándar de la referencia de una versión."""
+    return str(Path(directory) / f"reference_stats_{version}.json")
+
+
+class DriftReference:
+    """Estadísticas de referencia (entrenamiento) de una versión.
+
+    numeric: campo → {"n", "media", "desviacion", "faltantes"} (valores o None)
+    categorical: campo → {categoría: proporción o None}
+    classes: clase → proporción (None si no se conoce)
+    """
+
+    def __init__(
+        self,
+        numeric: dict,
+        categorical: dict,
+        classes: dict,
+        source: str,
+        n: int | None = None,
+        created_at: str | None = None,
+    ):
+        self.numeric = {field: dict(stats) for field, stats in numeric.items()}
+        self.categorical = {field: dict(freqs) for field, freqs in categorical.items()}
+        self.classes = dict(classes)
+        self.source = source
+        self.n = n
+        self.created_at = created_at
+
+    @property
+    def layout(self) -> tuple:
+        """Variables y vocabulario: define la forma de los acumulados."""
+        return (
+            tuple(self.numeric),
+            tuple((field, tuple(freqs)) for field, freqs in self.categorical.items()),
+            tuple(self.classes),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "DriftReference | None":
+        """Lee reference_stats_{v}.json; None si no existe."""
+        if not path or not Path(path).exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            numeric=data["numericas"],
+            categorical=data["categoricas"],
+            classes=data["clases"],
+            source=Path(path).name,
+            n=data.get("n"),
+            created_at=data.get("creado"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "n": self.n,
+            "creado": self.created_at,
+            "numericas": self.numeric,
+            "categoricas": self.categorical,
+            "clases": self.classes,
+        }
+
+
+class _TopK:
+    """Valores más frecuentes en k contadores (algoritmo space-saving)."""
+
+    def __init__(self, k: int, counts: dict | None = None):
+        self.k = k
+        self.counts: dict[str, int] = dict(counts or {})
+
+    def add(self, value: str, count: int = 1):
+        value = value[:_UNSEEN_MAX_LENGTH]
+        if value in self.counts or len(self.counts) < self.k:
+            self.counts[value] = self.counts.get(value, 0) + count
+            return
+        # Reemplaza al menor y hereda su conteo (cota superior)
+        smallest = min(self.counts, key=self.counts.get)
+        self.counts[value] = self.counts.pop(smallest) + count
+
+    def update(self, other: "_TopK"):
+        for value, count in other.counts.items():
+            self.add(value, count)
+
+    def top(self) -> list[dict]:
+        ranked = sorted(self.counts.items(), key=lambda item: -item[1])
+        return [{"valor": value, "n": n} for value, n in ranked]
+
+
+def _merge_unseen(*sources: dict) -> dict:
+    """Une los top-k de no vistas (campo → _TopK) de varios buckets."""
+    merged: dict[str, _TopK] = {}
+    for unseen in sources:
+        for field, topk in unseen.items():
+            merged.setdefault(field, _TopK(UNSEEN_TOP_K)).update(topk)
+    return merged
+
+
+def _combine(n_a, mean_a, m2_a, n_b, mean_b, m2_b) -> tuple:
+    """Une dos acumulados de Welford (Chan et al.), elemento a elemento."""
+    n = n_a + n_b
+    frac = np.divide(n_b, n, out=np.zeros_like(mean_a), where=n > 0)
+    delta = mean_b - mean_a
+    return n, mean_a + delta * frac, m2_a + m2_b + delta * delta * n_a * frac
+
+
+class _Buckets:
+    """Anillo de buckets de tiempo de una versión."""
+
+    def __init__(self, reference: DriftReference, size: int):
+        self.reference = reference
+        self.layout = reference.layout
+        self.size = size
+        self.num_fields = list(reference.numeric)
+        self.cat_fields = list(reference.categorical)
+        self.class_keys = list(reference.classes)
+        # Posición de cada categoría; la última de cada variable = no vista
+        self.cat_items = []
+        self.cat_slices = []
+        offset = 0
+        for field, freqs in reference.categorical.items():
+            lookup = {category: offset + i for i, category in enumerate(freqs)}
+            other = offset + len(freqs)
+            self.cat_items.append((field, lookup, other))
+            self.cat_slices.append(slice(offset, other + 1))
+            offset = other + 1
+        # No vistas de cada bucket: campo → _TopK (solo los campos con alguna)
+        self.unseen: list[dict[str, _TopK]] = [{} for _ in range(size)]
+
+        f, s, c = len(self.num_fields), offset, len(self.class_keys)
+        self.epoch = np.full(size, -1, dtype=np.int64)
+        self.rows = np.zeros(size, dtype=np.int64)
+        self.n = np.zeros((size, f))
+        self.mean = np.zeros((size, f))
+        self.m2 = np.zeros((size, f))
+        self.missing = np.zeros((size, f), dtype=np.int64)
+        self.cats = np.zeros((size, s), dtype=np.int64)
+        self.classes = np.zeros((size, c), dtype=np.int64)
+
+    def _row(self, epoch: int) -> int | None:
+        row = epoch % self.size
+        if self.epoch[row] != epoch:
+            if self.epoch[row] > epoch:
+                return None  # El bucket ya se reutilizó para un período posterior
+            self.epoch[row] = epoch
+            for array in (self.rows, self.n, self.mean, self.m2, self.missing, self.cats, self.classes):
+                array[row] = 0
+            self.unseen[row] = {}
+        return row
+
+    def add(self, epoch: int, records: list[dict], codes: list[int]) -> bool:
+        row = self._row(epoch)
+        if row is None:
+            return False
+        nan = math.nan
+        x = np.array(
+            [[nan if r.get(f) is None else r[f] for f in self.num_fields] for r in records],
+            dtype=np.float64,
+        ).reshape(len(records), len(self.num_fields))
+        present = ~np.isnan(x)
+        count = present.sum(axis=0).astype(np.float64)
+        mean = np.divide(np.nansum(x, axis=0), count, out=np.zeros_like(count), where=count > 0)
+        m2 = np.nansum((x - mean) ** 2, axis=0)
+        self.n[row], self.mean[row], self.m2[row] = _combine(
+            self.n[row], self.mean[row], self.m2[row], count, mean, m2
+        )
+        self.missing[row] += len(records) - present.sum(axis=0)
+
+        slots = []
+        unseen = self.unseen[row]
+        for field, lookup, other in self.cat_items:
+            for record in records:
+                value = record.get(field)
+                slot = lookup.get(value)
+                if slot is None:
+                    slot = other
+                    if value is not None:
+                        if field not in unseen:
+                            unseen[field] = _TopK(UNSEEN_TOP_K)
+                        unseen[field].add(str(value))
+                slots.append(slot)
+        self.cats[row] += np.bincount(slots, minlength=self.cats.shape[1])
+        self.classes[row] += np.bincount(
+            [c for c in codes if 0 <= c < len(self.class_keys)], minlength=len(self.class_keys)
+        )
+        self.rows[row] += len(records)
+        return True
+
+    def aggregate(self, first_epoch: int, last_epoch: int) -> dict:
+        """Acumulados combinados de los buckets de [first_epoch, last_epoch]."""
+        sel = (self.epoch >= first_epoch) & (self.epoch <= last_epoch)
+        n = self.n[sel]
+        total_n = n.sum(axis=0)
+        weighted = (n * self.mean[sel]).sum(axis=0)
+        mean = np.divide(weighted, total_n, out=np.zeros_like(total_n), where=total_n > 0)
+        m2 = (self.m2[sel] + n * (self.mean[sel] - mean) ** 2).sum(axis=0)
+        return {
+            "rows": int(self.rows[sel].sum()),
+            "n": total_n,
+            "mean": mean,
+            "m2": m2,
+            "missing": self.missing[sel].sum(axis=0),
+            "cats": self.cats[sel].sum(axis=0),
+            "classes": self.classes[sel].sum(axis=0),
+            "unseen": _merge_unseen(*(self.unseen[row] for row in np.flatnonzero(sel))),
+        }
+
+
+def _merge_aggregates(a: dict, b: dict) -> dict:
+    """Une dos resultados de _Buckets.aggregate (p. ej. de dos workers)."""
+    n, mean, m2 = _combine(a["n"], a["mean"], a["m2"], b["n"], b["mean"], b["m2"])
+    merged = {key: a[key] + b[key] for key in ("rows", "missing", "cats", "classes")}
+    return dict(merged, n=n, mean=mean, m2=m2, unseen=_merge_unseen(a["unseen"], b["unseen"]))
+
+
+_BUCKET_ARRAYS = ("epoch", "rows", "n", "mean", "m2", "missing", "cats", "classes")
+
+
+def _round(value, digits: int = 4):
+    if value is None or not math.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def psi(observed: np.ndarray, expected: np.ndarray) -> float:
+    """Population Stability Index entre dos distribuciones (proporciones)."""
+    o = np.maximum(observed, _PSI_EPSILON)
+    e = np.maximum(expected, _PSI_EPSILON)
+    return float(np.sum((o - e) * np.log(o / e)))
+
+
+class DriftMonitor:
+    """Cola de observaciones, acumulados por versión y reportes de deriva."""
+
+    def __init__(self):
+        self.enabled = False
+        self.bucket_seconds = 600
+        self.windows: list[tuple[str, int]] = [("1h", 3600), ("24h", 86400), ("7d", 604800)]
+        self.max_pending = 10_000
+        self.min_samples = 30
+        self.psi_threshold = 0.25
+        self.smd_threshold = 0.5
+        self.rate_threshold = 0.1
+        self._references: dict[str, DriftReference] = {}
+        self._buckets: dict[str, _Buckets] = {}
+        self._pending: deque = deque()
+        # Registros (no lotes) en la cola; max_pending acota este número
+        self._pending_records = 0
+        self._pending_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._folded = 0
+        self._published = -1
+
+    @property
+    def _size(self) -> int:
+        longest = max(seconds for _, seconds in self.windows)
+        return math.ceil(longest / self.bucket_seconds) + 1
+
+    def configure(
+        self,
+        windows: str = "1h,24h,7d",
+        bucket_seconds: int = 600,
+        max_pending: int = 10_000,
+        min_samples: int = 30,
+        psi_threshold: float = 0.25,
+        smd_threshold: float = 0.5,
+        rate_threshold: float = 0.1,
+    ):
+        """Activa el monitoreo (los acumulados anteriores se descartan).
+
+        `max_pending`: registros encolados como máximo entre agregaciones;
+        un lote que no cabe se descarta completo (febril_drift_dropped_total).
+        """
+        parsed = [(name.strip(), parse_window(name)) for name in windows.split(",") if name.strip()]
+        if not parsed:
+            raise ValueError("DRIFT_WINDOWS no define ninguna ventana")
+        with self._lock:
+            self.windows = sorted(parsed, key=lambda w: w[1])
+            self.bucket_seconds = max(1, int(bucket_seconds))
+            self.max_pending = max(1, max_pending)
+            self.min_samples = max(1, min_samples)
+            self.psi_threshold = psi_threshold
+            self.smd_threshold = smd_threshold
+            self.rate_threshold = rate_threshold
+            self._buckets.clear()
+            self._published = -1
+        self.enabled = True
+        logger.info(
+            "Monitoreo de deriva activo — ventanas %s, buckets de %d s (%d por versión)",
+            ", ".join(name for name, _ in self.windows),
+            self.bucket_seconds,
+            self._size,
+        )
+
+    def register(self, version: str, reference: DriftReference):
+        """Referencia de `version` (al cargar o recargar el modelo)."""
+        self._references[version] = reference
+
+    def reference(self, version: str) -> DriftReference | None:
+        return self._references.get(version)
+
+    # ── Camino de la solicitud ──
+
+    def _enqueue(self, entry: tuple) -> bool:
+        """Encola (ts, versión, registros, códigos) si cabe en max_pending."""
+        size = len(entry[2])
+        with self._pending_lock:
+            if self._pending_records + size > self.max_pending:
+                accepted = False
+            else:
+                self._pending.append(entry)
+                self._pending_records += size
+                accepted = True
+        if not accepted:
+            drift_dropped.inc(amount=size)
+        return accepted
+
+    def _take_pending(self) -> deque:
+        with self._pending_lock:
+            pending, self._pending = self._pending, deque()
+            self._pending_records = 0
+        return pending
+
+    def observe(self, version: str, records: list[dict], results: list[dict]):
+        """Encola un lote servido; la agregación ocurre fuera de la solicitud."""
+        if not self.enabled:
+            return
+        if self._enqueue((time.time(), version, records, [r["codigo"] for r in results])):
+            drift_observations.inc(version, amount=len(records))
+
+    # ── Ejecutor de procesos ──
+
+    def drain(self) -> list:
+        """Retira la cola de este proceso (hijo del ejecutor) para enviarla."""
+        return list(self._take_pending())
+
+    def merge(self, entries: list | None):
+        """Incorpora la cola de un proceso hijo (con el mismo límite de registros)."""
+        if entries and self.enabled:
+            for entry in entries:
+                self._enqueue(entry)
+
+    # ── Agregación ──
+
+    def _buckets_for(self, version: str) -> _Buckets | None:
+        reference = self._references.get(version)
+        if reference is None:
+            return None
+        buckets = self._buckets.get(version)
+        if buckets is None or buckets.layout != reference.layout:
+            if buckets is not None:
+                logger.info("Referencia de %s con otras variables — acumulados reiniciados", version)
+            buckets = self._buckets[version] = _Buckets(reference, self._size)
+        buckets.reference = reference
+        return buckets
+
+    def fold(self):
+        """Agrega la cola pendiente en los buckets."""
+        with self._lock:
+            groups: dict[tuple, tuple[list, list]] = {}
+            for ts, version, records, codes in self._take_pending():
+                group = groups.setdefault((version, int(ts // self.bucket_seconds)), ([], []))
+                group[0].extend(records)
+                group[1].extend(codes)
+            for (version, epoch), (records, codes) in groups.items():
+                buckets = self._buckets_for(version)
+                if buckets is None or not buckets.add(epoch, records, codes):
+                    drift_dropped.inc(amount=len(records))
+                    continue
+                self._folded += len(records)
+
+    def start(self, interval: float = 5.0):
+        """Hilo que agrega la cola cada `interval` segundos."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.fold()
+                except Exception:
+                    logger.exception("Error agregando observaciones de deriva")
+
+        self._thread = threading.Thread(target=run, name="drift-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    # ── Varios workers (ver cluster) ──
+
+    def publish(self):
+        """Publica los buckets de este worker (si hubo observaciones nuevas)."""
+        if not self.enabled:
+            return
+        self.fold()
+        with self._lock:
+            if self._folded == self._published:
+                return
+            meta = {"bucket_seconds": self.bucket_seconds, "versions": {}}
+            arrays = {}
+            for i, (version, buckets) in enumerate(self._buckets.items()):
+                used = buckets.epoch >= 0
+                meta["versions"][version] = {
+                    "key": i,
+                    "layout": json.dumps(buckets.layout),
+                    # Alineado con las filas publicadas (solo los buckets usados)
+                    "unseen": [
+                        {f: topk.counts for f, topk in buckets.unseen[row].items()}
+                        for row in np.flatnonzero(used)
+                    ],
+                }
+                for name in _BUCKET_ARRAYS:
+                    arrays[f"{i}_{name}"] = getattr(buckets, name)[used]
+            self._published = self._folded
+        cluster.publish(
+            "drift", "npz", lambda f: np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        )
+
+    def _shared(self, version: str, buckets: _Buckets) -> list[_Buckets]:
+        """Buckets de `version` publicados por los demás workers."""
+        layout = json.dumps(buckets.layout)
+        shared = []
+        for path in cluster.snapshots("drift", "npz", include_self=False):
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    meta = json.loads(str(data["meta"]))
+                    entry = meta["versions"].get(version)
+                    if (
+                        entry is None
+                        or entry["layout"] != layout
+                        or meta["bucket_seconds"] != self.bucket_seconds
+                    ):
+                        continue
+                    other = _Buckets(buckets.reference, 0)
+                    for name in _BUCKET_ARRAYS:
+                        setattr(other, name, data[f"{entry['key']}_{name}"])
+                # Una lista alineada con las filas publicadas
+                other.unseen = [
+                    {f: _TopK(UNSEEN_TOP_K, counts) for f, counts in row.items()}
+                    for row in entry["unseen"]
+                ]
+                if len(other.unseen) != len(other.epoch):
+                    raise ValueError("no vistas desalineadas con los buckets")
+            except (OSError, ValueError, KeyError, AttributeError, TypeError) as e:
+                logger.warning("Snapshot de deriva ilegible (%s): %s", path.name, e)
+                continue
+            shared.append(other)
+        return shared
+
+    # ── Reporte ──
+
+    def report(self, version: str, window: str | None = None) -> dict:
+        """Comparación con la referencia en cada ventana (o solo en `window`).
+
+        Cada ventana trae en sus categóricas los valores no vistos más
+        frecuentes de sus propios buckets; "no_vistas" del reporte es el de
+        la ventana más larga.
+        """
+        self.fold()
+        with self._lock:
+            reference = self._references.get(version)
+            buckets = self._buckets_for(version)
+            windows = [w for w in self.windows if window is None or w[0] == window]
+            if window is not None and not windows:
+                raise ValueError(f"Ventana no configurada: {window}")
+            shared = self._shared(version, buckets) if cluster.enabled and buckets else []
+            now_epoch = int(time.time() // self.bucket_seconds)
+            report = {
+                "version": version,
+                "referencia": {
+                    "fuente": reference.source if reference else None,
+                    "n": reference.n if reference else None,
+                    "creado": reference.created_at if reference else None,
+                },
+                "bucket_s": self.bucket_seconds,
+                "ventanas": {},
+            }
+            unseen = {}
+            for name, seconds in windows:
+                span = math.ceil(seconds / self.bucket_seconds)
+                first = now_epoch - span + 1
+                agg = buckets.aggregate(first, now_epoch) if buckets else None
+                for other in shared:
+                    agg = _merge_aggregates(agg, other.aggregate(first, now_epoch))
+                result = self._compare(reference, buckets, agg) if agg else {"n": 0}
+                result["desde"] = time.strftime(
+                    "%Y-%m-%dT%H:%M:%SZ", time.gmtime(first * self.bucket_seconds)
+                )
+                report["ventanas"][name] = result
+                # Ventanas en orden creciente: queda la más larga
+                unseen = {f: topk.top() for f, topk in agg["unseen"].items()} if agg else {}
+            report["no_vistas"] = unseen
+        return report
+
+    def _compare(self, reference: DriftReference, buckets: _Buckets, agg: dict) -> dict:
+        rows = agg["rows"]
+        enough = rows >= self.min_samples
+        alerts = []
+
+        numeric = {}
+        for j, field in enumerate(buckets.num_fields):
+            ref = reference.numeric[field]
+            n = agg["n"][j]
+            mean = agg["mean"][j] if n else None
+            std = math.sqrt(agg["m2"][j] / (n - 1)) if n > 1 else None
+            missing = agg["missing"][j] / rows if rows else None
+            smd = None
+            if mean is not None and ref.get("media") is not None and ref.get("desviacion"):
+                smd = (mean - ref["media"]) / ref["desviacion"]
+            missing_diff = None
+            if missing is not None and ref.get("faltantes") is not None:
+                missing_diff = missing - ref["faltantes"]
+            alert = enough and (
+                (smd is not None and abs(smd) > self.smd_threshold)
+                or (missing_diff is not None and abs(missing_diff) > self.rate_threshold)
+            )
+            if alert:
+                alerts.append(field)
+            numeric[field] = {
+                "n": int(n),
+                "media": _round(mean),
+                "desviacion": _round(std),
+                "faltantes": _round(missing),
+                "ref_media": ref.get("media"),
+                "ref_desviacion": ref.get("desviacion"),
+                "ref_faltantes": ref.get("faltantes"),
+                "diferencia_estandarizada": _round(smd),
+                "alerta": bool(alert),
+            }
+
+        categorical = {}
+        for (field, lookup, other), part in zip(buckets.cat_items, buckets.cat_slices):
+            counts = agg["cats"][part]
+            observed = counts / rows if rows else np.zeros(len(counts))
+            freqs = list(reference.categorical[field].values())
+            value = None
+            if rows and all(p is not None for p in freqs):
+                value = psi(observed, np.array(freqs + [0.0], dtype=np.float64))
+                alert = enough and value > self.psi_threshold
+            else:
+                alert = enough and observed[-1] > self.rate_threshold
+            if alert:
+                alerts.append(field)
+            categorical[field] = {
+                "distribucion": {
+                    category: _round(observed[i - part.start])
+                    for category, i in lookup.items()
+                    if counts[i - part.start]
+                },
+                "no_vistas": _round(observed[-1]) if rows else None,
+                "valores_no_vistos": agg["unseen"][field].top() if field in agg["unseen"] else [],
+                "psi": _round(value),
+                "alerta": bool(alert),
+            }
+
+        class_counts = agg["classes"]
+        mix = class_counts / rows if rows else np.zeros(len(class_counts))
+        ref_mix = list(reference.classes.values())
+        class_psi = None
+        if rows and all(p is not None for p in ref_mix):
+            class_psi = psi(mix, np.array(ref_mix, dtype=np.float64))
+        class_alert = enough and class_psi is not None and class_psi > self.psi_threshold
+        if class_alert:
+            alerts.append("clases")
+
+        return {
+            "n": rows,
+            "suficiente": enough,
+            "alertas": alerts,
+            "clases": {
+                "observado": {k: _round(p) for k, p in zip(buckets.class_keys, mix)},
+                "referencia": reference.classes,
+                "psi": _round(class_psi),
+                "alerta": bool(class_alert),
+            },
+            "numericas": numeric,
+            "categoricas": categorical,
+        }
+
+    def alert_counts(self) -> list[tuple[tuple, int]]:
+        """(versión, ventana) → variables en alerta, para /api/metrics."""
+        if not self.enabled:
+            return []
+        counts = []
+        for version in list(self._references):
+            for name, result in self.report(version)["ventanas"].items():
+                counts.append(((version, name), len(result.get("alertas", []))))
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self._pending_records,
+            "folded": self._folded,
+            "versions": sorted(self._buckets),
+        }
+
+
+# Instancia global
+drift_monitor = DriftMonitor()
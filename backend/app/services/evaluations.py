@@ -0,0 +1,220 @@
+"""Consultas sobre las evaluaciones registradas en la base de datos.
+
+El historial se pagina por keyset sobre (created_at, id), en orden
+descendente: cada página continúa desde la última fila de la anterior
+(el cursor) usando los índices de 004_historial_indices.sql, así que
+cuesta O(tamaño de página) sin importar la antigüedad de la página ni el
+largo del historial. Las filas del listado traen solo las columnas que
+muestra la tabla; el detalle completo se pide por id.
+
+Las estadísticas se leen de los acumulados por usuario y día
+(evaluaciones_diarias y factores_diarios), que los triggers de
+003_estadisticas.sql mantienen al insertar cada evaluación: el costo
+depende de la cantidad de días, no de la cantidad de evaluaciones.
+"""
+import base64
+import json
+from datetime import date, datetime, time, timedelta, timezone
+
+from .clinical_rules import DEFAULT_RULES
+from .database import database
+from .ml_service import CLASS_KEYS
+from .registry import model_registry
+
+# Día calendario de los acumulados: hora de Colombia (America/Bogota, UTC−5
+# sin horario de verano), igual que en los triggers
+STATS_TZ = timezone(timedelta(hours=-5))
+
+_CONFIDENCE_BANDS = ("alta", "media", "baja")
+
+# Campos de datos_paciente que muestra el listado del historial
+SUMMARY_FIELDS = ("grupo_edad", "sexo", "area", "tiempo_fiebre")
+_DETAIL_COLUMNS = (
+    "id, datos_paciente, prediccion, prediccion_codigo, probabilidades, "
+    "factores, confianza, modelo_version, created_at"
+)
+
+
+def local_today() -> date:
+    return datetime.now(STATS_TZ).date()
+
+
+def _no_factor_messages() -> set[str]:
+    """Mensajes de "sin factores" de las tablas de reglas cargadas."""
+    messages = {DEFAULT_RULES["sin_factores"]}
+    for version in model_registry.specs_by_version():
+        messages.add(model_registry.get(version).rules.sin_factores)
+    return messages
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _point(day: date, counts: dict) -> dict:
+    total = counts.get("total", 0)
+    return {
+        "fecha": day.isoformat(),
+        "total": total,
+        **{key: counts.get(key, 0) for key in CLASS_KEYS},
+        "confianza_promedio": round(counts["suma_confianza"] / total, 1) if total else None,
+    }
+
+
+def _add(into: dict, row: dict):
+    for key in ("total", *CLASS_KEYS, "suma_confianza"):
+        into[key] = into.get(key, 0) + (row.get(key) or 0)
+
+
+def user_stats(user_id: str, days: int, top_factors: int, today: date | None = None) -> dict:
+    """Totales del historial, series diaria/semanal y factores de los últimos `days` días."""
+    today = today or local_today()
+    since = today - timedelta(days=days - 1)
+
+    totals = database.fetch_all(
+        "SELECT COALESCE(SUM(total), 0) AS total, COALESCE(SUM(leve), 0) AS leve, "
+        "COALESCE(SUM(moderada), 0) AS moderada, COALESCE(SUM(severa), 0) AS severa, "
+        "COALESCE(SUM(suma_confianza), 0) AS suma_confianza, "
+        "COALESCE(SUM(confianza_alta), 0) AS alta, COALESCE(SUM(confianza_media), 0) AS media, "
+        "COALESCE(SUM(confianza_baja), 0) AS baja "
+        "FROM evaluaciones_diarias WHERE user_id = ?",
+        (user_id,),
+    )[0]
+    daily_rows = database.fetch_all(
+        "SELECT dia, total, leve, moderada, severa, suma_confianza "
+        "FROM evaluaciones_diarias WHERE user_id = ? AND dia >= ? ORDER BY dia",
+        (user_id, since),
+    )
+    factor_rows = database.fetch_all(
+        "SELECT factor, SUM(n) AS n FROM factores_diarios "
+        "WHERE user_id = ? AND dia >= ? GROUP BY factor ORDER BY n DESC, factor",
+        (user_id, since),
+    )
+
+    # Series completas (días sin evaluaciones en cero) y semanas desde el lunes
+    by_day = {_as_date(row["dia"]): row for row in daily_rows}
+    daily, weekly = [], {}
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        counts: dict = {}
+        _add(counts, by_day.get(day, {}))
+        daily.append(_point(day, counts))
+        _add(weekly.setdefault(day - timedelta(days=day.weekday()), {}), counts)
+
+    skip = _no_factor_messages()
+    factors = [
+        {"factor": row["factor"], "n": int(row["n"])}
+        for row in factor_rows
+        if row["factor"] not in skip
+    ][:top_factors]
+
+    total = int(totals["total"])
+    return {
+        "total": total,
+        "clases": {key: int(totals[key]) for key in CLASS_KEYS},
+        "confianza_promedio": round(totals["suma_confianza"] / total, 1) if total else None,
+        "confianza": {band: int(totals[band]) for band in _CONFIDENCE_BANDS},
+        "desde": since.isoformat(),
+        "diario": daily,
+        "semanal": [_point(week, counts) for week, counts in weekly.items()],
+        "factores": factors,
+    }
+
+
+def encode_cursor(created_at, evaluation_id) -> str:
+    """Cursor opaco con la posición (created_at, id) de una fila."""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([str(created_at), str(evaluation_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverso de encode_cursor; ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, evaluation_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(evaluation_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("cursor inválido") from e
+
+
+def _local_midnight(day: date) -> datetime:
+    """Inicio del día en hora de Colombia, en UTC (como se guarda created_at)."""
+    return datetime.combine(day, time(), STATS_TZ).astimezone(timezone.utc)
+
+
+def _iso(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def user_history(
+    user_id: str,
+    limit: int,
+    cursor: str | None = None,
+    clase: str | None = None,
+    confidence_min: float | None = None,
+    confidence_max: float | None = None,
+    since: date | None = None,
+    until: date | None = None,
+) -> dict:
+    """Página del historial (más recientes primero) y cursor de la siguiente.
+
+    Filtros opcionales: clase ("leve", "moderada", "severa"), rango de
+    confianza (inclusivo) y rango de días en hora de Colombia (inclusivo).
+    """
+    where, params = ["user_id = ?"], [user_id]
+    if clase is not None:
+        where.append("prediccion_codigo = ?")
+        params.append(CLASS_KEYS.index(clase))
+    if confidence_min is not None:
+        where.append("confianza >= ?")
+        params.append(confidence_min)
+    if confidence_max is not None:
+        where.append("confianza <= ?")
+        params.append(confidence_max)
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(_local_midnight(since))
+    if until is not None:
+        where.append("created_at < ?")
+        params.append(_local_midnight(until + timedelta(days=1)))
+    if cursor:
+        where.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    summary = ", ".join(
+        f"{database.json_field('datos_paciente', key)} AS {key}" for key in SUMMARY_FIELDS
+    )
+    rows = database.fetch_all(
+        "SELECT id, created_at, prediccion, prediccion_codigo, confianza, modelo_version, "
+        f"{summary} FROM evaluaciones WHERE {' AND '.join(where)} "
+        "ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*params, limit + 1),
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    items = [{**row, "id": str(row["id"]), "created_at": _iso(row["created_at"])} for row in rows]
+    return {"items": items, "siguiente_cursor": next_cursor}
+
+
+def user_evaluation(user_id: str, evaluation_id: str) -> dict | None:
+    """Evaluación completa del usuario (None si no existe o es de otro usuario)."""
+    rows = database.fetch_all(
+        f"SELECT {_DETAIL_COLUMNS} FROM evaluaciones WHERE id = ? AND user_id = ?",
+        (evaluation_id, user_id),
+    )
+    if not rows:
+        return None
+    row = rows[0]
+    return {
+        **row,
+        "id": str(row["id"]),
+        "created_at": _iso(row["created_at"]),
+        **{
+            key: database.json_value(row[key])
+            for key in ("datos_paciente", "probabilidades", "factores")
+        },
+    }
@@ -0,0 +1,223 @@
+"""Ejecutor de inferencia — saca el trabajo CPU del event loop de asyncio.
+
+Las predicciones se ejecutan en un pool de hilos o de procesos (con el
+modelo precargado en cada hijo). La cola es acotada: cuando está llena se
+lanza ExecutorSaturated y la ruta responde 503 con Retry-After, en lugar de
+acumular latencia. Expone profundidad de cola y tiempos de espera.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .drift import drift_monitor
+from .metrics import metrics
+from .registry import ModelSpec, model_registry
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """La cola de inferencia está llena; el cliente debe reintentar."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Cola de inferencia llena")
+        self.retry_after = retry_after
+
+
+# ── Funciones ejecutadas en el worker (deben ser picklables) ──
+
+def _init_process_worker(
+    specs: list[ModelSpec], default_version: str, cache: tuple, drift: bool = False
+):
+    """Precarga todas las versiones del registro en cada proceso hijo.
+
+    Con `drift` el hijo encola sus observaciones de deriva y las entrega
+    con cada resultado; la agregación ocurre en el proceso principal.
+    """
+    model_registry.configure_cache(*cache)
+    drift_monitor.enabled = drift
+    for spec in specs:
+        model_registry.load(spec, default=spec.version == default_version)
+
+
+def _timed_call(fn, args: tuple, drain: bool = False) -> tuple:
+    """Ejecuta fn registrando el instante de inicio (reloj monotónico del host).
+
+    En procesos hijos (`drain`) retorna además las métricas y observaciones
+    de deriva acumuladas en el hijo, para que el proceso principal las
+    incorpore.
+    """
+    started = time.monotonic()
+    result = fn(*args)
+    return started, result, (metrics.drain(), drift_monitor.drain()) if drain else None
+
+
+def run_predict_batch(
+    records: list[dict], version: str | None = None, explain: bool = False
+) -> list[dict]:
+    """Predicción por lotes en el proceso/hilo del worker."""
+    return model_registry.get(version).predict_batch(records, explain)
+
+
+def warm_up_worker(versions: list[str]) -> tuple:
+    """Predicción sintética por cada versión en el worker; retorna (pid, hilo)."""
+    for version in versions:
+        model_registry.get(version).warm_up()
+    return os.getpid(), threading.get_ident()
+
+
+class InferenceExecutor:
+    """Pool de inferencia con cola acotada y métricas de espera."""
+
+    def __init__(self):
+        self._pool: Executor | None = None
+        self.mode = "inline"
+        self.workers = 0
+        self.max_queue = 0
+        self.retry_after = 1
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+
+    def start(
+        self,
+        mode: str,
+        workers: int,
+        max_queue: int,
+        retry_after: int,
+    ):
+        """Crea el pool. mode: 'thread' o 'process'."""
+        self.shutdown()
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Modo de ejecutor desconocido: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._pool = self._create_pool()
+        logger.info(
+            "Ejecutor de inferencia: %s × %d (cola máx. %d)",
+            mode,
+            self.workers,
+            self.max_queue,
+        )
+
+    def _create_pool(self) -> Executor:
+        if self.mode == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(
+                    model_registry.specs(),
+                    model_registry.default_version,
+                    (model_registry.cache_size, model_registry.cache_ttl),
+                    drift_monitor.enabled,
+                ),
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+
+    def reload_workers(self):
+        """Tras un cambio en el registro, reemplaza el pool de procesos.
+
+        Los hilos comparten el registro y no necesitan recarga. Los procesos
+        nuevos cargan las versiones actuales; el pool anterior termina sus
+        tareas en curso antes de cerrarse.
+        """
+        if self.mode != "process" or self._pool is None:
+            return
+        old, self._pool = self._pool, self._create_pool()
+        old.shutdown(wait=False)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn, *args):
+        """Ejecuta fn(*args) en el pool sin bloquear el event loop.
+
+        Lanza ExecutorSaturated si ya hay `workers + max_queue` tareas en curso.
+        """
+        if self._pool is None:
+            return fn(*args)
+
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(self.retry_after)
+            self._in_flight += 1
+            self._submitted += 1
+
+        loop = asyncio.get_running_loop()
+        enqueued = time.monotonic()
+        try:
+            started, result, delta = await loop.run_in_executor(
+                self._pool, _timed_call, fn, args, self.mode == "process"
+            )
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        if delta:
+            metrics.merge(delta[0])
+            drift_monitor.merge(delta[1])
+        wait = max(0.0, started - enqueued)
+        with self._lock:
+            self._completed += 1
+            self._wait_sum += wait
+            self._wait_max = max(self._wait_max, wait)
+        return result
+
+    async def warm_up(self) -> int:
+        """Una predicción sintética por worker antes de recibir tráfico.
+
+        En modo proceso crea ahora los hijos (que cargan los modelos), en
+        lugar de hacerlo con la primera solicitud. Retorna cuántos workers
+        distintos respondieron.
+        """
+        if self._pool is None:
+            return 0
+        versions = list(model_registry.specs_by_version())
+
+        async def warm_one():
+            while True:
+                try:
+                    return await self.run(warm_up_worker, versions)
+                except ExecutorSaturated:
+                    # El tráfico llegó antes: reintentar cuando haya lugar
+                    await asyncio.sleep(0.05)
+
+        workers = await asyncio.gather(*(warm_one() for _ in range(self.workers)))
+        return len(set(workers))
+
+    def stats(self) -> dict:
+        """Métricas de la cola de inferencia."""
+        with self._lock:
+            completed = self._completed
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.workers),
+                "submitted": self._submitted,
+                "completed": completed,
+                "rejected": self._rejected,
+                "wait_ms_avg": round(self._wait_sum / completed * 1000, 3)
+                if completed
+                else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+            }
+
+
+# Instancia global
+inference_executor = InferenceExecutor()
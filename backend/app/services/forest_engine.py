@@ -0,0 +1,436 @@
+"""Motor de inferencia compilado para el bosque calibrado.
+
+Aplana los árboles de todos los sub-estimadores de CalibratedClassifierCV en
+arreglos contiguos (feature, threshold, hijos, valores de hoja) y los recorre
+de forma vectorizada sobre todo el lote: una iteración por nivel de
+profundidad en lugar de una llamada por árbol. Los calibradores se aplican
+como tablas de interpolación precalculadas (isotónico) o parámetros a/b
+(sigmoide), y la clase se obtiene de la misma pasada de probabilidades.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CALIBRATOR_ISOTONIC = 0
+CALIBRATOR_SIGMOID = 1
+
+
+class CompiledForest:
+    """Bosque calibrado representado como arreglos planos de NumPy.
+
+    Los nodos de todos los árboles se concatenan; las hojas apuntan a sí
+    mismas (threshold=+inf) para que el recorrido avance exactamente
+    `max_depth` pasos sin ramificaciones por muestra.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        tree_offsets: np.ndarray,
+        class_index: np.ndarray,
+        cal_kind: np.ndarray,
+        cal_offsets: np.ndarray,
+        cal_x: np.ndarray,
+        cal_y: np.ndarray,
+        cal_ab: np.ndarray,
+        classes: np.ndarray,
+        max_depth: int,
+        n_features: int,
+    ):
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.tree_offsets = np.asarray(tree_offsets, dtype=np.intp)
+        self.class_index = np.asarray(class_index, dtype=np.intp)
+        self.cal_kind = np.asarray(cal_kind, dtype=np.int8)
+        self.cal_offsets = np.asarray(cal_offsets, dtype=np.intp)
+        self.cal_x = np.asarray(cal_x, dtype=np.float64)
+        self.cal_y = np.asarray(cal_y, dtype=np.float64)
+        self.cal_ab = np.asarray(cal_ab, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+        # Peso de cada árbol en la probabilidad media del bosque sin calibrar
+        # (media de sus árboles y luego de los sub-estimadores)
+        trees_per_estimator = np.diff(self.tree_offsets)
+        self.tree_weight = np.repeat(
+            1.0 / (trees_per_estimator * self.n_estimators), trees_per_estimator
+        )
+        # Probabilidad esperada antes de ver al paciente (raíces)
+        self.bias = self.tree_weight @ self.value[self.roots]
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.tree_offsets) - 1
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        """Aplana un CalibratedClassifierCV que envuelve un bosque de árboles.
+
+        Lanza ValueError si el modelo usa una estructura no soportada; en ese
+        caso MLService conserva model.predict_proba.
+        """
+        calibrated = getattr(model, "calibrated_classifiers_", None)
+        if not calibrated:
+            raise ValueError(f"modelo no soportado: {type(model).__name__}")
+        classes = np.asarray(model.classes_)
+        n_classes = len(classes)
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        roots, tree_offsets = [], [0]
+        class_index, cal_kind, cal_ab = [], [], []
+        cal_x, cal_y, cal_offsets = [], [], [0]
+        n_nodes = 0
+        max_depth = 0
+        n_features = None
+
+        for calibrated_clf in calibrated:
+            estimator = calibrated_clf.estimator
+            if hasattr(estimator, "decision_function"):
+                raise ValueError("estimadores con decision_function no soportados")
+            trees = getattr(estimator, "estimators_", None) or [estimator]
+            est_classes = np.asarray(estimator.classes_)
+
+            for tree in trees:
+                t = getattr(tree, "tree_", None)
+                if t is None or t.n_outputs != 1:
+                    raise ValueError("solo se soportan árboles de una salida")
+                if n_features is None:
+                    n_features = t.n_features
+                is_leaf = t.children_left < 0
+                node_ids = np.arange(t.node_count)
+                feature.append(np.where(is_leaf, 0, t.feature))
+                threshold.append(np.where(is_leaf, np.inf, t.threshold))
+                left.append(np.where(is_leaf, node_ids, t.children_left) + n_nodes)
+                right.append(np.where(is_leaf, node_ids, t.children_right) + n_nodes)
+                # Mismo cálculo que DecisionTreeClassifier.predict_proba
+                proba = t.value[:, 0, : len(est_classes)].astype(np.float64)
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value.append(proba / normalizer)
+                roots.append(n_nodes)
+                n_nodes += t.node_count
+                max_depth = max(max_depth, t.max_depth)
+            tree_offsets.append(len(roots))
+
+            # Calibradores por clase (one-vs-all)
+            pos_class = np.searchsorted(classes, est_classes)
+            if n_classes == 2:
+                pos_class = pos_class[1:]
+            if len(calibrated_clf.calibrators) != len(pos_class):
+                raise ValueError("número de calibradores inesperado")
+            class_index.append(pos_class)
+            kinds, abs_ = [], []
+            for calibrator in calibrated_clf.calibrators:
+                if hasattr(calibrator, "X_thresholds_"):
+                    kinds.append(CALIBRATOR_ISOTONIC)
+                    abs_.append((0.0, 0.0))
+                    cal_x.append(np.asarray(calibrator.X_thresholds_, dtype=np.float64))
+                    cal_y.append(np.asarray(calibrator.y_thresholds_, dtype=np.float64))
+                elif hasattr(calibrator, "a_") and hasattr(calibrator, "b_"):
+                    kinds.append(CALIBRATOR_SIGMOID)
+                    abs_.append((float(calibrator.a_), float(calibrator.b_)))
+                    cal_x.append(np.empty(0))
+                    cal_y.append(np.empty(0))
+                else:
+                    raise ValueError(
+                        f"calibrador no soportado: {type(calibrator).__name__}"
+                    )
+                cal_offsets.append(cal_offsets[-1] + len(cal_x[-1]))
+            cal_kind.append(kinds)
+            cal_ab.append(abs_)
+
+        return cls(
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            value=np.concatenate(value),
+            roots=np.array(roots),
+            tree_offsets=np.array(tree_offsets),
+            class_index=np.array(class_index),
+            cal_kind=np.array(cal_kind),
+            cal_offsets=np.array(cal_offsets),
+            cal_x=np.concatenate(cal_x),
+            cal_y=np.concatenate(cal_y),
+            cal_ab=np.array(cal_ab),
+            classes=classes,
+            max_depth=max_depth,
+            n_features=n_features,
+        )
+
+    # Arreglos que definen el bosque, en el orden del constructor
+    ARRAY_FIELDS = (
+        "feature",
+        "threshold",
+        "left",
+        "right",
+        "value",
+        "roots",
+        "tree_offsets",
+        "class_index",
+        "cal_kind",
+        "cal_offsets",
+        "cal_x",
+        "cal_y",
+        "cal_ab",
+        "classes",
+    )
+
+    def to_arrays(self) -> tuple[dict, dict]:
+        """Retorna (parámetros JSON, arreglos NumPy) para el bundle."""
+        params = {"max_depth": self.max_depth, "n_features": self.n_features}
+        return params, {name: getattr(self, name) for name in self.ARRAY_FIELDS}
+
+    @classmethod
+    def from_arrays(cls, params: dict, arrays: dict) -> "CompiledForest":
+        """Reconstruye el bosque exportado con to_arrays.
+
+        Los arreglos se usan tal cual (sin copia) cuando ya tienen el dtype
+        esperado, de modo que un np.memmap sigue respaldado por el archivo.
+        """
+        return cls(**{name: arrays[name] for name in cls.ARRAY_FIELDS}, **params)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes de los arreglos del bosque (lo que ocupa en el bundle)."""
+        return sum(getattr(self, name).nbytes for name in self.ARRAY_FIELDS)
+
+    def _uniform_subtrees(self, tolerance: float) -> tuple:
+        """Nodos cuyo subárbol predice lo mismo en todas sus hojas.
+
+        Retorna (máscara, valor): un nodo es uniforme si en cada clase sus
+        hojas difieren a lo sumo `tolerance`. Con hojas idénticas el valor es
+        el de las hojas (bit a bit); si no, el del propio nodo, que es la
+        media ponderada de sus hojas.
+        """
+        n = len(self.left)
+        ids = np.arange(n)
+        is_leaf = self.left == ids
+        inner = ids[~is_leaf]
+        if np.any(self.left[inner] <= inner) or np.any(self.right[inner] <= inner):
+            raise ValueError("los hijos deben seguir a su padre (orden de sklearn)")
+        uniform = is_leaf.copy()
+        low = self.value.copy()
+        high = self.value.copy()
+        # Recorrido inverso: los hijos se resuelven antes que el padre
+        for node in inner[::-1]:
+            l, r = self.left[node], self.right[node]
+            low[node] = np.minimum(low[l], low[r])
+            high[node] = np.maximum(high[l], high[r])
+            spread = (high[node] - low[node]).max()
+            uniform[node] = uniform[l] and uniform[r] and spread <= tolerance
+        value = np.where((high == low).all(axis=1)[:, np.newaxis], low, self.value)
+        return uniform, value
+
+    def compact(
+        self,
+        keep: list | None = None,
+        merge_tolerance: float | None = 0.0,
+        float32_thresholds: bool = True,
+    ) -> "CompiledForest":
+        """Copia compactada del bosque.
+
+        `keep` indica, por sub-estimador, los árboles que se conservan
+        (índices dentro del sub-estimador; None = todos). Con
+        `merge_tolerance` cada subárbol cuyas hojas difieren a lo sumo en esa
+        cantidad se reemplaza por una hoja (0 = hojas idénticas: ninguna
+        probabilidad ni contribución cambia) y los nodos inalcanzables se
+        eliminan. Con `float32_thresholds` los umbrales se guardan en float32
+        redondeados hacia abajo: como X se compara en float32, x <= t32
+        equivale exactamente a x <= t64.
+        """
+        if keep is None:
+            keep = [range(n) for n in np.diff(self.tree_offsets)]
+        if len(keep) != self.n_estimators:
+            raise ValueError("keep requiere una lista de árboles por sub-estimador")
+        if merge_tolerance is None:
+            collapse, value = self.left == np.arange(len(self.left)), self.value
+        else:
+            collapse, value = self._uniform_subtrees(merge_tolerance)
+
+        order, roots, tree_offsets = [], [], [0]
+        max_depth = 0
+        for k, trees in enumerate(keep):
+            start, end = self.tree_offsets[k], self.tree_offsets[k + 1]
+            trees = sorted(set(int(t) for t in trees))
+            if not trees or trees[0] < 0 or trees[-1] >= end - start:
+                raise ValueError(f"árboles fuera de rango en el sub-estimador {k}")
+            for t in trees:
+                roots.append(len(order))
+                # Preorden, igual que sklearn: los hijos siguen a su padre
+                stack = [(self.roots[start + t], 0)]
+                while stack:
+                    node, depth = stack.pop()
+                    order.append(node)
+                    if collapse[node]:
+                        max_depth = max(max_depth, depth)
+                    else:
+                        stack.append((self.right[node], depth + 1))
+                        stack.append((self.left[node], depth + 1))
+            tree_offsets.append(len(roots))
+
+        order = np.array(order, dtype=np.intp)
+        new_id = np.arange(len(order))
+        # Cada nodo aparece una sola vez: mapa de índice viejo → nuevo
+        remap = np.full(len(self.left), -1, dtype=np.intp)
+        remap[order] = new_id
+        leaf = collapse[order]
+        threshold = np.where(leaf, np.inf, self.threshold[order]).astype(np.float64)
+        if float32_thresholds:
+            rounded = threshold.astype(np.float32)
+            above = rounded.astype(np.float64) > threshold
+            rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+            threshold = rounded
+        return CompiledForest(
+            feature=np.where(leaf, 0, self.feature[order]),
+            threshold=threshold,
+            left=np.where(leaf, new_id, remap[self.left[order]]),
+            right=np.where(leaf, new_id, remap[self.right[order]]),
+            value=value[order],
+            roots=np.array(roots),
+            tree_offsets=np.array(tree_offsets),
+            class_index=self.class_index,
+            cal_kind=self.cal_kind,
+            cal_offsets=self.cal_offsets,
+            cal_x=self.cal_x,
+            cal_y=self.cal_y,
+            cal_ab=self.cal_ab,
+            classes=self.classes,
+            max_depth=max_depth,
+            n_features=self.n_features,
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Retorna el índice global de la hoja alcanzada: (N, n_trees)."""
+        # Los árboles de sklearn comparan en float32
+        X32 = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X32.shape[0])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (X32.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            go_left = X32[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def _forest_proba(self, leaves: np.ndarray, k: int) -> np.ndarray:
+        """Promedio de las hojas del sub-estimador k (orden de RandomForest)."""
+        start, end = self.tree_offsets[k], self.tree_offsets[k + 1]
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]))
+        for t in range(start, end):
+            proba += self.value[leaves[:, t]]
+        proba /= end - start
+        return proba
+
+    def _calibrate(self, forest_proba: np.ndarray, k: int) -> np.ndarray:
+        """Aplica los calibradores del sub-estimador k y normaliza."""
+        n_classes = len(self.classes)
+        n = forest_proba.shape[0]
+        if n_classes == 2:
+            predictions = forest_proba[:, 1:]
+        else:
+            predictions = forest_proba
+        proba = np.zeros((n, n_classes))
+        for j, class_idx in enumerate(self.class_index[k]):
+            pred = predictions[:, j]
+            c = k * len(self.class_index[k]) + j
+            if self.cal_kind[k, j] == CALIBRATOR_ISOTONIC:
+                lo, hi = self.cal_offsets[c], self.cal_offsets[c + 1]
+                proba[:, class_idx] = np.interp(pred, self.cal_x[lo:hi], self.cal_y[lo:hi])
+            else:
+                a, b = self.cal_ab[k, j]
+                proba[:, class_idx] = 1.0 / (1.0 + np.exp(a * pred + b))
+
+        if n_classes == 2:
+            proba[:, 0] = 1.0 - proba[:, 1]
+        else:
+            denominator = np.sum(proba, axis=1)[:, np.newaxis]
+            uniform_proba = np.full_like(proba, 1 / n_classes)
+            proba = np.divide(proba, denominator, out=uniform_proba, where=denominator != 0)
+        proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+        return proba
+
+    def apply_contributions(
+        self, X: np.ndarray, groups: np.ndarray | None = None, n_groups: int = 0
+    ) -> tuple:
+        """Como apply, acumulando además la contribución de cada feature.
+
+        Contribuciones de trayectoria (Saabas): en cada nodo de decisión, la
+        diferencia entre los valores del hijo y del padre se atribuye a la
+        feature del padre, ponderada por el peso del árbol. Por construcción
+        bias + Σ contribuciones = probabilidad media del bosque sin calibrar.
+        `groups` (feature → grupo) suma las contribuciones por grupo dentro
+        del mismo recorrido. Retorna (hojas, contribuciones (N, G, clases)).
+        """
+        X32 = np.asarray(X, dtype=np.float32)
+        n = X32.shape[0]
+        n_classes = self.value.shape[1]
+        if groups is None:
+            groups, n_groups = np.arange(self.n_features), self.n_features
+        groups = np.asarray(groups, dtype=np.intp)
+
+        # Pares (muestra, árbol) aún en nodos de decisión, aplanados
+        n_trees = self.n_trees
+        position = np.arange(n * n_trees)
+        sample = position // n_trees
+        node = np.tile(self.roots, n)
+        weight = np.tile(self.tree_weight, n)
+        leaves = node.copy()
+        contributions = np.zeros((n_classes, n * n_groups))
+        for _ in range(self.max_depth):
+            feature = self.feature[node]
+            go_left = X32[sample, feature] <= self.threshold[node]
+            child = np.where(go_left, self.left[node], self.right[node])
+            # Las hojas apuntan a sí mismas: se descartan del recorrido
+            moved = child != node
+            if not moved.all():
+                node, child, feature = node[moved], child[moved], feature[moved]
+                sample, weight, position = sample[moved], weight[moved], position[moved]
+                if not node.size:
+                    break
+            delta = (self.value[child] - self.value[node]) * weight[:, np.newaxis]
+            slot = sample * n_groups + groups[feature]
+            for c in range(n_classes):
+                contributions[c] += np.bincount(slot, delta[:, c], minlength=n * n_groups)
+            leaves[position] = child
+            node = child
+        return leaves.reshape(n, n_trees), contributions.T.reshape(n, n_groups, n_classes)
+
+    def proba_from_leaves(self, leaves: np.ndarray) -> np.ndarray:
+        """Probabilidades calibradas a partir de las hojas de apply."""
+        mean_proba = np.zeros((leaves.shape[0], len(self.classes)))
+        for k in range(self.n_estimators):
+            mean_proba += self._calibrate(self._forest_proba(leaves, k), k)
+        mean_proba /= self.n_estimators
+        return mean_proba
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidades calibradas (media de los sub-estimadores)."""
+        return self.proba_from_leaves(self.apply(X))
+
+    def predict(self, X: np.ndarray) -> tuple:
+        """Retorna (clases, probabilidades) en una sola pasada por los árboles."""
+        proba = self.predict_proba(X)
+        return self.classes[np.argmax(proba, axis=1)], proba
+
+    def predict_explain(
+        self, X: np.ndarray, groups: np.ndarray | None = None, n_groups: int = 0
+    ) -> tuple:
+        """(clases, probabilidades, contribuciones) en una sola pasada por los árboles."""
+        leaves, contributions = self.apply_contributions(X, groups, n_groups)
+        proba = self.proba_from_leaves(leaves)
+        return self.classes[np.argmax(proba, axis=1)], proba, contributions
@@ -0,0 +1,166 @@
+"""Gestor asíncrono de claves públicas JWKS de Supabase.
+
+Las claves se precargan al iniciar (lifespan) y se refrescan en segundo
+plano cada `refresh_interval` segundos sin bloquear el event loop. Ante un
+`kid` desconocido se hace un único refetch, limitado por
+`min_refetch_interval`. Si un refresh falla se conserva el último conjunto
+válido; las consultas nunca esperan a un refresh salvo que falte la clave.
+"""
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import jwt as pyjwt
+
+# httpx se importa con el primer refresh (solo con claves asimétricas)
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Reintento tras un refresh fallido (s)
+_RETRY_INTERVAL = 30.0
+
+
+class JWKSManager:
+    """Conjunto de claves de firma (PyJWK por kid) con refresco en background."""
+
+    def __init__(self):
+        self.url = ""
+        self.refresh_interval = 600.0
+        self.min_refetch_interval = 30.0
+        self.timeout = 10.0
+        self._keys: dict[str, pyjwt.PyJWK] = {}
+        self._default: pyjwt.PyJWK | None = None
+        self._client: "httpx.AsyncClient | None" = None
+        self._task: asyncio.Task | None = None
+        self._lock: asyncio.Lock | None = None
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self.refreshes = 0
+        self.failures = 0
+
+    def configure(
+        self,
+        url: str,
+        refresh_interval: float = 600.0,
+        min_refetch_interval: float = 30.0,
+        timeout: float = 10.0,
+    ):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+
+    @property
+    def has_keys(self) -> bool:
+        return bool(self._keys) or self._default is not None
+
+    async def start(self):
+        """Precarga las claves y arranca el refresco periódico."""
+        if self._task is not None:
+            return
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._lock = None
+
+    async def _refresh_loop(self):
+        while True:
+            ok = self._fetched_at > 0 and self._fetched_at >= self._last_attempt
+            await asyncio.sleep(self.refresh_interval if ok else _RETRY_INTERVAL)
+            await self.refresh()
+
+    async def refresh(self) -> bool:
+        """Descarga el JWKS; conserva el conjunto anterior si falla."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._last_attempt = time.monotonic()
+            if self._client is None:
+                import httpx
+
+                self._client = httpx.AsyncClient(timeout=self.timeout)
+            try:
+                response = await self._client.get(self.url)
+                response.raise_for_status()
+                self.load_document(response.json())
+            except Exception as e:
+                self.failures += 1
+                logger.error(
+                    "No se pudo obtener JWKS (%s) — se conservan %d claves previas",
+                    e,
+                    len(self._keys),
+                )
+                return False
+            self._fetched_at = time.monotonic()
+            self.refreshes += 1
+            logger.info("JWKS obtenido desde %s — %d claves", self.url, len(self._keys))
+            return True
+
+    def load_document(self, jwks: dict):
+        """Construye los PyJWK del documento y los publica atómicamente."""
+        keys, default = {}, None
+        for key_data in jwks.get("keys", []):
+            try:
+                signing_key = pyjwt.PyJWK.from_dict(key_data)
+            except Exception as e:
+                logger.warning("Clave JWKS ignorada (%s): %s", key_data.get("kid"), e)
+                continue
+            if key_data.get("kid"):
+                keys[key_data["kid"]] = signing_key
+            # Primera llave de firma: fallback cuando el token no trae kid
+            if default is None and (
+                key_data.get("use") == "sig" or key_data.get("alg") in ["RS256", "ES256"]
+            ):
+                default = signing_key
+        if not keys and default is None:
+            raise ValueError("JWKS sin claves utilizables")
+        self._keys, self._default = keys, default
+
+    async def get_key(self, kid: str | None) -> pyjwt.PyJWK | None:
+        """Clave para `kid`; refetch único (con límite de frecuencia) si falta."""
+        key = self._keys.get(kid) if kid else None
+        if key is not None:
+            return key
+        if kid or not self.has_keys:
+            if self._lock is not None and self._lock.locked():
+                # Ya hay un refresh en curso: esperar su resultado
+                async with self._lock:
+                    pass
+            elif self._can_refetch():
+                await self.refresh()
+            key = self._keys.get(kid) if kid else None
+        return key or self._default
+
+    def _can_refetch(self) -> bool:
+        return (
+            self._last_attempt == 0.0
+            or time.monotonic() - self._last_attempt >= self.min_refetch_interval
+        )
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._keys),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "age_s": round(time.monotonic() - self._fetched_at, 1)
+            if self._fetched_at
+            else None,
+        }
+
+
+# Instancia global
+jwks_manager = JWKSManager()
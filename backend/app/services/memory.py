@@ -0,0 +1,64 @@
+"""Memoria residente por proceso (RSS, PSS, compartida y privada).
+
+Con workers pre-fork, el RSS de cada worker cuenta también las páginas que
+comparte con el padre y sus hermanos (modelo cargado antes del fork, bundles
+mapeados). Para dimensionar el contenedor sirve la PSS: cada página
+compartida se reparte entre los procesos que la usan, y la suma de las PSS
+es la memoria real del grupo.
+
+Lee /proc/<pid>/smaps_rollup (Linux ≥ 4.14); sin él, solo el RSS de
+/proc/<pid>/status o, fuera de Linux, el máximo de getrusage.
+"""
+import os
+import sys
+
+_ROLLUP_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "private",
+    "Private_Dirty": "private",
+}
+
+
+def _read_kb(path: str, fields: dict) -> dict:
+    usage: dict = {}
+    with open(path, encoding="ascii") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            stat = fields.get(key)
+            if stat is not None:
+                usage[stat] = usage.get(stat, 0) + int(rest.split()[0]) * 1024
+    return usage
+
+
+def memory_usage(pid: int | None = None) -> dict:
+    """Bytes de memoria de `pid` (por defecto este proceso).
+
+    Claves: rss y, si el kernel lo expone, pss, shared y private.
+    Retorna {} si el proceso ya no existe.
+    """
+    pid = os.getpid() if pid is None else pid
+    try:
+        return _read_kb(f"/proc/{pid}/smaps_rollup", _ROLLUP_FIELDS)
+    except FileNotFoundError:
+        if os.path.isdir("/proc/self"):
+            if not os.path.isdir(f"/proc/{pid}"):
+                return {}
+            return _read_kb(f"/proc/{pid}/status", {"VmRSS": "rss"})
+    except (PermissionError, ProcessLookupError):
+        return {}
+    if pid != os.getpid():
+        return {}
+    import resource
+
+    # ru_maxrss: KB en Linux, bytes en macOS (pico, no el valor actual)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"rss": peak if sys.platform == "darwin" else peak * 1024}
+
+
+def format_bytes(value: float | None) -> str:
+    if value is None:
+        return "—"
+    return f"{value / 2**20:,.1f} MiB"
@@ -0,0 +1,344 @@
+"""Métricas en proceso con exposición en formato de texto de Prometheus.
+
+Contadores e histogramas sin dependencias externas. Cada hilo escribe en su
+propio fragmento (threading.local), por lo que el camino caliente no toma
+locks: un incremento es una suma en un dict del hilo. La exposición
+(/api/metrics) suma los fragmentos de todos los hilos al momento de leer.
+
+En el ejecutor de procesos, cada hijo acumula en su propio registro y
+entrega lo acumulado junto con cada resultado (`drain`); el proceso
+principal lo incorpora con `merge`.
+
+Con varios workers pre-fork (ver cluster), cada worker publica su
+acumulado y la exposición suma los de todos: contadores e histogramas son
+del servicio completo sin importar qué worker atienda el scrape. Los gauges
+describen al worker que responde y llevan la etiqueta `worker`.
+"""
+import bisect
+import json
+import logging
+import math
+import threading
+import time
+
+from .cluster import cluster
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latencia de solicitudes HTTP y verificación de JWT (s)
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Etapas del pipeline (s)
+STAGE_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base: un fragmento de datos por hilo, combinados al exponer."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.data
+        except AttributeError:
+            data: dict = {}
+            with self._shards_lock:
+                self._shards.append(data)
+            self._local.data = data
+            return data
+
+    def _snapshots(self) -> list[dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict.copy es atómica bajo el GIL: no hace falta bloquear al escritor
+        return [shard.copy() for shard in shards]
+
+    def drain(self) -> dict:
+        """Retorna lo acumulado por este proceso y lo reinicia (workers)."""
+        merged = self.collect()
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+        return merged
+
+
+class Counter(_Metric):
+    """Contador monotónico por combinación de etiquetas."""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def collect(self) -> dict:
+        totals: dict = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def merge(self, data: dict):
+        shard = self._shard()
+        for labels, value in data.items():
+            shard[labels] = shard.get(labels, 0.0) + value
+
+    def render(self, data: dict | None = None) -> list[str]:
+        data = self.collect() if data is None else data
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(data.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma de buckets fijos por combinación de etiquetas.
+
+    Cada serie guarda [conteo por bucket..., conteo +Inf, suma].
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> dict:
+        totals: dict = {}
+        for shard in self._snapshots():
+            for labels, series in shard.items():
+                series = list(series)
+                current = totals.get(labels)
+                totals[labels] = (
+                    series if current is None else [a + b for a, b in zip(current, series)]
+                )
+        return totals
+
+    def merge(self, data: dict):
+        shard = self._shard()
+        for labels, series in data.items():
+            current = shard.get(labels)
+            shard[labels] = (
+                list(series) if current is None else [a + b for a, b in zip(current, series)]
+            )
+
+    def render(self, data: dict | None = None) -> list[str]:
+        data = self.collect() if data is None else data
+        lines = []
+        for labels, series in sorted(data.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Métricas registradas y gauges calculados al momento de exponer."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._gauges: list[tuple] = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: tuple = (), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple, callback):
+        """Gauge leído en cada exposición: callback() → [(labels, valor)]."""
+        self._gauges.append((name, documentation, tuple(labelnames), callback))
+
+    def drain(self) -> dict:
+        """Acumulado de todas las métricas de este proceso (y lo reinicia)."""
+        return {
+            name: data for name, metric in self._metrics.items() if (data := metric.drain())
+        }
+
+    def merge(self, delta: dict | None):
+        """Incorpora lo acumulado por un proceso worker."""
+        for name, data in (delta or {}).items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(data)
+
+    # ── Varios workers (ver cluster) ──
+
+    def publish(self):
+        """Publica el acumulado de este worker para los demás."""
+        snapshot = {
+            name: [[list(labels), value] for labels, value in metric.collect().items()]
+            for name, metric in self._metrics.items()
+        }
+        cluster.publish("metrics", "json", lambda f: f.write(json.dumps(snapshot).encode()))
+
+    def _combined(self) -> dict:
+        """Acumulado de todos los workers: nombre → {etiquetas: valor o serie}."""
+        self.publish()
+        combined: dict = {name: {} for name in self._metrics}
+        for path in cluster.snapshots("metrics", "json"):
+            try:
+                snapshot = json.loads(path.read_bytes())
+            except (OSError, ValueError) as e:
+                logger.warning("Snapshot de métricas ilegible (%s): %s", path.name, e)
+                continue
+            for name, items in snapshot.items():
+                totals = combined.get(name)
+                if totals is None:
+                    continue
+                for labels, value in items:
+                    key = tuple(labels)
+                    current = totals.get(key)
+                    if current is None:
+                        totals[key] = value
+                    elif isinstance(value, list):  # histograma
+                        totals[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        totals[key] = current + value
+        return combined
+
+    def render(self) -> str:
+        """Exposición en formato de texto de Prometheus (0.0.4)."""
+        combined = self._combined() if cluster.enabled else {}
+        worker = f'worker="{_escape(cluster.worker)}"' if cluster.enabled else ""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render(combined.get(metric.name)))
+        for name, documentation, labelnames, callback in self._gauges:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in callback():
+                lines.append(f"{name}{_labels(labelnames, labels, worker)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Instancia global y métricas del servicio
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    "febril_http_requests_total",
+    "Solicitudes HTTP por ruta y código de estado (5xx/503 incluidos).",
+    ("method", "route", "status"),
+)
+http_latency = metrics.histogram(
+    "febril_http_request_duration_seconds",
+    "Latencia de solicitudes HTTP por ruta.",
+    ("method", "route"),
+)
+auth_latency = metrics.histogram(
+    "febril_auth_verify_duration_seconds",
+    "Tiempo de verificación del JWT por algoritmo y resultado.",
+    ("alg", "result"),
+)
+stage_latency = metrics.histogram(
+    "febril_pipeline_stage_duration_seconds",
+    "Tiempo de cada etapa del pipeline de predicción por lote.",
+    ("version", "stage"),
+    buckets=STAGE_BUCKETS,
+)
+predictions = metrics.counter(
+    "febril_predictions_total",
+    "Pacientes puntuados por versión de modelo y clase predicha.",
+    ("version", "clase"),
+)
+rate_limited = metrics.counter(
+    "febril_rate_limit_rejections_total",
+    "Solicitudes rechazadas por el rate limiter.",
+    ("route",),
+)
+
+
+def observe_stages(version: str, timings: dict):
+    """Registra los tiempos de etapa de un lote (ver MLService._apply_pipeline)."""
+    for stage, seconds in timings.items():
+        stage_latency.observe(seconds, version, stage)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia y código de estado por ruta.
+
+    La ruta se etiqueta con su plantilla (/api/model/{...}) para acotar la
+    cardinalidad; las solicitudes sin ruta se agrupan como "unmatched".
+    Las excepciones no manejadas cuentan como 500.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope.get("method", "")
+            http_requests.inc(method, route, str(status_code))
+            http_latency.observe(time.perf_counter() - start, method, route)
@@ -1,10 +1,26 @@
 """Servicio de Machine Learning — carga pipeline y ejecuta predicciones."""
+import itertools
 import json
 import logging
-import joblib
+import math
+import time
 import numpy as np
-import pandas as pd
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .bundle import BundleError, check_source, load_components, read_bundle
+from .cache import PredictionCache
+from .clinical_rules import ClinicalRules
+from .drift import DriftReference, drift_monitor
+from .forest_engine import CompiledForest
+from .metrics import observe_stages, predictions as predictions_total
+from .preprocessing import CompiledPreprocessor
+
+# pandas y joblib (y sklearn, al deserializar) solo se importan al cargar
+# los pickles o usar el camino de sklearn: el arranque desde un bundle no
+# los necesita
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +46,50 @@ COLUMN_NAMES = [
     "Proteina C reactiva mg/Dl",
 ]
 
+# Campo de la API → columna del pipeline (mismo orden que COLUMN_NAMES)
+FIELD_TO_COLUMN = {
+    "grupo_edad": "Grupo edad años",
+    "sexo": "Sexo",
+    "area": "Area",
+    "tiempo_fiebre": "Tiempo dias de inicio de la fiebre en fecha de consulta",
+    "vacunacion": "Vacunación",
+    "antecedentes": "Antecedentes personales de patologías",
+    "contacto_epidemiologico": "Contacto epidemiologico con enfermedades infecciosas",
+    "exposicion_ambiental": "Exposicion ambiental",
+    "estado_nutricional": "Estado nutricional",
+    "hallazgo_examen_fisico": "Hallazgo relevante al examen fisico",
+    "glasgow": "Glasgow",
+    "cayados": "Cayados absolutos",
+    "plaquetas": "Plaquetas cel/mm3",
+    "albumina": "Albúmina sérica g/dl",
+    "globulina": "Globulina sérica g/dl",
+    "procalcitonina": "Procalcitonina ng/mL",
+    "leucocitos": "Leucocitos cel/mm3",
+    "pcr": "Proteina C reactiva mg/Dl",
+}
+COLUMN_TO_FIELD = {col: field for field, col in FIELD_TO_COLUMN.items()}
+
+# Campos cuyas categorías raras se agrupan como 'Otro'
+RARE_GROUPED_FIELDS = {
+    "grupo_edad": "Grupo edad años",
+    "antecedentes": "Antecedentes personales de patologías",
+    "contacto_epidemiologico": "Contacto epidemiologico con enfermedades infecciosas",
+    "estado_nutricional": "Estado nutricional",
+    "hallazgo_examen_fisico": "Hallazgo relevante al examen fisico",
+}
+
+# Indicador de missingness → campo de la API del que se deriva
+MISSING_FLAG_FIELDS = {
+    "Albúmina_sérica_g_dl_missing": "albumina",
+    "Globulina_sérica_g_dl_missing": "globulina",
+}
+
 CLASS_LABELS = {0: "Leve", 1: "Moderada", 2: "Severa"}
+CLASS_KEYS = ("leve", "moderada", "severa")
+
+# Variables clínicas a las que se agregan las contribuciones (orden de la API)
+EXPLAIN_FIELDS = list(FIELD_TO_COLUMN)
+EXPLAIN_METHOD = "Contribuciones de trayectoria (Saabas) sobre el bosque sin calibrar"
 
 DISCLAIMER = (
     "Esta herramienta es de apoyo a la decisión clínica y no reemplaza "
@@ -39,18 +98,54 @@ DISCLAIMER = (
 )
 
 
-class MLService:
-    """Singleton que carga y ejecuta el pipeline de predicción."""
+class ExplanationUnavailable(RuntimeError):
+    """La versión cargada no admite explicaciones (sin motor compilado)."""
+
+
+class SchemaMismatch(ValueError):
+    """Los artefactos esperan columnas que la API (PatientInput) no recibe."""
+
 
-    _instance = None
+def _lap(timings: dict, stage: str, since: float) -> float:
+    """Acumula en timings[stage] el tiempo desde `since`; retorna el instante actual."""
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - since
+    return now
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-            cls._instance.metadata = {}
-            cls._instance.feature_names = {}
-        return cls._instance
+
+# Secuencia global de cargas (distingue instancias de una misma versión)
+_LOAD_SEQ = itertools.count(1)
+
+
+class MLService:
+    """Carga y ejecuta el pipeline de predicción de una versión del modelo.
+
+    Las instancias las administra ModelRegistry (una por versión cargada).
+    """
+
+    def __init__(self, version: str = ""):
+        self.version = version
+        self._initialized = False
+        self.metadata = {}
+        self.feature_names = {}
+        self.preprocessor = None
+        self.engine = None
+        # Objetos de sklearn: solo presentes al cargar desde los pickles
+        self.modelo = None
+        self.scaler = None
+        self.ohe = None
+        self.source = ""
+        # Componente compilado → motivo por el que se usa sklearn en su lugar
+        self.fallbacks: dict[str, str] = {}
+        # Reporte de tools/compact.py si el bosque del bundle fue compactado
+        self.compaction: dict | None = None
+        # Columna categórica → categorías del OHE (incluida la que descarta drop='first')
+        self.categories = {}
+        self.rules: ClinicalRules | None = None
+        self._feature_groups = None
+        self.cache = PredictionCache()
+        self.model_version = ""
+        self._rare_sets = {}
 
     def load(self, pipeline_path: str, metadata_path: str, features_path: str):
         """Carga pipeline (joblib) y metadata al iniciar la app."""
@@ -67,6 +162,8 @@ class MLService:
                     raise FileNotFoundError(f"{desc} no encontrado: {fpath}")
 
             # Cargar artefactos con joblib
+            import joblib
+
             pipeline_dict = joblib.load(pipeline_path)
 
             # Extraer componentes del pipeline
@@ -82,6 +179,10 @@ class MLService:
             self.features_originales = pipeline_dict["features_originales"]
             self.categorias_raras = pipeline_dict["categorias_raras"]
             self.class_names = pipeline_dict["class_names"]
+            self._check_schema()
+            self.categories = {
+                col: [str(c) for c in cats] for col, cats in zip(self.cols_cat, self.ohe.categories_)
+            }
 
             # Cargar metadata
             with open(metadata_path, "r", encoding="utf-8") as f:
@@ -90,7 +191,13 @@ class MLService:
             with open(features_path, "r", encoding="utf-8") as f:
                 self.feature_names = json.load(f)
 
-            self._initialized = True
+            self.fallbacks = {}
+            self.compaction = None
+            self.preprocessor = self._compile_preprocessor()
+            self.engine = self._compile_engine()
+
+            self.source = "joblib"
+            self._finish_load()
             logger.info(
                 "Pipeline cargado — modelo: %s, features originales: %d, post-OHE: %d",
                 type(self.modelo).__name__,
@@ -102,29 +209,265 @@ class MLService:
             logger.error("Error cargando pipeline: %s", e, exc_info=True)
             raise
 
+    def load_bundle(self, bundle_path: str, verify: bool = True, pipeline_path: str = ""):
+        """Carga la versión desde un bundle de arreglos mapeados en memoria.
+
+        No requiere sklearn ni unpickling: el preprocesamiento y el bosque
+        compilados se reconstruyen directamente sobre los arreglos del bundle
+        (ver services/bundle.py). Lanza BundleError si el bundle es inválido
+        o si `pipeline_path` no es el pickle del que se exportó.
+        """
+        try:
+            logger.info("Cargando bundle desde %s...", bundle_path)
+            manifest, arrays = read_bundle(bundle_path, verify=verify)
+            if pipeline_path:
+                check_source(manifest, pipeline_path)
+            preprocessor, engine = load_components(manifest, arrays)
+
+            pipeline = manifest["pipeline"]
+            self.cols_num = pipeline["cols_num"]
+            self.cols_cat = pipeline["cols_cat"]
+            self.cols_escalar = pipeline["cols_escalar"]
+            self.feature_names_post_ohe = pipeline["feature_names_post_ohe"]
+            self.features_originales = pipeline["features_originales"]
+            self.categorias_raras = pipeline["categorias_raras"]
+            self.class_names = pipeline["class_names"]
+            self._check_schema()
+            # Bundles anteriores: solo las categorías con columna propia
+            self.categories = pipeline.get("categorias_ohe") or {
+                col: list(table) for col, table in zip(self.cols_cat, preprocessor.cat_lookup)
+            }
+            if len(self.feature_names_post_ohe) != engine.n_features:
+                raise BundleError("feature_names_post_ohe no coincide con el bosque")
+
+            self.metadata = manifest["metadata"]
+            self.feature_names = manifest["feature_names"]
+            self.preprocessor = preprocessor
+            self.engine = engine
+            self.fallbacks = {}
+            self.compaction = pipeline.get("compactacion")
+
+            self.source = "bundle"
+            self._finish_load()
+            logger.info(
+                "Bundle cargado — %d árboles, post-OHE: %d (creado %s)",
+                engine.n_trees,
+                engine.n_features,
+                manifest.get("created_at", "?"),
+            )
+        except Exception as e:
+            self._initialized = False
+            logger.error("Error cargando bundle: %s", e)
+            raise
+
+    def _check_schema(self):
+        """SchemaMismatch si alguna columna del pipeline no tiene campo en la API.
+
+        Los campos de la API y su columna (FIELD_TO_COLUMN) son los de V3; una
+        versión entrenada con otras variables (p. ej. v2c, con 'Nivel de
+        Triage por el TEP') no puede servirse y se rechaza al cargar.
+        """
+        columns = dict.fromkeys(self.features_originales + self.cols_cat + self.cols_num)
+        unknown = [c for c in columns if c not in COLUMN_TO_FIELD and c not in MISSING_FLAG_FIELDS]
+        if unknown:
+            raise SchemaMismatch(
+                "la versión %s espera columnas sin campo en la API: %s"
+                % (self.version or "?", ", ".join(unknown))
+            )
+
+    def _finish_load(self):
+        """Deriva el estado por versión e invalida resultados del modelo anterior."""
+        self.rules = ClinicalRules.from_metadata(self.metadata)
+        self._feature_groups = self._group_features() if self.engine is not None else None
+        self._rare_sets = {
+            field: frozenset(self.categorias_raras.get(col, ()))
+            for field, col in RARE_GROUPED_FIELDS.items()
+        }
+        self.model_version = "%s:%s#%d" % (
+            self.version,
+            self.metadata.get("version", "unknown"),
+            next(_LOAD_SEQ),
+        )
+        self.cache.clear()
+        self._initialized = True
+
     @property
     def is_loaded(self) -> bool:
         return self._initialized
 
+    @property
+    def can_explain(self) -> bool:
+        return self._feature_groups is not None
+
+    def _group_features(self):
+        """Variable clínica (índice en EXPLAIN_FIELDS) de cada feature post-OHE.
+
+        Los numéricos se mapean por nombre, los indicadores de missingness a
+        su variable y las columnas del OHE ('<columna>_<categoría>') a su
+        columna categórica. None si algún nombre no se reconoce.
+        """
+        groups = []
+        for name in self.feature_names_post_ohe:
+            field = COLUMN_TO_FIELD.get(name) or MISSING_FLAG_FIELDS.get(name)
+            if field is None:
+                column = max(
+                    (c for c in self.cols_cat if name.startswith(f"{c}_")), key=len, default=None
+                )
+                field = COLUMN_TO_FIELD.get(column)
+            if field is None:
+                logger.warning("Explicaciones deshabilitadas: feature desconocida %r", name)
+                return None
+            groups.append(EXPLAIN_FIELDS.index(field))
+        return np.array(groups, dtype=np.intp)
+
+    def _compile_preprocessor(self):
+        """Compila el preprocesamiento y verifica paridad con sklearn.
+
+        La paridad se prueba en tests/test_preprocessing.py; esta verificación
+        es la red de seguridad para artefactos nuevos: si el motor compilado
+        no puede construirse o su salida difiere en algún bit de la de los
+        transformadores de sklearn, se usa el camino de sklearn.
+        """
+        try:
+            preprocessor = CompiledPreprocessor.from_sklearn(
+                imputer_num=self.imputer_num,
+                imputer_cat=self.imputer_cat,
+                ohe=self.ohe,
+                scaler=self.scaler,
+                cols_num=self.cols_num,
+                cols_cat=self.cols_cat,
+                cols_escalar=self.cols_escalar,
+                categorias_raras=self.categorias_raras,
+                column_to_field=COLUMN_TO_FIELD,
+                missing_flag_fields=MISSING_FLAG_FIELDS,
+                rare_columns=set(RARE_GROUPED_FIELDS.values()),
+            )
+            probe = self._parity_probe()
+            expected = self._transform_sklearn(self._build_dataframe(probe))
+            actual = preprocessor.transform(probe)
+            if expected.shape != actual.shape or not np.array_equal(expected, actual):
+                raise ValueError("la salida no coincide con los transformadores de sklearn")
+        except Exception as e:
+            self.fallbacks["preprocesamiento"] = str(e)
+            logger.error("Preprocesamiento compilado deshabilitado, se usa sklearn: %s", e)
+            return None
+        logger.info(
+            "Preprocesamiento compilado ✓ (paridad verificada en %d registros)",
+            len(probe),
+        )
+        return preprocessor
+
+    def _compile_engine(self):
+        """Aplana el bosque calibrado y verifica paridad con predict_proba.
+
+        La paridad se prueba en tests/test_forest_engine.py; esta verificación
+        (entradas aleatorias en el espacio post-OHE) es la red de seguridad
+        para artefactos nuevos: si el motor no puede construirse o difiere de
+        sklearn se usa el modelo original, y el fallback queda a la vista en
+        /api/model/info y en febril_model_fallback.
+        """
+        try:
+            engine = CompiledForest.from_sklearn(self.modelo)
+            rng = np.random.default_rng(0)
+            n_features = len(self.feature_names_post_ohe)
+            X = rng.normal(0.0, 1.5, size=(256, n_features))
+            X[:, len(self.cols_escalar):] = rng.integers(0, 2, size=X[:, len(self.cols_escalar):].shape)
+            expected = self.modelo.predict_proba(X)
+            actual = engine.predict_proba(X)
+            if not np.allclose(expected, actual, rtol=0.0, atol=1e-12):
+                raise ValueError(
+                    "probabilidades difieren de sklearn (máx. %.3g)"
+                    % np.max(np.abs(expected - actual))
+                )
+        except Exception as e:
+            self.fallbacks["motor"] = str(e)
+            logger.error("Motor de inferencia compilado deshabilitado, se usa sklearn: %s", e)
+            return None
+        logger.info(
+            "Motor de inferencia compilado ✓ — %d árboles, %d nodos, profundidad %d",
+            engine.n_trees,
+            len(engine.feature),
+            engine.max_depth,
+        )
+        return engine
+
+    def _parity_probe(self) -> list[dict]:
+        """Registros sintéticos que recorren todas las categorías y faltantes."""
+        cat_fields = [COLUMN_TO_FIELD[c] for c in self.cols_cat]
+        num_fields = [COLUMN_TO_FIELD[c] for c in self.cols_escalar]
+        if self.ohe is not None:
+            all_categories = self.ohe.categories_
+            means = self.scaler.mean_
+        else:
+            # Cargado desde un bundle: las categorías salen de las tablas OHE
+            all_categories = [list(table) for table in self.preprocessor.cat_lookup]
+            means = self.preprocessor.num_mean
+        values = {
+            field: list(categories)
+            + list(self.categorias_raras.get(FIELD_TO_COLUMN[field], []))[:2]
+            + ["__desconocida__"]
+            for field, categories in zip(cat_fields, all_categories)
+        }
+        rng = np.random.default_rng(0)
+        n = max(len(v) for v in values.values())
+        probe = []
+        for i in range(n):
+            data = {field: vals[i % len(vals)] for field, vals in values.items()}
+            for j, field in enumerate(num_fields):
+                if field in ("tiempo_fiebre", "glasgow"):
+                    data[field] = int(rng.integers(3, 15))
+                elif (i + j) % 4 == 0:
+                    data[field] = None
+                else:
+                    data[field] = float(rng.uniform(0, 2)) * float(means[j] or 1.0)
+            probe.append(data)
+        return probe
+
+    def drift_reference(self) -> DriftReference:
+        """Referencia de deriva derivada del modelo, sin datos de entrenamiento.
+
+        Media y desviación de las numéricas escaladas (StandardScaler) y
+        vocabulario de las categóricas (OneHotEncoder + categorías raras),
+        sin proporciones, tasas de faltantes ni mezcla de clases.
+        """
+        if self.scaler is not None:
+            means, scales = self.scaler.mean_, self.scaler.scale_
+        else:
+            means, scales = self.preprocessor.num_mean, self.preprocessor.num_scale
+        scaled = {
+            col: (float(mean), float(scale))
+            for col, mean, scale in zip(self.cols_escalar, means, scales)
+        }
+        numeric = {}
+        # Los indicadores de missingness no son variables de entrada
+        for col in filter(COLUMN_TO_FIELD.__contains__, self.cols_num):
+            field = COLUMN_TO_FIELD[col]
+            mean, scale = scaled.get(col, (None, None))
+            numeric[field] = {"n": None, "media": mean, "desviacion": scale, "faltantes": None}
+        categorical = {}
+        for col in self.cols_cat:
+            vocab = list(self.categories.get(col, ()))
+            vocab += [str(c) for c in self.categorias_raras.get(col, ()) if str(c) not in vocab]
+            categorical[COLUMN_TO_FIELD[col]] = dict.fromkeys(vocab)
+        return DriftReference(
+            numeric=numeric,
+            categorical=categorical,
+            classes=dict.fromkeys(CLASS_KEYS),
+            source="modelo",
+            n=self.metadata.get("train_size"),
+        )
+
     def _group_rare_categories(self, data: dict) -> dict:
         """Agrupa categorías raras como 'Otro' según el mapeo guardado."""
         grouped = data.copy()
-        # Map API field names → column names
-        field_to_col = {
-            "grupo_edad": "Grupo edad años",
-            "antecedentes": "Antecedentes personales de patologías",
-            "contacto_epidemiologico": "Contacto epidemiologico con enfermedades infecciosas",
-            "estado_nutricional": "Estado nutricional",
-            "hallazgo_examen_fisico": "Hallazgo relevante al examen fisico",
-        }
-        for field, col in field_to_col.items():
+        for field, col in RARE_GROUPED_FIELDS.items():
             if col in self.categorias_raras and field in grouped:
                 if grouped[field] in self.categorias_raras[col]:
                     grouped[field] = "Otro"
         return grouped
 
-    def _build_dataframe(self, data: dict) -> pd.DataFrame:
-        """Construye DataFrame con nombres exactos de columnas para el modelo V3.
+    def _build_row(self, data: dict) -> dict:
+        """Construye una fila con nombres exactos de columnas para el modelo V3.
 
         El pipeline V3 incluye indicadores de missingness para albúmina y
         globulina dentro de cols_num. Se generan antes de imputar.
@@ -134,7 +477,7 @@ class MLService:
         albumina_val = grouped.get("albumina")
         globulina_val = grouped.get("globulina")
 
-        row = {
+        return {
             "Grupo edad años": grouped["grupo_edad"],
             "Sexo": grouped["sexo"],
             "Area": grouped["area"],
@@ -158,6 +501,10 @@ class MLService:
             "Globulina_sérica_g_dl_missing": 1 if globulina_val is None else 0,
         }
 
+    def _build_dataframe(self, records: list[dict]) -> "pd.DataFrame":
+        """Construye un DataFrame de N filas (una por paciente) para el pipeline."""
+        import pandas as pd
+
         # El DataFrame debe contener exactamente cols_num + cols_cat
         # features_originales solo tiene las columnas clínicas base (18);
         # creamos el DF con todas las columnas que el pipeline necesita.
@@ -169,22 +516,28 @@ class MLService:
         seen = set()
         unique_cols = [c for c in all_cols if not (c in seen or seen.add(c))]
 
-        df = pd.DataFrame([row])
+        df = pd.DataFrame([self._build_row(data) for data in records])
         # Conservar solo columnas conocidas para no romper el pipeline
         df = df[[c for c in unique_cols if c in df.columns]]
         return df
 
-    def _apply_pipeline(self, df: pd.DataFrame) -> tuple:
+    def _transform_sklearn(self, df: "pd.DataFrame", timings: dict | None = None) -> np.ndarray:
         """
-        Aplica el pipeline paso a paso (compatible con modelo V3):
+        Aplica los transformadores de sklearn paso a paso (compatible con
+        modelo V3) sobre las N filas del DataFrame en una sola pasada:
         1. Separar indicadores de missingness de las columnas numéricas clínicas
         2. Impute numéricos clínicos (imputer_num no incluye missingness flags)
         3. Impute categóricos
         4. OHE categóricos
         5. Scale numéricos (cols_escalar)
         6. Concatenar: [numéricos escalados | missingness flags | categóricos OHE]
-        7. Predict
+
+        Es la referencia contra la que se verifica el preprocesamiento compilado.
+        Si se pasa `timings`, registra la duración de imputación, OHE y escalado.
         """
+        import pandas as pd
+
+        tick = time.perf_counter()
         # Columnas que el imputer_num conoce (sin missingness flags)
         cols_imputer = list(self.imputer_num.feature_names_in_)
 
@@ -212,13 +565,20 @@ class MLService:
             columns=self.cols_cat,
         )
 
+        if timings is not None:
+            tick = _lap(timings, "imputation", tick)
+
         # 3. OHE categóricos
         X_cat_ohe = self.ohe.transform(X_cat_imputed)
         if hasattr(X_cat_ohe, "toarray"):
             X_cat_ohe = X_cat_ohe.toarray()
+        if timings is not None:
+            tick = _lap(timings, "ohe", tick)
 
         # 4. Escalar numéricos (sólo cols_escalar, sin flags)
         X_num_scaled = self.scaler.transform(X_num_imputed[self.cols_escalar])
+        if timings is not None:
+            _lap(timings, "scaling", tick)
 
         # 5. Concatenar respetando el orden de feature_names_post_ohe
         if X_missing_flags is not None:
@@ -226,85 +586,57 @@ class MLService:
         else:
             X_final = np.hstack([X_num_scaled, X_cat_ohe])
 
-        # 6. Predecir
-        prediction = self.modelo.predict(X_final)[0]
-        probabilities = self.modelo.predict_proba(X_final)[0]
-
-        return prediction, probabilities
-
-    def _identify_factors(self, data: dict) -> list:
-        """Identifica factores clínicos contribuyentes."""
-        factors = []
-
-        glasgow = data.get("glasgow", 15)
-        if glasgow is not None and glasgow < 13:
-            factors.append(f"Glasgow alterado ({glasgow})")
-
-        plaquetas = data.get("plaquetas")
-        if plaquetas is not None:
-            if plaquetas < 150000:
-                factors.append(f"Trombocitopenia ({plaquetas:,.0f} cel/mm³)")
-            elif plaquetas > 400000:
-                factors.append(f"Trombocitosis ({plaquetas:,.0f} cel/mm³)")
-
-        albumina = data.get("albumina")
-        if albumina is not None and albumina < 3.5:
-            factors.append(f"Hipoalbuminemia ({albumina} g/dl)")
-
-        cayados = data.get("cayados")
-        if cayados is not None and cayados > 500:
-            factors.append(f"Cayados elevados ({cayados:,.0f} cel/mm³)")
-
-        globulina = data.get("globulina")
-        if globulina is not None and globulina > 4.0:
-            factors.append(f"Globulina elevada ({globulina} g/dl)")
-
-        # Nuevos factores V3
-        procalcitonina = data.get("procalcitonina")
-        if procalcitonina is not None and procalcitonina > 0.5:
-            factors.append(f"Procalcitonina elevada ({procalcitonina} ng/mL)")
-
-        leucocitos = data.get("leucocitos")
-        if leucocitos is not None:
-            if leucocitos < 4000:
-                factors.append(f"Leucopenia ({leucocitos:,.0f} cel/mm³)")
-            elif leucocitos > 15000:
-                factors.append(f"Leucocitosis ({leucocitos:,.0f} cel/mm³)")
-
-        pcr = data.get("pcr")
-        if pcr is not None and pcr > 10:
-            factors.append(f"PCR elevada ({pcr} mg/dL)")
-
-        hallazgo = data.get("hallazgo_examen_fisico", "Ninguno")
-        if hallazgo and hallazgo not in ("Ninguno", ""):
-            factors.append(f"Hallazgo al examen físico: {hallazgo}")
-
-        tiempo = data.get("tiempo_fiebre", 0)
-        if tiempo > 5:
-            factors.append(f"Fiebre prolongada ({tiempo} días)")
-
-        vacunacion = data.get("vacunacion", "")
-        if vacunacion == "Incompleto":
-            factors.append("Esquema de vacunación incompleto")
-
-        estado_nut = data.get("estado_nutricional", "")
-        if estado_nut == "Riesgo de desnutrición":
-            factors.append("Desnutrición")
-
-        if not factors:
-            factors.append("Parámetros clínicos dentro de rangos esperados")
-
-        return factors
+        return X_final
+
+    def _transform(self, records: list[dict], timings: dict | None = None) -> np.ndarray:
+        """Convierte registros de la API en la matriz post-OHE del modelo."""
+        tick = time.perf_counter()
+        if self.preprocessor is not None:
+            X = self.preprocessor.transform(records)
+            if timings is not None:
+                _lap(timings, "preprocess", tick)
+            return X
+        df = self._build_dataframe(records)
+        if timings is not None:
+            _lap(timings, "dataframe", tick)
+        return self._transform_sklearn(df, timings)
+
+    def _apply_pipeline(
+        self, records: list[dict], timings: dict | None = None, explain: bool = False
+    ) -> tuple:
+        """
+        Preprocesa los N registros y ejecuta el modelo en una sola llamada.
 
-    def predict(self, data: dict) -> dict:
-        """Ejecuta predicción completa."""
-        if not self._initialized:
-            raise RuntimeError("Pipeline no cargado. Llame a load() primero.")
+        Retorna (predicciones, probabilidades) con una fila por paciente. Si
+        se pasa `timings`, acumula ahí la duración (s) de cada etapa. Con
+        `explain` agrega las contribuciones por variable (N, 18, clases),
+        calculadas en el mismo recorrido de los árboles.
+        """
+        if explain and not self.can_explain:
+            raise ExplanationUnavailable(f"El modelo {self.version} no admite explicaciones")
+        X_final = self._transform(records, timings)
+
+        tick = time.perf_counter()
+        if explain:
+            outputs = self.engine.predict_explain(
+                X_final, self._feature_groups, len(EXPLAIN_FIELDS)
+            )
+            if timings is not None:
+                _lap(timings, "model", tick)
+            return outputs
+        if self.engine is not None:
+            predictions, probabilities = self.engine.predict(X_final)
+        else:
+            # La clase sale de las mismas probabilidades (una sola pasada)
+            probabilities = self.modelo.predict_proba(X_final)
+            predictions = self.modelo.classes_[np.argmax(probabilities, axis=1)]
+        if timings is not None:
+            _lap(timings, "model", tick)
 
-        df = self._build_dataframe(data)
-        prediction, probabilities = self._apply_pipeline(df)
+        return predictions, probabilities
 
-        # Construir resultado
+    def _format_result(self, prediction, probabilities, factors: list) -> dict:
+        """Construye la respuesta de un paciente a partir de su fila de salida."""
         pred_label = CLASS_LABELS[int(prediction)]
         probs = {
             "leve": round(float(probabilities[0]) * 100, 1),
@@ -312,7 +644,6 @@ class MLService:
             "severa": round(float(probabilities[2]) * 100, 1),
         }
         confianza = round(float(np.max(probabilities)) * 100, 1)
-        factors = self._identify_factors(data)
 
         return {
             "prediccion": pred_label,
@@ -323,6 +654,125 @@ class MLService:
             "disclaimer": DISCLAIMER,
         }
 
+    def _explanation(self, data: dict, prediction, contributions: np.ndarray) -> dict:
+        """Contribuciones por variable (puntos porcentuales), de mayor a menor
+        peso sobre la clase predicha."""
+
+        def percent(row) -> dict:
+            return {key: round(float(v) * 100, 2) for key, v in zip(CLASS_KEYS, row)}
+
+        k = int(prediction)
+        order = np.argsort(-np.abs(contributions[:, k]), kind="stable")
+        return {
+            "metodo": EXPLAIN_METHOD,
+            "clase": CLASS_LABELS[k],
+            "base": percent(self.engine.bias),
+            "bosque": percent(self.engine.bias + contributions.sum(axis=0)),
+            "contribuciones": [
+                {
+                    "variable": EXPLAIN_FIELDS[g],
+                    "valor": data.get(EXPLAIN_FIELDS[g]),
+                    **percent(contributions[g]),
+                }
+                for g in order
+            ],
+        }
+
+    def _cache_key(self, data: dict) -> tuple:
+        """Clave canónica: versión del modelo + entrada tras agrupar raras.
+
+        Los numéricos se normalizan a float (12 y 12.0 producen la misma
+        salida del modelo) y NaN se trata como faltante.
+        """
+        key = [self.model_version]
+        for field in FIELD_TO_COLUMN:
+            value = data.get(field)
+            if isinstance(value, str):
+                if value in self._rare_sets.get(field, ()):
+                    value = "Otro"
+            elif value is not None:
+                value = float(value)
+                if math.isnan(value):
+                    value = None
+            key.append(value)
+        return tuple(key)
+
+    def warm_up(self):
+        """Ejecuta predicciones sintéticas por el pipeline completo.
+
+        Inicializa rutas perezosas (NumPy, calibradores) antes de recibir
+        tráfico; no deja entradas en la caché.
+        """
+        probe = self._parity_probe()
+        predictions, _ = self._apply_pipeline(probe)
+        if self.can_explain:
+            self._apply_pipeline(probe[:1], explain=True)
+        factors = self.rules.evaluate(probe)
+        self._format_result(predictions[0], np.full(3, 1 / 3), factors[0])
+
+    def predict(self, data: dict, explain: bool = False) -> dict:
+        """Ejecuta predicción completa."""
+        return self.predict_batch([data], explain)[0]
+
+    def predict_batch(self, records: list[dict], explain: bool = False) -> list[dict]:
+        """Ejecuta la predicción de N pacientes en una sola pasada vectorizada.
+
+        Los resultados se retornan en el mismo orden de entrada. Con `explain`
+        cada resultado incluye "explicacion" (ver _explanation).
+        """
+        if not self._initialized:
+            raise RuntimeError("Pipeline no cargado. Llame a load() primero.")
+        if not records:
+            return []
+
+        timings: dict = {}
+        outputs = self._model_outputs(records, timings, explain)
+        tick = time.perf_counter()
+        factors = self.rules.evaluate(records)
+        tick = _lap(timings, "factors", tick)
+        results = [
+            self._format_result(output[0], output[1], record_factors)
+            for output, record_factors in zip(outputs, factors)
+        ]
+        tick = _lap(timings, "format", tick)
+        if explain:
+            for result, data, output in zip(results, records, outputs):
+                result["explicacion"] = self._explanation(data, output[0], output[2])
+            _lap(timings, "explain", tick)
+
+        observe_stages(self.version, timings)
+        for result in results:
+            predictions_total.inc(self.version, result["prediccion"])
+        drift_monitor.observe(self.version, records, results)
+        return results
+
+    def _model_outputs(
+        self, records: list[dict], timings: dict | None = None, explain: bool = False
+    ) -> list[tuple]:
+        """(clase, probabilidades[, contribuciones]) por registro, con caché.
+
+        Solo los registros sin entrada vigente en la caché pasan por el
+        pipeline, en una única llamada vectorizada. Las contribuciones se
+        guardan junto a la predicción: una entrada sin ellas cuenta como
+        faltante cuando se pide `explain`. Los factores y el texto de la
+        respuesta se generan siempre a partir de la entrada original, porque
+        dependen de valores que la agrupación de raras unifica.
+        """
+        if not self.cache.enabled:
+            return list(zip(*self._apply_pipeline(records, timings, explain)))
+
+        tick = time.perf_counter()
+        keys = [self._cache_key(data) for data in records]
+        outputs = [self.cache.get(key) for key in keys]
+        missing = [
+            i for i, out in enumerate(outputs) if out is None or (explain and len(out) < 3)
+        ]
+        if timings is not None:
+            _lap(timings, "cache", tick)
+        if missing:
+            computed = self._apply_pipeline([records[i] for i in missing], timings, explain)
+            for i, output in zip(missing, zip(*computed)):
+                outputs[i] = output
+                self.cache.put(keys[i], output)
+        return outputs
 
-# Singleton global
-ml_service = MLService()
@@ -0,0 +1,252 @@
+"""Registro de evaluaciones en el servidor con escritura diferida (write-behind).
+
+/api/predict encola cada predicción servida y responde sin esperar a la
+base de datos. Un único escritor vacía la cola con INSERT multi-fila cuando
+junta `batch_size` filas o cuando vence `flush_interval`; las escrituras
+corren en un hilo dedicado, fuera del event loop.
+
+Si un volcado falla, el lote vuelve al frente de la cola y se reintenta con
+espera exponencial (hasta `max_backoff`) mientras las predicciones siguen
+encolándose. Cada fila lleva su id (UUID generado aquí) y el INSERT ignora
+ids repetidos, así que reintentar un lote que sí llegó a guardarse no
+duplica filas. Un lote rechazado por sus datos (integridad) se reintenta
+fila por fila y se descartan solo las filas inválidas. La cola es acotada:
+por encima de `max_pending` las filas nuevas se descartan y se cuentan. Al
+detener el servidor se vacía la cola.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .database import database, insert_rows_sql, json_param, max_rows_per_statement
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    "id",
+    "user_id",
+    "datos_paciente",
+    "prediccion",
+    "prediccion_codigo",
+    "probabilidades",
+    "factores",
+    "confianza",
+    "modelo_version",
+    "created_at",
+]
+_JSON_COLUMNS = {"datos_paciente", "probabilidades", "factores"}
+# Intentos del vaciado final al detener el servidor
+_DRAIN_ATTEMPTS = 3
+
+persisted_rows = metrics.counter(
+    "febril_persistence_rows_total",
+    "Evaluaciones registradas por el servidor (written, rejected = datos inválidos, "
+    "dropped = cola llena o perdidas al detener).",
+    ("result",),
+)
+persistence_flushes = metrics.counter(
+    "febril_persistence_flushes_total",
+    "Volcados de la cola de evaluaciones a la base de datos.",
+    ("result",),
+)
+
+
+def _is_data_error(exc: Exception) -> bool:
+    """IntegrityError / DataError de DB-API (sqlite3 o psycopg)."""
+    return any(c.__name__ in ("IntegrityError", "DataError") for c in type(exc).__mro__)
+
+
+def evaluation_row(user_id: str, data: dict, result: dict, version: str) -> tuple:
+    """Fila de `evaluaciones` (en el orden de COLUMNS) para una predicción."""
+    return (
+        str(uuid.uuid4()),
+        user_id,
+        json.dumps(data, ensure_ascii=False),
+        result["prediccion"],
+        result["codigo"],
+        json.dumps(result["probabilidades"]),
+        json.dumps(result["factores"], ensure_ascii=False),
+        result["confianza"],
+        version,
+        datetime.now(timezone.utc),
+    )
+
+
+class EvaluationWriter:
+    """Cola de evaluaciones pendientes y su escritor en segundo plano."""
+
+    def __init__(self):
+        self.enabled = False
+        self.batch_size = 100
+        self.flush_interval = 1.0
+        self.max_pending = 10_000
+        self.max_backoff = 30.0
+        self._pending: deque[tuple] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._stopping = False
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._written = 0
+        self._dropped = 0
+        self._rejected = 0
+        self._failures = 0
+        self._last_error = None
+
+    def start(self, batch_size: int, flush_interval: float, max_pending: int, max_backoff: float):
+        """Arranca el escritor en el event loop actual (requiere `database`)."""
+        if not database.enabled:
+            raise RuntimeError("La persistencia requiere DATABASE_URL")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.01, flush_interval)
+        self.max_pending = max(self.batch_size, max_pending)
+        self.max_backoff = max(self.flush_interval, max_backoff)
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persistence")
+        self._task = asyncio.create_task(self._run())
+        self.enabled = True
+        logger.info(
+            "Registro de evaluaciones activo — lotes de %d o cada %.1f s (%s)",
+            self.batch_size,
+            self.flush_interval,
+            database.dialect,
+        )
+
+    def record(self, user_id: str | None, data: dict, result: dict, version: str) -> str | None:
+        """Encola la evaluación; retorna su id (None si no se registra)."""
+        if not self.enabled or not user_id:
+            return None
+        if len(self._pending) >= self.max_pending:
+            self._dropped += 1
+            persisted_rows.inc("dropped")
+            if self._dropped % 1000 == 1:
+                logger.error("Cola de evaluaciones llena — se descartan filas nuevas")
+            return None
+        row = evaluation_row(user_id, data, result, version)
+        self._pending.append(row)
+        if len(self._pending) % self.batch_size == 0:
+            self._wakeup.set()
+        return row[0]
+
+    async def stop(self, timeout: float = 10.0):
+        """Deja de aceptar filas y vacía la cola (a lo sumo `timeout` s)."""
+        if self._task is None:
+            return
+        self.enabled = False
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._lose_pending()
+        self._task = None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    async def _run(self):
+        while not self._stopping:
+            delay = self._retry_at - time.monotonic()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), delay if delay > 0 else self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() >= self._retry_at:
+                await self._flush()
+        for _ in range(_DRAIN_ATTEMPTS):
+            if await self._flush():
+                break
+            await asyncio.sleep(min(self._backoff, 1.0))
+        self._lose_pending()
+
+    def _lose_pending(self):
+        if self._pending:
+            logger.error("Se perdieron %d evaluaciones sin guardar", len(self._pending))
+            self._dropped += len(self._pending)
+            persisted_rows.inc("dropped", amount=len(self._pending))
+            self._pending.clear()
+
+    async def _flush(self) -> bool:
+        """Vacía la cola en lotes; ante un error programa el reintento."""
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                written, rejected = await loop.run_in_executor(self._executor, self._write, batch)
+            except Exception as e:
+                self._pending.extendleft(reversed(batch))
+                self._failures += 1
+                self._last_error = f"{type(e).__name__}: {e}"
+                self._backoff = min(self.max_backoff, max(self.flush_interval, self._backoff * 2))
+                self._retry_at = time.monotonic() + self._backoff
+                persistence_flushes.inc("error")
+                logger.warning(
+                    "Error guardando %d evaluaciones (%s) — reintento en %.1f s",
+                    len(batch),
+                    self._last_error,
+                    self._backoff,
+                )
+                return False
+            self._backoff = self._retry_at = 0.0
+            self._written += written
+            self._rejected += rejected
+            persisted_rows.inc("written", amount=written)
+            if rejected:
+                persisted_rows.inc("rejected", amount=rejected)
+            persistence_flushes.inc("ok")
+        return True
+
+    def _write(self, rows: list[tuple]) -> tuple[int, int]:
+        """Inserta `rows` (hilo del escritor): (guardadas, rechazadas)."""
+        try:
+            self._insert(rows)
+            return len(rows), 0
+        except Exception as e:
+            if not _is_data_error(e):
+                raise
+            if len(rows) == 1:
+                logger.error("Evaluación %s rechazada por la base de datos: %s", rows[0][0], e)
+                return 0, 1
+        # Lote con alguna fila inválida: una por una
+        written = rejected = 0
+        for row in rows:
+            w, r = self._write([row])
+            written += w
+            rejected += r
+        return written, rejected
+
+    def _insert(self, rows: list[tuple]):
+        placeholders = [json_param() if c in _JSON_COLUMNS else "?" for c in COLUMNS]
+        step = max_rows_per_statement(database.dialect, len(COLUMNS))
+        with database.connection() as conn:
+            for i in range(0, len(rows), step):
+                chunk = rows[i : i + step]
+                query = insert_rows_sql("evaluaciones", COLUMNS, placeholders, len(chunk))
+                params = database.params(value for row in chunk for value in row)
+                conn.execute(database.sql(query + " ON CONFLICT (id) DO NOTHING"), params)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "written": self._written,
+            "rejected": self._rejected,
+            "dropped": self._dropped,
+            "flush_failures": self._failures,
+            "retry_in_s": round(max(0.0, self._retry_at - time.monotonic()), 2),
+            "last_error": self._last_error,
+        }
+
+
+# Instancia global
+evaluation_writer = EvaluationWriter()
@@ -0,0 +1,206 @@
+"""Preprocesamiento compilado — imputers + OHE + scaler sin pandas.
+
+Los parámetros de los transformadores de sklearn (medianas, modas, tablas
+categoría→columna del OneHotEncoder y media/escala del StandardScaler) se
+extraen una sola vez al cargar el modelo. Cada solicitud llena directamente
+una matriz NumPy preasignada, con las mismas operaciones en float64 que
+realiza sklearn, por lo que el resultado es idéntico bit a bit.
+"""
+import logging
+import math
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _is_missing(value) -> bool:
+    """True si el valor es None o NaN (criterio de SimpleImputer)."""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class CompiledPreprocessor:
+    """Transforma registros de la API (dicts) a la matriz post-OHE del modelo.
+
+    Layout de salida (igual que MLService._transform_sklearn):
+    [numéricos escalados | indicadores de missingness | categóricos OHE]
+    """
+
+    def __init__(
+        self,
+        num_fields: list[str],
+        num_fill: np.ndarray,
+        num_mean: np.ndarray,
+        num_scale: np.ndarray,
+        flag_fields: list[str],
+        cat_fields: list[str],
+        cat_lookup: list[dict],
+        cat_fill_col: list[int],
+        n_features: int,
+    ):
+        self.num_fields = list(num_fields)
+        self.num_fill = np.asarray(num_fill, dtype=np.float64)
+        self.num_mean = np.asarray(num_mean, dtype=np.float64)
+        self.num_scale = np.asarray(num_scale, dtype=np.float64)
+        self.flag_fields = list(flag_fields)
+        self.cat_fields = list(cat_fields)
+        self.cat_lookup = [dict(t) for t in cat_lookup]
+        self.cat_fill_col = [int(c) for c in cat_fill_col]
+        self.n_features = int(n_features)
+
+        self._n_num = len(self.num_fields)
+        self._flag_offset = self._n_num
+        # Pares (campo, columna) precalculados para el bucle por fila
+        self._num_items = [
+            (field, float(fill)) for field, fill in zip(self.num_fields, self.num_fill)
+        ]
+        self._flag_items = [
+            (field, self._flag_offset + j) for j, field in enumerate(self.flag_fields)
+        ]
+        self._cat_items = list(zip(self.cat_fields, self.cat_lookup, self.cat_fill_col))
+
+    @classmethod
+    def from_sklearn(
+        cls,
+        imputer_num,
+        imputer_cat,
+        ohe,
+        scaler,
+        cols_num: list[str],
+        cols_cat: list[str],
+        cols_escalar: list[str],
+        categorias_raras: dict,
+        column_to_field: dict,
+        missing_flag_fields: dict,
+        rare_columns: set,
+        rare_label: str = "Otro",
+    ) -> "CompiledPreprocessor":
+        """Extrae los parámetros de los transformadores ajustados de sklearn.
+
+        Lanza ValueError si algún transformador usa opciones que este motor no
+        reproduce; en ese caso MLService conserva el camino de sklearn.
+        """
+        if getattr(imputer_num, "strategy", None) != "median":
+            raise ValueError("imputer_num debe usar strategy='median'")
+        if getattr(imputer_cat, "strategy", None) != "most_frequent":
+            raise ValueError("imputer_cat debe usar strategy='most_frequent'")
+        if getattr(ohe, "handle_unknown", None) != "ignore":
+            raise ValueError("OHE debe usar handle_unknown='ignore'")
+        if getattr(ohe, "infrequent_categories_", None) is not None and any(
+            c is not None for c in ohe.infrequent_categories_
+        ):
+            raise ValueError("OHE con categorías infrecuentes no soportado")
+
+        # ── Numéricos: mediana del imputer + media/escala del scaler ──
+        cols_imputer = list(imputer_num.feature_names_in_)
+        medians = dict(zip(cols_imputer, imputer_num.statistics_))
+        if list(scaler.feature_names_in_) != list(cols_escalar):
+            raise ValueError("El scaler no coincide con cols_escalar")
+        num_fill = np.array([medians[c] for c in cols_escalar], dtype=np.float64)
+        if np.isnan(num_fill).any():
+            raise ValueError("imputer_num tiene estadísticos NaN")
+        n_num = len(cols_escalar)
+        num_mean = (
+            np.asarray(scaler.mean_, dtype=np.float64)
+            if scaler.with_mean
+            else np.zeros(n_num)
+        )
+        num_scale = (
+            np.asarray(scaler.scale_, dtype=np.float64)
+            if scaler.with_std
+            else np.ones(n_num)
+        )
+
+        # ── Indicadores de missingness (en cols_num pero no en el imputer) ──
+        flag_cols = [c for c in cols_num if c not in cols_imputer]
+        unknown = [c for c in flag_cols if c not in missing_flag_fields]
+        if unknown:
+            raise ValueError(f"Indicadores de missingness desconocidos: {unknown}")
+
+        # ── Categóricos: tabla valor → columna de salida ──
+        if list(ohe.feature_names_in_) != list(cols_cat):
+            raise ValueError("El OHE no coincide con cols_cat")
+        modes = dict(zip(imputer_cat.feature_names_in_, imputer_cat.statistics_))
+        offset = n_num + len(flag_cols)
+        drop_idx = ohe.drop_idx_
+        cat_lookup, cat_fill_col = [], []
+        for j, col in enumerate(cols_cat):
+            dropped = None if drop_idx is None else drop_idx[j]
+            table = {}
+            for k, category in enumerate(ohe.categories_[j]):
+                if dropped is not None and k == dropped:
+                    continue
+                table[category] = offset
+                offset += 1
+            # Categorías raras agrupadas como 'Otro' antes del OHE
+            if col in rare_columns:
+                for rare in categorias_raras.get(col, []):
+                    table[rare] = table.get(rare_label, -1)
+            cat_lookup.append(table)
+            cat_fill_col.append(table.get(modes[col], -1))
+
+        return cls(
+            num_fields=[column_to_field[c] for c in cols_escalar],
+            num_fill=num_fill,
+            num_mean=num_mean,
+            num_scale=num_scale,
+            flag_fields=[missing_flag_fields[c] for c in flag_cols],
+            cat_fields=[column_to_field[c] for c in cols_cat],
+            cat_lookup=cat_lookup,
+            cat_fill_col=cat_fill_col,
+            n_features=offset,
+        )
+
+    def to_arrays(self) -> tuple[dict, dict]:
+        """Retorna (parámetros JSON, arreglos NumPy) para el bundle."""
+        for table in self.cat_lookup:
+            if not all(isinstance(value, str) for value in table):
+                raise ValueError("solo se exportan categorías de tipo texto")
+        params = {
+            "num_fields": self.num_fields,
+            "flag_fields": self.flag_fields,
+            "cat_fields": self.cat_fields,
+            "cat_lookup": [{str(k): int(v) for k, v in t.items()} for t in self.cat_lookup],
+            "cat_fill_col": self.cat_fill_col,
+            "n_features": self.n_features,
+        }
+        arrays = {
+            "num_fill": self.num_fill,
+            "num_mean": self.num_mean,
+            "num_scale": self.num_scale,
+        }
+        return params, arrays
+
+    @classmethod
+    def from_arrays(cls, params: dict, arrays: dict) -> "CompiledPreprocessor":
+        """Reconstruye el preprocesador exportado con to_arrays."""
+        return cls(
+            num_fill=arrays["num_fill"],
+            num_mean=arrays["num_mean"],
+            num_scale=arrays["num_scale"],
+            **params,
+        )
+
+    def transform(self, records: list[dict]) -> np.ndarray:
+        """Retorna la matriz (N, n_features) lista para el modelo."""
+        X = np.zeros((len(records), self.n_features), dtype=np.float64)
+        n_num = self._n_num
+        for i, data in enumerate(records):
+            row = X[i]
+            for j, (field, fill) in enumerate(self._num_items):
+                value = data.get(field)
+                row[j] = fill if _is_missing(value) else value
+            for field, col in self._flag_items:
+                if data.get(field) is None:
+                    row[col] = 1.0
+            for field, table, fill_col in self._cat_items:
+                value = data.get(field)
+                col = fill_col if _is_missing(value) else table.get(value, -1)
+                if col >= 0:
+                    row[col] = 1.0
+
+        # Mismas operaciones en el mismo orden que StandardScaler.transform
+        X_num = X[:, :n_num]
+        X_num -= self.num_mean
+        X_num /= self.num_scale
+        return X
@@ -0,0 +1,240 @@
+"""Rate limiting por usuario (token bucket) compartido entre workers.
+
+Cada usuario autenticado (claim `sub` del JWT) tiene un bucket con
+capacidad `burst` que se rellena a `rate` tokens por segundo; cada
+solicitud consume uno. El estado vive en una tabla de tamaño fijo dentro de
+un archivo mapeado en memoria (por defecto en /dev/shm), de modo que todos
+los workers de uvicorn del mismo host aplican un único límite. El acceso se
+serializa con flock y cada consulta revisa a lo sumo PROBES ranuras: O(1).
+
+Las ranuras cuyo bucket ya se rellenó por completo equivalen a ranuras
+vacías y se reutilizan; si no hay ninguna libre entre las revisadas se
+reemplaza la de actividad más antigua.
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from .auth import verify_jwt
+from .metrics import rate_limited
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FEBRLRL1"
+PROBES = 8
+# magic, ranuras, capacidad, tokens por segundo
+_HEADER = struct.Struct("<8sQdd")
+# hash de la clave (0 = vacía), tokens, último acceso (epoch s)
+_SLOT = struct.Struct("<Qdd")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """'30/minute' → (30, 0.5 tokens/s). Acepta second, minute, hour y day.
+
+    Un límite de 0 solicitudes (o un periodo de 0) es ValueError: para
+    desactivar el límite se usa RATE_LIMIT_ENABLED=false.
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*(?:/|per)\s*(\d*)\s*(second|minute|hour|day)s?\s*", rate)
+    if not match:
+        raise ValueError(f"Límite inválido: {rate!r} (ej. '30/minute')")
+    count, multiplier, unit = match.groups()
+    period = _PERIODS[unit] * int(multiplier or 1)
+    if int(count) == 0 or period == 0:
+        raise ValueError(
+            f"Límite inválido: {rate!r} (debe ser mayor que 0; para desactivarlo, "
+            "RATE_LIMIT_ENABLED=false)"
+        )
+    return int(count), int(count) / period
+
+
+def default_store_path() -> str:
+    """Archivo compartido por los workers del host: /dev/shm si existe."""
+    base = Path("/dev/shm")
+    if not base.is_dir():
+        base = Path(tempfile.gettempdir())
+    return str(base / "febril-rate-limit")
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float  # segundos hasta tener el bucket lleno
+    retry_after: float  # segundos hasta el próximo token (si se rechazó)
+
+    def headers(self) -> dict:
+        """Headers RateLimit-* (draft IETF) y Retry-After en los rechazos."""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class TokenBucketLimiter:
+    """Tabla de buckets en un mmap compartido (o privado del proceso)."""
+
+    def __init__(self):
+        self.enabled = False
+        self.capacity = 0
+        self.rate = 0.0
+        self.slots = 0
+        self.path = ""
+        self._mm: mmap.mmap | None = None
+        self._fd: int | None = None
+        self._lock = threading.Lock()
+
+    def configure(self, rate: str, burst: int = 0, path: str = "", slots: int = 4096):
+        """Abre (o crea) la tabla. path="memory": tabla privada del proceso."""
+        self.close()
+        count, self.rate = parse_rate(rate)
+        self.capacity = burst if burst > 0 else count
+        self.slots = max(PROBES, int(slots))
+        size = _HEADER.size + self.slots * _SLOT.size
+        header = (MAGIC, self.slots, float(self.capacity), self.rate)
+
+        if path == "memory" or fcntl is None:
+            if fcntl is None and path != "memory":
+                logger.warning("flock no disponible — rate limit por proceso")
+            self.path = "memory"
+            self._mm = mmap.mmap(-1, size)
+            _HEADER.pack_into(self._mm, 0, *header)
+        else:
+            self.path = path or default_store_path()
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                # Otra configuración (o un archivo ajeno): se reinicia la tabla
+                current = os.pread(self._fd, _HEADER.size, 0)
+                if len(current) != _HEADER.size or _HEADER.unpack(current) != header:
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, _HEADER.pack(*header), 0)
+                self._mm = mmap.mmap(self._fd, size)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.enabled = True
+        logger.info(
+            "Rate limit: %d solicitudes, %.3f/s por usuario (%s, %d ranuras)",
+            self.capacity,
+            self.rate,
+            self.path,
+            self.slots,
+        )
+
+    def close(self):
+        self.enabled = False
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _acquire(self):
+        self._lock.acquire()
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def _release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+    def take(self, key: str, cost: float = 1.0, now: float | None = None) -> Decision:
+        """Consume `cost` tokens del bucket de `key` si alcanzan."""
+        now = time.time() if now is None else now
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        key_hash = int.from_bytes(digest, "little") or 1
+        full_after = self.capacity / self.rate
+        mm = self._mm
+        start = key_hash % self.slots
+
+        self._acquire()
+        try:
+            found = free = oldest = None
+            oldest_seen = math.inf
+            for i in range(PROBES):
+                offset = _HEADER.size + ((start + i) % self.slots) * _SLOT.size
+                slot_hash, tokens, updated = _SLOT.unpack_from(mm, offset)
+                if slot_hash == key_hash:
+                    found = offset
+                    break
+                if slot_hash == 0 or now - updated >= full_after:
+                    if free is None:
+                        free = offset
+                elif updated < oldest_seen:
+                    oldest, oldest_seen = offset, updated
+
+            if found is not None:
+                offset = found
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+            else:
+                offset = free if free is not None else oldest
+                tokens = float(self.capacity)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            _SLOT.pack_into(mm, offset, key_hash, tokens, now)
+        finally:
+            self._release()
+
+        return Decision(
+            allowed=allowed,
+            limit=self.capacity,
+            remaining=int(tokens),
+            reset=(self.capacity - tokens) / self.rate,
+            retry_after=0.0 if allowed else (cost - tokens) / self.rate,
+        )
+
+
+# Instancia global
+rate_limiter = TokenBucketLimiter()
+
+
+async def rate_limit(
+    request: Request, response: Response, user: dict = Depends(verify_jwt)
+) -> dict:
+    """Dependencia: verifica el JWT y consume un token del usuario.
+
+    Se resuelve antes del cuerpo de la ruta, por lo que una solicitud
+    rechazada (429) no llega a la inferencia. Sin `sub`, la clave es la IP.
+    """
+    if not rate_limiter.enabled:
+        return user
+    key = user.get("sub") or f"ip:{request.client.host if request.client else '?'}"
+    decision = rate_limiter.take(key)
+    headers = decision.headers()
+    if not decision.allowed:
+        rate_limited.inc(getattr(request.scope.get("route"), "path", request.url.path))
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiadas solicitudes. Intente nuevamente en unos segundos.",
+            headers=headers,
+        )
+    response.headers.update(headers)
+    # Para rutas que retornan su propia Response (streaming)
+    request.state.rate_limit_headers = headers
+    return user
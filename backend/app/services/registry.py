@@ -0,0 +1,248 @@
+"""Registro de modelos — varias versiones cargadas en paralelo y hot swap.
+
+Cada versión (p. ej. "v3", "v3-compacto") es una instancia independiente
+de MLService. Solo se sirven versiones cuyas columnas tienen campo en la
+API (MLService._check_schema): v2c, con 'Nivel de Triage por el TEP', se
+rechaza al cargar con SchemaMismatch. Una recarga construye y precalienta una instancia nueva fuera del
+registro y solo al final reemplaza el puntero, de forma atómica; las
+solicitudes en curso terminan con la instancia que ya tenían.
+"""
+import asyncio
+import logging
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Header, HTTPException, Query
+
+from .bundle import BundleError, find_bundle
+from .drift import DriftReference, drift_monitor, reference_path
+from .ml_service import MLService
+
+logger = logging.getLogger(__name__)
+
+
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,32}$")
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Versión de modelo y rutas de sus artefactos.
+
+    Si `bundle_path` apunta a un bundle (services/bundle.py) se carga desde
+    ahí; los pickles quedan como respaldo si el bundle es inválido.
+    `reference_path`: estadísticas de entrenamiento para el monitoreo de
+    deriva (services/drift.py); si no existe se derivan del modelo.
+    """
+
+    version: str
+    pipeline_path: str
+    metadata_path: str
+    features_path: str
+    bundle_path: str = ""
+    reference_path: str = ""
+
+    @classmethod
+    def from_artifacts_dir(
+        cls, version: str, artifacts_dir: str, use_bundle: bool = True
+    ) -> "ModelSpec":
+        """Rutas estándar de una versión: pipeline_completo_{v}.pkl, bundle_{v}/, etc."""
+        base = Path(artifacts_dir)
+        return cls(
+            version=version,
+            pipeline_path=str(base / f"pipeline_completo_{version}.pkl"),
+            metadata_path=str(base / f"metadata_{version}.json"),
+            features_path=str(base / f"feature_names_{version}.json"),
+            bundle_path=find_bundle(artifacts_dir, version) if use_bundle else "",
+            reference_path=reference_path(artifacts_dir, version),
+        )
+
+
+def version_from_path(pipeline_path: str) -> str:
+    """Deduce la versión del nombre del pipeline (pipeline_completo_v2c.pkl → v2c)."""
+    match = re.match(r"pipeline_completo_(.+)\.pkl$", Path(pipeline_path).name)
+    return match.group(1) if match else "default"
+
+
+class UnknownModelVersion(KeyError):
+    """La versión solicitada no está cargada."""
+
+
+class ModelRegistry:
+    """Versiones cargadas de MLService, seleccionables por solicitud."""
+
+    def __init__(self):
+        self._models: dict[str, MLService] = {}
+        self._specs: dict[str, ModelSpec] = {}
+        self.default_version = ""
+        self.cache_size = 2048
+        self.cache_ttl = 900.0
+        self.verify_bundles = True
+        self._lock = threading.Lock()
+        self._reloads: dict[str, dict] = {}
+
+    def configure_cache(self, maxsize: int, ttl: float):
+        self.cache_size, self.cache_ttl = maxsize, ttl
+
+    def configure_bundles(self, verify: bool):
+        """`verify`: recalcular el SHA-256 de cada arreglo al abrir un bundle."""
+        self.verify_bundles = verify
+
+    def _build(self, spec: ModelSpec) -> MLService:
+        """Carga y precalienta una instancia nueva (sin publicarla)."""
+        service = MLService(version=spec.version)
+        service.cache.configure(self.cache_size, self.cache_ttl)
+        if not (spec.bundle_path and self._load_bundle(service, spec)):
+            service.load(
+                pipeline_path=spec.pipeline_path,
+                metadata_path=spec.metadata_path,
+                features_path=spec.features_path,
+            )
+        service.warm_up()
+        drift_monitor.register(spec.version, self._drift_reference(spec, service))
+        return service
+
+    @staticmethod
+    def _drift_reference(spec: ModelSpec, service: MLService) -> DriftReference:
+        try:
+            reference = DriftReference.load(spec.reference_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Referencia de deriva de %s inválida (%s)", spec.version, e)
+            reference = None
+        if reference is None:
+            return service.drift_reference()
+        logger.info("Referencia de deriva de %s: %s (n=%s)", spec.version, reference.source, reference.n)
+        return reference
+
+    def _load_bundle(self, service: MLService, spec: ModelSpec) -> bool:
+        """Intenta cargar el bundle; False si hay que recurrir a los pickles."""
+        try:
+            service.load_bundle(
+                spec.bundle_path,
+                verify=self.verify_bundles,
+                pipeline_path=spec.pipeline_path,
+            )
+        except (BundleError, OSError) as e:
+            if not Path(spec.pipeline_path).exists():
+                raise
+            logger.warning(
+                "Bundle de %s inválido (%s) — cargando desde %s",
+                spec.version,
+                e,
+                spec.pipeline_path,
+            )
+            return False
+        return True
+
+    def load(self, spec: ModelSpec, default: bool = False) -> MLService:
+        """Carga una versión de forma síncrona y la publica."""
+        service = self._build(spec)
+        self._publish(spec, service, default)
+        return service
+
+    def _publish(self, spec: ModelSpec, service: MLService, default: bool):
+        with self._lock:
+            models = dict(self._models)
+            models[spec.version] = service
+            specs = dict(self._specs)
+            specs[spec.version] = spec
+            # Reemplazo atómico de los punteros
+            self._models, self._specs = models, specs
+            if default or not self.default_version:
+                self.default_version = spec.version
+        logger.info(
+            "Modelo %s publicado%s",
+            spec.version,
+            " (por defecto)" if self.default_version == spec.version else "",
+        )
+
+    async def reload(self, spec: ModelSpec, default: bool = False) -> bool:
+        """Carga y precalienta `spec` en un hilo y luego intercambia el puntero."""
+        status = {"version": spec.version, "state": "loading", "started_at": time.time()}
+        self._reloads[spec.version] = status
+        try:
+            service = await asyncio.to_thread(self._build, spec)
+        except Exception as e:
+            logger.error("Recarga de %s fallida: %s", spec.version, e)
+            status.update(state="failed", error=str(e), finished_at=time.time())
+            return False
+        self._publish(spec, service, default)
+        status.update(state="ready", finished_at=time.time())
+        return True
+
+    def get(self, version: str | None = None) -> MLService:
+        """Instancia de `version` (o la versión por defecto)."""
+        key = version or self.default_version
+        try:
+            return self._models[key]
+        except KeyError:
+            raise UnknownModelVersion(key) from None
+
+    def resolve(self, version: str | None) -> str:
+        """Normaliza la versión solicitada (None → por defecto)."""
+        key = version or self.default_version
+        if key not in self._models:
+            raise UnknownModelVersion(key)
+        return key
+
+    def specs(self) -> list[ModelSpec]:
+        return list(self._specs.values())
+
+    def specs_by_version(self) -> dict[str, ModelSpec]:
+        return dict(self._specs)
+
+    def spec_for(self, version: str) -> ModelSpec | None:
+        return self._specs.get(version)
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self._models) and self.default_version in self._models
+
+    def versions(self) -> list[dict]:
+        """Resumen de las versiones cargadas."""
+        return [
+            {
+                "version": version,
+                "default": version == self.default_version,
+                "model_version": service.model_version,
+                "source": service.source,
+                "fallbacks": service.fallbacks,
+                "metadata_version": service.metadata.get("version", "unknown"),
+                "rules_version": service.rules.version,
+                **asdict(self._specs[version]),
+            }
+            for version, service in self._models.items()
+        ]
+
+    def reload_status(self) -> list[dict]:
+        return list(self._reloads.values())
+
+
+# Instancia global
+model_registry = ModelRegistry()
+
+
+def selected_version(
+    x_model_version: Optional[str] = Header(
+        None, description="Versión del modelo (p. ej. v3, v3-compacto)"
+    ),
+    model_version: Optional[str] = Query(
+        None, description="Versión del modelo; alternativa al header X-Model-Version"
+    ),
+) -> str:
+    """Dependencia: versión de modelo solicitada (header o query)."""
+    if not model_registry.is_loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="El modelo no está cargado. Reinicie el servidor.",
+        )
+    try:
+        return model_registry.resolve(x_model_version or model_version)
+    except UnknownModelVersion as e:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Versión de modelo no disponible: {e.args[0]}",
+        )
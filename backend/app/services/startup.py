@@ -0,0 +1,66 @@
+"""Fases del arranque y readiness de la instancia.
+
+El arranque registra la duración de cada fase (importaciones, modelos,
+servicios, JWKS, warm-up) y marca la instancia como lista recién cuando el
+warm-up pasó por el ejecutor de inferencia: /api/ready responde 503 hasta
+entonces, mientras /api/health (liveness) responde apenas el proceso
+atiende solicitudes. Con el servidor pre-fork las fases del padre
+(importaciones, modelos) se heredan en cada worker.
+"""
+import contextlib
+import logging
+import time
+
+from .. import IMPORT_STARTED
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """Duración de las fases del arranque y estado de readiness."""
+
+    def __init__(self):
+        # Reloj desde que se empezó a importar el paquete `app`
+        self.started = IMPORT_STARTED
+        self.phases: dict[str, float] = {}
+        self.ready = False
+        self.ready_after: float | None = None
+        self.error: str | None = None
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Suma a `name` la duración del bloque."""
+        tick = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - tick)
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def mark_ready(self):
+        self.ready = True
+        self.error = None
+        self.ready_after = time.perf_counter() - self.started
+        logger.info(
+            "Instancia lista en %.2f s — %s",
+            self.ready_after,
+            " · ".join(f"{name} {seconds:.2f} s" for name, seconds in self.phases.items()),
+        )
+
+    def mark_failed(self, error: str):
+        self.error = error
+        logger.error("Warm-up fallido: %s — la instancia no se marca como lista", error)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_after_s": round(self.ready_after, 3) if self.ready_after is not None else None,
+            "phases_s": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            "error": self.error,
+        }
+
+
+# Instancia global
+startup = StartupTracker()
@@ -0,0 +1,358 @@
+"""Compacta el bosque de una versión del modelo dentro de un presupuesto de exactitud.
+
+Carga la versión desde los pickles (como export_bundle) y produce el bundle
+de una versión nueva con un bosque más pequeño, por defecto <v>-compacto
+(artifacts/bundle_<v>-compacto/). La versión servida no cambia: la
+compactada se carga aparte (EXTRA_MODEL_VERSIONS, POST /api/model/reload)
+y sus evaluaciones se registran con su propio modelo_version.
+
+- Submuestreo de árboles: por sub-estimador del CalibratedClassifierCV los
+  árboles se ordenan de forma voraz según cuánto acercan el promedio al del
+  bosque completo sobre el conjunto de referencia, y se conservan los
+  primeros --trees (sin --trees, la menor cantidad que cumple el presupuesto).
+- Fusión de hojas: los subárboles cuyas hojas predicen lo mismo (a menos de
+  --merge-tolerance) se reemplazan por una hoja.
+- Umbrales en float32, redondeados hacia abajo (sin cambio en las
+  predicciones: X ya se compara en float32).
+
+Latencia, memoria y las métricas de metricas_holdout (f1_macro,
+recall_severa, errores_sev_leve) se miden sobre el conjunto de referencia
+para el bosque original y el compactado. Si el compactado excede el
+presupuesto no se escribe nada. El bundle se escribe en un directorio
+aparte y reemplaza al destino solo si, leído de vuelta, reproduce el bosque
+compactado. /api/model/info de la versión incluye el resumen en
+`compactacion`.
+
+El conjunto de referencia tiene el formato de reference_stats (columnas del
+pipeline, campos de la API o una exportación de `evaluaciones`); sin
+--target solo se mide la concordancia con el modelo original.
+
+Uso (desde backend/):
+    python -m app.tools.compact v3 holdout.csv --target Severidad_Ordinal
+    python -m app.tools.compact v3 holdout.csv --target Severidad_Ordinal --trees 10 --dry-run
+    python -m app.tools.compact v3 holdout.csv --target Severidad_Ordinal --as-version v3c
+"""
+import argparse
+import logging
+import math
+import shutil
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+from ..config import get_settings
+from ..services.bulk import validate_record
+from ..services.bundle import bundle_dir, export_service, replace_bundle, source_info
+from ..services.drift import reference_path
+from ..services.forest_engine import CompiledForest
+from ..services.ml_service import FIELD_TO_COLUMN, MLService
+from ..services.registry import VERSION_PATTERN, ModelSpec
+from .reference_stats import class_codes, read_table
+
+logger = logging.getLogger("compact")
+
+# Métricas de metricas_holdout que se comparan
+METRICS = ("f1_macro", "recall_severa", "errores_sev_leve")
+SEVERA, LEVE = 2, 0
+# Versión por defecto del modelo compactado: <v>-compacto
+VERSION_SUFFIX = "-compacto"
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Pérdida máxima admitida respecto del bosque original (misma referencia)."""
+
+    max_f1_drop: float = 0.01
+    max_recall_drop: float = 0.0
+    max_sev_leve_increase: int = 0
+    min_agreement: float = 0.98
+
+    def violations(self, original: dict, candidate: dict) -> list[str]:
+        """Incumplimientos de `candidate` frente a `original` (vacío si cumple)."""
+        problems = []
+        if candidate["concordancia"] < self.min_agreement:
+            problems.append(f"concordancia {candidate['concordancia']:.4f} < {self.min_agreement}")
+        if "f1_macro" not in original:
+            return problems
+        drop = original["f1_macro"] - candidate["f1_macro"]
+        if drop > self.max_f1_drop:
+            problems.append(f"f1_macro cae {drop:.4f} > {self.max_f1_drop}")
+        drop = original["recall_severa"] - candidate["recall_severa"]
+        if drop > self.max_recall_drop:
+            problems.append(f"recall_severa cae {drop:.4f} > {self.max_recall_drop}")
+        increase = candidate["errores_sev_leve"] - original["errores_sev_leve"]
+        if increase > self.max_sev_leve_increase:
+            problems.append(f"errores_sev_leve sube {increase} > {self.max_sev_leve_increase}")
+        return problems
+
+
+def load_reference(path: str, target: str | None) -> tuple[list[dict], np.ndarray | None]:
+    """Registros validados (como la API) y clases del conjunto de referencia."""
+    df = read_table(path)
+    missing = [f for f in FIELD_TO_COLUMN if f not in df.columns]
+    if missing:
+        raise ValueError(f"faltan columnas: {', '.join(missing)}")
+    if target and target not in df.columns:
+        raise ValueError(f"no existe la columna {target}")
+    codes = class_codes(df[target]) if target else None
+    records, labels, invalid = [], [], 0
+    for i, row in enumerate(df[list(FIELD_TO_COLUMN)].to_dict("records")):
+        row = {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in row.items()}
+        data, _, errors = validate_record(row, {})
+        if errors or (codes is not None and math.isnan(codes.iloc[i])):
+            invalid += 1
+            continue
+        records.append(data)
+        if codes is not None:
+            labels.append(int(codes.iloc[i]))
+    if invalid:
+        logger.warning("%d filas inválidas o sin clase omitidas", invalid)
+    if not records:
+        raise ValueError("el conjunto de referencia no tiene filas válidas")
+    return records, np.array(labels) if codes is not None else None
+
+
+def rank_trees(engine: CompiledForest, X: np.ndarray) -> list[list[int]]:
+    """Orden voraz de los árboles de cada sub-estimador.
+
+    En cada paso se agrega el árbol que deja el promedio parcial más cerca
+    (error cuadrático) del promedio de todos los árboles del sub-estimador.
+    """
+    leaves = engine.apply(X)
+    orders = []
+    for k in range(engine.n_estimators):
+        start, end = engine.tree_offsets[k], engine.tree_offsets[k + 1]
+        values = engine.value[leaves[:, start:end]]  # (N, árboles, clases)
+        target = values.mean(axis=1)
+        total = np.zeros_like(target)
+        remaining = list(range(end - start))
+        order = []
+        while remaining:
+            partial = (total[:, np.newaxis] + values[:, remaining]) / (len(order) + 1)
+            errors = np.square(partial - target[:, np.newaxis]).sum(axis=(0, 2))
+            best = remaining.pop(int(np.argmin(errors)))
+            order.append(best)
+            total += values[:, best]
+        orders.append(order)
+    return orders
+
+
+def evaluate(engine: CompiledForest, X: np.ndarray, y, reference: np.ndarray | None = None) -> dict:
+    """Métricas del bosque sobre X (y la concordancia con `reference`)."""
+    predictions, _ = engine.predict(X)
+    predictions = predictions.astype(int)
+    result = {
+        "arboles": engine.n_trees,
+        "nodos": len(engine.feature),
+        "profundidad": engine.max_depth,
+        "bytes": engine.nbytes,
+        "concordancia": 1.0 if reference is None else float(np.mean(predictions == reference)),
+    }
+    if y is not None:
+        from sklearn.metrics import f1_score, recall_score
+
+        result["f1_macro"] = float(f1_score(y, predictions, average="macro", zero_division=0))
+        result["recall_severa"] = float(
+            recall_score(y, predictions, labels=[SEVERA], average="macro", zero_division=0)
+        )
+        result["errores_sev_leve"] = int(np.sum((y == SEVERA) & (predictions == LEVE)))
+    return result
+
+
+def measure_latency(
+    engine: CompiledForest, X: np.ndarray, rows: int = 200, repeat: int = 5
+) -> dict:
+    """Mediana (ms) de predecir un paciente y todo el conjunto de referencia."""
+    single = []
+    for i in range(min(rows, len(X))):
+        tick = time.perf_counter()
+        engine.predict(X[i : i + 1])
+        single.append(time.perf_counter() - tick)
+    batch = []
+    for _ in range(repeat):
+        tick = time.perf_counter()
+        engine.predict(X)
+        batch.append(time.perf_counter() - tick)
+    return {
+        "latencia_ms_1": round(float(np.median(single)) * 1000, 3),
+        f"latencia_ms_{len(X)}": round(float(np.median(batch)) * 1000, 3),
+    }
+
+
+def compact_forest(
+    engine: CompiledForest,
+    X: np.ndarray,
+    y,
+    budget: Budget,
+    trees: int | None = None,
+    merge_tolerance: float = 0.0,
+) -> tuple:
+    """Busca el bosque compactado más pequeño dentro del presupuesto.
+
+    Retorna (bosque, métricas del original, métricas del bosque,
+    incumplimientos): si ninguno cumple, el último probado y sus
+    incumplimientos. Con `trees` solo se prueba esa cantidad por
+    sub-estimador; si no, de menor a mayor hasta la primera que cumple.
+    """
+    original_predictions = engine.predict(X)[0].astype(int)
+    original = evaluate(engine, X, y)
+    orders = rank_trees(engine, X)
+    largest = min(len(order) for order in orders)
+    counts = [min(trees, largest)] if trees else range(1, largest + 1)
+    for count in counts:
+        candidate = engine.compact(
+            keep=[order[:count] for order in orders], merge_tolerance=merge_tolerance
+        )
+        result = evaluate(candidate, X, y, original_predictions)
+        problems = budget.violations(original, result)
+        if not problems:
+            break
+    return candidate, original, result, problems
+
+
+def _cell(value) -> str:
+    if isinstance(value, float):
+        return f"{value:>16.4f}"
+    return f"{'—' if value is None else value:>16}"
+
+
+def _report(holdout: dict, rows: list[tuple[str, dict]]):
+    """Tabla comparativa; la fila holdout es la registrada al entrenar."""
+    columns = ["arboles", "nodos", "profundidad", "bytes", "concordancia", *METRICS]
+    columns += sorted({k for _, row in rows for k in row if k.startswith("latencia")})
+    logger.info("%-20s %s", "", " ".join(f"{c:>16}" for c in columns))
+    holdout_row = {k: holdout[k] for k in METRICS if k in holdout}
+    for name, row in [("holdout (metadata)", holdout_row), *rows]:
+        logger.info("%-20s %s", name, " ".join(_cell(row.get(c)) for c in columns))
+
+
+def verify_bundle(path: Path, version: str, records: list[dict], expected: np.ndarray) -> bool:
+    """El bundle escrito en `path`, leído de vuelta, reproduce `expected`."""
+    restored = MLService(version=version)
+    restored.load_bundle(str(path))
+    return np.array_equal(restored._apply_pipeline(records)[1], expected)
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("version", help="Versión del modelo (p. ej. v3)")
+    parser.add_argument("reference", help="Conjunto de referencia (.csv o .parquet)")
+    parser.add_argument("--target", help="Columna de la clase (0/1/2 o Leve/Moderada/Severa)")
+    parser.add_argument(
+        "--trees", type=int, help="Árboles por sub-estimador (por defecto, los mínimos)"
+    )
+    parser.add_argument("--merge-tolerance", type=float, default=0.0)
+    parser.add_argument("--max-f1-drop", type=float, default=Budget.max_f1_drop)
+    parser.add_argument("--max-recall-drop", type=float, default=Budget.max_recall_drop)
+    parser.add_argument("--max-sev-leve-increase", type=int, default=Budget.max_sev_leve_increase)
+    parser.add_argument("--min-agreement", type=float, default=Budget.min_agreement)
+    parser.add_argument("--artifacts-dir", default=settings.artifacts_dir)
+    parser.add_argument(
+        "--as-version",
+        help=f"Versión del modelo compactado (por defecto <v>{VERSION_SUFFIX}); "
+        "igual a <v> reemplaza el bundle de la versión servida",
+    )
+    parser.add_argument(
+        "--out", help="Directorio del bundle (por defecto bundle_<versión compactada>)"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Solo reportar, sin escribir el bundle"
+    )
+    args = parser.parse_args(argv)
+    if args.trees is not None and args.trees < 1:
+        parser.error("--trees debe ser ≥ 1")
+    version = args.as_version or args.version + VERSION_SUFFIX
+    if not VERSION_PATTERN.match(version):
+        parser.error(f"versión inválida: {version}")
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    budget = Budget(
+        max_f1_drop=args.max_f1_drop,
+        max_recall_drop=args.max_recall_drop,
+        max_sev_leve_increase=args.max_sev_leve_increase,
+        min_agreement=args.min_agreement,
+    )
+    try:
+        records, y = load_reference(args.reference, args.target)
+    except ValueError as e:
+        parser.error(str(e))
+    if y is None:
+        logger.warning("Sin --target: el presupuesto solo controla la concordancia")
+
+    spec = ModelSpec.from_artifacts_dir(args.version, args.artifacts_dir, use_bundle=False)
+    service = MLService(version=args.version)
+    service.load(
+        pipeline_path=spec.pipeline_path,
+        metadata_path=spec.metadata_path,
+        features_path=spec.features_path,
+    )
+    if service.engine is None or service.preprocessor is None:
+        logger.error("%s: el modelo no tiene motor compilado verificado", args.version)
+        return 1
+    original_engine = service.engine
+    X = service._transform(records)
+
+    engine, original, result, problems = compact_forest(
+        original_engine, X, y, budget, args.trees, args.merge_tolerance
+    )
+    original.update(measure_latency(original_engine, X))
+    result.update(measure_latency(engine, X))
+    logger.info("Referencia: %s (%d pacientes)", Path(args.reference).name, len(X))
+    _report(
+        service.metadata.get("metricas_holdout", {}),
+        [("original", original), ("compactado", result)],
+    )
+    if problems:
+        logger.error("Fuera del presupuesto — no se escribe el modelo: %s", "; ".join(problems))
+        return 1
+    if args.dry_run:
+        return 0
+
+    target = Path(args.out) if args.out else bundle_dir(args.artifacts_dir, version)
+    if version == args.version:
+        logger.warning(
+            "Se reemplaza el bundle de %s: la versión servida pasa a ser la compactada", version
+        )
+    service.engine = engine
+    compaction = {
+        "de_version": args.version,
+        "referencia": Path(args.reference).name,
+        "presupuesto": asdict(budget),
+        "original": original,
+        "compactado": result,
+    }
+    staging = target.with_name(target.name + ".compact")
+    shutil.rmtree(staging, ignore_errors=True)
+    export_service(
+        service, str(staging), source=source_info(spec.pipeline_path), compaction=compaction
+    )
+    if not verify_bundle(staging, version, records, engine.predict_proba(X)):
+        shutil.rmtree(staging, ignore_errors=True)
+        logger.error("El bundle escrito no reproduce el bosque compactado — no se publica")
+        return 1
+    replace_bundle(staging, target)
+
+    # Misma referencia de deriva que la versión original
+    source_reference = Path(reference_path(args.artifacts_dir, args.version))
+    own_reference = Path(reference_path(args.artifacts_dir, version))
+    if not args.out and source_reference.exists() and not own_reference.exists():
+        shutil.copyfile(source_reference, own_reference)
+    logger.info(
+        "%s → %s %s (%d → %d árboles, %.1f → %.1f KB)",
+        args.version,
+        version,
+        target,
+        original["arboles"],
+        result["arboles"],
+        original["bytes"] / 1024,
+        result["bytes"] / 1024,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Exporta los pickles de una versión del modelo a un bundle de arranque rápido.
+
+Carga la versión con MLService.load (el preprocesamiento y el bosque
+compilados se verifican contra sklearn) y escribe sus arreglos en
+{artifacts_dir}/bundle_{v}/. Al iniciar, el servidor usa el bundle si existe.
+
+El bundle se escribe en un directorio aparte y reemplaza al anterior solo
+si, leído de vuelta, da las mismas probabilidades que los pickles: una
+exportación fallida no deja un bundle que el servidor prefiera cargar.
+
+Uso (desde backend/):
+    python -m app.tools.export_bundle v3 [v3-compacto ...] [--artifacts-dir ./artifacts]
+    python -m app.tools.export_bundle --all
+"""
+import argparse
+import logging
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from ..services.bundle import (
+    bundle_dir,
+    export_service,
+    read_bundle,
+    replace_bundle,
+    source_info,
+)
+from ..services.ml_service import MLService
+from ..services.registry import ModelSpec
+
+logger = logging.getLogger("export_bundle")
+
+
+def verify_bundle(service: MLService, path: Path, pipeline_path: str) -> float:
+    """Abre el bundle de `path` y compara sus probabilidades con las de los
+    pickles; retorna el tiempo de carga (ms). RuntimeError si difieren."""
+    start = time.perf_counter()
+    restored = MLService(version=service.version)
+    restored.load_bundle(str(path), pipeline_path=pipeline_path)
+    elapsed = (time.perf_counter() - start) * 1000
+    probe = service._parity_probe()
+    expected = service._apply_pipeline(probe)[1]
+    actual = restored._apply_pipeline(probe)[1]
+    if not (expected == actual).all():
+        raise RuntimeError("las probabilidades del bundle difieren del pickle")
+    return elapsed
+
+
+def export_version(version: str, artifacts_dir: str, out_dir: str | None = None) -> Path:
+    """Exporta `version`, verifica el bundle y solo entonces lo publica."""
+    spec = ModelSpec.from_artifacts_dir(version, artifacts_dir, use_bundle=False)
+    service = MLService(version=version)
+    service.load(
+        pipeline_path=spec.pipeline_path,
+        metadata_path=spec.metadata_path,
+        features_path=spec.features_path,
+    )
+    target = Path(out_dir) if out_dir else bundle_dir(artifacts_dir, version)
+    staging = target.with_name(target.name + ".export")
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        manifest = export_service(service, str(staging), source=source_info(spec.pipeline_path))
+        elapsed = verify_bundle(service, staging, spec.pipeline_path)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    replace_bundle(staging, target)
+
+    size = sum(f.stat().st_size for f in target.iterdir())
+    logger.info(
+        "%s → %s (%d arreglos, %.1f KB, carga %.1f ms, checksum %s)",
+        version,
+        target,
+        len(manifest["arrays"]),
+        size / 1024,
+        elapsed,
+        read_bundle(str(target), verify=False)[0]["checksum"][:12],
+    )
+    return target
+
+
+def _discover(artifacts_dir: str) -> list[str]:
+    return sorted(
+        p.name[len("pipeline_completo_"):-len(".pkl")]
+        for p in Path(artifacts_dir).glob("pipeline_completo_*.pkl")
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("versions", nargs="*", help="Versiones a exportar (p. ej. v3 v3-compacto)")
+    parser.add_argument("--all", action="store_true", help="Todas las versiones con pickle")
+    parser.add_argument("--artifacts-dir", default="./artifacts")
+    parser.add_argument("--out", help="Directorio de salida (solo con una versión)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    versions = _discover(args.artifacts_dir) if args.all else args.versions
+    if not versions:
+        parser.error("indique al menos una versión o --all")
+    if args.out and len(versions) != 1:
+        parser.error("--out requiere exactamente una versión")
+
+    failed = 0
+    for version in versions:
+        try:
+            export_version(version, args.artifacts_dir, args.out)
+        except Exception as e:
+            logger.error("%s: no exportado — %s", version, e)
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Genera las estadísticas de referencia para el monitoreo de deriva.
+
+Lee el conjunto de entrenamiento de una versión (CSV o Parquet) y escribe
+{artifacts_dir}/reference_stats_{v}.json, que el servidor carga junto con
+el modelo (services/drift.py): media, desviación y tasa de faltantes de las
+variables numéricas, proporción de cada categoría y mezcla de clases.
+
+Las columnas pueden ser las del pipeline ("Grupo edad años", ...), los
+campos de la API (grupo_edad, ...) o una exportación de `evaluaciones`
+(datos_paciente en JSON). La clase se toma de --target (códigos 0/1/2 o
+etiquetas Leve/Moderada/Severa); sin ella la referencia no incluye la
+mezcla de clases.
+
+Uso (desde backend/):
+    python -m app.tools.reference_stats entrenamiento.csv --version v3 --target Severidad_Ordinal
+    python -m app.tools.reference_stats evaluaciones.csv --version v3 --target prediccion_codigo
+
+Parquet requiere pyarrow.
+"""
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from ..config import get_settings
+from ..models.schemas import PatientInput
+from ..services.drift import reference_path
+from ..services.ml_service import CLASS_KEYS, CLASS_LABELS, COLUMN_TO_FIELD, FIELD_TO_COLUMN
+from ..services.registry import version_from_path
+
+logger = logging.getLogger("reference_stats")
+
+CATEGORICAL_FIELDS = [f for f in FIELD_TO_COLUMN if PatientInput.model_fields[f].annotation is str]
+NUMERIC_FIELDS = [f for f in FIELD_TO_COLUMN if f not in CATEGORICAL_FIELDS]
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """Archivo de entrada con los campos de la API como columnas."""
+    if Path(path).suffix.lower() in (".parquet", ".pq"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, encoding="utf-8-sig")
+    if "datos_paciente" in df.columns:
+        datos = pd.json_normalize(
+            [json.loads(d) if isinstance(d, str) else d for d in df["datos_paciente"]]
+        )
+        df = pd.concat([df.drop(columns="datos_paciente").reset_index(drop=True), datos], axis=1)
+    return df.rename(columns=COLUMN_TO_FIELD)
+
+
+def class_codes(values: pd.Series) -> pd.Series:
+    labels = {label.lower(): code for code, label in CLASS_LABELS.items()}
+    labels.update({key: i for i, key in enumerate(CLASS_KEYS)})
+    codes = pd.to_numeric(values, errors="coerce")
+    as_label = values.astype(str).str.strip().str.lower().map(labels)
+    return codes.fillna(as_label)
+
+
+def compute_reference(df: pd.DataFrame, target: str | None = None) -> dict:
+    """Estadísticas de referencia (formato de reference_stats_{v}.json)."""
+    missing = [f for f in FIELD_TO_COLUMN if f not in df.columns]
+    if missing:
+        raise ValueError(f"faltan columnas: {', '.join(missing)}")
+    n = len(df)
+    numeric = {}
+    for field in NUMERIC_FIELDS:
+        values = pd.to_numeric(df[field], errors="coerce")
+        present = values.dropna()
+        numeric[field] = {
+            "n": int(len(present)),
+            "media": float(present.mean()) if len(present) else None,
+            "desviacion": float(present.std(ddof=1)) if len(present) > 1 else None,
+            "faltantes": float(values.isna().mean()) if n else None,
+        }
+    categorical = {}
+    for field in CATEGORICAL_FIELDS:
+        values = df[field].dropna().astype(str).str.strip()
+        counts = values[values != ""].value_counts()
+        categorical[field] = {str(k): float(v / n) for k, v in counts.items()}
+    if target:
+        codes = class_codes(df[target])
+        if codes.isna().any():
+            raise ValueError(f"{target}: {int(codes.isna().sum())} valores sin clase reconocible")
+        mix = codes.astype(int).value_counts(normalize=True)
+        classes = {key: float(mix.get(i, 0.0)) for i, key in enumerate(CLASS_KEYS)}
+    else:
+        classes = dict.fromkeys(CLASS_KEYS)
+    return {
+        "n": n,
+        "numericas": numeric,
+        "categoricas": categorical,
+        "clases": classes,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="Conjunto de entrenamiento (.csv o .parquet)")
+    parser.add_argument(
+        "--version",
+        default=settings.model_version or version_from_path(settings.pipeline_path),
+        help="Versión del modelo (por defecto la del servidor)",
+    )
+    parser.add_argument("--target", help="Columna de la clase (0/1/2 o Leve/Moderada/Severa)")
+    parser.add_argument("--artifacts-dir", default=settings.artifacts_dir)
+    parser.add_argument("--out", help="Archivo de salida (por defecto junto a los artefactos)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    df = read_table(args.input)
+    if args.target and args.target not in df.columns:
+        parser.error(f"no existe la columna {args.target}")
+    try:
+        stats = compute_reference(df, args.target)
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = Path(args.out or reference_path(args.artifacts_dir, args.version))
+    document = {
+        "version": args.version,
+        "creado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "fuente": Path(args.input).name,
+        **stats,
+    }
+    out.write_text(json.dumps(document, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info("Referencia de %s (%d filas) en %s", args.version, stats["n"], out)
+    if not args.target:
+        logger.warning("Sin --target: la referencia no incluye la mezcla de clases")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Puntúa un archivo CSV o Parquet de pacientes sin levantar el servidor.
+
+Usa el mismo MLService (bundle o pickles) y la misma validación que la API.
+El archivo se lee por fragmentos, que se reparten entre un pool de procesos;
+cada proceso carga los artefactos una sola vez. Los resultados se escriben
+en el orden de entrada a medida que terminan, con a lo sumo 2 × workers
+fragmentos en memoria, y se reporta el avance por stderr.
+
+Cada fila es un paciente plano o una fila exportada de `evaluaciones`
+(columnas id, prediccion y datos_paciente en JSON). La salida tiene las
+columnas de la salida CSV de /api/predict/stream.
+
+Uso (desde backend/):
+    python -m app.tools.score cohorte.csv resultados.csv [--version v3] [--workers 8]
+    python -m app.tools.score cohorte.parquet resultados.parquet --chunk-size 5000
+
+Parquet requiere pyarrow.
+"""
+import argparse
+import csv
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from ..config import get_settings
+from ..services.bulk import CSV_COLUMNS, flatten_item, prepare_record, result_items
+from ..services.executor import _init_process_worker, run_predict_batch
+from ..services.registry import ModelSpec, model_registry, version_from_path
+
+logger = logging.getLogger("score")
+
+
+def _is_parquet(path: str) -> bool:
+    return Path(path).suffix.lower() in (".parquet", ".pq")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise SystemExit("Parquet requiere pyarrow: pip install pyarrow") from None
+
+
+def _clean(row: dict) -> dict:
+    """Celdas vacías o NaN como faltantes."""
+    return {
+        k: None if v == "" or (isinstance(v, float) and math.isnan(v)) else v
+        for k, v in row.items()
+    }
+
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[list[dict]]:
+    """Filas del archivo en fragmentos de `chunk_size`, sin cargarlo completo."""
+    if _is_parquet(path):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+
+    import pandas as pd
+
+    reader = pd.read_csv(
+        path, chunksize=chunk_size, dtype=str, keep_default_na=False, encoding="utf-8-sig"
+    )
+    for frame in reader:
+        yield frame.to_dict("records")
+
+
+def score_chunk(start: int, rows: list[dict], version: str) -> tuple[list[list], int]:
+    """Valida y puntúa un fragmento en el worker: (filas de salida, fallidos)."""
+    entries = [prepare_record(_clean(row)) for row in rows]
+    valid = [data for data, _, _ in entries if data is not None]
+    outputs = run_predict_batch(valid, version) if valid else []
+    items = result_items(start, entries, outputs)
+    return [flatten_item(item) for item in items], len(entries) - len(valid)
+
+
+class _CSVOutput:
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CSV_COLUMNS)
+
+    def write(self, rows: list[list]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetOutput:
+    def __init__(self, path: str):
+        _require_pyarrow()
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        types = {
+            "indice": pa.int64(),
+            "codigo": pa.int64(),
+            "leve": pa.float64(),
+            "moderada": pa.float64(),
+            "severa": pa.float64(),
+            "confianza": pa.float64(),
+        }
+        self._schema = pa.schema([(c, types.get(c, pa.string())) for c in CSV_COLUMNS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: list[list]):
+        columns = list(zip(*rows)) if rows else [()] * len(CSV_COLUMNS)
+        self._writer.write_table(
+            self._pa.Table.from_arrays(
+                [self._pa.array(col, type=f.type) for col, f in zip(columns, self._schema)],
+                schema=self._schema,
+            )
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+class Progress:
+    """Avance y throughput, reportados cada `interval` segundos."""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.rows = 0
+        self.failed = 0
+        self._start = self._last = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def update(self, rows: int, failed: int):
+        self.rows += rows
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.report()
+
+    def report(self, final: bool = False):
+        elapsed = self.elapsed
+        logger.info(
+            "%s%s filas (%s con error) · %.1f s · %s filas/s",
+            "Total: " if final else "",
+            f"{self.rows:,}",
+            f"{self.failed:,}",
+            elapsed,
+            f"{self.rows / elapsed:,.0f}" if elapsed else "—",
+        )
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    spec: ModelSpec,
+    workers: int,
+    chunk_size: int,
+    progress: Progress,
+):
+    """Puntúa `input_path` y escribe `output_path` (se reemplaza al terminar).
+
+    Con workers <= 1 todo corre en este proceso.
+    """
+    staging = f"{output_path}.tmp"
+    output = _ParquetOutput(staging) if _is_parquet(output_path) else _CSVOutput(staging)
+    chunks = read_chunks(input_path, chunk_size)
+    try:
+        if workers <= 1:
+            model_registry.configure_cache(0, 0)
+            model_registry.load(spec, default=True)
+            start = 0
+            for rows in chunks:
+                out, failed = score_chunk(start, rows, spec.version)
+                output.write(out)
+                progress.update(len(out), failed)
+                start += len(rows)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=([spec], spec.version, (0, 0)),
+            ) as pool:
+                pending: deque = deque()
+                start = 0
+
+                def drain_one():
+                    out, failed = pending.popleft().result()
+                    output.write(out)
+                    progress.update(len(out), failed)
+
+                for rows in chunks:
+                    pending.append(pool.submit(score_chunk, start, rows, spec.version))
+                    start += len(rows)
+                    if len(pending) >= 2 * workers:
+                        drain_one()
+                while pending:
+                    drain_one()
+    except BaseException:
+        output.close()
+        os.remove(staging)
+        raise
+    output.close()
+    os.replace(staging, output_path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="Archivo de entrada (.csv o .parquet)")
+    parser.add_argument("output", help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument(
+        "--version",
+        default=settings.model_version or version_from_path(settings.pipeline_path),
+        help="Versión del modelo (por defecto la del servidor)",
+    )
+    parser.add_argument("--artifacts-dir", default=settings.artifacts_dir)
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Procesos (1 = sin pool)"
+    )
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Filas por fragmento")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Segundos")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    spec = ModelSpec.from_artifacts_dir(args.version, args.artifacts_dir, settings.use_bundles)
+    if not (spec.bundle_path or Path(spec.pipeline_path).exists()):
+        parser.error(f"no hay artefactos de {args.version} en {args.artifacts_dir}")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size debe ser positivo")
+
+    logger.info(
+        "Puntuando %s con %s (%s) — %d workers, fragmentos de %d",
+        args.input,
+        spec.version,
+        "bundle" if spec.bundle_path else "pickle",
+        max(1, args.workers),
+        args.chunk_size,
+    )
+    progress = Progress(args.progress_interval)
+    score_file(args.input, args.output, spec, args.workers, args.chunk_size, progress)
+    progress.report(final=True)
+    logger.info("Resultados en %s", args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
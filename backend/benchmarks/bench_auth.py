@@ -0,0 +1,74 @@
+"""Benchmark del costo de verify_jwt por solicitud (sin caché vs con caché).
+
+Genera claves locales (HS256 y ES256/RS256, benchmarks/issuer.py), carga
+su JWKS en memoria en lugar del de Supabase y mide la verificación del
+mismo token repetido, como ocurre con el frontend durante la vida de una
+sesión.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_auth [--iterations 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://jwks.local")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret-benchmark-secret-0123")
+
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+from app.services import auth  # noqa: E402
+from app.services.jwks import jwks_manager  # noqa: E402
+
+from .issuer import ALGORITHMS, StubIssuer  # noqa: E402
+
+
+def _make_tokens() -> tuple[dict, dict]:
+    """Retorna (tokens por algoritmo, documento JWKS)."""
+    issuer = StubIssuer(os.environ["SUPABASE_JWT_SECRET"])
+    return {alg: issuer.token("bench-user", alg) for alg in ALGORITHMS}, issuer.jwks()
+
+
+def _clear_caches(jwks: dict):
+    """Estado equivalente a no tener cachés: token sin verificar y PyJWK sin construir."""
+    auth._token_cache.clear()
+    jwks_manager.load_document(jwks)
+
+
+async def _measure(token: str, jwks: dict, iterations: int, cold: bool) -> dict:
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    samples = []
+    for _ in range(iterations):
+        if cold:
+            _clear_caches(jwks)
+        start = time.perf_counter()
+        await auth.verify_jwt(credentials)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 2),
+        "p99_us": round(samples[int(len(samples) * 0.99)] * 1e6, 2),
+        "mean_us": round(sum(samples) / len(samples) * 1e6, 2),
+    }
+
+
+async def main(iterations: int) -> dict:
+    tokens, jwks = _make_tokens()
+    jwks_manager.configure(os.environ["SUPABASE_URL"])
+    jwks_manager.load_document(jwks)  # JWKS local en lugar de Supabase
+    results = {}
+    for alg, token in tokens.items():
+        results[alg] = {
+            "sin_cache": await _measure(token, jwks, iterations, cold=True),
+            "con_cache": await _measure(token, jwks, iterations, cold=False),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.iterations)), indent=2))
@@ -0,0 +1,243 @@
+"""Benchmark de latencia y throughput del stack de predicción.
+
+Mide, sobre el modelo sustituto (benchmarks/standin.py) y pacientes
+sintéticos (benchmarks/synthetic.py):
+
+- stages: cada etapa del camino de sklearn de _apply_pipeline (agrupación
+  de raras, DataFrame, imputación, OHE, escalado, modelo) más los factores,
+  y las etapas compiladas (preprocesamiento y bosque);
+- service: MLService.predict y predict_batch de extremo a extremo, sin caché
+  y con caché caliente;
+- http: /api/predict y /api/predict/batch a través de la app FastAPI
+  (auth en modo dev, ejecutor de hilos).
+
+Cada resultado reporta p50/p95/p99 (ms) y filas/s por tamaño de lote, y se
+guarda como JSON para comparar commits con benchmarks/compare.py.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_predict [--batch-sizes 1,32,256] [--out FILE]
+    python -m benchmarks.bench_predict --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+from .common import environment, measure
+from .compare import compare, print_comparison
+from .standin import standin_spec
+from .synthetic import synthetic_patients, vocabulary
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _iterations(base: int, batch: int) -> int:
+    """Menos repeticiones para lotes grandes (tiempo total acotado)."""
+    return base if batch <= 32 else max(20, base * 32 // batch)
+
+
+def _cycle(pool: list):
+    """Fuente rotativa de elementos distintos entre iteraciones."""
+    return itertools.cycle(pool).__next__
+
+
+def bench_stages(service, pools: dict, iterations: int) -> dict:
+    """Costo de cada etapa del pipeline, por tamaño de lote."""
+    cols_imputer = list(service.imputer_num.feature_names_in_)
+    results = {}
+    for batch, pool in pools.items():
+        n = _iterations(iterations, batch)
+        # Entradas precalculadas de cada etapa (se mide solo la etapa)
+        prepared = []
+        for records in pool:
+            df = service._build_dataframe(records)
+            num = pd.DataFrame(service.imputer_num.transform(df[cols_imputer]), columns=cols_imputer)
+            cat = pd.DataFrame(
+                service.imputer_cat.transform(df[service.cols_cat]), columns=service.cols_cat
+            )
+            X = service._transform_sklearn(df)
+            prepared.append((records, df, num, cat, X))
+        nxt = _cycle(prepared)
+
+        def imputation():
+            df = nxt()[1]
+            service.imputer_num.transform(df[cols_imputer])
+            service.imputer_cat.transform(df[service.cols_cat])
+
+        stages = {
+            "rare_grouping": lambda: [service._group_rare_categories(d) for d in nxt()[0]],
+            "dataframe": lambda: service._build_dataframe(nxt()[0]),
+            "imputation": imputation,
+            "ohe": lambda: service.ohe.transform(nxt()[3]),
+            "scaling": lambda: service.scaler.transform(nxt()[2][service.cols_escalar]),
+            "model": lambda: service.modelo.predict_proba(nxt()[4]),
+            "factors": lambda: service.rules.evaluate(nxt()[0]),
+        }
+        if service.preprocessor is not None:
+            stages["preprocess_compiled"] = lambda: service.preprocessor.transform(nxt()[0])
+        if service.engine is not None:
+            stages["model_compiled"] = lambda: service.engine.predict(nxt()[4])
+
+        for name, fn in stages.items():
+            results[f"stages.{name}@{batch}"] = measure(fn, batch, n)
+    return results
+
+
+def bench_service(service, pools: dict, iterations: int) -> dict:
+    """MLService de extremo a extremo (sin caché y con caché caliente)."""
+    results = {}
+    maxsize, ttl = service.cache.maxsize, service.cache.ttl
+    service.cache.configure(0, 0)
+    singles = _cycle([records[0] for records in pools[min(pools)]])
+    results["service.predict@1"] = measure(lambda: service.predict(singles()), 1, iterations)
+    for batch, pool in pools.items():
+        nxt = _cycle(pool)
+        results[f"service.predict_batch@{batch}"] = measure(
+            lambda: service.predict_batch(nxt()), batch, _iterations(iterations, batch)
+        )
+    if service.can_explain:
+        results["service.predict_explain@1"] = measure(
+            lambda: service.predict(singles(), explain=True), 1, iterations
+        )
+
+    service.cache.configure(max(maxsize, 4096), max(ttl, 900.0))
+    for batch, pool in pools.items():
+        nxt = _cycle(pool)
+        for records in pool:
+            service.predict_batch(records)
+        results[f"service.predict_batch_cached@{batch}"] = measure(
+            lambda: service.predict_batch(nxt()), batch, _iterations(iterations, batch)
+        )
+    service.cache.configure(maxsize, ttl)
+    service.cache.clear()
+    return results
+
+
+def bench_http(client, pools: dict, iterations: int) -> dict:
+    """/api/predict y /api/predict/batch a través de la app."""
+    headers = {"Authorization": "Bearer dev"}
+
+    def post(path, body):
+        response = client.post(path, json=body, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path}: HTTP {response.status_code} {response.text[:200]}")
+
+    results = {}
+    singles = _cycle([records[0] for records in pools[min(pools)]])
+    results["http.predict@1"] = measure(lambda: post("/api/predict", singles()), 1, iterations)
+    for batch, pool in pools.items():
+        nxt = _cycle(pool)
+        results[f"http.predict_batch@{batch}"] = measure(
+            lambda: post("/api/predict/batch", {"pacientes": nxt()}),
+            batch,
+            _iterations(iterations, batch),
+        )
+    return results
+
+
+def run(batch_sizes: list[int], iterations: int, trees: int, seed: int, groups: set) -> dict:
+    spec = standin_spec(n_estimators=trees, seed=seed)
+    # Configuración de la app antes de importarla (get_settings se cachea)
+    os.environ.update(
+        SUPABASE_URL="",
+        PIPELINE_PATH=spec.pipeline_path,
+        METADATA_PATH=spec.metadata_path,
+        FEATURES_PATH=spec.features_path,
+        ARTIFACTS_DIR=str(Path(spec.pipeline_path).parent),
+        EXTRA_MODEL_VERSIONS="",
+        USE_BUNDLES="false",
+        PREDICTION_CACHE_SIZE="0",
+        MICROBATCH_ENABLED="false",
+        INFERENCE_EXECUTOR="thread",
+        RATE_LIMIT_ENABLED="false",
+    )
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services.registry import model_registry
+
+    vocab = vocabulary()
+    pools = {
+        batch: [
+            synthetic_patients(batch, vocab, seed=seed + 1000 * batch + k) for k in range(4)
+        ]
+        for batch in batch_sizes
+    }
+
+    results = {}
+    with TestClient(app) as client:
+        # Logs por solicitud fuera de la medición
+        logging.disable(logging.CRITICAL)
+        service = model_registry.get()
+        if "stages" in groups:
+            results.update(bench_stages(service, pools, iterations))
+        if "service" in groups:
+            results.update(bench_service(service, pools, iterations))
+        if "http" in groups:
+            results.update(bench_http(client, pools, iterations))
+        logging.disable(logging.NOTSET)
+
+    return {
+        "environment": environment(),
+        "config": {
+            "batch_sizes": batch_sizes,
+            "iterations": iterations,
+            "trees_per_estimator": trees,
+            "n_trees": service.engine.n_trees if service.engine is not None else None,
+            "seed": seed,
+            "compiled_preprocessor": service.preprocessor is not None,
+            "compiled_engine": service.engine is not None,
+        },
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-sizes", default="1,32,256")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--trees", type=int, default=100, help="Árboles por sub-estimador")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", default="stages,service,http", help="Grupos a medir")
+    parser.add_argument("--out", help="Archivo JSON (por defecto results/<commit>.json)")
+    parser.add_argument("--compare", help="JSON de referencia para comparar")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    logging.basicConfig(level=logging.WARNING)
+    report = run(
+        batch_sizes=sorted({int(b) for b in args.batch_sizes.split(",")}),
+        iterations=args.iterations,
+        trees=args.trees,
+        seed=args.seed,
+        groups={g.strip() for g in args.only.split(",")},
+    )
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{report['environment']['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for name, stats in report["results"].items():
+        print(
+            f"{name:<42} p50 {stats['p50_ms']:>9.3f}  p95 {stats['p95_ms']:>9.3f}  "
+            f"p99 {stats['p99_ms']:>9.3f} ms  {stats['rows_per_s'] or 0:>11.1f} filas/s"
+        )
+    print(f"\nResultados: {out}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        rows = compare(baseline, report, args.threshold)
+        print_comparison(rows)
+        return 1 if any(row["regression"] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Utilidades compartidas por los benchmarks: medición y entorno."""
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+
+def summarize(samples: list[float], rows: int = 1) -> dict:
+    """Percentiles (ms) y throughput de una serie de tiempos en segundos."""
+    values = np.asarray(samples, dtype=np.float64)
+    mean = float(values.mean())
+    return {
+        "n": len(values),
+        "rows": rows,
+        "p50_ms": round(float(np.percentile(values, 50)) * 1000, 4),
+        "p95_ms": round(float(np.percentile(values, 95)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(values, 99)) * 1000, 4),
+        "mean_ms": round(mean * 1000, 4),
+        "rows_per_s": round(rows / mean, 1) if mean > 0 else None,
+    }
+
+
+def measure(fn, rows: int = 1, iterations: int = 200, warmup: int = 10) -> dict:
+    """Ejecuta `fn()` `iterations` veces (tras `warmup`) y resume los tiempos."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, rows)
+
+
+def git_commit() -> str:
+    """Commit actual del repositorio (o 'unknown' fuera de git)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def environment() -> dict:
+    """Versiones y hardware, para saber si dos resultados son comparables."""
+    import sklearn
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
@@ -0,0 +1,76 @@
+"""Compara dos resultados JSON de bench_predict (referencia vs actual).
+
+Marca como regresión todo caso cuyo p50 o p95 empeora más que `threshold`
+(relativo) y más que `min_delta_ms` (absoluto, para ignorar ruido en etapas
+de microsegundos).
+
+Uso (desde backend/):
+    python -m benchmarks.compare results/base.json results/new.json [--threshold 0.1]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old if old else 0.0
+
+
+def compare(
+    baseline: dict, current: dict, threshold: float = 0.10, min_delta_ms: float = 0.02
+) -> list[dict]:
+    """Filas de comparación para los casos presentes en ambos resultados."""
+    rows = []
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        row = {"name": name}
+        regression = False
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            change = _change(old[metric], new[metric])
+            row[metric] = (old[metric], new[metric], change)
+            if metric != "p99_ms" and change > threshold and (
+                new[metric] - old[metric] > min_delta_ms
+            ):
+                regression = True
+        row["rows_per_s"] = (old["rows_per_s"], new["rows_per_s"])
+        row["regression"] = regression
+        rows.append(row)
+    return rows
+
+
+def print_comparison(rows: list[dict]):
+    print(f"\n{'caso':<42} {'p50 ref→act (ms)':>26} {'p95 ref→act (ms)':>26}")
+    for row in rows:
+        cells = []
+        for metric in ("p50_ms", "p95_ms"):
+            old, new, change = row[metric]
+            cells.append(f"{old:>9.3f}→{new:<9.3f}{change:>+7.1%}")
+        flag = "  ✗ regresión" if row["regression"] else ""
+        print(f"{row['name']:<42} {cells[0]:>26} {cells[1]:>26}{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"\n{len(rows)} casos comparados, {regressions} regresiones")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--min-delta-ms", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    for label, report in (("referencia", baseline), ("actual", current)):
+        env = report.get("environment", {})
+        print(f"{label}: {env.get('commit', '?')} — {env.get('platform', '?')}")
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+    print_comparison(rows)
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
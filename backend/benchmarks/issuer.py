@@ -0,0 +1,155 @@
+"""Emisor local de JWT con la forma de los de Supabase Auth (pruebas de carga).
+
+Firma tokens HS256 con un secreto compartido (el "Legacy JWT Secret") y
+RS256/ES256 con claves generadas al iniciar, y sirve por HTTP:
+
+- /auth/v1/.well-known/jwks.json: el JWKS, en la misma ruta que Supabase;
+- /token?sub=...&alg=RS256&role=authenticated&ttl=3600: un token nuevo.
+
+Con SUPABASE_URL apuntando al emisor y SUPABASE_JWT_SECRET = su secreto,
+verify_jwt recorre el mismo camino que en producción (JWKS, caché de
+tokens, service_role) sin depender del proyecto real.
+
+Uso (desde backend/):
+    python -m benchmarks.issuer [--port 9999] [--host 0.0.0.0]
+
+Imprime las variables de entorno para el servidor y atiende hasta Ctrl+C;
+benchmarks/loadtest.py --issuer http://127.0.0.1:9999 obtiene ahí sus tokens.
+"""
+import argparse
+import json
+import secrets
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import jwt as pyjwt
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+JWKS_PATH = "/auth/v1/.well-known/jwks.json"
+TOKEN_PATH = "/token"
+ALGORITHMS = ("HS256", "RS256", "ES256")
+
+
+class StubIssuer:
+    """Claves de firma, emisión de tokens y servidor HTTP del JWKS."""
+
+    def __init__(self, secret: str = ""):
+        self.secret = secret or secrets.token_urlsafe(32)
+        self.url = ""
+        self._server: ThreadingHTTPServer | None = None
+        self._private = {
+            "ES256": ec.generate_private_key(ec.SECP256R1()),
+            "RS256": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        }
+        keys = []
+        for alg, private in self._private.items():
+            jwk = json.loads(
+                pyjwt.algorithms.get_default_algorithms()[alg].to_jwk(private.public_key())
+            )
+            jwk.update(kid=f"stub-{alg.lower()}", alg=alg, use="sig")
+            keys.append(jwk)
+        self._jwks = {"keys": keys}
+
+    def jwks(self) -> dict:
+        return self._jwks
+
+    def token(
+        self, sub: str, alg: str = "HS256", role: str = "authenticated", ttl: int = 3600
+    ) -> str:
+        """Access token de Supabase para `sub`, firmado con `alg`."""
+        if alg not in ALGORITHMS:
+            raise ValueError(f"algoritmo no soportado: {alg}")
+        now = int(time.time())
+        claims = {
+            "sub": sub,
+            "email": f"{sub}@local",
+            "role": role,
+            "aud": "authenticated",
+            "iat": now,
+            "exp": now + ttl,
+            "session_id": str(uuid.uuid4()),
+        }
+        if alg == "HS256":
+            return pyjwt.encode(claims, self.secret, algorithm="HS256")
+        kid = f"stub-{alg.lower()}"
+        return pyjwt.encode(claims, self._private[alg], algorithm=alg, headers={"kid": kid})
+
+    def server_env(self) -> dict:
+        """Variables de entorno del backend para verificar estos tokens."""
+        return {
+            "SUPABASE_URL": self.url,
+            "SUPABASE_JWT_SECRET": self.secret,
+            "SUPABASE_JWKS_URL": self.url + JWKS_PATH,
+        }
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Atiende el JWKS y /token en un hilo; retorna la URL base."""
+        issuer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == JWKS_PATH:
+                    self._send(200, issuer.jwks())
+                elif url.path == TOKEN_PATH:
+                    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                    try:
+                        token = issuer.token(
+                            query.get("sub") or "load-user",
+                            query.get("alg", "HS256"),
+                            query.get("role", "authenticated"),
+                            int(query.get("ttl", 3600)),
+                        )
+                    except ValueError as e:
+                        self._send(400, {"detail": str(e)})
+                        return
+                    self._send(200, {"access_token": token, "token_type": "bearer"})
+                else:
+                    self._send(404, {"detail": "Not Found"})
+
+            def _send(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        bound_host, bound_port = self._server.server_address[:2]
+        if bound_host in ("0.0.0.0", "::"):
+            bound_host = "127.0.0.1"
+        self.url = f"http://{bound_host}:{bound_port}"
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--secret", default="", help="Secreto HS256 (por defecto, aleatorio)")
+    args = parser.parse_args()
+    issuer = StubIssuer(args.secret)
+    issuer.start(args.host, args.port)
+    print("# Variables para el backend:")
+    for name, value in issuer.server_env().items():
+        print(f"{name}={value}")
+    print(f"# Token: curl '{issuer.url}{TOKEN_PATH}?sub=user-1&alg=RS256'")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        issuer.stop()
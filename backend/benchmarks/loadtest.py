@@ -0,0 +1,443 @@
+"""Prueba de carga de extremo a extremo contra el servidor real.
+
+Genera tráfico HTTP asíncrono (httpx) con tokens del emisor local
+(benchmarks/issuer.py), uno por usuario simulado y con el algoritmo elegido
+(HS256, RS256, ES256 o una mezcla), así que verify_jwt, el rate limit por
+usuario y el registro de evaluaciones trabajan como en producción.
+
+La carga se aplica por etapas de --duration segundos:
+
+- --concurrency 4,8,16: lazo cerrado, N clientes que envían una solicitud
+  apenas termina la anterior;
+- --rate 20,50,100: lazo abierto, llegadas de Poisson a R solicitudes/s, con
+  a lo sumo --max-inflight en curso (las que no caben se cuentan como
+  omitidas). La latencia se mide desde la llegada programada, de modo que la
+  espera en el cliente también cuenta.
+
+Cada etapa reporta throughput, p50/p95/p99/máx y las tasas de 429, 503 y
+otros errores. El punto de saturación es la última etapa con p99 ≤ --slo-ms
+y errores (incluidas omitidas) ≤ --max-error-rate.
+
+Destinos:
+
+- --spawn: arranca `python -m app.server` (--workers) apuntando al emisor;
+  el resto de la configuración sale del entorno (artefactos, RATE_LIMIT_*,
+  DATABASE_URL...).
+- --url: un servidor ya levantado, p. ej. el contenedor (http://localhost:8000)
+  o el proxy de Next.js (http://localhost:3000, que reenvía /api/*). Debe
+  verificar los tokens del emisor: levantar `python -m benchmarks.issuer`,
+  configurar el servidor con las variables que imprime y pasar --issuer.
+  Se puede repetir --url para comparar, p. ej., el backend directo y el proxy.
+
+Uso (desde backend/):
+    python -m benchmarks.loadtest --spawn --workers 2 --concurrency 4,8,16,32
+    python -m benchmarks.loadtest --url http://localhost:8000 --url http://localhost:3000 \\
+        --issuer http://127.0.0.1:9999 --rate 25,50,100 --mix predict=8,historial=1,info=1
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from .common import environment
+from .issuer import ALGORITHMS, TOKEN_PATH, StubIssuer
+from .synthetic import synthetic_patients, vocabulary
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Escenario → (método, ruta, cuerpo: None | "paciente" | "lote")
+SCENARIOS = {
+    "predict": ("POST", "/api/predict", "paciente"),
+    "explain": ("POST", "/api/predict?explain=true", "paciente"),
+    "batch": ("POST", "/api/predict/batch", "lote"),
+    "historial": ("GET", "/api/evaluaciones?limit=20", None),
+    "estadisticas": ("GET", "/api/evaluaciones/estadisticas", None),
+    "info": ("GET", "/api/model/info", None),
+    "health": ("GET", "/api/health", None),
+}
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """'predict=8,historial=1' → pesos por escenario."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"escenario desconocido: {name} ({', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("--mix sin escenarios")
+    return mix
+
+
+def _stages(text: str) -> list[float]:
+    return [float(v) for v in text.split(",") if v.strip()]
+
+
+class Workload:
+    """Solicitudes pre-armadas: escenario, cuerpo y token de cada envío."""
+
+    def __init__(
+        self, mix: dict, tokens: list[str], patients: list[dict], batch_size: int, seed: int
+    ):
+        self._rng = random.Random(seed)
+        self._names = list(mix)
+        self._weights = list(mix.values())
+        self._headers = itertools.cycle(
+            [{"Authorization": f"Bearer {t}", "Content-Type": "application/json"} for t in tokens]
+        )
+        self._patients = itertools.cycle([json.dumps(p).encode() for p in patients])
+        batches = [
+            {"pacientes": patients[i : i + batch_size]}
+            for i in range(0, max(1, len(patients) - batch_size + 1), batch_size)
+        ]
+        self._batches = itertools.cycle([json.dumps(b).encode() for b in batches])
+
+    def next(self) -> tuple:
+        """(escenario, método, ruta, headers, cuerpo)."""
+        name = self._rng.choices(self._names, self._weights)[0]
+        method, path, body = SCENARIOS[name]
+        content = None
+        if body == "paciente":
+            content = next(self._patients)
+        elif body == "lote":
+            content = next(self._batches)
+        return name, method, path, next(self._headers), content
+
+
+class StageRecorder:
+    """Resultados de una etapa."""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.scenarios: list[str] = []
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.skipped = 0
+
+    def record(self, scenario: str, latency: float, status: int | None, error: str | None = None):
+        self.latencies.append(latency)
+        self.scenarios.append(scenario)
+        if status is None:
+            self.errors[error] += 1
+        else:
+            self.statuses[status] += 1
+
+    def report(self, elapsed: float) -> dict:
+        n = len(self.latencies)
+        ok = sum(c for s, c in self.statuses.items() if 200 <= s < 300)
+        attempted = n + self.skipped
+        result = {
+            "solicitudes": n,
+            "omitidas": self.skipped,
+            "duracion_s": round(elapsed, 2),
+            "throughput_rps": round(n / elapsed, 1) if elapsed else 0.0,
+            "ok_rps": round(ok / elapsed, 1) if elapsed else 0.0,
+            "tasa_429": round(self.statuses[429] / n, 4) if n else 0.0,
+            "tasa_503": round(self.statuses[503] / n, 4) if n else 0.0,
+            "tasa_error": round((attempted - ok) / attempted, 4) if attempted else 0.0,
+            "estados": {str(s): c for s, c in sorted(self.statuses.items())},
+            "errores": dict(self.errors),
+        }
+        result.update(_percentiles(self.latencies))
+        names = np.array(self.scenarios)
+        latencies = np.array(self.latencies)
+        result["por_escenario"] = {
+            name: {"n": int((names == name).sum()), **_percentiles(latencies[names == name])}
+            for name in sorted(set(self.scenarios))
+        }
+        return result
+
+
+def _percentiles(samples) -> dict:
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    if not values.size:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+async def _send(
+    client: httpx.AsyncClient, workload: Workload, recorder: StageRecorder, start: float
+):
+    name, method, path, headers, content = workload.next()
+    try:
+        response = await client.request(method, path, headers=headers, content=content)
+        await response.aread()
+        recorder.record(name, time.perf_counter() - start, response.status_code)
+    except httpx.HTTPError as e:
+        recorder.record(name, time.perf_counter() - start, None, type(e).__name__)
+
+
+async def closed_loop(client, workload, concurrency: int, duration: float) -> StageRecorder:
+    """N clientes que envían una solicitud apenas termina la anterior."""
+    recorder = StageRecorder()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await _send(client, workload, recorder, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return recorder
+
+
+async def open_loop(
+    client, workload, rate: float, duration: float, max_inflight: int, seed: int
+) -> StageRecorder:
+    """Llegadas de Poisson a `rate` solicitudes/s, independientes de las respuestas."""
+    recorder = StageRecorder()
+    rng = random.Random(seed)
+    inflight: set[asyncio.Task] = set()
+    arrival = time.perf_counter()
+    deadline = arrival + duration
+    while True:
+        arrival += rng.expovariate(rate)
+        if arrival >= deadline:
+            break
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(inflight) >= max_inflight:
+            recorder.skipped += 1
+            continue
+        task = asyncio.create_task(_send(client, workload, recorder, arrival))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+    if inflight:
+        await asyncio.wait(inflight)
+    return recorder
+
+
+def saturation(stages: list[dict], slo_ms: float, max_error_rate: float) -> dict | None:
+    """Última etapa que cumple el SLO antes de la primera que no lo cumple."""
+    best = None
+    for stage in stages:
+        p99 = stage["p99_ms"]
+        if p99 is None or p99 > slo_ms or stage["tasa_error"] > max_error_rate:
+            break
+        best = stage
+    return best
+
+
+async def run_target(url: str, workload: Workload, args) -> list[dict]:
+    """Calentamiento y etapas contra `url`."""
+    limits = httpx.Limits(
+        max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight
+    )
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        if args.warmup > 0:
+            await closed_loop(client, workload, min(4, args.max_inflight), args.warmup)
+        stages = []
+        if args.rate:
+            levels = [("rate", r) for r in _stages(args.rate)]
+        else:
+            levels = [("concurrency", int(c)) for c in _stages(args.concurrency)]
+        for i, (kind, level) in enumerate(levels):
+            start = time.perf_counter()
+            if kind == "rate":
+                recorder = await open_loop(
+                    client, workload, level, args.duration, args.max_inflight, args.seed + i
+                )
+            else:
+                recorder = await closed_loop(client, workload, level, args.duration)
+            stage = {kind: level, **recorder.report(time.perf_counter() - start)}
+            stages.append(stage)
+            _print_stage(url, kind, stage)
+            if args.pause:
+                await asyncio.sleep(args.pause)
+        return stages
+
+
+def _print_stage(url: str, kind: str, stage: dict):
+    level = f"{stage[kind]:g} rps" if kind == "rate" else f"{stage[kind]} clientes"
+    print(
+        f"{url:<28} {level:>12}  {stage['throughput_rps']:>8.1f} req/s  "
+        f"p50 {stage['p50_ms'] or 0:>8.1f}  p99 {stage['p99_ms'] or 0:>8.1f} ms  "
+        f"429 {stage['tasa_429']:>6.1%}  503 {stage['tasa_503']:>6.1%}  "
+        f"error {stage['tasa_error']:>6.1%}",
+        flush=True,
+    )
+
+
+def fetch_tokens(issuer_url: str, users: int, algs: list[str], role: str, ttl: int) -> list[str]:
+    """Tokens de un emisor ya levantado (python -m benchmarks.issuer)."""
+    tokens = []
+    with httpx.Client(base_url=issuer_url, timeout=10.0) as client:
+        for i in range(users):
+            params = {
+                "sub": f"load-user-{i}", "alg": algs[i % len(algs)], "role": role, "ttl": ttl
+            }
+            response = client.get(TOKEN_PATH, params=params)
+            response.raise_for_status()
+            tokens.append(response.json()["access_token"])
+    return tokens
+
+
+def spawn_server(
+    port: int, workers: int, env: dict, log_path: str, timeout: float = 120.0
+) -> subprocess.Popen:
+    """Arranca app.server (salida en `log_path`) y espera a que /api/ready responda."""
+    command = [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port)]
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            command + ["--workers", str(workers)],
+            env={**os.environ, **env},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"el servidor terminó al iniciar (código {process.returncode}, ver {log_path})"
+            )
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/ready", timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"el servidor no quedó listo (/api/ready) a tiempo (ver {log_path})")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", action="append", help="Servidor a probar (repetible)")
+    target.add_argument("--spawn", action="store_true", help="Arrancar app.server localmente")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de --spawn")
+    parser.add_argument("--port", type=int, default=8765, help="Puerto de --spawn")
+    parser.add_argument(
+        "--server-log",
+        default=str(Path(tempfile.gettempdir()) / "loadtest-server.log"),
+        help="Salida del servidor de --spawn",
+    )
+    parser.add_argument("--issuer", help="URL de un emisor ya levantado (benchmarks.issuer)")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", default="1,4,16", help="Clientes por etapa (lazo cerrado)")
+    load.add_argument("--rate", help="Solicitudes/s por etapa (lazo abierto)")
+    parser.add_argument("--duration", type=float, default=15.0, help="Segundos por etapa")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Segundos de calentamiento")
+    parser.add_argument("--pause", type=float, default=1.0, help="Pausa entre etapas (s)")
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--mix", default="predict=1", help="Pesos por escenario: " + ", ".join(SCENARIOS)
+    )
+    parser.add_argument("--batch-size", type=int, default=32, help="Pacientes por lote (batch)")
+    parser.add_argument("--users", type=int, default=50, help="Usuarios simulados (un token c/u)")
+    parser.add_argument("--alg", default="HS256", help="HS256, RS256, ES256 o mixed")
+    parser.add_argument("--role", default="authenticated")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p99 máximo aceptable")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--artifacts-dir", default="./artifacts", help="Vocabulario de pacientes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Archivo JSON (por defecto results/loadtest-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    algs = list(ALGORITHMS) if args.alg == "mixed" else [args.alg]
+    if any(a not in ALGORITHMS for a in algs):
+        parser.error(f"--alg debe ser uno de {', '.join(ALGORITHMS)} o mixed")
+    if args.spawn and args.issuer:
+        parser.error("--spawn usa su propio emisor: no combinar con --issuer")
+    levels = _stages(args.rate or args.concurrency)
+    if not levels or min(levels) <= 0:
+        parser.error("--rate/--concurrency: valores positivos separados por coma")
+    # Los tokens no deben vencer durante la prueba
+    runs = len(args.url or [None])
+    ttl = int(runs * (args.warmup + len(levels) * (args.duration + args.pause))) + 600
+
+    issuer = None
+    if args.issuer:
+        tokens = fetch_tokens(args.issuer, args.users, algs, args.role, ttl)
+    else:
+        issuer = StubIssuer()
+        issuer.start()
+        tokens = [
+            issuer.token(f"load-user-{i}", algs[i % len(algs)], args.role, ttl)
+            for i in range(args.users)
+        ]
+        if args.url:
+            print("Emisor local sin --issuer: el servidor debe estar en modo dev", file=sys.stderr)
+
+    patients = synthetic_patients(
+        max(1000, args.batch_size * 8), vocabulary(args.artifacts_dir), seed=args.seed
+    )
+    workload = Workload(mix, tokens, patients, args.batch_size, args.seed)
+    server = None
+    try:
+        if args.spawn:
+            server = spawn_server(args.port, args.workers, issuer.server_env(), args.server_log)
+            urls = [f"http://127.0.0.1:{args.port}"]
+        else:
+            urls = args.url
+        results = {url: asyncio.run(run_target(url, workload, args)) for url in urls}
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if issuer is not None:
+            issuer.stop()
+
+    report = {
+        "environment": environment(),
+        "config": {
+            "spawn_workers": args.workers if args.spawn else None,
+            "mix": mix,
+            "alg": args.alg,
+            "users": args.users,
+            "duration_s": args.duration,
+            "max_inflight": args.max_inflight,
+            "slo_p99_ms": args.slo_ms,
+            "max_error_rate": args.max_error_rate,
+        },
+        "targets": {},
+    }
+    kind = "rate" if args.rate else "concurrency"
+    for url, stages in results.items():
+        best = saturation(stages, args.slo_ms, args.max_error_rate)
+        peak = max(stages, key=lambda stage: stage["ok_rps"])
+        report["targets"][url] = {
+            "stages": stages,
+            "saturacion": best and best[kind],
+            "pico": {kind: peak[kind], "ok_rps": peak["ok_rps"]},
+        }
+        if best is None:
+            print(f"{url}: ninguna etapa cumple p99 ≤ {args.slo_ms:g} ms")
+        elif best is stages[-1]:
+            print(f"{url}: todas las etapas cumplen (saturación por encima de {best[kind]:g})")
+        else:
+            print(f"{url}: saturación tras {kind}={best[kind]:g} ({best['ok_rps']:.1f} req/s ok)")
+
+    commit = report["environment"]["commit"]
+    out = Path(args.out) if args.out else RESULTS_DIR / f"loadtest-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nResultados: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Modelo sustituto con la misma forma de artefactos que pipeline_completo_v3.pkl.
+
+El pickle real no se versiona en el repositorio. Este módulo entrena
+localmente un CalibratedClassifierCV(RandomForest, isotónico) sobre
+pacientes sintéticos, reutilizando los transformadores ajustados que sí
+están en artifacts/ (imputers, OHE, scaler), y escribe el mismo diccionario
+que carga MLService.load junto con metadata y feature_names.
+
+Lo usan los benchmarks y las pruebas (tests/conftest.py), estas con menos
+árboles y otros estimadores o métodos de calibración (fit_pipeline).
+
+Uso (desde backend/):
+    python -m benchmarks.standin [--out DIR] [--trees 100]
+"""
+import argparse
+import functools
+import json
+import tempfile
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import RandomForestClassifier
+
+from app.services.ml_service import MLService
+from app.services.registry import ModelSpec
+
+from .synthetic import synthetic_patients, vocabulary
+
+# Transformadores versionados (backend/artifacts), sin depender del cwd
+ARTIFACTS_DIR = str(Path(__file__).resolve().parent.parent / "artifacts")
+
+
+@functools.lru_cache(maxsize=None)
+def _vocabulary(artifacts_dir: str, version: str) -> dict:
+    return vocabulary(artifacts_dir, version)
+
+
+def patients(
+    n: int,
+    seed: int = 0,
+    missing_rate: float = 0.15,
+    rare_rate: float = 0.0,
+    unknown_rate: float = 0.0,
+    artifacts_dir: str = ARTIFACTS_DIR,
+    version: str = "v3",
+) -> list[dict]:
+    """Pacientes sintéticos; por defecto solo con el vocabulario de entrenamiento."""
+    return synthetic_patients(
+        n,
+        _vocabulary(str(artifacts_dir), version),
+        seed=seed,
+        missing_rate=missing_rate,
+        rare_rate=rare_rate,
+        unknown_rate=unknown_rate,
+    )
+
+
+def _labels(patients: list[dict], rng: np.random.Generator) -> np.ndarray:
+    """Severidad sintética (0/1/2) derivada de marcadores clínicos con ruido."""
+    score = np.zeros(len(patients))
+    for i, p in enumerate(patients):
+        score[i] += (15 - p["glasgow"]) * 0.6
+        score[i] += 1.0 if (p["plaquetas"] or 300000) < 150000 else 0.0
+        score[i] += 1.0 if (p["pcr"] or 0) > 20 else 0.0
+        score[i] += 1.0 if (p["procalcitonina"] or 0) > 1.0 else 0.0
+        score[i] += 0.5 if p["tiempo_fiebre"] > 5 else 0.0
+    score += rng.normal(0, 0.8, len(patients))
+    return np.digitize(score, [0.8, 2.0])
+
+
+def transformers(artifacts_dir: str = ARTIFACTS_DIR, version: str = "v3") -> dict:
+    """Diccionario del pipeline sin el modelo: transformadores de artifacts/ y columnas."""
+    source = Path(artifacts_dir)
+    with open(source / f"feature_names_{version}.json", encoding="utf-8") as f:
+        feature_names = json.load(f)
+    return {
+        "scaler": joblib.load(source / f"scaler_{version}.pkl"),
+        "ohe": joblib.load(source / f"ohe_{version}.pkl"),
+        "imputer_num": joblib.load(source / f"imputer_num_{version}.pkl"),
+        "imputer_cat": joblib.load(source / f"imputer_cat_{version}.pkl"),
+        "cols_num": feature_names["cols_numericas"],
+        "cols_cat": feature_names["cols_categoricas"],
+        "cols_escalar": feature_names["cols_escaladas"],
+        "feature_names_post_ohe": feature_names["features_post_ohe"],
+        "features_originales": feature_names["features_originales"],
+        "categorias_raras": feature_names["categorias_raras"],
+        "class_names": ["Leve", "Moderada", "Severa"],
+    }
+
+
+def fit_pipeline(
+    method: str = "isotonic",
+    estimator=None,
+    seed: int = 42,
+    n_samples: int = 433,
+    n_estimators: int = 100,
+    artifacts_dir: str = ARTIFACTS_DIR,
+    version: str = "v3",
+) -> dict:
+    """Entrena el modelo sustituto; retorna el dict que guarda joblib.
+
+    `estimator` (por defecto un RandomForest de `n_estimators` árboles) es
+    el modelo que envuelve CalibratedClassifierCV con `method`.
+    """
+    pipeline = transformers(artifacts_dir, version)
+
+    # Misma transformación que en producción (camino de sklearn)
+    transformer = MLService(version=version)
+    for key, value in pipeline.items():
+        setattr(transformer, key, value)
+    rng = np.random.default_rng(seed)
+    records = patients(
+        n_samples, seed=seed, rare_rate=0.05, unknown_rate=0.01,
+        artifacts_dir=artifacts_dir, version=version,
+    )
+    X = transformer._transform_sklearn(transformer._build_dataframe(records))
+    y = _labels(records, rng)
+
+    if estimator is None:
+        estimator = RandomForestClassifier(
+            n_estimators=n_estimators, min_samples_leaf=2, random_state=seed
+        )
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pipeline["modelo"] = CalibratedClassifierCV(estimator, method=method, cv=3).fit(X, y)
+    return pipeline
+
+
+def write_artifacts(
+    out_dir: str, pipeline: dict, version: str = "v3", artifacts_dir: str = ARTIFACTS_DIR
+) -> ModelSpec:
+    """Escribe pipeline, metadata y feature_names como en artifacts/; retorna su ModelSpec.
+
+    La metadata es la de `version` en `artifacts_dir`; feature_names se
+    deriva del pipeline (refleja cualquier cambio de columnas).
+    """
+    target = Path(out_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    spec = ModelSpec.from_artifacts_dir(version, str(target), use_bundle=False)
+    joblib.dump(pipeline, spec.pipeline_path)
+    with open(Path(artifacts_dir) / f"metadata_{version}.json", encoding="utf-8") as f:
+        metadata = json.load(f)
+    features = {
+        "features_originales": pipeline["features_originales"],
+        "features_post_ohe": pipeline["feature_names_post_ohe"],
+        "cols_numericas": pipeline["cols_num"],
+        "cols_categoricas": pipeline["cols_cat"],
+        "cols_escaladas": pipeline["cols_escalar"],
+        "categorias_raras": pipeline["categorias_raras"],
+    }
+    for path, content in ((spec.metadata_path, metadata), (spec.features_path, features)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(content, f, ensure_ascii=False)
+    return spec
+
+
+def build_standin(
+    out_dir: str,
+    version: str = "v3",
+    artifacts_dir: str = ARTIFACTS_DIR,
+    n_samples: int = 433,
+    n_estimators: int = 100,
+    seed: int = 42,
+) -> ModelSpec:
+    """Entrena y escribe los artefactos sustitutos; retorna su ModelSpec."""
+    pipeline = fit_pipeline(
+        seed=seed,
+        n_samples=n_samples,
+        n_estimators=n_estimators,
+        artifacts_dir=artifacts_dir,
+        version=version,
+    )
+    return write_artifacts(out_dir, pipeline, version, artifacts_dir)
+
+
+def standin_spec(n_estimators: int = 100, seed: int = 42, rebuild: bool = False) -> ModelSpec:
+    """ModelSpec del sustituto en el directorio temporal (lo entrena si falta)."""
+    out_dir = Path(tempfile.gettempdir()) / f"febril-standin-{n_estimators}-{seed}"
+    spec = ModelSpec.from_artifacts_dir("v3", str(out_dir), use_bundle=False)
+    if rebuild or not Path(spec.pipeline_path).exists():
+        spec = build_standin(str(out_dir), n_estimators=n_estimators, seed=seed)
+    return spec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", help="Directorio de salida (por defecto, temporal)")
+    parser.add_argument("--trees", type=int, default=100, help="Árboles por sub-estimador")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.out:
+        result = build_standin(args.out, n_estimators=args.trees, seed=args.seed)
+    else:
+        result = standin_spec(args.trees, args.seed, rebuild=True)
+    print(result.pipeline_path)
@@ -0,0 +1,107 @@
+"""Pacientes sintéticos generados a partir del schema PatientInput.
+
+Los campos, tipos y rangos (ge/le) salen de PatientInput; el vocabulario de
+cada categórica y la escala de cada numérico, de los transformadores
+ajustados (OHE y medianas del imputer). Una fracción de los valores se
+reemplaza por categorías raras, categorías desconocidas o faltantes, como
+ocurre con pacientes reales. Cada registro se valida con el schema.
+"""
+import json
+import typing
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from app.models.schemas import PatientInput
+from app.services.ml_service import COLUMN_TO_FIELD, SchemaMismatch
+
+
+def _bounds(field_info) -> tuple:
+    """(ge, le) declarados en el Field, o None si no existen."""
+    ge = le = None
+    for constraint in field_info.metadata:
+        ge = getattr(constraint, "ge", ge)
+        le = getattr(constraint, "le", le)
+    return ge, le
+
+
+def _is_optional(annotation) -> bool:
+    return type(None) in typing.get_args(annotation)
+
+
+def vocabulary(artifacts_dir: str = "./artifacts", version: str = "v3") -> dict:
+    """Categorías (frecuentes y raras) y medianas por campo de la API.
+
+    SchemaMismatch si los transformadores de `version` usan columnas sin
+    campo en PatientInput (p. ej. v2c, con 'Nivel de Triage por el TEP').
+    """
+    base = Path(artifacts_dir)
+    ohe = joblib.load(base / f"ohe_{version}.pkl")
+    imputer_num = joblib.load(base / f"imputer_num_{version}.pkl")
+    with open(base / f"feature_names_{version}.json", encoding="utf-8") as f:
+        feature_names = json.load(f)
+    rare = feature_names.get("categorias_raras", {})
+    columns = dict.fromkeys([*ohe.feature_names_in_, *imputer_num.feature_names_in_, *rare])
+    unknown = [str(col) for col in columns if col not in COLUMN_TO_FIELD]
+    if unknown:
+        raise SchemaMismatch(
+            "los artefactos %s usan columnas sin campo en PatientInput: %s"
+            % (version, ", ".join(unknown))
+        )
+    return {
+        "categories": {
+            COLUMN_TO_FIELD[col]: [str(c) for c in cats]
+            for col, cats in zip(ohe.feature_names_in_, ohe.categories_)
+        },
+        "rare": {COLUMN_TO_FIELD[col]: list(values) for col, values in rare.items()},
+        "medians": {
+            COLUMN_TO_FIELD[col]: float(value)
+            for col, value in zip(imputer_num.feature_names_in_, imputer_num.statistics_)
+        },
+    }
+
+
+def synthetic_patients(
+    n: int,
+    vocab: dict,
+    seed: int = 0,
+    missing_rate: float = 0.15,
+    rare_rate: float = 0.05,
+    unknown_rate: float = 0.01,
+) -> list[dict]:
+    """Genera `n` pacientes válidos según PatientInput (dicts de model_dump)."""
+    rng = np.random.default_rng(seed)
+    patients = []
+    for _ in range(n):
+        data = {}
+        for field, info in PatientInput.model_fields.items():
+            annotation = info.annotation
+            ge, le = _bounds(info)
+            if annotation is str:
+                roll = rng.random()
+                rare = vocab["rare"].get(field)
+                if rare and roll < rare_rate:
+                    data[field] = str(rng.choice(rare))
+                elif roll > 1.0 - unknown_rate:
+                    data[field] = "Categoría no vista"
+                else:
+                    data[field] = str(rng.choice(vocab["categories"][field]))
+            elif annotation is int:
+                low = int(ge) if ge is not None else 0
+                high = int(le) if le is not None else 100
+                median = vocab["medians"].get(field, (low + high) / 2)
+                value = int(round(rng.normal(median, max(1.0, (high - low) / 8))))
+                data[field] = int(np.clip(value, low, high))
+            elif _is_optional(annotation) and rng.random() < missing_rate:
+                data[field] = None
+            else:
+                median = vocab["medians"].get(field, 1.0) or 1.0
+                value = abs(rng.normal(median, abs(median) * 0.6))
+                if ge is not None:
+                    value = max(value, float(ge))
+                if le is not None:
+                    value = min(value, float(le))
+                data[field] = round(float(value), 2)
+        patients.append(PatientInput.model_validate(data).model_dump())
+    return patients
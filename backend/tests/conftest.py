@@ -0,0 +1,108 @@
+"""Fixtures compartidas de las pruebas del backend."""
+import pytest
+
+from app.config import get_settings
+from app.services.database import database
+from app.services.ml_service import MLService
+from benchmarks.standin import fit_pipeline, write_artifacts
+
+# Modelo sustituto pequeño (benchmarks/standin.py) para que las pruebas sean rápidas
+STANDIN = {"seed": 0, "n_samples": 300, "n_estimators": 15}
+
+
+@pytest.fixture(scope="session")
+def standin_pipeline():
+    """fit(method, estimator, **opciones) → pipeline sustituto sobre los transformadores v3."""
+
+    def fit(method: str = "isotonic", estimator=None, **options) -> dict:
+        return fit_pipeline(method, estimator, **{**STANDIN, **options})
+
+    return fit
+
+
+@pytest.fixture(scope="session")
+def standin_artifacts(tmp_path_factory, standin_pipeline) -> dict:
+    """Artefactos del pipeline de reemplazo (isotónico) en un directorio temporal."""
+    directory = tmp_path_factory.mktemp("artifacts")
+    spec = write_artifacts(str(directory), standin_pipeline())
+    return {
+        "dir": directory,
+        "pipeline_path": spec.pipeline_path,
+        "metadata_path": spec.metadata_path,
+        "features_path": spec.features_path,
+    }
+
+
+@pytest.fixture(scope="session")
+def standin_service(standin_artifacts) -> MLService:
+    """MLService cargado desde los pickles del pipeline de reemplazo."""
+    service = MLService("v3")
+    service.load(
+        standin_artifacts["pipeline_path"],
+        standin_artifacts["metadata_path"],
+        standin_artifacts["features_path"],
+    )
+    return service
+
+
+@pytest.fixture(scope="session", params=["isotonic", "sigmoid"])
+def calibrated_pipeline(request, standin_pipeline) -> dict:
+    """Pipeline de reemplazo con cada método de calibración."""
+    return standin_pipeline(request.param)
+
+
+@pytest.fixture(scope="session")
+def client(standin_artifacts):
+    """TestClient de la app sobre el pipeline de reemplazo (auth en modo dev)."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    env = {
+        "PIPELINE_PATH": standin_artifacts["pipeline_path"],
+        "METADATA_PATH": standin_artifacts["metadata_path"],
+        "FEATURES_PATH": standin_artifacts["features_path"],
+        "ARTIFACTS_DIR": str(standin_artifacts["dir"]),
+        "SUPABASE_URL": "",
+        "DATABASE_URL": "",
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in env.items():
+            mp.setenv(name, value)
+        get_settings.cache_clear()
+        with TestClient(app, headers={"Authorization": "Bearer dev"}) as test_client:
+            yield test_client
+    get_settings.cache_clear()
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Base SQLite temporal con el esquema de evaluaciones (base global)."""
+    database.configure(f"sqlite:///{tmp_path / 'evaluaciones.db'}", pool_size=2)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def supabase_auth(monkeypatch):
+    """Auth de Supabase con HS256: retorna token(role) → header Authorization."""
+    import time
+
+    import jwt as pyjwt
+
+    from app.services import auth
+
+    secret = "secreto-de-prueba-de-32-bytes-o-mas"
+    monkeypatch.setenv("SUPABASE_URL", "http://supabase.invalid")
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", secret)
+    get_settings.cache_clear()
+    auth._token_cache.clear()
+
+    def token(role: str = "authenticated", sub: str = "user-1") -> dict:
+        claims = {"sub": sub, "role": role, "exp": int(time.time()) + 300}
+        return {"Authorization": "Bearer " + pyjwt.encode(claims, secret, algorithm="HS256")}
+
+    yield token
+    get_settings.cache_clear()
+    auth._token_cache.clear()
@@ -0,0 +1,79 @@
+"""Caché de JWT verificados: expiración por `exp` y límite LRU."""
+import time
+import types
+
+import jwt as pyjwt
+import pytest
+
+from app.config import get_settings
+from app.services import auth
+from app.services.auth import VerifiedTokenCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj de pared del módulo auth controlado por la prueba."""
+    fake = types.SimpleNamespace(now=1_800_000_000.0, perf_counter=time.perf_counter)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(auth, "time", fake)
+    return fake
+
+
+def test_entry_is_rejected_once_exp_passes(clock):
+    cache = VerifiedTokenCache(maxsize=4)
+    key = cache.digest("token")
+    payload = {"sub": "user-1", "exp": clock.now + 60}
+    cache.put(key, payload)
+
+    clock.now += 59
+    assert cache.get(key) is payload
+    clock.now += 1
+    assert cache.get(key) is None
+    # La entrada expirada se descarta, no vuelve aunque el reloj retroceda
+    clock.now -= 30
+    assert cache.get(key) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_bound(clock):
+    cache = VerifiedTokenCache(maxsize=2)
+    keys = [cache.digest(f"token-{i}") for i in range(3)]
+    for key in keys[:2]:
+        cache.put(key, {"exp": clock.now + 60})
+    cache.get(keys[0])  # keys[1] pasa a ser la menos usada
+    cache.put(keys[2], {"exp": clock.now + 60})
+
+    assert len(cache._data) == 2
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+@pytest.mark.parametrize(
+    "maxsize, payload",
+    [(0, {"exp": 1_800_000_060}), (2, {"sub": "sin-exp"}), (2, {"exp": "1800000060"})],
+)
+def test_uncacheable_payloads(clock, maxsize, payload):
+    cache = VerifiedTokenCache(maxsize=maxsize)
+    cache.put(cache.digest("token"), payload)
+    assert len(cache._data) == 0
+
+
+def test_cached_token_is_rejected_after_exp(client, supabase_auth):
+    """Un token verificado mientras era válido no se acepta desde la caché al expirar."""
+    claims = {"sub": "user-1", "role": "service_role", "exp": int(time.time()) - 5}
+    token = pyjwt.encode(claims, get_settings().supabase_jwt_secret, algorithm="HS256")
+    # Como si se hubiera verificado (y cacheado) antes del exp
+    auth._token_cache._data[auth._token_cache.digest(token)] = (claims["exp"], claims)
+
+    response = client.get("/api/model/versions", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token expirado, inicie sesión nuevamente"
+    assert len(auth._token_cache._data) == 0
+
+
+def test_valid_token_is_served_from_cache(client, supabase_auth):
+    headers = supabase_auth("service_role")
+    hits = auth._token_cache.hits
+    for _ in range(2):
+        assert client.get("/api/model/versions", headers=headers).status_code == 200
+    assert auth._token_cache.hits == hits + 1
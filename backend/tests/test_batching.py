@@ -0,0 +1,114 @@
+"""Micro-batching: la ventana se abre con solicitudes concurrentes escalonadas."""
+import asyncio
+import random
+import time
+
+import pytest
+
+from app.services import batching
+from app.services.batching import MicroBatcher, batch_sizes, micro_batcher
+from benchmarks.standin import patients
+
+
+class FakeExecutor:
+    """Ejecuta el lote tras `latency` s y registra el tamaño de cada uno."""
+
+    def __init__(self, latency: float = 0.003):
+        self.latency = latency
+        self.sizes = []
+
+    async def run(self, fn, records, version):
+        self.sizes.append(len(records))
+        await asyncio.sleep(self.latency)
+        return [{"id": data["id"], "version": version} for data in records]
+
+
+@pytest.fixture
+def executor(monkeypatch) -> FakeExecutor:
+    fake = FakeExecutor()
+    monkeypatch.setattr(batching, "inference_executor", fake)
+    return fake
+
+
+async def _run_clients(batcher: MicroBatcher, clients: int, requests: int, jitter: float):
+    """Clientes en lazo cerrado: cada uno envía, espera y vuelve a enviar."""
+    rng = random.Random(0)
+
+    async def client(c: int):
+        # Arranque escalonado: nunca llegan todos en el mismo tick
+        await asyncio.sleep(c * 0.002)
+        for i in range(requests):
+            await asyncio.sleep(rng.uniform(0, jitter))
+            result = await batcher.submit({"id": (c, i)}, "v3")
+            assert result["id"] == (c, i)
+
+    batcher.start(max_batch=32, window_ms=2.0)
+    try:
+        await asyncio.gather(*(client(c) for c in range(clients)))
+    finally:
+        await batcher.stop()
+
+
+def test_isolated_requests_do_not_wait(executor):
+    batcher = MicroBatcher()
+
+    async def sequential():
+        batcher.start(max_batch=32, window_ms=50.0)
+        try:
+            assert batcher.window == 0.0
+            start = time.monotonic()
+            for i in range(5):
+                await batcher.submit({"id": i})
+            return time.monotonic() - start
+        finally:
+            await batcher.stop()
+
+    elapsed = asyncio.run(sequential())
+    assert executor.sizes == [1] * 5
+    # Sin ventana: solo la latencia del ejecutor (5 × 3 ms), no 5 × 50 ms
+    assert elapsed < 0.2
+
+
+def test_staggered_concurrent_arrivals_are_batched(executor):
+    batcher = MicroBatcher()
+    before = batch_sizes.collect().get((), [0] * (len(batch_sizes.buckets) + 2))
+    asyncio.run(_run_clients(batcher, clients=8, requests=20, jitter=0.003))
+    stats = batcher.stats()
+    assert stats["requests"] == 160
+    assert stats["avg_batch_size"] >= 2.5
+
+    # Histograma: un conteo por lote, con la suma de solicitudes
+    after = batch_sizes.collect()[()]
+    assert sum(after[:-1]) - sum(before[:-1]) == stats["batches"]
+    assert after[-1] - before[-1] == 160
+
+
+def test_window_has_floor_while_others_wait():
+    batcher = MicroBatcher()
+    batcher.max_window = 0.002
+    assert batcher.window == 0.0
+    batcher._waiting = 3
+    assert batcher.window > 0.0
+    batcher._ema = 10.0
+    assert batcher.window == pytest.approx(0.002)
+
+
+def test_metrics_expose_batch_sizes_and_window(client):
+    metrics = client.get("/api/metrics").text
+    assert "febril_microbatch{" not in metrics
+
+    client.portal.call(micro_batcher.start, 8, 2.0)
+    try:
+        for data in patients(3, seed=15):
+            assert client.post("/api/predict", json=data).status_code == 200
+        metrics = client.get("/api/metrics").text
+    finally:
+        client.portal.call(micro_batcher.stop)
+
+    assert 'febril_microbatch{stat="max_window_ms"} 2' in metrics
+    assert 'febril_microbatch{stat="window_ms"}' in metrics
+    assert 'febril_microbatch_size_bucket{le="1"}' in metrics
+    count = next(
+        line for line in metrics.splitlines() if line.startswith("febril_microbatch_size_count")
+    )
+    assert float(count.split()[-1]) >= 3
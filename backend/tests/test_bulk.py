@@ -0,0 +1,184 @@
+"""POST /api/predict/stream y services/bulk.py: NDJSON/CSV, errores por registro y orden."""
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+
+from app.config import get_settings
+from app.services.bulk import CSV_COLUMNS, iter_lines, iter_records
+from benchmarks.standin import patients
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+@pytest.fixture
+def small_chunks(client, monkeypatch):
+    """Lotes de 2 registros, para que un cuerpo corto cruce varios lotes."""
+    monkeypatch.setattr(get_settings(), "stream_chunk_size", 2)
+    return client
+
+
+def probabilities(client, data: dict) -> dict:
+    return client.post("/api/predict", json=data).json()["probabilidades"]
+
+
+def cohort() -> tuple[list[dict], bytes]:
+    """Pacientes y cuerpo NDJSON con registros inválidos y filas de `evaluaciones`."""
+    records = patients(6, seed=13)
+    records[0]["estado_nutricional"] = "Riesgo de desnutrición"
+    lines = [
+        json.dumps(records[0], ensure_ascii=False),
+        json.dumps({k: v for k, v in records[1].items() if k != "sexo"}, ensure_ascii=False),
+        "{no es json",
+        # Fila exportada con datos_paciente como texto JSON (columna jsonb serializada)
+        json.dumps(
+            {"id": "e-3", "prediccion": "Leve", "datos_paciente": json.dumps(records[3])},
+            ensure_ascii=False,
+        ),
+        json.dumps({"id": "e-4", "prediccion": "Severa", "datos_paciente": records[4]}),
+        "",
+        json.dumps(records[5], ensure_ascii=False),
+    ]
+    return records, ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def ndjson_lines(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def check_cohort(client, records: list[dict], items: list[dict]):
+    *results, summary = items
+    assert summary == {
+        "resumen": {"total": 6, "exitosos": 4, "fallidos": 2, "version": "v3"}
+    }
+    assert [item["indice"] for item in results] == list(range(6))
+    assert [e["loc"] for e in results[1]["errores"]] == [["sexo"]]
+    assert results[2]["errores"][0]["type"] == "parse_error"
+    assert (results[3]["id"], results[3]["prediccion_anterior"]) == ("e-3", "Leve")
+    assert (results[4]["id"], results[4]["prediccion_anterior"]) == ("e-4", "Severa")
+    for i in (0, 3, 4, 5):
+        assert results[i]["resultado"]["probabilidades"] == pytest.approx(
+            probabilities(client, records[i])
+        )
+
+
+def test_ndjson_order_errors_and_summary(small_chunks):
+    records, body = cohort()
+    response = small_chunks.post("/api/predict/stream", content=body, headers=NDJSON)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    check_cohort(small_chunks, records, ndjson_lines(response.text))
+
+
+def to_csv(records: list[dict], fields: list[str]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for data in records:
+        writer.writerow(["" if data.get(f) is None else data[f] for f in fields])
+    return buffer.getvalue()
+
+
+def test_csv_input_and_output(small_chunks):
+    records = patients(3, seed=14)
+    records[1]["hallazgo_examen_fisico"] = 'Lesión "en diana",\nmultilínea'
+    fields = list(records[0])
+    body = to_csv(records, fields) + "1,2,3\n"
+
+    # Entrada CSV detectada por el contenido, salida CSV
+    response = small_chunks.post("/api/predict/stream?formato=csv", content=body.encode())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header == CSV_COLUMNS
+    rows = [dict(zip(header, row)) for row in rows]
+    assert [row["indice"] for row in rows] == ["0", "1", "2", "3"]
+    # El campo entre comillas con salto de línea se lee como un solo registro
+    assert "Lesión \"en diana\",\nmultilínea" in rows[1]["factores"]
+    for row, data in zip(rows, records):
+        expected = probabilities(small_chunks, data)
+        assert float(row["severa"]) == pytest.approx(expected["severa"])
+        assert row["errores"] == ""
+    assert "columnas" in json.loads(rows[3]["errores"])[0]["msg"]
+
+
+def test_csv_without_header_is_an_input_error(client):
+    response = client.post(
+        "/api/predict/stream", content=b"", headers={"Content-Type": "text/csv"}
+    )
+    # El error corta el stream: no hay línea de resumen
+    assert ndjson_lines(response.text) == [
+        {"indice": -1, "errores": [{"type": "input_error", "msg": "CSV sin encabezado"}]}
+    ]
+
+
+def stream_in_chunks(client, path: str, body: bytes, size: int, headers: dict) -> tuple:
+    """Envía `body` a la app ASGI en fragmentos de `size` bytes; (status, cuerpo).
+
+    TestClient entrega el cuerpo en un solo mensaje; aquí cada fragmento es
+    un `http.request` con more_body, como en un upload real.
+    """
+    parts = [body[i:i + size] for i in range(0, len(body), size)]
+    messages = [{"type": "http.request", "body": p, "more_body": True} for p in parts]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [
+            (k.lower().encode(), v.encode())
+            for k, v in {**client.headers, **headers}.items()
+        ],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    sent: list[dict] = []
+    received = []
+
+    async def receive():
+        if messages:
+            message = messages.pop(0)
+            received.append(message)
+            return message
+        await asyncio.Event().wait()  # sin desconexión: la respuesta no la espera
+
+    async def send(message):
+        sent.append(message)
+
+    client.portal.call(client.app, scope, receive, send)
+    assert not messages, "la app no leyó todo el cuerpo"
+    assert len(received) == len(parts) + 1
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    return status, b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+
+
+def test_body_streamed_over_several_chunks(small_chunks):
+    records, body = cohort()
+    # 7 bytes: corta líneas y caracteres UTF-8 de varios bytes ("desnutrición")
+    status, output = stream_in_chunks(small_chunks, "/api/predict/stream", body, 7, NDJSON)
+    assert status == 200
+    check_cohort(small_chunks, records, ndjson_lines(output.decode()))
+
+
+def test_iter_lines_and_records_across_fragments():
+    async def collect(chunks, fmt):
+        async def source():
+            for chunk in chunks:
+                yield chunk
+
+        return [r async for r in iter_records(iter_lines(source(), 1000), fmt)]
+
+    text = 'a,b\n1,"x\r\ny"\n2,ñ\n3,"sin cerrar\n'.encode()
+    fragments = [text[i:i + 3] for i in range(0, len(text), 3)]
+    records = asyncio.run(collect(fragments, "csv"))
+    assert [r[0] for r in records[:2]] == [{"a": "1", "b": "x\ny"}, {"a": "2", "b": "ñ"}]
+    assert records[2][2][0]["msg"] == "comillas sin cerrar al final del CSV"
@@ -0,0 +1,96 @@
+"""Bundle de arranque rápido: paridad con los pickles y detección de origen cambiado."""
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.services.bundle import BundleError, bundle_dir, export_service, source_info
+from app.services.ml_service import MLService
+from app.tools import export_bundle
+from app.tools.export_bundle import export_version
+from benchmarks.standin import patients
+
+
+@pytest.fixture
+def exported(standin_service, standin_artifacts, tmp_path):
+    """Copia del pickle de origen y bundle exportado a partir de ella."""
+    pipeline_path = tmp_path / "pipeline_completo_v3.pkl"
+    shutil.copyfile(standin_artifacts["pipeline_path"], pipeline_path)
+    bundle_path = tmp_path / "bundle_v3"
+    export_service(standin_service, str(bundle_path), source=source_info(str(pipeline_path)))
+    return str(bundle_path), pipeline_path
+
+
+def load(bundle_path: str, pipeline_path="") -> MLService:
+    service = MLService("v3")
+    service.load_bundle(bundle_path, pipeline_path=str(pipeline_path))
+    return service
+
+
+def test_bundle_predicts_like_pickles(standin_service, exported):
+    service = load(*exported)
+    assert service.source == "bundle" and service.fallbacks == {}
+    records = patients(50, seed=11)
+    for ours, theirs in zip(service.predict_batch(records), standin_service.predict_batch(records)):
+        assert ours == theirs
+
+
+def test_retrained_pickle_of_same_size_is_detected(exported):
+    bundle_path, pipeline_path = exported
+    data = bytearray(pipeline_path.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    pipeline_path.write_bytes(bytes(data))
+    with pytest.raises(BundleError, match="desactualizado"):
+        load(bundle_path, pipeline_path)
+
+
+def test_resized_pickle_is_detected(exported):
+    bundle_path, pipeline_path = exported
+    with open(pipeline_path, "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(BundleError, match="desactualizado"):
+        load(bundle_path, pipeline_path)
+
+
+def test_missing_pickle_is_not_checked(exported):
+    bundle_path, pipeline_path = exported
+    pipeline_path.unlink()
+    assert load(bundle_path, pipeline_path).is_loaded
+
+
+def test_corrupted_array_is_rejected(exported):
+    bundle_path, _ = exported
+    target = Path(bundle_path) / "forest.value.npy"
+    np.save(target, np.load(target) + 1)
+    with pytest.raises(BundleError, match="checksum"):
+        load(bundle_path)
+
+
+@pytest.fixture
+def artifacts_copy(standin_artifacts, tmp_path) -> Path:
+    for key in ("pipeline_path", "metadata_path", "features_path"):
+        shutil.copy(standin_artifacts[key], tmp_path)
+    return tmp_path
+
+
+def test_export_publishes_a_verified_bundle(artifacts_copy):
+    target = export_version("v3", str(artifacts_copy))
+    assert target == bundle_dir(artifacts_copy, "v3")
+    assert load(str(target), artifacts_copy / "pipeline_completo_v3.pkl").is_loaded
+    assert [p.name for p in artifacts_copy.iterdir() if p.is_dir()] == ["bundle_v3"]
+
+
+def test_failed_export_keeps_the_previous_bundle(artifacts_copy, monkeypatch):
+    target = export_version("v3", str(artifacts_copy))
+    manifest = (target / "manifest.json").read_bytes()
+
+    def mismatch(service, path, pipeline_path):
+        raise RuntimeError("las probabilidades del bundle difieren del pickle")
+
+    monkeypatch.setattr(export_bundle, "verify_bundle", mismatch)
+    with pytest.raises(RuntimeError, match="difieren"):
+        export_version("v3", str(artifacts_copy))
+    assert (target / "manifest.json").read_bytes() == manifest
+    assert [p.name for p in artifacts_copy.iterdir() if p.is_dir()] == ["bundle_v3"]
+    assert export_bundle.main(["v3", "--artifacts-dir", str(artifacts_copy)]) == 1
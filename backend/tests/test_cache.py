@@ -0,0 +1,110 @@
+"""Caché de predicciones: LRU + TTL, clave canónica e invalidación al recargar."""
+import asyncio
+import math
+import types
+
+import pytest
+
+from app.services import cache as cache_module
+from app.services.cache import PredictionCache
+from app.services.ml_service import MLService
+from app.services.registry import ModelRegistry, ModelSpec
+from benchmarks.standin import patients
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj monotónico de la caché controlado por la prueba."""
+    fake = types.SimpleNamespace(now=100.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(cache_module, "time", fake)
+    return fake
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(maxsize=10, ttl=30)
+    cache.put("a", 1)
+    clock.now += 29.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (1, 1, 1, 0)
+
+
+def test_lru_eviction_and_disabled_cache(clock):
+    cache = PredictionCache(maxsize=2, ttl=30)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # 'b' pasa a ser la menos usada
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+    cache.configure(0, 30)
+    assert not cache.enabled and cache.stats()["size"] == 0
+
+
+@pytest.fixture
+def service(standin_artifacts) -> MLService:
+    """Instancia propia (las pruebas la recargan)."""
+    service = MLService("v3")
+    service.load(
+        standin_artifacts["pipeline_path"],
+        standin_artifacts["metadata_path"],
+        standin_artifacts["features_path"],
+    )
+    return service
+
+
+def test_nan_and_none_share_a_key(service):
+    data = patients(1, seed=5, missing_rate=0.0)[0]
+    with_none = {**data, "pcr": None, "glasgow": 14}
+    with_nan = {**data, "pcr": math.nan, "glasgow": 14.0}
+    assert service._cache_key(with_none) == service._cache_key(with_nan)
+    assert service._cache_key(with_none) != service._cache_key({**data, "glasgow": 14})
+
+    service.predict_batch([with_none])
+    hits = service.cache.stats()["hits"]
+    service.predict_batch([with_nan])
+    assert service.cache.stats()["hits"] == hits + 1
+
+
+def test_reload_bumps_model_version_and_clears(service, standin_artifacts):
+    records = patients(4, seed=6)
+    service.predict_batch(records)
+    before = service.model_version
+    assert service.cache.stats()["size"] == 4
+    keys = [service._cache_key(data) for data in records]
+
+    service.load(
+        standin_artifacts["pipeline_path"],
+        standin_artifacts["metadata_path"],
+        standin_artifacts["features_path"],
+    )
+    assert service.model_version != before
+    assert service.model_version.startswith("v3:")
+    assert service.cache.stats()["size"] == 0
+    # Las claves incluyen la versión: nada del modelo anterior coincide
+    assert all(key[0] == before for key in keys)
+    assert service._cache_key(records[0])[0] == service.model_version
+
+
+def test_registry_reload_publishes_a_fresh_cache(standin_artifacts):
+    registry = ModelRegistry()
+    spec = ModelSpec(
+        "v3",
+        standin_artifacts["pipeline_path"],
+        standin_artifacts["metadata_path"],
+        standin_artifacts["features_path"],
+    )
+    old = registry.load(spec, default=True)
+    records = patients(3, seed=7)
+    old.predict_batch(records)
+
+    assert asyncio.run(registry.reload(spec))
+    new = registry.get("v3")
+    assert new is not old and new.model_version != old.model_version
+    misses = new.cache.stats()["misses"]
+    new.predict_batch(records)
+    assert new.cache.stats()["misses"] == misses + 3
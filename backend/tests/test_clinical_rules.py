@@ -0,0 +1,187 @@
+"""Reglas clínicas declarativas: equivalencia con la cadena de if original y validación."""
+import math
+
+import pytest
+
+from app.services.clinical_rules import DEFAULT_RULES, ClinicalRules, RuleError
+from benchmarks.standin import patients
+
+
+def identify_factors(data: dict) -> list:
+    """MLService._identify_factors anterior a la tabla de reglas (referencia)."""
+    factors = []
+
+    glasgow = data.get("glasgow", 15)
+    if glasgow is not None and glasgow < 13:
+        factors.append(f"Glasgow alterado ({glasgow})")
+
+    plaquetas = data.get("plaquetas")
+    if plaquetas is not None:
+        if plaquetas < 150000:
+            factors.append(f"Trombocitopenia ({plaquetas:,.0f} cel/mm³)")
+        elif plaquetas > 400000:
+            factors.append(f"Trombocitosis ({plaquetas:,.0f} cel/mm³)")
+
+    albumina = data.get("albumina")
+    if albumina is not None and albumina < 3.5:
+        factors.append(f"Hipoalbuminemia ({albumina} g/dl)")
+
+    cayados = data.get("cayados")
+    if cayados is not None and cayados > 500:
+        factors.append(f"Cayados elevados ({cayados:,.0f} cel/mm³)")
+
+    globulina = data.get("globulina")
+    if globulina is not None and globulina > 4.0:
+        factors.append(f"Globulina elevada ({globulina} g/dl)")
+
+    procalcitonina = data.get("procalcitonina")
+    if procalcitonina is not None and procalcitonina > 0.5:
+        factors.append(f"Procalcitonina elevada ({procalcitonina} ng/mL)")
+
+    leucocitos = data.get("leucocitos")
+    if leucocitos is not None:
+        if leucocitos < 4000:
+            factors.append(f"Leucopenia ({leucocitos:,.0f} cel/mm³)")
+        elif leucocitos > 15000:
+            factors.append(f"Leucocitosis ({leucocitos:,.0f} cel/mm³)")
+
+    pcr = data.get("pcr")
+    if pcr is not None and pcr > 10:
+        factors.append(f"PCR elevada ({pcr} mg/dL)")
+
+    hallazgo = data.get("hallazgo_examen_fisico", "Ninguno")
+    if hallazgo and hallazgo not in ("Ninguno", ""):
+        factors.append(f"Hallazgo al examen físico: {hallazgo}")
+
+    tiempo = data.get("tiempo_fiebre", 0)
+    if tiempo > 5:
+        factors.append(f"Fiebre prolongada ({tiempo} días)")
+
+    vacunacion = data.get("vacunacion", "")
+    if vacunacion == "Incompleto":
+        factors.append("Esquema de vacunación incompleto")
+
+    estado_nut = data.get("estado_nutricional", "")
+    if estado_nut == "Riesgo de desnutrición":
+        factors.append("Desnutrición")
+
+    if not factors:
+        factors.append("Parámetros clínicos dentro de rangos esperados")
+    return factors
+
+
+# Umbral, a cada lado, faltante (None y NaN) y valores enteros / con decimales
+EDGES = {
+    "glasgow": [3, 12, 13, 15],
+    "tiempo_fiebre": [0, 5, 6, 60],
+    "plaquetas": [None, math.nan, 0.0, 149999.5, 150000, 150000.0, 400000, 400000.01, 1e6],
+    "albumina": [None, math.nan, 3.49, 3.5, 3.51],
+    "cayados": [None, math.nan, 500, 500.4, 500.6],
+    "globulina": [None, math.nan, 4.0, 4.01],
+    "procalcitonina": [None, math.nan, 0.5, 0.5000001, 12.25],
+    "leucocitos": [None, math.nan, 3999.9, 4000, 15000, 15000.5],
+    "pcr": [None, math.nan, 10, 10.0, 10.5],
+    "hallazgo_examen_fisico": ["Ninguno", "", "Taquipnea", "Petequias", "Categoría no vista"],
+    "vacunacion": ["Completo", "Incompleto", "incompleto"],
+    "estado_nutricional": ["Normal", "Riesgo de desnutrición", "Desnutrición", "Obesidad"],
+}
+
+
+def edge_records() -> list[dict]:
+    """Pacientes sintéticos y, sobre ellos, cada valor límite combinado con los demás."""
+    base = patients(200, seed=21, missing_rate=0.3, rare_rate=0.1, unknown_rate=0.05)
+    records = base[:100]
+    for i, data in enumerate(base[100:]):
+        record = dict(data)
+        for j, (field, values) in enumerate(EDGES.items()):
+            record[field] = values[(i + j) % len(values)]
+        records.append(record)
+    # Todas las reglas a la vez y ninguna
+    records.append({field: values[-1] for field, values in EDGES.items()})
+    records.append({"glasgow": 15, "tiempo_fiebre": 1})
+    return records
+
+
+@pytest.fixture(scope="module")
+def rules() -> ClinicalRules:
+    return ClinicalRules.compile(DEFAULT_RULES)
+
+
+def test_batch_matches_if_chain(rules):
+    records = edge_records()
+    assert rules.evaluate(records) == [identify_factors(data) for data in records]
+
+
+def test_single_record_matches_if_chain(rules):
+    for data in edge_records():
+        assert rules.evaluate([data]) == [identify_factors(data)]
+
+
+def test_every_edge_value_is_exercised(rules):
+    records = edge_records()
+    seen = {field: {repr(r.get(field)) for r in records} for field in EDGES}
+    assert all(seen[field] >= {repr(v) for v in values} for field, values in EDGES.items())
+    # Cada regla se activa y no se activa en algún registro
+    masks = rules.masks(records)
+    assert masks.any(axis=1).all() and (~masks).any(axis=1).all()
+
+
+def test_empty_and_metadata_table():
+    table = {
+        "version": "prueba",
+        "sin_factores": "Nada",
+        "reglas": [
+            {"campo": "sexo", "op": "in", "valor": ["Masculino"], "mensaje": "Sexo {valor}"},
+            {"campo": "glasgow", "op": "<=", "valor": 8, "mensaje": "Glasgow grave"},
+        ],
+    }
+    rules = ClinicalRules.from_metadata({"reglas_clinicas": table})
+    assert rules.version == "prueba"
+    records = [{"sexo": "Masculino", "glasgow": 8}, {"sexo": None, "glasgow": None}]
+    assert rules.evaluate(records) == [["Sexo Masculino", "Glasgow grave"], ["Nada"]]
+    assert rules.evaluate([]) == []
+    assert ClinicalRules.from_metadata({}).version == DEFAULT_RULES["version"]
+
+
+def rule(**entry) -> dict:
+    return {"reglas": [{"campo": "glasgow", "op": "<", "valor": 13, "mensaje": "m", **entry}]}
+
+
+@pytest.mark.parametrize(
+    "table, message",
+    [
+        (rule(campo="triage"), "campo desconocido"),
+        (rule(op="~"), "operador desconocido"),
+        # Operador de otro tipo de campo, o umbral del tipo equivocado
+        (rule(campo="sexo", op="<", valor=1), "requiere campo y umbral numéricos"),
+        (rule(op=">", valor="13"), "requiere campo y umbral numéricos"),
+        (rule(op=">", valor=True), "requiere campo y umbral numéricos"),
+        (rule(op="==", valor="13"), "valor inválido"),
+        (rule(campo="sexo", op="in", valor="Masculino"), "valor inválido"),
+        (rule(campo="sexo", op="==", valor=["Masculino"]), "valor inválido"),
+        # Plantillas que no se pueden formatear
+        (rule(mensaje="Glasgow {otro}"), "mensaje inválido"),
+        (rule(mensaje="Glasgow {0}"), "mensaje inválido"),
+        (rule(mensaje="Glasgow {valor:%}x{"), "mensaje inválido"),
+        (rule(campo="sexo", op="==", valor="M", mensaje="{valor:,.0f}"), "mensaje inválido"),
+        ({"reglas": [{"campo": "glasgow", "op": "<"}]}, "regla incompleta"),
+        ({"version": "sin reglas"}, "lista 'reglas'"),
+    ],
+)
+def test_invalid_tables_are_rejected(table, message):
+    with pytest.raises(RuleError, match=message):
+        ClinicalRules.compile(table)
+
+
+def test_invalid_metadata_table_fails_loading():
+    with pytest.raises(RuleError):
+        ClinicalRules.from_metadata({"reglas_clinicas": rule(campo="triage")})
+
+
+def test_order_follows_the_table(rules):
+    data = {"glasgow": 10, "plaquetas": 100000, "pcr": 50, "vacunacion": "Incompleto",
+            "tiempo_fiebre": 7}
+    expected = ["Glasgow alterado (10)", "Trombocitopenia (100,000 cel/mm³)", "PCR elevada (50 mg/dL)",
+                "Fiebre prolongada (7 días)", "Esquema de vacunación incompleto"]
+    for records in ([data], [data, data]):
+        assert rules.evaluate(records) == [expected] * len(records)
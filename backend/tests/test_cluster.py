@@ -0,0 +1,182 @@
+"""Estado compartido entre workers pre-fork: métricas, deriva, recargas y reinicios."""
+import json
+import os
+import socket
+
+import pytest
+
+from app.server import Supervisor
+from app.services.cluster import cluster
+from app.services.drift import DriftMonitor, DriftReference
+from app.services.metrics import MetricsRegistry
+
+# pid que no corresponde a este proceso: un worker ya terminado
+OTHER_PID = 999_999
+
+
+@pytest.fixture
+def shared(tmp_path):
+    cluster.configure(str(tmp_path), "1")
+    yield tmp_path
+    cluster.__init__()
+
+
+def as_other_worker(kind: str, suffix: str):
+    """Renombra el snapshot de este proceso como si lo hubiera publicado otro."""
+    os.replace(cluster.path(kind, suffix), cluster.path(kind, suffix, OTHER_PID))
+
+
+def registry() -> tuple:
+    metrics = MetricsRegistry()
+    counter = metrics.counter("solicitudes_total", "Solicitudes.", ("route",))
+    histogram = metrics.histogram("latencia_seconds", "Latencia.", (), buckets=(0.1, 1.0))
+    metrics.gauge("en_cola", "En cola.", (), lambda: [((), 3)])
+    return metrics, counter, histogram
+
+
+def sample(text: str, series: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{series} no está en la exposición")
+
+
+def test_metrics_combine_workers(shared):
+    other, other_counter, other_histogram = registry()
+    other_counter.inc("/api/predict", amount=5)
+    other_histogram.observe(0.05)
+    other.publish()
+    as_other_worker("metrics", "json")
+
+    metrics, counter, histogram = registry()
+    counter.inc("/api/predict", amount=2)
+    counter.inc("/api/health")
+    histogram.observe(0.5)
+    text = metrics.render()
+
+    assert sample(text, 'solicitudes_total{route="/api/predict"}') == 7
+    assert sample(text, 'solicitudes_total{route="/api/health"}') == 1
+    assert sample(text, 'latencia_seconds_bucket{le="0.1"}') == 1
+    assert sample(text, 'latencia_seconds_bucket{le="1"}') == 2
+    assert sample(text, "latencia_seconds_count") == 2
+    # Los gauges son del worker que responde
+    assert sample(text, 'en_cola{worker="1"}') == 3
+
+
+def test_counters_survive_a_terminated_worker(shared):
+    """El snapshot de un worker terminado se conserva: el total no retrocede."""
+    other, other_counter, _ = registry()
+    other_counter.inc("/api/predict", amount=4)
+    other.publish()
+    as_other_worker("metrics", "json")
+
+    metrics, counter, _ = registry()
+    first = sample(metrics.render(), 'solicitudes_total{route="/api/predict"}')
+    counter.inc("/api/predict")
+    second = sample(metrics.render(), 'solicitudes_total{route="/api/predict"}')
+    assert (first, second) == (4, 5)
+
+
+def test_single_process_render_is_unchanged():
+    metrics, counter, _ = registry()
+    counter.inc("/api/predict")
+    text = metrics.render()
+    assert 'en_cola 3' in text and "worker=" not in text
+    assert sample(text, 'solicitudes_total{route="/api/predict"}') == 1
+
+
+def drift_reference() -> DriftReference:
+    return DriftReference(
+        numeric={"temperatura": {"media": 38.5, "desviacion": 0.5, "faltantes": 0.0}},
+        categorical={"sexo": {"M": 0.5, "F": 0.5}},
+        classes={"leve": 0.5, "grave": 0.5},
+        source="prueba",
+    )
+
+
+def drift_monitor() -> DriftMonitor:
+    monitor = DriftMonitor()
+    monitor.configure(windows="1h", bucket_seconds=60, min_samples=1)
+    monitor.register("v3", drift_reference())
+    return monitor
+
+
+def observe(monitor: DriftMonitor, temperatures: list, sexo: str):
+    records = [{"temperatura": t, "sexo": sexo} for t in temperatures]
+    monitor.observe("v3", records, [{"codigo": 0} for _ in records])
+
+
+def test_drift_report_combines_workers(shared):
+    other = drift_monitor()
+    observe(other, [39.0, 40.0], "X")
+    other.publish()
+    as_other_worker("drift", "npz")
+
+    monitor = drift_monitor()
+    observe(monitor, [37.0, 38.0], "M")
+    monitor.publish()
+    window = monitor.report("v3")["ventanas"]["1h"]
+
+    assert window["n"] == 4
+    stats = window["numericas"]["temperatura"]
+    assert stats["media"] == pytest.approx(38.5)
+    assert stats["desviacion"] == pytest.approx(1.2910, abs=1e-4)
+    assert window["categoricas"]["sexo"]["no_vistas"] == 0.5
+    assert monitor.report("v3")["no_vistas"] == {"sexo": [{"valor": "X", "n": 2}]}
+
+
+def test_drift_snapshot_with_other_layout_is_ignored(shared):
+    other = DriftMonitor()
+    other.configure(windows="1h", bucket_seconds=60)
+    reference = drift_reference()
+    reference.categorical["sexo"]["Otro"] = None
+    other.register("v3", reference)
+    observe(other, [39.0], "M")
+    other.publish()
+    as_other_worker("drift", "npz")
+
+    monitor = drift_monitor()
+    observe(monitor, [37.0], "M")
+    assert monitor.report("v3")["ventanas"]["1h"]["n"] == 1
+
+
+def write_orders(directory, *orders):
+    with open(directory / "reloads.jsonl", "a", encoding="utf-8") as f:
+        for order in orders:
+            f.write(json.dumps(order) + "\n")
+
+
+def test_pending_reloads_are_read_once(shared):
+    write_orders(
+        shared,
+        {"version": "v3", "default": False, "pid": OTHER_PID},
+        {"version": "v4", "default": True, "pid": OTHER_PID},
+        {"version": "v3", "default": True, "pid": OTHER_PID},
+        {"version": "v5", "default": False, "pid": os.getpid()},
+    )
+    # De v3 queda la última orden, después de v4; las propias no se repiten
+    assert [(o["version"], o["default"]) for o in cluster.pending_reloads()] == [
+        ("v4", True),
+        ("v3", True),
+    ]
+    assert cluster.pending_reloads() == []
+
+    # Una línea a medio escribir se lee cuando se completa
+    with open(shared / "reloads.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"version": "v6", "default": false,')
+    assert cluster.pending_reloads() == []
+    with open(shared / "reloads.jsonl", "a", encoding="utf-8") as f:
+        f.write(f' "pid": {OTHER_PID}}}\n')
+    assert [o["version"] for o in cluster.pending_reloads()] == ["v6"]
+
+
+def test_restart_backoff():
+    with socket.socket() as sock:
+        supervisor = Supervisor(sock, 2, 0, 1.0, max_backoff=8.0, backoff_reset=60.0)
+    delays = [supervisor.restart_delay(1, uptime=0.5) for _ in range(6)]
+    assert delays == [0.0, 1.0, 2.0, 4.0, 8.0, 8.0]
+    # Otro worker lleva su propia cuenta
+    assert supervisor.restart_delay(2, uptime=0.5) == 0.0
+    # Tras funcionar un buen rato, se reinicia de inmediato otra vez
+    assert supervisor.restart_delay(1, uptime=120.0) == 0.0
+    assert supervisor.restart_delay(1, uptime=0.5) == 1.0
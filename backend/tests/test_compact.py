@@ -0,0 +1,80 @@
+"""tools/compact.py: versión aparte, publicación atómica y resumen en /api/model/info."""
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.bundle import bundle_dir
+from app.services.ml_service import MLService
+from app.services.registry import ModelSpec, model_registry
+from app.tools import compact
+from benchmarks.standin import patients
+
+
+@pytest.fixture
+def artifacts(standin_artifacts, standin_service, tmp_path):
+    """Copia de los artefactos y un conjunto de referencia con clase."""
+    for key in ("pipeline_path", "metadata_path", "features_path"):
+        shutil.copy(standin_artifacts[key], tmp_path)
+    records = patients(300, seed=11)
+    probabilities = standin_service._apply_pipeline(records)[1]
+    table = pd.DataFrame(records).assign(Severidad_Ordinal=probabilities.argmax(axis=1))
+    table.to_csv(tmp_path / "referencia.csv", index=False)
+    return tmp_path
+
+
+def run(artifacts, *options) -> int:
+    return compact.main(
+        ["v3", str(artifacts / "referencia.csv"), "--target", "Severidad_Ordinal",
+         "--artifacts-dir", str(artifacts), "--min-agreement", "0.9", "--max-f1-drop", "0.2",
+         "--max-recall-drop", "1", "--max-sev-leve-increase", "100", *options]
+    )
+
+
+def test_writes_a_separate_version(artifacts):
+    assert run(artifacts) == 0
+    # El bundle servido de v3 no se toca; la versión compactada tiene el suyo
+    assert not bundle_dir(artifacts, "v3").exists()
+    target = bundle_dir(artifacts, "v3-compacto")
+    assert (target / "manifest.json").is_file()
+    assert sorted(p.name for p in artifacts.iterdir() if p.is_dir()) == ["bundle_v3-compacto"]
+
+    spec = ModelSpec.from_artifacts_dir("v3-compacto", str(artifacts))
+    service = MLService(version=spec.version)
+    service.load_bundle(spec.bundle_path, pipeline_path=spec.pipeline_path)
+    assert service.compaction["de_version"] == "v3"
+    assert service.compaction["compactado"]["arboles"] <= service.compaction["original"]["arboles"]
+
+
+def test_failed_round_trip_keeps_the_previous_bundle(artifacts, monkeypatch):
+    assert run(artifacts) == 0
+    target = bundle_dir(artifacts, "v3-compacto")
+    manifest = (target / "manifest.json").read_bytes()
+
+    calls = []
+    monkeypatch.setattr(compact, "verify_bundle", lambda *args: calls.append(args) and False)
+    # Otro presupuesto: un manifest distinto si llegara a publicarse
+    assert run(artifacts, "--min-agreement", "0.91") == 1
+    assert len(calls) == 1
+    assert (target / "manifest.json").read_bytes() == manifest
+    assert not target.with_name(target.name + ".compact").exists()
+
+
+def test_same_version_must_be_explicit(artifacts):
+    assert run(artifacts, "--as-version", "v3") == 0
+    assert (bundle_dir(artifacts, "v3") / "manifest.json").is_file()
+
+
+def test_model_info_reports_compaction(artifacts, client, monkeypatch):
+    assert run(artifacts) == 0
+    service = MLService(version="v3")
+    service.load_bundle(str(bundle_dir(artifacts, "v3-compacto")))
+    monkeypatch.setattr(model_registry, "get", lambda version=None: service)
+
+    info = client.get("/api/model/info").json()
+    assert info["fuente"] == "bundle"
+    summary = info["compactacion"]
+    assert summary["de_version"] == "v3" and summary["referencia"] == "referencia.csv"
+    assert set(summary["original"]) >= {"arboles", "nodos", "concordancia", "f1_macro"}
+    assert np.isclose(summary["original"]["concordancia"], 1.0)
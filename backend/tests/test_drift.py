@@ -0,0 +1,179 @@
+"""Monitor de deriva: referencia, alertas PSI/SMD, ventanas y cola acotada."""
+import json
+import time
+import types
+
+import pytest
+
+from app.services import drift
+from app.services.drift import DriftMonitor, DriftReference
+from app.services.registry import ModelRegistry, ModelSpec
+from benchmarks.standin import patients
+
+T0 = 1_800_000_000.0  # inicio de un bucket de 60 s
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj del monitor controlado por la prueba: clock.now = epoch s."""
+    fake = types.SimpleNamespace(now=T0, strftime=time.strftime, gmtime=time.gmtime)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(drift, "time", fake)
+    return fake
+
+
+def reference() -> DriftReference:
+    return DriftReference(
+        numeric={"temperatura": {"n": 100, "media": 38.5, "desviacion": 0.5, "faltantes": 0.0}},
+        categorical={"sexo": {"M": 0.5, "F": 0.5}},
+        classes={"leve": 0.6, "moderada": 0.3, "severa": 0.1},
+        source="prueba",
+        n=100,
+    )
+
+
+def monitor(**options) -> DriftMonitor:
+    options = {"windows": "1m,5m", "bucket_seconds": 60, "min_samples": 10, **options}
+    m = DriftMonitor()
+    m.configure(**options)
+    m.register("v3", reference())
+    return m
+
+
+def observe(m: DriftMonitor, n: int, temperatura=38.5, sexo=None, codigo: int = 0):
+    """n registros; sexo alterna M/F salvo que se fije."""
+    records = [
+        {"temperatura": temperatura, "sexo": sexo or ("M", "F")[i % 2]} for i in range(n)
+    ]
+    m.observe("v3", records, [{"codigo": codigo} for _ in records])
+
+
+def window(m: DriftMonitor, name: str = "1m") -> dict:
+    return m.report("v3")["ventanas"][name]
+
+
+def test_balanced_traffic_has_no_alerts(clock):
+    m = monitor()
+    observe(m, 40, codigo=0)
+    result = window(m)
+    assert result["n"] == 40 and result["suficiente"]
+    assert result["categoricas"]["sexo"]["psi"] == pytest.approx(0.0, abs=1e-9)
+    assert result["numericas"]["temperatura"]["diferencia_estandarizada"] == 0.0
+    # Solo la mezcla de clases se aleja (todas leves)
+    assert result["alertas"] == ["clases"]
+
+
+def test_psi_alert_on_categorical_shift(clock):
+    m = monitor()
+    observe(m, 40, sexo="M")
+    sexo = window(m)["categoricas"]["sexo"]
+    # PSI(M=1, F≈0 | 0.5/0.5) = 0.5·ln2 + (1e-4 − 0.5)·ln(1e-4/0.5)
+    assert sexo["psi"] == pytest.approx(4.6038, abs=1e-3)
+    assert sexo["alerta"] and "sexo" in window(m)["alertas"]
+
+
+def test_smd_alert_and_min_samples(clock):
+    m = monitor()
+    observe(m, 5, temperatura=40.0)
+    # Por debajo de min_samples: se reporta, sin alerta
+    stats = window(m)["numericas"]["temperatura"]
+    assert stats["diferencia_estandarizada"] == pytest.approx(3.0)
+    assert not stats["alerta"] and not window(m)["suficiente"]
+
+    observe(m, 5, temperatura=40.0)
+    stats = window(m)["numericas"]["temperatura"]
+    assert stats["alerta"] and "temperatura" in window(m)["alertas"]
+    assert stats["media"] == 40.0 and stats["desviacion"] == 0.0
+
+
+def test_missing_rate_alert(clock):
+    m = monitor()
+    observe(m, 10, temperatura=None)
+    stats = window(m)["numericas"]["temperatura"]
+    assert stats["faltantes"] == 1.0 and stats["n"] == 0 and stats["alerta"]
+
+
+def test_windows_expire(clock):
+    m = monitor()
+    observe(m, 20, sexo="X")
+    clock.now = T0 + 120
+    observe(m, 10, sexo="Y")
+
+    report = m.report("v3")
+    assert report["ventanas"]["1m"]["n"] == 10
+    assert report["ventanas"]["5m"]["n"] == 30
+    # No vistas por ventana: la de 1 minuto ya no incluye 'X'
+    assert report["ventanas"]["1m"]["categoricas"]["sexo"]["valores_no_vistos"] == [
+        {"valor": "Y", "n": 10}
+    ]
+    assert report["no_vistas"] == {"sexo": [{"valor": "X", "n": 20}, {"valor": "Y", "n": 10}]}
+
+    clock.now = T0 + 600
+    report = m.report("v3")
+    assert [w["n"] for w in report["ventanas"].values()] == [0, 0]
+    assert report["no_vistas"] == {}
+
+
+def test_reused_bucket_forgets_unseen_values(clock):
+    m = monitor(windows="1m", bucket_seconds=60)  # anillo de 2 buckets
+    observe(m, 5, sexo="X")
+    m.fold()
+    clock.now = T0 + 120  # mismo bucket del anillo, otro período
+    observe(m, 5, sexo="Y")
+    assert m.report("v3")["no_vistas"] == {"sexo": [{"valor": "Y", "n": 5}]}
+
+
+def test_pending_is_bounded_by_records(clock):
+    m = monitor(max_pending=10)
+    dropped = drift.drift_dropped.collect().get((), 0.0)
+    observe(m, 6)
+    observe(m, 6)  # no cabe: 12 registros > 10
+    observe(m, 4)
+    assert m.stats()["pending"] == 10
+    assert drift.drift_dropped.collect().get((), 0.0) == dropped + 6
+
+    m.fold()
+    assert m.stats()["pending"] == 0 and window(m)["n"] == 10
+    # Con la cola de un hijo del ejecutor rige el mismo límite
+    entries = [(clock.now, "v3", [{"temperatura": 38.0}] * 8, [0] * 8)] * 2
+    m.merge(entries)
+    assert m.stats()["pending"] == 8
+
+
+def test_reference_falls_back_to_the_model(standin_service, tmp_path, caplog):
+    registry = ModelRegistry()
+    spec = ModelSpec("v3", "", "", "", reference_path=str(tmp_path / "reference_stats_v3.json"))
+    fallback = registry._drift_reference(spec, standin_service)
+    assert fallback.source == "modelo"
+    assert set(fallback.numeric) == {
+        "tiempo_fiebre", "glasgow", "cayados", "plaquetas", "albumina", "globulina",
+        "procalcitonina", "leucocitos", "pcr",
+    }
+    # Sin proporciones: las alertas categóricas usan la tasa de no vistas
+    assert all(p is None for freqs in fallback.categorical.values() for p in freqs.values())
+
+    (tmp_path / "reference_stats_v3.json").write_text("{no es json", encoding="utf-8")
+    assert registry._drift_reference(spec, standin_service).source == "modelo"
+    assert "inválida" in caplog.text
+
+    (tmp_path / "reference_stats_v3.json").write_text(
+        json.dumps(reference().to_dict()), encoding="utf-8"
+    )
+    loaded = registry._drift_reference(spec, standin_service)
+    assert loaded.source == "reference_stats_v3.json" and loaded.layout == reference().layout
+
+
+def test_model_reference_alerts_on_unseen_rate(standin_service, clock):
+    m = DriftMonitor()
+    m.configure(windows="1m", bucket_seconds=60, min_samples=10)
+    m.register("v3", standin_service.drift_reference())
+    records = patients(20, seed=3)
+    for data in records[:5]:
+        data["sexo"] = "No informado"
+    m.observe("v3", records, standin_service.predict_batch(records))
+
+    result = m.report("v3")["ventanas"]["1m"]
+    sexo = result["categoricas"]["sexo"]
+    assert sexo["psi"] is None and sexo["no_vistas"] == 0.25
+    assert sexo["alerta"] and "sexo" in result["alertas"]
+    assert result["clases"]["psi"] is None
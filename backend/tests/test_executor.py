@@ -0,0 +1,94 @@
+"""Ejecutor de inferencia: cola acotada, ExecutorSaturated y 503 con Retry-After."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.executor import ExecutorSaturated, InferenceExecutor, inference_executor
+from benchmarks.standin import patients
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condición no alcanzada"
+        time.sleep(0.01)
+
+
+def test_run_rejects_when_workers_and_queue_are_full():
+    executor = InferenceExecutor()
+    executor.start("thread", workers=1, max_queue=1, retry_after=7)
+    release = threading.Event()
+
+    async def scenario():
+        # Un worker ocupado y una tarea en cola
+        blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert executor.stats()["in_flight"] == 2
+
+        with pytest.raises(ExecutorSaturated) as excinfo:
+            await executor.run(sum, [1, 2])
+        assert excinfo.value.retry_after == 7
+        stats = executor.stats()
+        assert stats["rejected"] == 1 and stats["queue_depth"] == 1
+
+        release.set()
+        assert await asyncio.gather(*blocked) == [True, True]
+        # Con lugar libre vuelve a aceptar
+        assert await executor.run(sum, [1, 2]) == 3
+
+    try:
+        asyncio.run(scenario())
+        stats = executor.stats()
+        assert stats["in_flight"] == 0 and stats["completed"] == 3 and stats["rejected"] == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.fixture
+def saturated(client):
+    """Ejecutor global con 1 worker y 1 lugar en cola, ambos ocupados por tareas bloqueadas."""
+    previous = (
+        inference_executor.mode,
+        inference_executor.workers,
+        inference_executor.max_queue,
+        inference_executor.retry_after,
+    )
+    inference_executor.start("thread", workers=1, max_queue=1, retry_after=7)
+    release = threading.Event()
+    # Las tareas corren en el event loop de la app (portal del TestClient)
+    blocked = [
+        client.portal.start_task_soon(inference_executor.run, release.wait) for _ in range(2)
+    ]
+    wait_for(lambda: inference_executor.stats()["in_flight"] == 2)
+    yield client
+    release.set()
+    for future in blocked:
+        future.result(timeout=5)
+    inference_executor.start(*previous)
+
+
+def rejected_gauge(client) -> float:
+    for line in client.get("/api/metrics").text.splitlines():
+        if line.startswith('febril_inference_executor{stat="rejected"}'):
+            return float(line.split()[-1])
+    raise AssertionError("gauge de rechazos ausente")
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("/api/predict?explain=true", patients(1, seed=4)[0]),
+        ("/api/predict/batch", {"pacientes": patients(3, seed=4)}),
+    ],
+)
+def test_saturated_executor_returns_503_with_retry_after(saturated, path, body):
+    before = inference_executor.stats()["rejected"]
+    response = saturated.post(path, json=body)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert inference_executor.stats()["rejected"] == before + 1
+    assert rejected_gauge(saturated) == before + 1
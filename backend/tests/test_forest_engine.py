@@ -0,0 +1,196 @@
+"""Paridad del motor compilado con CalibratedClassifierCV.predict_proba."""
+import logging
+
+import numpy as np
+import pytest
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from app.services.forest_engine import (
+    CALIBRATOR_ISOTONIC,
+    CALIBRATOR_SIGMOID,
+    CompiledForest,
+)
+from app.services.ml_service import ExplanationUnavailable, MLService
+from app.services.registry import model_registry
+from benchmarks.standin import patients, write_artifacts
+
+# Misma tolerancia que la verificación al cargar (MLService._compile_engine)
+ATOL = 1e-12
+
+
+def post_ohe_inputs(pipeline: dict, n: int = 300, seed: int = 0) -> np.ndarray:
+    """Entradas en el espacio post-OHE: escalados ~N(0, 1.5) e indicadores 0/1."""
+    rng = np.random.default_rng(seed)
+    n_scaled = len(pipeline["cols_escalar"])
+    X = rng.normal(0.0, 1.5, size=(n, len(pipeline["feature_names_post_ohe"])))
+    X[:, n_scaled:] = rng.integers(0, 2, size=X[:, n_scaled:].shape)
+    return X
+
+
+def assert_parity(model, engine: CompiledForest, X: np.ndarray):
+    np.testing.assert_allclose(engine.predict_proba(X), model.predict_proba(X), rtol=0, atol=ATOL)
+    classes, _ = engine.predict(X)
+    np.testing.assert_array_equal(classes, model.predict(X))
+
+
+def test_matches_predict_proba(calibrated_pipeline):
+    model = calibrated_pipeline["modelo"]
+    engine = CompiledForest.from_sklearn(model)
+    assert engine.n_estimators == len(model.calibrated_classifiers_)
+    assert_parity(model, engine, post_ohe_inputs(calibrated_pipeline))
+
+
+def test_calibrator_tables(calibrated_pipeline):
+    model = calibrated_pipeline["modelo"]
+    engine = CompiledForest.from_sklearn(model)
+    expected = CALIBRATOR_ISOTONIC if model.method == "isotonic" else CALIBRATOR_SIGMOID
+    assert (engine.cal_kind == expected).all()
+    for k, calibrated in enumerate(model.calibrated_classifiers_):
+        for j, calibrator in enumerate(calibrated.calibrators):
+            if expected == CALIBRATOR_SIGMOID:
+                assert tuple(engine.cal_ab[k, j]) == (calibrator.a_, calibrator.b_)
+            else:
+                c = k * engine.class_index.shape[1] + j
+                lo, hi = engine.cal_offsets[c], engine.cal_offsets[c + 1]
+                np.testing.assert_array_equal(engine.cal_x[lo:hi], calibrator.X_thresholds_)
+                np.testing.assert_array_equal(engine.cal_y[lo:hi], calibrator.y_thresholds_)
+
+
+def test_inputs_on_split_thresholds(calibrated_pipeline):
+    """Valores justo en el umbral (y a un ulp) siguen la rama de sklearn (float32)."""
+    model = calibrated_pipeline["modelo"]
+    engine = CompiledForest.from_sklearn(model)
+    internal = np.flatnonzero(np.isfinite(engine.threshold))[:200]
+    X = np.zeros((3 * len(internal), engine.n_features))
+    for i, node in enumerate(internal):
+        threshold = engine.threshold[node]
+        for r, value in enumerate((threshold, np.nextafter(threshold, np.inf), threshold - 1e-9)):
+            X[3 * i + r, engine.feature[node]] = value
+    assert_parity(model, engine, X)
+
+
+def test_extra_trees_sigmoid(standin_pipeline):
+    pipeline = standin_pipeline(
+        "sigmoid", ExtraTreesClassifier(n_estimators=10, min_samples_leaf=2, random_state=1)
+    )
+    engine = CompiledForest.from_sklearn(pipeline["modelo"])
+    assert_parity(pipeline["modelo"], engine, post_ohe_inputs(pipeline, seed=1))
+
+
+@pytest.mark.parametrize("method", ["isotonic", "sigmoid"])
+def test_binary_classes(method):
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(200, 5))
+    y = (X[:, 0] + rng.normal(0, 0.5, 200) > 0).astype(int)
+    model = CalibratedClassifierCV(
+        RandomForestClassifier(n_estimators=8, random_state=2), method=method, cv=3
+    ).fit(X, y)
+    assert_parity(model, CompiledForest.from_sklearn(model), rng.normal(size=(100, 5)))
+
+
+def test_bundle_round_trip(calibrated_pipeline):
+    engine = CompiledForest.from_sklearn(calibrated_pipeline["modelo"])
+    params, arrays = engine.to_arrays()
+    restored = CompiledForest.from_arrays(params, arrays)
+    X = post_ohe_inputs(calibrated_pipeline, seed=3)
+    np.testing.assert_array_equal(restored.predict_proba(X), engine.predict_proba(X))
+
+
+def test_service_predictions_match_sklearn(standin_service):
+    records = patients(100, seed=4)
+    X = standin_service._transform_sklearn(standin_service._build_dataframe(records))
+    expected = standin_service.modelo.predict_proba(X)
+    results = standin_service.predict_batch(records)
+    assert standin_service.engine is not None and standin_service.fallbacks == {}
+    for result, proba in zip(results, expected):
+        assert result["probabilidades"] == {
+            "leve": round(float(proba[0]) * 100, 1),
+            "moderada": round(float(proba[1]) * 100, 1),
+            "severa": round(float(proba[2]) * 100, 1),
+        }
+
+
+def test_unsupported_model_falls_back_visibly(standin_pipeline, tmp_path, caplog):
+    pipeline = standin_pipeline(estimator=LogisticRegression(max_iter=500))
+    spec = write_artifacts(str(tmp_path), pipeline)
+    service = MLService("v3")
+    with caplog.at_level(logging.ERROR, logger="app.services.ml_service"):
+        service.load(spec.pipeline_path, spec.metadata_path, spec.features_path)
+    assert service.engine is None
+    assert "decision_function" in service.fallbacks["motor"]
+    assert any(
+        r.levelno == logging.ERROR and "se usa sklearn" in r.getMessage() for r in caplog.records
+    )
+    # El camino de sklearn sigue atendiendo, sin explicaciones
+    assert len(service.predict_batch(patients(5, seed=5))) == 5
+    assert not service.can_explain
+    with pytest.raises(ExplanationUnavailable):
+        service.predict_batch(patients(5, seed=5), explain=True)
+
+
+def test_fallback_exposed_in_model_info(client, monkeypatch):
+    info = client.get("/api/model/info").json()
+    assert info["fuente"] == "joblib" and info["fallbacks"] == {}
+    assert 'febril_model_fallback{version="v3",component="motor"} 0' in client.get(
+        "/api/metrics"
+    ).text
+
+    monkeypatch.setitem(model_registry.get("v3").fallbacks, "motor", "difiere de sklearn")
+    assert client.get("/api/model/info").json()["fallbacks"] == {"motor": "difiere de sklearn"}
+    assert 'febril_model_fallback{version="v3",component="motor"} 1' in client.get(
+        "/api/metrics"
+    ).text
+
+
+def test_contributions_sum_to_uncalibrated_forest(calibrated_pipeline):
+    model = calibrated_pipeline["modelo"]
+    engine = CompiledForest.from_sklearn(model)
+    X = post_ohe_inputs(calibrated_pipeline, n=200, seed=3)
+    leaves, contributions = engine.apply_contributions(X)
+    assert contributions.shape == (200, engine.n_features, 3)
+    np.testing.assert_array_equal(leaves, engine.apply(X))
+
+    # Promedio de los bosques sin calibrar de cada sub-estimador
+    forest = np.mean(
+        [cc.estimator.predict_proba(X) for cc in model.calibrated_classifiers_], axis=0
+    )
+    np.testing.assert_allclose(engine.bias + contributions.sum(axis=1), forest, atol=1e-12)
+
+    # Agrupadas en el mismo recorrido, la suma se conserva
+    groups = np.arange(engine.n_features) % 4
+    _, grouped = engine.apply_contributions(X, groups, 4)
+    np.testing.assert_allclose(grouped.sum(axis=1), contributions.sum(axis=1), atol=1e-12)
+
+
+def test_explain_keeps_calibrated_probabilities(standin_service):
+    records = patients(30, seed=8, missing_rate=0.3)
+    predictions, probabilities = standin_service._apply_pipeline(records)
+    explained = standin_service._apply_pipeline(records, explain=True)
+    np.testing.assert_array_equal(explained[0], predictions)
+    np.testing.assert_array_equal(explained[1], probabilities)
+
+    for plain, result in zip(
+        standin_service.predict_batch(records), standin_service.predict_batch(records, True)
+    ):
+        assert result["probabilidades"] == plain["probabilidades"]
+        assert result["prediccion"] == plain["prediccion"]
+        explicacion = result["explicacion"]
+        for key in ("leve", "moderada", "severa"):
+            total = explicacion["base"][key] + sum(c[key] for c in explicacion["contribuciones"])
+            assert total == pytest.approx(explicacion["bosque"][key], abs=0.2)
+
+
+def test_explain_returns_501_on_sklearn_fallback(client, monkeypatch):
+    service = model_registry.get("v3")
+    monkeypatch.setattr(service, "engine", None)
+    monkeypatch.setattr(service, "_feature_groups", None)
+    # Pacientes que no están en la caché de predicciones
+    data = patients(2, seed=901)
+
+    response = client.post("/api/predict?explain=true", json=data[0])
+    assert response.status_code == 501
+    assert "no admite explicaciones" in response.json()["detail"]
+    assert client.post("/api/predict/batch?explain=true", json={"pacientes": data}).status_code == 501
+    assert client.post("/api/predict", json=data[0]).status_code == 200
@@ -0,0 +1,173 @@
+"""Historial de evaluaciones: paginación por keyset, cursor, filtros y acceso por usuario."""
+import base64
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.services.evaluations import decode_cursor, encode_cursor, user_history
+from app.services.persistence import COLUMNS, EvaluationWriter, evaluation_row
+
+DATOS = {"grupo_edad": "2-5", "sexo": "Femenino", "area": "Rural", "tiempo_fiebre": 3}
+TIE = "2026-10-18T15:00:00.500000+00:00"
+
+
+def insert(user_id: str, created_at: str, codigo: int = 0, confianza: float | None = 90.0) -> str:
+    """Inserta una evaluación con `created_at` fijo; retorna su id."""
+    result = {
+        "prediccion": ("Leve", "Moderada", "Severa")[codigo],
+        "codigo": codigo,
+        "probabilidades": {"leve": 0.9, "moderada": 0.05, "severa": 0.05},
+        "factores": ["Sin factores"],
+        "confianza": confianza,
+    }
+    row = list(evaluation_row(user_id, DATOS, result, "v3"))
+    row[COLUMNS.index("created_at")] = datetime.fromisoformat(created_at)
+    EvaluationWriter()._insert([tuple(row)])
+    return row[0]
+
+
+@pytest.fixture
+def history(db) -> list[str]:
+    """Ids de user-1 en el orden esperado (created_at DESC, id DESC)."""
+    fixtures = [
+        # 04:30 UTC del 18 = 23:30 del 17 en Colombia
+        ("2026-10-18T04:30:00+00:00", 2, 85.0),
+        ("2026-10-18T05:30:00+00:00", 0, 50.0),
+        ("2026-10-19T12:00:00+00:00", 1, None),
+        # Cinco filas con el mismo created_at: el id desempata
+        *[(TIE, 1, 70.0)] * 5,
+    ]
+    rows = [(insert("user-1", at, codigo, confianza), at) for at, codigo, confianza in fixtures]
+    insert("user-2", TIE, codigo=2, confianza=99.0)
+    rows.sort(key=lambda r: (datetime.fromisoformat(r[1]), r[0]), reverse=True)
+    return [evaluation_id for evaluation_id, _ in rows]
+
+
+def all_pages(limit: int, **filters) -> list[list[str]]:
+    pages, cursor = [], None
+    while True:
+        page = user_history("user-1", limit, cursor=cursor, **filters)
+        pages.append([item["id"] for item in page["items"]])
+        cursor = page["siguiente_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 8, 20])
+def test_pages_cover_every_row_once(history, limit):
+    pages = all_pages(limit)
+    assert [i for page in pages for i in page] == history
+    assert all(len(page) == limit for page in pages[:-1])
+    # Sin página final vacía cuando el total es múltiplo del tamaño
+    assert len(pages) == -(-len(history) // limit)
+
+
+def test_page_rows_have_summary_fields(history):
+    item = user_history("user-1", 1)["items"][0]
+    assert item["id"] == history[0] and item["created_at"] == "2026-10-19T12:00:00+00:00"
+    assert {key: item[key] for key in DATOS} == DATOS
+    assert "datos_paciente" not in item and "probabilidades" not in item
+
+
+@pytest.mark.parametrize(
+    "created_at",
+    [
+        datetime(2026, 10, 18, 15, 0, 0, 500000, tzinfo=timezone.utc),
+        datetime(2026, 10, 18, 15, 0, tzinfo=timezone.utc),
+        "2026-10-18T15:00:00+00:00",
+    ],
+)
+def test_cursor_round_trip(created_at):
+    evaluation_id = str(uuid.uuid4())
+    cursor = encode_cursor(created_at, evaluation_id)
+    assert "=" not in cursor
+    expected = created_at if isinstance(created_at, datetime) else datetime.fromisoformat(created_at)
+    assert decode_cursor(cursor) == (expected, evaluation_id)
+
+
+def b64(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+@pytest.mark.parametrize(
+    "cursor", ["no es un cursor", b64("[1]"), b64('["ayer", "x"]'), b64("{}"), b64("nulo")]
+)
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError, match="cursor inválido"):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({"clase": "moderada"}, [0, 1, 2, 3, 4, 5]),
+        ({"confidence_min": 70.0}, [1, 2, 3, 4, 5, 7]),
+        ({"confidence_min": 50.0, "confidence_max": 70.0}, [1, 2, 3, 4, 5, 6]),
+        # Días en hora de Colombia: la fila de las 04:30 UTC es del 17
+        ({"since": date(2026, 10, 18), "until": date(2026, 10, 18)}, [1, 2, 3, 4, 5, 6]),
+        ({"until": date(2026, 10, 17)}, [7]),
+        ({"since": date(2026, 10, 19), "clase": "moderada"}, [0]),
+    ],
+)
+def test_filters(history, filters, expected):
+    """`expected`: posiciones en el historial completo (más recientes primero)."""
+    pages = all_pages(2, **filters)
+    assert [i for page in pages for i in page] == [history[i] for i in expected]
+
+
+def test_history_routes(client, history):
+    # El usuario de desarrollo no ve las filas de user-1
+    assert client.get("/api/evaluaciones").json() == {"items": [], "siguiente_cursor": None}
+    assert client.get(f"/api/evaluaciones/{history[0]}").status_code == 404
+
+    own = insert("dev-user", "2026-10-20T10:00:00+00:00", codigo=2, confianza=88.0)
+    first = client.get("/api/evaluaciones", params={"limit": 1}).json()
+    assert [item["id"] for item in first["items"]] == [own]
+    assert first["siguiente_cursor"] is None
+
+    detail = client.get(f"/api/evaluaciones/{own}").json()
+    assert detail["datos_paciente"] == DATOS and detail["prediccion"] == "Severa"
+    assert detail["probabilidades"]["leve"] == 0.9 and detail["factores"] == ["Sin factores"]
+
+
+def test_history_routes_with_cursor(client, supabase_auth, history):
+    headers = supabase_auth(sub="user-1")
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 3, "clase": "moderada", **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/evaluaciones", params=params, headers=headers).json()
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["siguiente_cursor"]
+        if cursor is None:
+            break
+    assert ids == history[:6]
+
+    assert client.get(f"/api/evaluaciones/{history[0]}", headers=headers).status_code == 200
+    # user-2 no puede leer la evaluación de user-1
+    other = supabase_auth(sub="user-2")
+    assert client.get(f"/api/evaluaciones/{history[0]}", headers=other).status_code == 404
+    items = client.get("/api/evaluaciones", headers=other).json()["items"]
+    assert [item["prediccion"] for item in items] == ["Severa"]
+
+
+@pytest.mark.parametrize(
+    "params, status",
+    [
+        ({"cursor": "no es un cursor"}, 400),
+        ({"confianza_min": 80, "confianza_max": 20}, 422),
+        ({"desde": "2026-10-19", "hasta": "2026-10-18"}, 422),
+        ({"clase": "grave"}, 422),
+        ({"limit": 0}, 422),
+    ],
+)
+def test_invalid_history_queries(client, db, params, status):
+    response = client.get("/api/evaluaciones", params=params)
+    assert response.status_code == status
+    if status == 400:
+        assert response.json()["detail"] == "cursor inválido."
+
+
+def test_detail_requires_uuid_and_database(client):
+    assert client.get("/api/evaluaciones").status_code == 503
+    assert client.get("/api/evaluaciones/no-es-uuid").status_code == 422
@@ -0,0 +1,228 @@
+"""JWKSManager contra un servidor JWKS local (refresco, refetch y fallback)."""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt as pyjwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from app.config import get_settings
+from app.services import auth
+from app.services.jwks import JWKSManager, jwks_manager
+
+JWKS_PATH = "/auth/v1/.well-known/jwks.json"
+
+
+def signing_key(kid: str):
+    """(clave privada ES256, JWK público con `kid`)."""
+    private = ec.generate_private_key(ec.SECP256R1())
+    jwk = json.loads(pyjwt.algorithms.ECAlgorithm.to_jwk(private.public_key()))
+    jwk.update(kid=kid, alg="ES256", use="sig")
+    return private, jwk
+
+
+class StubJWKS:
+    """Servidor JWKS en un hilo: documento intercambiable, fallas y conteo."""
+
+    def __init__(self):
+        self.keys: list[dict] = []
+        self.status = 200
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                body = json.dumps({"keys": stub.keys}).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        self.base_url = "http://127.0.0.1:%d" % self._server.server_address[1]
+        self.url = self.base_url + JWKS_PATH
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubJWKS()
+    yield server
+    server.close()
+
+
+def run(manager: JWKSManager, scenario):
+    """Ejecuta `scenario(manager)` en un event loop nuevo y detiene el gestor."""
+
+    async def main():
+        try:
+            return await scenario(manager)
+        finally:
+            await manager.stop()
+
+    return asyncio.run(main())
+
+
+def manager_for(stub: StubJWKS, **options) -> JWKSManager:
+    manager = JWKSManager()
+    manager.configure(stub.url, timeout=2.0, **options)
+    return manager
+
+
+def test_start_preloads_keys(stub):
+    _, jwk = signing_key("k1")
+    stub.keys = [jwk]
+
+    async def scenario(manager):
+        await manager.start()
+        return await manager.get_key("k1")
+
+    manager = manager_for(stub)
+    assert run(manager, scenario) is not None
+    assert stub.requests == 1
+    assert manager.stats()["keys"] == 1 and manager.refreshes == 1
+
+
+def test_background_refresh_picks_up_rotation(stub):
+    _, old = signing_key("old")
+    _, new = signing_key("new")
+    stub.keys = [old]
+
+    async def scenario(manager):
+        await manager.start()
+        stub.keys = [new]
+        await asyncio.sleep(0.35)
+        # Sin ninguna consulta: la rotación llegó por el refresco periódico
+        return set(manager._keys)
+
+    manager = manager_for(stub, refresh_interval=0.1)
+    assert run(manager, scenario) == {"new"}
+    assert manager.refreshes >= 2
+
+
+def test_unknown_kid_refetch_is_rate_limited(stub):
+    _, old = signing_key("old")
+    _, new = signing_key("new")
+    stub.keys = [old]
+
+    async def scenario(manager):
+        await manager.start()
+        stub.keys = [old, new]
+        # Dentro de min_refetch_interval desde la precarga: sin refetch
+        early = await manager.get_key("new")
+        assert stub.requests == 1
+        assert early is manager._default  # aún no conocida: clave por defecto
+        await asyncio.sleep(0.25)
+        # Varias solicitudes con el kid nuevo comparten un único refetch
+        found = await asyncio.gather(*(manager.get_key("new") for _ in range(10)))
+        assert stub.requests == 2
+        # Otro kid desconocido enseguida: de nuevo limitado
+        await manager.get_key("desconocido")
+        assert stub.requests == 2
+        return found
+
+    manager = manager_for(stub, min_refetch_interval=0.2)
+    found = run(manager, scenario)
+    assert all(key is manager._keys["new"] for key in found)
+
+
+def test_failed_refresh_keeps_previous_keys(stub):
+    _, jwk = signing_key("k1")
+    stub.keys = [jwk]
+
+    async def scenario(manager):
+        await manager.start()
+        stub.status = 500
+        ok = await manager.refresh()
+        return ok, await manager.get_key("k1")
+
+    manager = manager_for(stub)
+    ok, key = run(manager, scenario)
+    assert ok is False and key is not None
+    assert manager.failures == 1 and manager.stats()["keys"] == 1
+
+
+def test_falls_back_to_default_key_when_endpoint_fails(stub):
+    _, first = signing_key("k1")
+    _, second = signing_key("k2")
+    stub.keys = [first, second]
+
+    async def scenario(manager):
+        await manager.start()
+        stub.status = 503
+        await asyncio.sleep(0.15)
+        # Refetch por kid desconocido que falla: se usa la clave por defecto
+        unknown = await manager.get_key("rotada")
+        # Token sin kid: clave por defecto sin refetch
+        without_kid = await manager.get_key(None)
+        return unknown, without_kid
+
+    manager = manager_for(stub, min_refetch_interval=0.1)
+    unknown, without_kid = run(manager, scenario)
+    assert unknown is manager._keys["k1"] and without_kid is manager._keys["k1"]
+    assert stub.requests == 2 and manager.failures == 1
+
+
+def test_unreachable_endpoint_has_no_keys():
+    manager = JWKSManager()
+    manager.configure("http://127.0.0.1:9/jwks.json", timeout=0.5)
+
+    async def scenario(manager):
+        await manager.start()
+        return await manager.get_key("k1")
+
+    assert run(manager, scenario) is None
+    assert not manager.has_keys and manager.failures >= 1
+
+
+@pytest.fixture
+def supabase_env(stub, monkeypatch):
+    """Settings apuntando al stub (SUPABASE_URL) con caché de tokens vacía."""
+    monkeypatch.setenv("SUPABASE_URL", stub.base_url)
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", "secreto-de-prueba")
+    monkeypatch.setenv("SUPABASE_JWKS_URL", "")
+    get_settings.cache_clear()
+    auth._token_cache.clear()
+    yield
+    jwks_manager.__init__()
+    get_settings.cache_clear()
+    auth._token_cache.clear()
+
+
+def test_verify_jwt_through_stub(stub, supabase_env):
+    """verify_jwt configura el gestor global con la URL estándar de Supabase."""
+    private, first = signing_key("k1")
+    _, second = signing_key("k2")
+    stub.keys = [first, second]
+    claims = {"sub": "user-1", "role": "authenticated", "exp": int(time.time()) + 60}
+    token = pyjwt.encode(claims, private, algorithm="ES256", headers={"kid": "k1"})
+    forged = pyjwt.encode(
+        claims, ec.generate_private_key(ec.SECP256R1()), algorithm="ES256", headers={"kid": "k1"}
+    )
+
+    async def scenario():
+        try:
+            payload = await auth._verify_token(token, {})
+            with pytest.raises(auth.HTTPException) as rejected:
+                await auth._verify_token(forged, {})
+            return payload, rejected.value.status_code
+        finally:
+            await jwks_manager.stop()
+
+    payload, status = asyncio.run(scenario())
+    assert payload["sub"] == "user-1" and status == 401
+    assert jwks_manager.url == stub.url
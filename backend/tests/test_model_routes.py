@@ -0,0 +1,21 @@
+"""Rutas administrativas de /api/model/*: acceso restringido a service_role."""
+import pytest
+
+
+@pytest.mark.parametrize("path", ["/api/model/versions", "/api/model/drift"])
+def test_admin_routes_require_service_role(client, supabase_auth, path):
+    assert client.get(path, headers=supabase_auth("authenticated")).status_code == 403
+    assert client.get(path, headers=supabase_auth("service_role")).status_code == 200
+
+
+def test_versions_reports_artifacts_to_service_role(client, supabase_auth):
+    body = client.get("/api/model/versions", headers=supabase_auth("service_role")).json()
+    assert body["default"] == "v3"
+    (version,) = body["versions"]
+    assert version["version"] == "v3" and version["pipeline_path"].endswith(".pkl")
+
+
+def test_public_model_info_has_no_paths(client, supabase_auth):
+    info = client.get("/api/model/info", headers=supabase_auth("authenticated"))
+    assert info.status_code == 200
+    assert not any("path" in key for key in info.json())
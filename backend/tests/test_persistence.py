@@ -0,0 +1,226 @@
+"""EvaluationWriter y los acumulados de evaluaciones contra SQLite."""
+import asyncio
+import sqlite3
+import time
+from datetime import date, datetime
+
+from app.services.database import database, max_rows_per_statement
+from app.services.evaluations import user_stats
+from app.services.persistence import COLUMNS, EvaluationWriter, evaluation_row
+
+
+def result(codigo: int = 0, confianza: float | None = 90.0, factores=("Sin factores",)) -> dict:
+    return {
+        "prediccion": ("Leve", "Moderada", "Severa")[codigo] if codigo is not None else None,
+        "codigo": codigo,
+        "probabilidades": {"leve": 0.9, "moderada": 0.05, "severa": 0.05},
+        "factores": list(factores),
+        "confianza": confianza,
+    }
+
+
+def count(table: str = "evaluaciones") -> int:
+    return database.fetch_all(f"SELECT count(*) AS n FROM {table}")[0]["n"]
+
+
+def run_writer(scenario, **options) -> EvaluationWriter:
+    """Ejecuta `scenario(writer)` con un escritor en marcha y lo detiene."""
+    options = {
+        "batch_size": 5, "flush_interval": 10.0, "max_pending": 100, "max_backoff": 1.0, **options
+    }
+    writer = EvaluationWriter()
+
+    async def main():
+        writer.start(**options)
+        try:
+            await scenario(writer)
+        finally:
+            await writer.stop()
+
+    asyncio.run(main())
+    return writer
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condición no alcanzada"
+        await asyncio.sleep(0.01)
+
+
+def test_full_batch_is_written_without_waiting_for_interval(db):
+    async def scenario(writer):
+        ids = [writer.record("user-1", {"edad": i}, result(), "v3") for i in range(5)]
+        await wait_for(lambda: count() == 5)
+        assert writer.stats()["pending"] == 0
+        stored = {row["id"] for row in database.fetch_all("SELECT id FROM evaluaciones")}
+        assert stored == set(ids)
+
+    run_writer(scenario, flush_interval=30.0)
+
+
+def test_partial_batch_is_written_after_interval(db):
+    async def scenario(writer):
+        for i in range(3):
+            writer.record("user-1", {"edad": i}, result(), "v3")
+        assert count() == 0
+        await wait_for(lambda: count() == 3)
+
+    run_writer(scenario, batch_size=100, flush_interval=0.05)
+
+
+def test_stop_drains_the_queue(db):
+    async def scenario(writer):
+        for i in range(7):
+            writer.record("user-1", {"edad": i}, result(), "v3")
+
+    writer = run_writer(scenario, batch_size=100, flush_interval=30.0)
+    assert count() == 7 and writer.stats()["written"] == 7
+
+
+def test_anonymous_and_overflow_are_not_queued(db):
+    async def scenario(writer):
+        assert writer.record(None, {}, result(), "v3") is None
+        for i in range(6):
+            writer.record("user-1", {"edad": i}, result(), "v3")
+
+    # max_pending se eleva al tamaño del lote (5); sin ceder el event loop
+    # el escritor no alcanza a vaciar la cola y la sexta fila se descarta
+    writer = run_writer(scenario, batch_size=5, max_pending=1, flush_interval=30.0)
+    assert writer.stats()["dropped"] == 1 and count() == 5
+
+
+def failing_insert(monkeypatch, writer_class, failures: int, after_insert: bool = False) -> list:
+    """_insert que falla `failures` veces (tras insertar, si after_insert)."""
+    original = writer_class._insert
+    calls: list[float] = []
+
+    def insert(self, rows):
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            if after_insert:
+                original(self, rows)
+            raise sqlite3.OperationalError("database is locked")
+        original(self, rows)
+
+    monkeypatch.setattr(writer_class, "_insert", insert)
+    return calls
+
+
+def test_transient_errors_are_retried_with_backoff(db, monkeypatch):
+    calls = failing_insert(monkeypatch, EvaluationWriter, failures=3)
+
+    async def scenario(writer):
+        for i in range(3):
+            writer.record("user-1", {"edad": i}, result(), "v3")
+        await wait_for(lambda: len(calls) == 1)
+        # Mientras tanto se siguen aceptando evaluaciones
+        writer.record("user-1", {"edad": 3}, result(), "v3")
+        await wait_for(lambda: count() == 4)
+
+    writer = run_writer(scenario, batch_size=100, flush_interval=0.05, max_backoff=0.1)
+    stats = writer.stats()
+    assert stats["flush_failures"] == 3 and stats["written"] == 4
+    assert "database is locked" in stats["last_error"]
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    # Espera exponencial desde flush_interval, acotada por max_backoff
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1 and gaps[2] >= 0.1
+    assert gaps[2] < 0.19
+
+
+def test_retrying_a_stored_batch_does_not_duplicate(db, monkeypatch):
+    """El lote se guardó pero el error llegó después: reintento idempotente."""
+    failing_insert(monkeypatch, EvaluationWriter, failures=1, after_insert=True)
+
+    async def scenario(writer):
+        for i in range(5):
+            writer.record("user-1", {"edad": i}, result(codigo=2, confianza=85.0), "v3")
+        await wait_for(lambda: writer.stats()["written"] == 5)
+
+    run_writer(scenario, flush_interval=0.05, max_backoff=0.1)
+    assert count() == 5
+    # ON CONFLICT DO NOTHING: el trigger no acumula las filas ignoradas
+    rollup = database.fetch_all("SELECT total, severa FROM evaluaciones_diarias")
+    assert rollup == [{"total": 5, "severa": 5}]
+
+
+def test_duplicate_ids_are_skipped(db):
+    writer = EvaluationWriter()
+    rows = [evaluation_row("user-1", {"edad": i}, result(), "v3") for i in range(3)]
+    assert writer._write(rows) == (3, 0)
+    assert writer._write(rows + [evaluation_row("user-1", {}, result(), "v3")]) == (4, 0)
+    assert count() == 4
+
+
+def test_invalid_rows_are_rejected_one_by_one(db):
+    async def scenario(writer):
+        for i in range(5):
+            # prediccion_codigo NOT NULL: solo la tercera fila es inválida
+            writer.record("user-1", {"edad": i}, result(codigo=None if i == 2 else 1), "v3")
+        await wait_for(lambda: writer.stats()["rejected"] == 1)
+
+    writer = run_writer(scenario, batch_size=5)
+    stats = writer.stats()
+    assert (stats["written"], stats["rejected"], stats["flush_failures"]) == (4, 1, 0)
+    assert count() == 4
+    assert database.fetch_all("SELECT total FROM evaluaciones_diarias") == [{"total": 4}]
+
+
+def test_large_batches_are_split_by_parameter_limit(db):
+    rows = max_rows_per_statement(database.dialect, len(COLUMNS)) + 10
+    writer = EvaluationWriter()
+    writer._insert([evaluation_row("user-1", {}, result(), "v3") for _ in range(rows)])
+    assert count() == rows
+
+
+def insert_at(user_id: str, created_at: str, **fields):
+    row = list(evaluation_row(user_id, {}, result(**fields), "v3"))
+    row[COLUMNS.index("created_at")] = datetime.fromisoformat(created_at)
+    EvaluationWriter()._insert([tuple(row)])
+
+
+def test_rollup_triggers_match_migration_003(db):
+    # 04:30 UTC = 23:30 del día anterior en Colombia (UTC−5)
+    insert_at(
+        "user-1",
+        "2026-10-18T04:30:00+00:00",
+        codigo=2,
+        confianza=85.0,
+        factores=["Glasgow alterado (10)", "Fiebre alta (39.8 °C)"],
+    )
+    insert_at(
+        "user-1", "2026-10-18T05:30:00.250000+00:00", codigo=0, confianza=60.0,
+        factores=["Glasgow alterado (12)"],
+    )
+    insert_at("user-1", "2026-10-18T20:00:00+00:00", codigo=1, confianza=40.0, factores=[])
+    insert_at("user-1", "2026-10-18T21:00:00+00:00", codigo=1, confianza=None)
+    insert_at("user-2", "2026-10-18T21:00:00+00:00", codigo=2, confianza=99.0)
+
+    daily = database.fetch_all(
+        "SELECT dia, total, leve, moderada, severa, suma_confianza, confianza_alta, "
+        "confianza_media, confianza_baja FROM evaluaciones_diarias "
+        "WHERE user_id = 'user-1' ORDER BY dia"
+    )
+    assert daily == [
+        {"dia": "2026-10-17", "total": 1, "leve": 0, "moderada": 0, "severa": 1,
+         "suma_confianza": 85.0, "confianza_alta": 1, "confianza_media": 0, "confianza_baja": 0},
+        {"dia": "2026-10-18", "total": 3, "leve": 1, "moderada": 2, "severa": 0,
+         "suma_confianza": 100.0, "confianza_alta": 0, "confianza_media": 1, "confianza_baja": 1},
+    ]
+    factors = database.fetch_all(
+        "SELECT dia, factor, n FROM factores_diarios WHERE user_id = 'user-1' ORDER BY dia, factor"
+    )
+    assert factors == [
+        {"dia": "2026-10-17", "factor": "Fiebre alta", "n": 1},
+        {"dia": "2026-10-17", "factor": "Glasgow alterado", "n": 1},
+        {"dia": "2026-10-18", "factor": "Glasgow alterado", "n": 1},
+        {"dia": "2026-10-18", "factor": "Sin factores", "n": 1},
+    ]
+
+    stats = user_stats("user-1", days=7, top_factors=5, today=date(2026, 10, 18))
+    assert stats["total"] == 4
+    assert stats["clases"] == {"leve": 1, "moderada": 2, "severa": 1}
+    assert stats["confianza"] == {"alta": 1, "media": 1, "baja": 1}
+    assert stats["confianza_promedio"] == round(185.0 / 4, 1)
+    assert [p["total"] for p in stats["diario"][-2:]] == [1, 3]
+    assert stats["factores"][0] == {"factor": "Glasgow alterado", "n": 2}
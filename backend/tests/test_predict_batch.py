@@ -0,0 +1,59 @@
+"""POST /api/predict/batch: orden de entrada y errores de validación por registro."""
+import pytest
+
+from benchmarks.standin import patients
+
+
+def predict_one(client, data: dict) -> dict:
+    response = client.post("/api/predict", json=data)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_results_keep_input_order(client):
+    records = patients(6, seed=11, missing_rate=0.3)
+    response = client.post("/api/predict/batch", json={"pacientes": records})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["exitosos"], body["fallidos"]) == (6, 6, 0)
+
+    assert [item["indice"] for item in body["resultados"]] == list(range(6))
+    for item, data in zip(body["resultados"], records):
+        expected = predict_one(client, data)
+        assert item["errores"] is None
+        assert item["resultado"]["probabilidades"] == pytest.approx(expected["probabilidades"])
+        assert item["resultado"]["factores"] == expected["factores"]
+
+
+def test_invalid_records_are_reported_in_place(client):
+    records = patients(5, seed=12)
+    del records[1]["sexo"]
+    records[3]["glasgow"] = "alerta"
+    body = client.post("/api/predict/batch", json={"pacientes": records}).json()
+    assert (body["total"], body["exitosos"], body["fallidos"]) == (5, 3, 2)
+
+    results = body["resultados"]
+    assert [item["indice"] for item in results] == list(range(5))
+    assert [item["resultado"] is None for item in results] == [False, True, False, True, False]
+    assert [e["loc"] for e in results[1]["errores"]] == [["sexo"]]
+    assert [e["loc"] for e in results[3]["errores"]] == [["glasgow"]]
+    # Los válidos se puntúan igual que si el lote no tuviera errores
+    for i in (0, 2, 4):
+        expected = predict_one(client, records[i])
+        assert results[i]["resultado"]["probabilidades"] == pytest.approx(
+            expected["probabilidades"]
+        )
+
+
+def test_all_records_invalid(client):
+    records = [{"sexo": "Femenino"}, {}, {"glasgow": 15}]
+    response = client.post("/api/predict/batch", json={"pacientes": records})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["exitosos"], body["fallidos"]) == (3, 0, 3)
+    assert all(item["resultado"] is None and item["errores"] for item in body["resultados"])
+    assert [item["indice"] for item in body["resultados"]] == [0, 1, 2]
+
+
+def test_empty_batch_is_rejected(client):
+    assert client.post("/api/predict/batch", json={"pacientes": []}).status_code == 422
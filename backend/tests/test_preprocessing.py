@@ -0,0 +1,136 @@
+"""Paridad del preprocesamiento compilado con los transformadores de sklearn."""
+import math
+
+import numpy as np
+import pytest
+
+from app.services.ml_service import MLService
+from app.services.preprocessing import CompiledPreprocessor
+from benchmarks.standin import ARTIFACTS_DIR, patients, transformers
+from benchmarks.synthetic import vocabulary
+
+# Vocabulario de los transformadores versionados (las columnas con raras incluyen 'Otro')
+VOCABULARY = vocabulary(ARTIFACTS_DIR)
+CATEGORIES, RARE = VOCABULARY["categories"], VOCABULARY["rare"]
+
+
+def sklearn_transform(service, records: list[dict]) -> np.ndarray:
+    """Camino de referencia: DataFrame + imputers + OHE + scaler de sklearn."""
+    return service._transform_sklearn(service._build_dataframe(records))
+
+
+def assert_parity(service, records: list[dict]):
+    expected = sklearn_transform(service, records)
+    actual = service.preprocessor.transform(records)
+    assert actual.shape == expected.shape
+    # Mismas operaciones en float64: igualdad exacta, no aproximada
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_compiled_at_load(standin_service):
+    assert isinstance(standin_service.preprocessor, CompiledPreprocessor)
+    assert standin_service.preprocessor.n_features == len(
+        standin_service.feature_names_post_ohe
+    )
+
+
+def test_committed_v3_transformers():
+    """imputer_*_v3.pkl, ohe_v3.pkl y scaler_v3.pkl de artifacts/, sin modelo."""
+    service = MLService("v3")
+    for key, value in transformers(ARTIFACTS_DIR, "v3").items():
+        setattr(service, key, value)
+    service.preprocessor = service._compile_preprocessor()
+    assert service.fallbacks == {}
+    assert service.preprocessor.n_features == len(service.feature_names_post_ohe) == 44
+    records = patients(300, seed=10, missing_rate=0.3, rare_rate=0.1, unknown_rate=0.05)
+    assert_parity(service, records)
+
+
+def test_training_vocabulary(standin_service):
+    assert_parity(standin_service, patients(200, seed=1))
+
+
+@pytest.mark.parametrize("missing", [None, math.nan], ids=["none", "nan"])
+def test_missing_numerics(standin_service, missing):
+    records = patients(20, seed=2, missing_rate=0.0)
+    for i, data in enumerate(records):
+        data["albumina"] = missing
+        if i % 2:
+            data["globulina"] = missing
+            data["pcr"] = missing
+    assert_parity(standin_service, records)
+
+
+def test_missing_flags_follow_none(standin_service):
+    """Los indicadores de missingness se activan solo con None (como _build_row)."""
+    records = patients(2, seed=3, missing_rate=0.0)
+    records[0]["albumina"] = None
+    records[1]["globulina"] = None
+    X = standin_service.preprocessor.transform(records)
+    flags = X[:, len(standin_service.cols_escalar):][:, :2]
+    np.testing.assert_array_equal(flags, [[1.0, 0.0], [0.0, 1.0]])
+    assert_parity(standin_service, records)
+
+
+def test_missing_categorical_uses_mode(standin_service):
+    records = patients(10, seed=4)
+    for data in records:
+        data["exposicion_ambiental"] = math.nan
+    assert_parity(standin_service, records)
+
+
+@pytest.mark.parametrize("field", sorted(RARE))
+def test_rare_categories_grouped_as_otro(standin_service, field):
+    base = patients(len(RARE[field]), seed=5)
+    rare = [dict(data, **{field: value}) for data, value in zip(base, RARE[field])]
+    grouped = [dict(data, **{field: "Otro"}) for data in base]
+    assert_parity(standin_service, rare)
+    np.testing.assert_array_equal(
+        standin_service.preprocessor.transform(rare),
+        standin_service.preprocessor.transform(grouped),
+    )
+
+
+@pytest.mark.parametrize("field", sorted(CATEGORIES))
+def test_unknown_categories_are_ignored(standin_service, field):
+    records = [dict(data, **{field: "__desconocida__"}) for data in patients(5, seed=6)]
+    assert_parity(standin_service, records)
+
+
+def test_dropped_category_encodes_as_zeros(standin_service):
+    """La primera categoría (drop='first') y una desconocida dan la misma fila."""
+    base = patients(1, seed=7)[0]
+    first = dict(base, sexo=CATEGORIES["sexo"][0])
+    unknown = dict(base, sexo="No informado")
+    X = standin_service.preprocessor.transform([first, unknown])
+    np.testing.assert_array_equal(X[0], X[1])
+    assert_parity(standin_service, [first, unknown])
+
+
+def test_int_and_float_numerics(standin_service):
+    records = patients(10, seed=8, missing_rate=0.0)
+    as_float = [
+        {k: float(v) if isinstance(v, int) else v for k, v in data.items()} for data in records
+    ]
+    as_int = [
+        {k: int(v) if isinstance(v, float) and v.is_integer() else v for k, v in data.items()}
+        for data in as_float
+    ]
+    for data in as_int:
+        data["plaquetas"] = 250000
+        data["leucocitos"] = 9000
+    for batch in (records, as_float, as_int):
+        assert_parity(standin_service, batch)
+    np.testing.assert_array_equal(
+        standin_service.preprocessor.transform(records),
+        standin_service.preprocessor.transform(as_float),
+    )
+
+
+def test_bundle_round_trip(standin_service):
+    params, arrays = standin_service.preprocessor.to_arrays()
+    restored = CompiledPreprocessor.from_arrays(params, arrays)
+    records = patients(50, seed=9)
+    np.testing.assert_array_equal(
+        restored.transform(records), standin_service.preprocessor.transform(records)
+    )
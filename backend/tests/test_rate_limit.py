@@ -0,0 +1,95 @@
+"""Token bucket por usuario: límites, headers, 429 y tabla compartida entre procesos."""
+import pytest
+
+from app.services.rate_limit import TokenBucketLimiter, parse_rate, rate_limiter
+from benchmarks.standin import patients
+
+
+@pytest.mark.parametrize(
+    "rate, expected",
+    [
+        ("30/minute", (30, 0.5)),
+        ("5 per second", (5, 5.0)),
+        ("10/5minutes", (10, 10 / 300)),
+        (" 2 / hour ", (2, 2 / 3600)),
+    ],
+)
+def test_parse_rate(rate, expected):
+    count, per_second = parse_rate(rate)
+    assert count == expected[0] and per_second == pytest.approx(expected[1])
+
+
+@pytest.mark.parametrize("rate", ["0/minute", "0 per day", "5/0minutes", "30", "30/week", "-1/minute"])
+def test_invalid_rates_are_rejected(rate):
+    with pytest.raises(ValueError, match="Límite inválido"):
+        parse_rate(rate)
+
+
+def test_zero_rate_is_rejected_at_configure():
+    limiter = TokenBucketLimiter()
+    with pytest.raises(ValueError, match="RATE_LIMIT_ENABLED"):
+        limiter.configure("0/minute", path="memory")
+    assert not limiter.enabled
+
+
+@pytest.fixture
+def limited(client):
+    """Límite de 2 solicitudes por minuto sobre la app de prueba."""
+    rate_limiter.configure("2/minute", path="memory")
+    yield client
+    rate_limiter.close()
+
+
+def test_rejects_with_429_and_retry_after(limited):
+    patient = patients(1, seed=1)[0]
+    responses = [limited.post("/api/predict", json=patient) for _ in range(3)]
+    assert [r.status_code for r in responses] == [200, 200, 429]
+
+    for response, remaining in zip(responses, ("1", "0", "0")):
+        assert response.headers["RateLimit-Limit"] == "2"
+        assert response.headers["RateLimit-Remaining"] == remaining
+    assert "Retry-After" not in responses[0].headers
+    rejected = responses[2]
+    # 2/minute: un token cada 30 s; el bucket completo en ~60 s
+    assert 29 <= int(rejected.headers["Retry-After"]) <= 30
+    assert 59 <= int(rejected.headers["RateLimit-Reset"]) <= 60
+    assert "Demasiadas solicitudes" in rejected.json()["detail"]
+
+    metrics = limited.get("/api/metrics").text
+    assert 'febril_rate_limit_rejections_total{route="/api/predict"}' in metrics
+
+
+def test_disabled_limiter_adds_no_headers(client):
+    response = client.post("/api/predict", json=patients(1, seed=2)[0])
+    assert response.status_code == 200
+    assert "RateLimit-Limit" not in response.headers
+
+
+def test_bucket_is_shared_through_the_file(tmp_path):
+    """Dos limitadores sobre el mismo archivo (dos workers) aplican un único límite."""
+    path = str(tmp_path / "rate-limit")
+    first, second = TokenBucketLimiter(), TokenBucketLimiter()
+    first.configure("3/minute", path=path)
+    second.configure("3/minute", path=path)
+    try:
+        now = 1_000.0
+        decisions = [
+            limiter.take("user-1", now=now) for limiter in (first, second, first, second)
+        ]
+        assert [d.allowed for d in decisions] == [True, True, True, False]
+        assert [d.remaining for d in decisions] == [2, 1, 0, 0]
+        assert decisions[-1].retry_after == pytest.approx(20.0)
+
+        # Otro usuario tiene su propio bucket; el token vuelve tras 20 s en ambos
+        assert second.take("user-2", now=now).allowed
+        assert not first.take("user-1", now=now + 19.0).allowed
+        assert second.take("user-1", now=now + 40.0).allowed
+
+        # Otra configuración reinicia la tabla (y ya no la comparte con la anterior)
+        third = TokenBucketLimiter()
+        third.configure("1/minute", path=path)
+        assert third.take("user-1", now=now + 40.0).allowed
+        third.close()
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,44 @@
+"""Readiness: /api/ready responde 503 hasta que el warm-up pasa por el ejecutor."""
+import pytest
+
+from app import main
+from app.services.executor import inference_executor
+from app.services.startup import StartupTracker
+
+
+@pytest.fixture
+def fresh_startup(client, monkeypatch):
+    """Estado de arranque nuevo (la app de prueba ya completó su warm-up)."""
+    tracker = StartupTracker()
+    monkeypatch.setattr(main, "startup", tracker)
+    return tracker
+
+
+def test_ready_only_after_warm_up(client, fresh_startup):
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+    # Liveness no depende del warm-up
+    assert client.get("/api/health").status_code == 200
+
+    submitted = inference_executor.stats()["submitted"]
+    client.portal.call(main.warm_up)
+    assert inference_executor.stats()["submitted"] == submitted + inference_executor.workers
+
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    state = response.json()
+    assert state["ready"] is True and state["error"] is None
+    assert "warm-up" in state["phases_s"] and state["ready_after_s"] is not None
+
+
+def test_failed_warm_up_keeps_instance_unready(client, fresh_startup, monkeypatch):
+    async def broken():
+        raise RuntimeError("modelo corrupto")
+
+    monkeypatch.setattr(inference_executor, "warm_up", broken)
+    client.portal.call(main.warm_up)
+
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["error"] == "RuntimeError: modelo corrupto"
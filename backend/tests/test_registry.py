@@ -0,0 +1,50 @@
+"""ModelRegistry con dos versiones: una servible y otra con otras variables."""
+import asyncio
+
+import pytest
+
+from app.services.ml_service import MLService, SchemaMismatch
+from app.services.registry import ModelRegistry, ModelSpec
+from benchmarks.standin import patients, write_artifacts
+
+TRIAGE = "Nivel de Triage por el TEP"
+
+
+@pytest.fixture(scope="module")
+def artifacts(tmp_path_factory, standin_pipeline):
+    """v3 y v2c de reemplazo; v2c reemplaza procalcitonina por el triage (como la real)."""
+    directory = tmp_path_factory.mktemp("versiones")
+    write_artifacts(str(directory), standin_pipeline(seed=1))
+    pipeline = standin_pipeline(seed=2)
+    swap = {"Procalcitonina ng/mL": TRIAGE}
+    for key in ("cols_num", "cols_escalar", "features_originales", "feature_names_post_ohe"):
+        pipeline[key] = [swap.get(c, c) for c in pipeline[key]]
+    write_artifacts(str(directory), pipeline, version="v2c")
+    return directory
+
+
+def spec(artifacts, version: str) -> ModelSpec:
+    return ModelSpec.from_artifacts_dir(version, str(artifacts), use_bundle=False)
+
+
+def test_mismatched_version_is_rejected(artifacts):
+    service = MLService("v2c")
+    paths = spec(artifacts, "v2c")
+    with pytest.raises(SchemaMismatch, match=TRIAGE):
+        service.load(paths.pipeline_path, paths.metadata_path, paths.features_path)
+    assert not service.is_loaded
+
+
+def test_registry_keeps_serving_the_valid_version(artifacts):
+    registry = ModelRegistry()
+    registry.load(spec(artifacts, "v3"), default=True)
+    with pytest.raises(SchemaMismatch):
+        registry.load(spec(artifacts, "v2c"))
+    assert [s.version for s in registry.specs()] == ["v3"]
+
+    # Por recarga en caliente: la orden queda fallida con el motivo
+    assert asyncio.run(registry.reload(spec(artifacts, "v2c"), default=True)) is False
+    [status] = registry.reload_status()
+    assert status["state"] == "failed" and TRIAGE in status["error"]
+    assert registry.default_version == "v3"
+    assert len(registry.get().predict_batch(patients(3))) == 3
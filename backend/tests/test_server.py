@@ -0,0 +1,129 @@
+"""Servidor pre-fork real con dos workers: recargas y métricas combinadas."""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere os.fork")
+
+BACKEND = Path(__file__).resolve().parent.parent
+HEADERS = {"Authorization": "Bearer dev"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def server(standin_artifacts):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PIPELINE_PATH=standin_artifacts["pipeline_path"],
+        METADATA_PATH=standin_artifacts["metadata_path"],
+        FEATURES_PATH=standin_artifacts["features_path"],
+        ARTIFACTS_DIR=str(standin_artifacts["dir"]),
+        SUPABASE_URL="",
+        DATABASE_URL="",
+        RATE_LIMIT_ENABLED="false",
+        SERVER_SHARE_INTERVAL="0.2",
+        SERVER_MEMORY_REPORT_INTERVAL="0",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "2"],
+        cwd=BACKEND,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            if httpx.get(base_url + "/api/ready").status_code == 200:
+                break
+        except httpx.TransportError:
+            pass
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            pytest.fail("El servidor pre-fork no arrancó")
+        time.sleep(0.1)
+    yield base_url
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=30)
+
+
+def from_many_workers(url: str, count: int = 40) -> list[dict]:
+    """Solicitudes concurrentes, cada una en su conexión (las reparte el kernel)."""
+    with ThreadPoolExecutor(8) as pool:
+        return list(pool.map(lambda _: httpx.get(url, headers=HEADERS).json(), range(count)))
+
+
+def test_reload_reaches_every_worker(server):
+    workers = {answer["worker"] for answer in from_many_workers(server + "/api/model/versions")}
+    assert len(workers) == 2, "las solicitudes no llegaron a ambos workers"
+
+    response = httpx.post(
+        server + "/api/model/reload", json={"version": "v3"}, headers=HEADERS
+    )
+    assert response.status_code == 202
+
+    deadline = time.monotonic() + 30
+    reloaded: set[int] = set()
+    while reloaded != workers and time.monotonic() < deadline:
+        for answer in from_many_workers(server + "/api/model/versions", count=10):
+            if any(r["version"] == "v3" and r["state"] == "ready" for r in answer["reloads"]):
+                reloaded.add(answer["worker"])
+        time.sleep(0.1)
+    assert reloaded == workers
+
+
+def health_count(base_url: str) -> float:
+    text = httpx.get(base_url + "/api/metrics").text
+    series = 'febril_http_requests_total{method="GET",route="/api/health",status="200"} '
+    for line in text.splitlines():
+        if line.startswith(series):
+            return float(line[len(series):])
+    return 0.0
+
+
+def test_counters_are_combined_across_workers(server):
+    before = health_count(server)
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: httpx.get(server + "/api/health"), range(30)))
+    time.sleep(0.5)  # > SERVER_SHARE_INTERVAL: ambos workers publicaron
+    counts = [health_count(server) for _ in range(10)]
+    assert counts == sorted(counts)
+    assert counts[0] == before + 30
+
+
+def test_restarted_worker_replays_reloads(server):
+    """Un worker reiniciado hereda del padre el modelo original: aplica el registro."""
+    httpx.post(server + "/api/model/reload", json={"version": "v3"}, headers=HEADERS)
+    workers = {answer["worker"] for answer in from_many_workers(server + "/api/model/versions")}
+    victim = min(workers)
+    os.kill(victim, signal.SIGKILL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            answers = from_many_workers(server + "/api/model/versions", count=10)
+        except httpx.TransportError:
+            answers = []
+        fresh = [a for a in answers if a["worker"] not in workers]
+        if fresh:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("El worker no se reinició")
+    assert any(r["version"] == "v3" and r["state"] == "ready" for r in fresh[0]["reloads"])
@@ -0,0 +1,21 @@
+"""benchmarks/synthetic.py sobre los transformadores versionados en artifacts/."""
+from pathlib import Path
+
+import pytest
+
+from app.models.schemas import PatientInput
+from app.services.ml_service import SchemaMismatch
+from benchmarks.synthetic import synthetic_patients, vocabulary
+
+ARTIFACTS = Path(__file__).resolve().parent.parent / "artifacts"
+
+
+def test_v3_vocabulary_uses_api_fields():
+    vocab = vocabulary(str(ARTIFACTS), "v3")
+    assert set(vocab["categories"]) | set(vocab["medians"]) <= set(PatientInput.model_fields)
+    assert len(synthetic_patients(50, vocab, seed=1)) == 50
+
+
+def test_other_schema_is_rejected():
+    with pytest.raises(SchemaMismatch, match="Nivel de Triage por el TEP"):
+        vocabulary(str(ARTIFACTS), "v2c")
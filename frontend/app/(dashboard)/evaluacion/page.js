@@ -26,6 +26,8 @@ export default function EvaluacionPage() {
       const prediction = await predictSeverity(data, token);
       setResult(prediction);
       setPatientData(data);
+      // Con DATABASE_URL el backend ya registró la evaluación
+      setSaved(Boolean(prediction.evaluacion_id));
       setShowModal(true);
     } catch (err) {
       setError(err.message || 'Error al conectar con el servidor de predicción');
@@ -1,7 +1,7 @@
 'use client';
 import { useState, useEffect, useMemo, Fragment } from 'react';
 import { useAuth } from '../../context/AuthContext';
-import { getEvaluaciones } from '../../lib/api';
+import { getEvaluaciones, getHistorial, getEvaluacion, getEstadisticas } from '../../lib/api';
 import { IconSearch, IconHistory, IconChevronLeft, IconChevronRight, IconEdit, IconChevronDown } from '../../components/Icons';
 
 function getBadgeClass(severity) {
@@ -12,6 +12,13 @@ function getBadgeClass(severity) {
 
 const ITEMS_PER_PAGE = 8;
 
+// Rangos de confianza del filtro (límites inclusivos en el backend)
+const CONFIDENCE_RANGES = {
+  'Alta (≥ 80%)': { confianza_min: 80 },
+  'Media (50–79%)': { confianza_min: 50, confianza_max: 79.99 },
+  'Baja (< 50%)': { confianza_max: 49.99 },
+};
+
 /** Muestra un campo con label y valor. Retorna null si no hay valor. */
 function Field({ label, value, color, fullWidth }) {
   if (value === null || value === undefined || value === '' || value === '—') return null;
@@ -58,16 +65,34 @@ export default function HistorialPage() {
   const [page, setPage] = useState(1);
   const [expandedRow, setExpandedRow] = useState(null);
   const [observaciones, setObservaciones] = useState({});
-
-  useEffect(() => { loadEvaluaciones(); }, []);
+  // Historial paginado en el backend (null = aún no se sabe; false = sin
+  // DATABASE_URL, se usan las últimas 200 filas desde Supabase)
+  const [remote, setRemote] = useState(null);
+  const [items, setItems] = useState([]);
+  const [cursors, setCursors] = useState([null]); // cursor de cada página visitada
+  const [nextCursor, setNextCursor] = useState(null);
+  const [filterConfidence, setFilterConfidence] = useState('Todas');
+  const [desde, setDesde] = useState('');
+  const [hasta, setHasta] = useState('');
+  const [serverStats, setServerStats] = useState(null);
+  const [detalles, setDetalles] = useState({});
+
+  useEffect(() => {
+    const savedObs = localStorage.getItem('clinical_observations');
+    if (savedObs) setObservaciones(JSON.parse(savedObs));
+    getEstadisticas({ dias: 1, factores: 0 }).then(setServerStats).catch(() => {});
+  }, []);
+
+  // Cada cambio de filtros vuelve a la primera página
+  useEffect(() => {
+    if (remote !== false) loadPage(1, null);
+  }, [filterSeverity, filterConfidence, desde, hasta]);
 
   async function loadEvaluaciones() {
     setLoading(true);
     try {
       const { data } = await getEvaluaciones(supabase, { limit: 200 });
       setEvaluaciones(data || []);
-      const savedObs = localStorage.getItem('clinical_observations');
-      if (savedObs) setObservaciones(JSON.parse(savedObs));
     } catch (err) {
       console.error('Error cargando historial:', err);
     } finally {
@@ -75,6 +100,47 @@ export default function HistorialPage() {
     }
   }
 
+  async function loadPage(pageNumber, cursor) {
+    setLoading(true);
+    try {
+      const res = await getHistorial({
+        limit: ITEMS_PER_PAGE,
+        cursor,
+        clase: filterSeverity === 'Todas' ? undefined : filterSeverity.toLowerCase(),
+        ...CONFIDENCE_RANGES[filterConfidence],
+        desde: desde || undefined,
+        hasta: hasta || undefined,
+      });
+      setItems(res.items);
+      setNextCursor(res.siguiente_cursor);
+      setCursors((prev) => [...prev.slice(0, pageNumber - 1), cursor]);
+      setPage(pageNumber);
+      setExpandedRow(null);
+      setRemote(true);
+    } catch (err) {
+      if (remote === null) {
+        setRemote(false);
+        await loadEvaluaciones();
+        return;
+      }
+      console.error('Error cargando historial:', err);
+    } finally {
+      setLoading(false);
+    }
+  }
+
+  async function toggleRow(id) {
+    const expand = expandedRow !== id;
+    setExpandedRow(expand ? id : null);
+    if (!expand || !remote || detalles[id]) return;
+    try {
+      const detalle = await getEvaluacion(id);
+      setDetalles((prev) => ({ ...prev, [id]: detalle }));
+    } catch (err) {
+      console.error('Error cargando evaluación:', err);
+    }
+  }
+
   const handleEditObservation = (ev, id) => {
     ev.stopPropagation();
     const current = observaciones[id] || '';
@@ -104,7 +170,9 @@ export default function HistorialPage() {
   }, [evaluaciones, search, filterSeverity]);
 
   const totalPages = Math.ceil(filtered.length / ITEMS_PER_PAGE);
-  const paginated = filtered.slice((page - 1) * ITEMS_PER_PAGE, page * ITEMS_PER_PAGE);
+  const paginated = remote
+    ? items
+    : filtered.slice((page - 1) * ITEMS_PER_PAGE, page * ITEMS_PER_PAGE);
 
   const stats = useMemo(() => ({
     total: evaluaciones.length,
@@ -113,6 +181,8 @@ export default function HistorialPage() {
     severa: evaluaciones.filter((e) => e.prediccion_codigo === 2).length,
   }), [evaluaciones]);
 
+  const shownStats = remote && serverStats ? { total: serverStats.total, ...serverStats.clases } : stats;
+
   const handlePageChange = (p) => { setPage(p); setExpandedRow(null); };
 
   const formatDate = (dateStr) =>
@@ -120,6 +190,17 @@ export default function HistorialPage() {
       year: 'numeric', month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit',
     });
 
+  /** Detalle de una fila; en el historial del backend se pide al expandirla. */
+  function renderDetail(e) {
+    const full = remote ? detalles[e.id] : e;
+    if (!full) {
+      return (
+        <div style={{ padding: '1.25rem 1.5rem', color: 'var(--text-muted)' }}>Cargando detalle...</div>
+      );
+    }
+    return <DetailPanel datos={full.datos_paciente} probs={full.probabilidades} factores={full.factores} />;
+  }
+
   /** Panel expandido con toda la información V3 */
   function DetailPanel({ datos, probs, factores }) {
     const d = datos || {};
@@ -197,19 +278,19 @@ export default function HistorialPage() {
       {/* Summary stats */}
       <div className="kpi-grid" style={{ marginBottom: '1.5rem' }}>
         <div className="kpi-card">
-          <div className="kpi-value">{stats.total}</div>
+          <div className="kpi-value">{shownStats.total}</div>
           <div className="kpi-label">Total Evaluaciones</div>
         </div>
         <div className="kpi-card">
-          <div className="kpi-value" style={{ color: 'var(--severity-low)' }}>{stats.leve}</div>
+          <div className="kpi-value" style={{ color: 'var(--severity-low)' }}>{shownStats.leve}</div>
           <div className="kpi-label">Leve</div>
         </div>
         <div className="kpi-card">
-          <div className="kpi-value" style={{ color: 'var(--severity-mid)' }}>{stats.moderada}</div>
+          <div className="kpi-value" style={{ color: 'var(--severity-mid)' }}>{shownStats.moderada}</div>
           <div className="kpi-label">Moderada</div>
         </div>
         <div className="kpi-card">
-          <div className="kpi-value" style={{ color: 'var(--severity-high)' }}>{stats.severa}</div>
+          <div className="kpi-value" style={{ color: 'var(--severity-high)' }}>{shownStats.severa}</div>
           <div className="kpi-label">Severa</div>
         </div>
       </div>
@@ -217,17 +298,49 @@ export default function HistorialPage() {
       {/* Search & Filter */}
       <div className="card">
         <div className="search-bar">
-          <div className="search-input-wrapper">
-            <span className="search-icon"><IconSearch /></span>
-            <input
-              className="input"
-              type="text"
-              placeholder="Buscar por severidad, edad, sexo, área..."
-              value={search}
-              onChange={(e) => { setSearch(e.target.value); setPage(1); }}
-              style={{ paddingLeft: '2.5rem' }}
-            />
-          </div>
+          {remote ? (
+            <>
+              <input
+                className="input"
+                type="date"
+                title="Desde"
+                value={desde}
+                max={hasta || undefined}
+                onChange={(e) => setDesde(e.target.value)}
+                style={{ maxWidth: '170px' }}
+              />
+              <input
+                className="input"
+                type="date"
+                title="Hasta"
+                value={hasta}
+                min={desde || undefined}
+                onChange={(e) => setHasta(e.target.value)}
+                style={{ maxWidth: '170px' }}
+              />
+              <select
+                className="select"
+                value={filterConfidence}
+                onChange={(e) => setFilterConfidence(e.target.value)}
+                style={{ maxWidth: '180px' }}
+              >
+                <option>Todas</option>
+                {Object.keys(CONFIDENCE_RANGES).map((label) => <option key={label}>{label}</option>)}
+              </select>
+            </>
+          ) : (
+            <div className="search-input-wrapper">
+              <span className="search-icon"><IconSearch /></span>
+              <input
+                className="input"
+                type="text"
+                placeholder="Buscar por severidad, edad, sexo, área..."
+                value={search}
+                onChange={(e) => { setSearch(e.target.value); setPage(1); }}
+                style={{ paddingLeft: '2.5rem' }}
+              />
+            </div>
+          )}
           <select
             className="select"
             value={filterSeverity}
@@ -242,7 +355,9 @@ export default function HistorialPage() {
         </div>
 
         <div style={{ fontSize: '0.8rem', color: 'var(--text-muted)', marginBottom: '0.75rem' }}>
-          Mostrando {paginated.length} de {filtered.length} evaluaciones
+          {remote
+            ? `Página ${page} · ${paginated.length} evaluaciones`
+            : `Mostrando ${paginated.length} de ${filtered.length} evaluaciones`}
         </div>
 
         {loading ? (
@@ -267,14 +382,14 @@ export default function HistorialPage() {
                 </thead>
                 <tbody>
                   {paginated.map((e) => {
-                    const datos = e.datos_paciente || {};
+                    // Las filas del backend traen los campos del listado sin datos_paciente
+                    const datos = e.datos_paciente || e;
                     const isExpanded = expandedRow === e.id;
-                    const probs = e.probabilidades || {};
 
                     return (
                       <Fragment key={e.id}>
                         <tr
-                          onClick={() => setExpandedRow(isExpanded ? null : e.id)}
+                          onClick={() => toggleRow(e.id)}
                           style={{
                             cursor: 'pointer',
                             background: isExpanded ? 'rgba(255,255,255,0.03)' : 'transparent',
@@ -324,7 +439,7 @@ export default function HistorialPage() {
                         {isExpanded && (
                           <tr>
                             <td colSpan={7} style={{ padding: 0, borderBottom: '2px solid var(--accent)' }}>
-                              <DetailPanel datos={datos} probs={probs} factores={e.factores} />
+                              {renderDetail(e)}
                             </td>
                           </tr>
                         )}
@@ -338,9 +453,8 @@ export default function HistorialPage() {
             {/* ── Mobile Cards ────────────────────────────── */}
             <div className="eval-cards mobile-only">
               {paginated.map((e) => {
-                const datos = e.datos_paciente || {};
+                const datos = e.datos_paciente || e;
                 const isExpanded = expandedRow === e.id;
-                const probs = e.probabilidades || {};
                 const severityColor =
                   e.prediccion === 'Leve' ? 'var(--severity-low)' :
                     e.prediccion === 'Moderada' ? 'var(--severity-mid)' :
@@ -354,7 +468,7 @@ export default function HistorialPage() {
                   >
                     {/* Header — clic expande */}
                     <div
-                      onClick={() => setExpandedRow(isExpanded ? null : e.id)}
+                      onClick={() => toggleRow(e.id)}
                       style={{ cursor: 'pointer', padding: '0.85rem 1rem' }}
                     >
                       <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'flex-start' }}>
@@ -403,7 +517,7 @@ export default function HistorialPage() {
                     {/* Expandido: toda la información */}
                     {isExpanded && (
                       <div style={{ borderTop: '1px solid var(--border)' }}>
-                        <DetailPanel datos={datos} probs={probs} factores={e.factores} />
+                        {renderDetail(e)}
 
                         {/* Observación editable */}
                         <div
@@ -435,7 +549,18 @@ export default function HistorialPage() {
         )}
 
         {/* Pagination */}
-        {totalPages > 1 && (
+        {remote && (page > 1 || nextCursor) && (
+          <div className="pagination">
+            <button disabled={loading || page === 1} onClick={() => loadPage(page - 1, cursors[page - 2])}>
+              <IconChevronLeft style={{ width: 14, height: 14 }} />
+            </button>
+            <button className="active">{page}</button>
+            <button disabled={loading || !nextCursor} onClick={() => loadPage(page + 1, nextCursor)}>
+              <IconChevronRight style={{ width: 14, height: 14 }} />
+            </button>
+          </div>
+        )}
+        {!remote && totalPages > 1 && (
           <div className="pagination">
             <button disabled={page === 1} onClick={() => handlePageChange(page - 1)}>
               <IconChevronLeft style={{ width: 14, height: 14 }} />
@@ -1,12 +1,44 @@
 'use client';
-import { useState, useEffect, useMemo } from 'react';
+import { useState, useEffect } from 'react';
 import { useAuth } from '../../context/AuthContext';
-import { getEvaluaciones } from '../../lib/api';
+import { getEstadisticas, getEvaluaciones } from '../../lib/api';
 import { IconPerformance, IconActivity, IconCheck, IconShield, IconTrendingUp, IconInfo } from '../../components/Icons';
 
+/** Estadísticas calculadas en el navegador (backend sin DATABASE_URL). */
+function statsFromEvaluaciones(evaluaciones) {
+  const total = evaluaciones.length;
+  const leve = evaluaciones.filter((e) => e.prediccion === 'Leve').length;
+  const moderada = evaluaciones.filter((e) => e.prediccion === 'Moderada').length;
+  const severa = evaluaciones.filter((e) => e.prediccion === 'Severa').length;
+  const avgConfianza = total > 0
+    ? (evaluaciones.reduce((s, e) => s + (e.confianza || 0), 0) / total).toFixed(1)
+    : 0;
+
+  // Confidence distribution
+  const highConf = evaluaciones.filter((e) => e.confianza >= 80).length;
+  const medConf = evaluaciones.filter((e) => e.confianza >= 50 && e.confianza < 80).length;
+  const lowConf = evaluaciones.filter((e) => e.confianza < 50).length;
+
+  return { total, leve, moderada, severa, avgConfianza, highConf, medConf, lowConf };
+}
+
+/** Estadísticas agregadas por el backend (todo el historial). */
+function statsFromServer(s) {
+  return {
+    total: s.total,
+    leve: s.clases.leve,
+    moderada: s.clases.moderada,
+    severa: s.clases.severa,
+    avgConfianza: s.confianza_promedio != null ? s.confianza_promedio.toFixed(1) : 0,
+    highConf: s.confianza.alta,
+    medConf: s.confianza.media,
+    lowConf: s.confianza.baja,
+  };
+}
+
 export default function RendimientoPage() {
   const { supabase } = useAuth();
-  const [evaluaciones, setEvaluaciones] = useState([]);
+  const [stats, setStats] = useState(() => statsFromEvaluaciones([]));
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -16,32 +48,20 @@ export default function RendimientoPage() {
   async function loadData() {
     setLoading(true);
     try {
-      const { data } = await getEvaluaciones(supabase, { limit: 500 });
-      setEvaluaciones(data || []);
-    } catch (err) {
-      console.error('Error cargando evaluaciones:', err);
+      setStats(statsFromServer(await getEstadisticas()));
+    } catch {
+      // Sin estadísticas en el servidor: últimas 500 evaluaciones
+      try {
+        const { data } = await getEvaluaciones(supabase, { limit: 500 });
+        setStats(statsFromEvaluaciones(data || []));
+      } catch (err) {
+        console.error('Error cargando evaluaciones:', err);
+      }
     } finally {
       setLoading(false);
     }
   }
 
-  const stats = useMemo(() => {
-    const total = evaluaciones.length;
-    const leve = evaluaciones.filter((e) => e.prediccion === 'Leve').length;
-    const moderada = evaluaciones.filter((e) => e.prediccion === 'Moderada').length;
-    const severa = evaluaciones.filter((e) => e.prediccion === 'Severa').length;
-    const avgConfianza = total > 0
-      ? (evaluaciones.reduce((s, e) => s + (e.confianza || 0), 0) / total).toFixed(1)
-      : 0;
-
-    // Confidence distribution
-    const highConf = evaluaciones.filter((e) => e.confianza >= 80).length;
-    const medConf = evaluaciones.filter((e) => e.confianza >= 50 && e.confianza < 80).length;
-    const lowConf = evaluaciones.filter((e) => e.confianza < 50).length;
-
-    return { total, leve, moderada, severa, avgConfianza, highConf, medConf, lowConf };
-  }, [evaluaciones]);
-
   // Percentages for donut chart
   const pctLeve = stats.total > 0 ? ((stats.leve / stats.total) * 100).toFixed(1) : 0;
   const pctModerada = stats.total > 0 ? ((stats.moderada / stats.total) * 100).toFixed(1) : 0;
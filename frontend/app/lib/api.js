@@ -8,6 +8,17 @@ import { supabase } from './supabase';
 // que hace proxy server-side al backend (elimina CORS)
 const API_URL = '';
 
+/**
+ * Header Authorization con el JWT de la sesión actual.
+ */
+async function authHeaders() {
+    const { data: { session } } = await supabase.auth.getSession();
+    if (!session?.access_token) {
+        throw new Error('No hay sesión activa. Inicie sesión nuevamente.');
+    }
+    return { Authorization: `Bearer ${session.access_token}` };
+}
+
 /**
  * Realiza una predicción de severidad febril.
  * @param {Object} data - 15 variables clínicas
@@ -106,6 +117,58 @@ export async function getEvaluaciones(supabase, { limit = 50, offset = 0 } = {})
     return { data, count };
 }
 
+/**
+ * Estadísticas agregadas del usuario calculadas por el backend
+ * (requiere DATABASE_URL; 503 si no está configurado).
+ */
+export async function getEstadisticas({ dias = 90, factores = 10 } = {}) {
+    const params = new URLSearchParams({ dias, factores });
+    const res = await fetch(`${API_URL}/api/evaluaciones/estadisticas?${params}`, {
+        headers: await authHeaders(),
+    });
+    if (!res.ok) {
+        const error = await res.json().catch(() => ({}));
+        throw new Error(error.detail || `Error ${res.status}`);
+    }
+    return res.json();
+}
+
+/**
+ * Página del historial paginada por cursor en el backend, del más reciente
+ * al más antiguo. Filtros opcionales: clase ('leve' | 'moderada' | 'severa'),
+ * confianza_min / confianza_max y desde / hasta (YYYY-MM-DD). Para la página
+ * siguiente se pasa `cursor: siguiente_cursor` con los mismos filtros
+ * (requiere DATABASE_URL; 503 si no está configurado).
+ */
+export async function getHistorial({ limit = 20, ...filtros } = {}) {
+    const params = new URLSearchParams({ limit });
+    for (const [key, value] of Object.entries(filtros)) {
+        if (value !== undefined && value !== null && value !== '') params.set(key, value);
+    }
+    const res = await fetch(`${API_URL}/api/evaluaciones?${params}`, {
+        headers: await authHeaders(),
+    });
+    if (!res.ok) {
+        const error = await res.json().catch(() => ({}));
+        throw new Error(error.detail || `Error ${res.status}`);
+    }
+    return res.json();
+}
+
+/**
+ * Evaluación completa (datos del paciente, probabilidades y factores).
+ */
+export async function getEvaluacion(id) {
+    const res = await fetch(`${API_URL}/api/evaluaciones/${encodeURIComponent(id)}`, {
+        headers: await authHeaders(),
+    });
+    if (!res.ok) {
+        const error = await res.json().catch(() => ({}));
+        throw new Error(error.detail || `Error ${res.status}`);
+    }
+    return res.json();
+}
+
 /**
  * Obtiene estadísticas del dashboard.
  */
@@ -0,0 +1,9 @@
+-- ============================================================
+-- Registro de evaluaciones por el backend
+-- ============================================================
+-- El backend inserta con su propia conexión (DATABASE_URL, rol con
+-- permisos sobre la tabla; no pasa por RLS), generando el id y created_at.
+-- ============================================================
+
+-- Versión del modelo que produjo la predicción (NULL en filas anteriores)
+ALTER TABLE evaluaciones ADD COLUMN IF NOT EXISTS modelo_version TEXT;
@@ -0,0 +1,127 @@
+-- ============================================================
+-- Estadísticas de evaluaciones acumuladas (GET /api/evaluaciones/estadisticas)
+-- ============================================================
+-- Cada INSERT en evaluaciones (desde el backend o desde el navegador)
+-- actualiza los acumulados de su usuario y día, de modo que el panel de
+-- rendimiento lee O(días) filas en lugar de todo el historial.
+-- El día es la fecha en hora de Colombia (UTC−5, sin horario de verano).
+-- ============================================================
+
+BEGIN;
+
+-- 1. Acumulados por usuario y día
+CREATE TABLE IF NOT EXISTS evaluaciones_diarias (
+  user_id UUID REFERENCES profiles(id) ON DELETE CASCADE NOT NULL,
+  dia DATE NOT NULL,
+  total INT NOT NULL DEFAULT 0,
+  leve INT NOT NULL DEFAULT 0,
+  moderada INT NOT NULL DEFAULT 0,
+  severa INT NOT NULL DEFAULT 0,
+  suma_confianza DOUBLE PRECISION NOT NULL DEFAULT 0,
+  confianza_alta INT NOT NULL DEFAULT 0,   -- confianza >= 80
+  confianza_media INT NOT NULL DEFAULT 0,  -- 50 <= confianza < 80
+  confianza_baja INT NOT NULL DEFAULT 0,   -- confianza < 50
+  PRIMARY KEY (user_id, dia)
+);
+
+-- 2. Frecuencia de factores por usuario y día (sin el valor entre paréntesis:
+--    "Glasgow alterado (10)" → "Glasgow alterado")
+CREATE TABLE IF NOT EXISTS factores_diarios (
+  user_id UUID REFERENCES profiles(id) ON DELETE CASCADE NOT NULL,
+  dia DATE NOT NULL,
+  factor TEXT NOT NULL,
+  n INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, dia, factor)
+);
+
+-- 3. Trigger: acumular cada evaluación nueva
+CREATE OR REPLACE FUNCTION public.acumular_evaluacion()
+RETURNS TRIGGER AS $$
+DECLARE
+  d DATE := (NEW.created_at AT TIME ZONE 'America/Bogota')::date;
+BEGIN
+  INSERT INTO public.evaluaciones_diarias AS e (
+    user_id, dia, total, leve, moderada, severa,
+    suma_confianza, confianza_alta, confianza_media, confianza_baja
+  )
+  VALUES (
+    NEW.user_id, d, 1,
+    (NEW.prediccion_codigo = 0)::int,
+    (NEW.prediccion_codigo = 1)::int,
+    (NEW.prediccion_codigo = 2)::int,
+    COALESCE(NEW.confianza, 0),
+    COALESCE(NEW.confianza >= 80, false)::int,
+    COALESCE(NEW.confianza >= 50 AND NEW.confianza < 80, false)::int,
+    COALESCE(NEW.confianza < 50, false)::int
+  )
+  ON CONFLICT (user_id, dia) DO UPDATE SET
+    total = e.total + EXCLUDED.total,
+    leve = e.leve + EXCLUDED.leve,
+    moderada = e.moderada + EXCLUDED.moderada,
+    severa = e.severa + EXCLUDED.severa,
+    suma_confianza = e.suma_confianza + EXCLUDED.suma_confianza,
+    confianza_alta = e.confianza_alta + EXCLUDED.confianza_alta,
+    confianza_media = e.confianza_media + EXCLUDED.confianza_media,
+    confianza_baja = e.confianza_baja + EXCLUDED.confianza_baja;
+
+  INSERT INTO public.factores_diarios AS f (user_id, dia, factor, n)
+  SELECT NEW.user_id, d, split_part(x, ' (', 1), count(*)
+  FROM jsonb_array_elements_text(COALESCE(NEW.factores, '[]'::jsonb)) AS x
+  GROUP BY 3
+  ON CONFLICT (user_id, dia, factor) DO UPDATE SET n = f.n + EXCLUDED.n;
+
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Sin inserciones concurrentes mientras se crea el trigger y se rellena
+LOCK TABLE evaluaciones IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS on_evaluacion_created ON evaluaciones;
+
+CREATE TRIGGER on_evaluacion_created
+  AFTER INSERT ON evaluaciones
+  FOR EACH ROW
+  EXECUTE FUNCTION public.acumular_evaluacion();
+
+-- 4. Relleno con el historial existente
+TRUNCATE evaluaciones_diarias, factores_diarios;
+
+INSERT INTO evaluaciones_diarias (
+  user_id, dia, total, leve, moderada, severa,
+  suma_confianza, confianza_alta, confianza_media, confianza_baja
+)
+SELECT
+  user_id,
+  (created_at AT TIME ZONE 'America/Bogota')::date,
+  count(*),
+  count(*) FILTER (WHERE prediccion_codigo = 0),
+  count(*) FILTER (WHERE prediccion_codigo = 1),
+  count(*) FILTER (WHERE prediccion_codigo = 2),
+  COALESCE(sum(confianza), 0),
+  count(*) FILTER (WHERE confianza >= 80),
+  count(*) FILTER (WHERE confianza >= 50 AND confianza < 80),
+  count(*) FILTER (WHERE confianza < 50)
+FROM evaluaciones
+GROUP BY 1, 2;
+
+INSERT INTO factores_diarios (user_id, dia, factor, n)
+SELECT e.user_id, (e.created_at AT TIME ZONE 'America/Bogota')::date, split_part(x, ' (', 1), count(*)
+FROM evaluaciones e, jsonb_array_elements_text(COALESCE(e.factores, '[]'::jsonb)) AS x
+GROUP BY 1, 2, 3;
+
+-- 5. RLS: cada médico ve solo sus acumulados
+ALTER TABLE evaluaciones_diarias ENABLE ROW LEVEL SECURITY;
+ALTER TABLE factores_diarios ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own evaluaciones_diarias" ON evaluaciones_diarias;
+CREATE POLICY "Users can view own evaluaciones_diarias"
+  ON evaluaciones_diarias FOR SELECT
+  USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can view own factores_diarios" ON factores_diarios;
+CREATE POLICY "Users can view own factores_diarios"
+  ON factores_diarios FOR SELECT
+  USING (auth.uid() = user_id);
+
+COMMIT;
@@ -0,0 +1,29 @@
+-- ============================================================
+-- Índices del historial paginado (GET /api/evaluaciones)
+-- ============================================================
+-- El historial se pagina por keyset sobre (created_at, id), del más
+-- reciente al más antiguo y siempre filtrado por usuario:
+--   WHERE user_id = $1 [AND prediccion_codigo = $2]
+--     AND (created_at, id) < ($3, $4)
+--   ORDER BY created_at DESC, id DESC LIMIT n
+-- Con estos índices cada página es un recorrido de n entradas del
+-- índice, sin ordenar ni saltar filas, sin importar el largo del
+-- historial. Los filtros de fecha usan el mismo rango del índice; el de
+-- confianza se evalúa sobre las filas recorridas.
+--
+-- En tablas grandes, fuera del SQL Editor (que corre en una transacción),
+-- se pueden crear con CREATE INDEX CONCURRENTLY para no bloquear inserts.
+-- ============================================================
+
+-- 1. Historial del usuario (también filtros por fecha)
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_user_historial
+  ON evaluaciones (user_id, created_at DESC, id DESC);
+
+-- 2. Historial filtrado por clase
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_user_clase_historial
+  ON evaluaciones (user_id, prediccion_codigo, created_at DESC, id DESC);
+
+-- 3. idx_evaluaciones_user_id queda cubierto por el prefijo de (1)
+DROP INDEX IF EXISTS idx_evaluaciones_user_id;
+
+ANALYZE evaluaciones;